@@ -0,0 +1,168 @@
+"""
+BENCHMARK: server.py cold start - import, listening, ready, first frame
+PURPOSE: Measure what a fresh server process costs before it can serve:
+           import_s        `import server` in a fresh interpreter
+           listening_s     process start -> first HTTP response
+           ready_s         process start -> /readyz 200 (servers without
+                           /readyz: /stats 200, i.e. model loaded)
+           first_frame_ms  first "landmark" -> "prediction" on a new client
+           next_frame_ms   median of the following frames (warm path)
+         --ref runs the same measurement against another git revision
+         (checked out into a temporary worktree) for before / after numbers.
+USAGE (from jars_project_onnx/):
+  python benchmarks/bench_cold_start.py [--runs 5] [--out results/cold_start.json]
+  python benchmarks/bench_cold_start.py --ref HEAD~1 --out results/cold_start_before.json
+  python benchmarks/bench_cold_start.py --compare results/cold_start_before.json
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+from bench_results import build_results, load_results, metric, print_comparison, save_results  # noqa: E402
+
+POLL_S = 0.01
+
+
+def status(url):
+    """HTTP status of url, or None when nothing answers yet"""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def import_seconds(project_dir, env):
+    code = "import time; t = time.perf_counter(); import server; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=project_dir, env=env, capture_output=True, text=True,
+                         timeout=300)
+    if out.returncode != 0:
+        raise SystemExit(f"`import server` failed:\n{out.stderr[-2000:]}")
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def frame_latencies(url, frames):
+    """Seconds from emit to prediction for each frame, sent one after another"""
+    import socketio
+    sio = socketio.Client(reconnection=False)
+    got = threading.Event()
+    sio.on("prediction", lambda data: got.set())
+    sio.connect(url, transports=["websocket"], wait_timeout=30)
+    latencies = []
+    for frame in frames:
+        got.clear()
+        t0 = time.perf_counter()
+        sio.emit("landmark", {"vector": frame.tolist(), "normalized": False})
+        if not got.wait(30):
+            raise SystemExit("No prediction within 30 s")
+        latencies.append(time.perf_counter() - t0)
+    sio.disconnect()
+    return latencies
+
+
+def one_run(project_dir, port, env, frames, log_path):
+    url = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen([sys.executable, "server.py"], cwd=project_dir, env=env, stdout=log,
+                                stderr=subprocess.STDOUT)
+    try:
+        listening = ready = None
+        ready_path = None
+        deadline = time.perf_counter() + 300
+        while ready is None and time.perf_counter() < deadline:
+            if proc.poll() is not None:
+                raise SystemExit(f"server.py exited with {proc.returncode}; see {log_path}")
+            if listening is None:
+                if status(url + "/healthz") is not None:
+                    listening = time.perf_counter() - t0
+                    ready_path = "/readyz" if status(url + "/readyz") != 404 else "/stats"
+            if listening is not None and status(url + ready_path) == 200:
+                ready = time.perf_counter() - t0
+                break
+            time.sleep(POLL_S)
+        if ready is None:
+            raise SystemExit(f"server.py was not ready within 300 s; see {log_path}")
+        latencies = frame_latencies(url, frames)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    return listening, ready, latencies[0], float(np.median(latencies[1:]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ref", default=None, help="Git revision to measure instead of the working tree")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--frames", type=int, default=20, help="Frames sent after ready (first + warm ones)")
+    parser.add_argument("--port", type=int, default=5077)
+    parser.add_argument("--server-env", nargs="*", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="cold_start_")
+    project_dir = PROJECT_DIR
+    repo_root = None
+    if args.ref:
+        repo_root = subprocess.run(["git", "rev-parse", "--show-toplevel"], cwd=PROJECT_DIR, capture_output=True,
+                                   text=True, check=True).stdout.strip()
+        tree = os.path.join(workdir, "tree")
+        subprocess.run(["git", "worktree", "add", "--detach", tree, args.ref], cwd=repo_root, check=True,
+                       capture_output=True)
+        project_dir = os.path.join(tree, os.path.relpath(PROJECT_DIR, repo_root))
+
+    env = dict(os.environ, PORT=str(args.port), HOST="127.0.0.1", **dict(kv.split("=", 1) for kv in args.server_env))
+    frames = np.random.default_rng(0).random((args.frames + 1, 1530), dtype=np.float32)
+    rows = []
+    try:
+        imports = [import_seconds(project_dir, env) for _ in range(args.runs)]
+        for i in range(args.runs):
+            rows.append(one_run(project_dir, args.port, env, frames, os.path.join(workdir, f"server_{i}.log")))
+            print(f"run {i + 1}: listening {rows[-1][0]:.2f}s, ready {rows[-1][1]:.2f}s, "
+                  f"first frame {rows[-1][2] * 1000:.1f} ms, next {rows[-1][3] * 1000:.1f} ms")
+    finally:
+        if repo_root:
+            subprocess.run(["git", "worktree", "remove", "--force", os.path.join(workdir, "tree")], cwd=repo_root,
+                           capture_output=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    listening, ready, first, warm = (np.median([r[k] for r in rows]) for k in range(4))
+    metrics = {
+        "import_s": metric(np.median(imports), "lower", "s"),
+        "listening_s": metric(listening, "lower", "s"),
+        "ready_s": metric(ready, "lower", "s"),
+        "first_frame_ms": metric(first * 1000.0, "lower", "ms"),
+        "next_frame_ms": metric(warm * 1000.0, "lower", "ms"),
+    }
+    print(f"median of {args.runs} runs" + (f" ({args.ref})" if args.ref else ""))
+    for name, entry in metrics.items():
+        print(f"  {name:<16} {entry['value']:>9.3f} {entry['unit']}")
+
+    result = build_results("cold_start", {"ref": args.ref, "runs": args.runs, "server_env": args.server_env},
+                           metrics)
+    if args.out:
+        save_results(args.out, result)
+        print(f"Saved {args.out}")
+    if args.compare:
+        ok = print_comparison(load_results(args.compare), result, args.tolerance)
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
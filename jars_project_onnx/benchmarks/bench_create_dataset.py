@@ -0,0 +1,209 @@
+"""
+BENCHMARK: Streaming parallel create_dataset.py vs the original list-and-concatenate script
+PURPOSE: Wall time and peak memory of building X.npy / y.npy from a large
+         generated JSONL corpus
+WORKFLOW:
+  1. Generate --gb of JSONL recordings (random landmark frames, 5 labels)
+  2. Run the original implementation (copied below) in a subprocess
+  3. Run preprocess/create_dataset.py in a subprocess
+  4. Report wall time, peak RSS of the main process, and peak RSS summed over
+     the process tree (workers included, sampled from /proc). The tree is
+     also reported as anonymous memory only: dirty pages of the memory-mapped
+     X.npy count towards RSS but are page cache the kernel can write back
+  5. Check both produced the same rows and labels
+USAGE (from jars_project_onnx/):
+  python benchmarks/bench_create_dataset.py [--gb 2] [--workers N] [--workdir /tmp/bench_ds]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from glob import glob
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+LABELS = ("Hello", "I Love You", "No", "Thank You", "Yes")
+
+
+# ============ ORIGINAL IMPLEMENTATION ============
+def legacy_create_dataset(raw_glob, out_dir):
+    """Copy of the pre-streaming script: per-file lists, one concatenate at the end"""
+    from preprocess.normalize import normalize_batch
+
+    X, y, classes = [], [], {}
+    for file in glob(raw_glob):
+        vectors, labels = [], []
+        with open(file) as f:
+            for line in f:
+                row = json.loads(line)
+                vectors.append(row["vector"])
+                label = row["label"]
+                if label not in classes:
+                    classes[label] = len(classes)
+                labels.append(classes[label])
+        if not vectors:
+            continue
+        block = np.asarray(vectors, dtype=np.float32)
+        normalize_batch(block, out=block)
+        X.append(block)
+        y.append(np.asarray(labels, dtype=np.int64))
+    X = np.concatenate(X)
+    y = np.concatenate(y)
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "X.npy"), X)
+    np.save(os.path.join(out_dir, "y.npy"), y)
+    with open(os.path.join(out_dir, "classes.json"), "w") as f:
+        json.dump(classes, f, indent=2)
+
+
+# ============ CORPUS ============
+def generate_corpus(raw_dir, gigabytes, seed=0):
+    """Write ~gigabytes of JSONL split over one file per label"""
+    os.makedirs(raw_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    # Distinct template frames (hand only / hand + face), formatted once
+    templates = []
+    for i in range(64):
+        vec = np.zeros(1530, dtype=np.float32)
+        vec[:63] = rng.random(63)
+        if i % 2:
+            vec[126:] = rng.random(1404)
+        templates.append(json.dumps([float(v) for v in vec]))
+    target = int(gigabytes * 2**30)
+    per_file = target // len(LABELS)
+    rows = 0
+    for label in LABELS:
+        path = os.path.join(raw_dir, f"data_{label}.jsonl")
+        written = 0
+        with open(path, "w") as f:
+            while written < per_file:
+                line = f'{{"timestamp": {rows * 0.033:.3f}, "label": "{label}", "vector": {templates[rows % 64]}}}\n'
+                f.write(line)
+                written += len(line)
+                rows += 1
+    return rows
+
+
+# ============ MEASUREMENT ============
+def tree_rss_bytes(pid):
+    """(VmRSS, RssAnon) summed over pid and all its descendants (Linux /proc)"""
+    total = anon = 0
+    stack = [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                    elif line.startswith("RssAnon:"):
+                        anon += int(line.split()[1]) * 1024
+            for task in os.listdir(f"/proc/{p}/task"):
+                with open(f"/proc/{p}/task/{task}/children") as f:
+                    stack.extend(int(c) for c in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return total, anon
+
+
+def measure(cmd, cwd):
+    """Run cmd; return (wall seconds, peak main-process RSS, peak tree RSS, peak tree anon)"""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.DEVNULL)
+    peak_tree = [0, 0]
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            rss, anon = tree_rss_bytes(proc.pid)
+            peak_tree[0] = max(peak_tree[0], rss)
+            peak_tree[1] = max(peak_tree[1], anon)
+            done.wait(0.02)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - t0
+    done.set()
+    sampler.join()
+    if status != 0:
+        raise SystemExit(f"{cmd} failed with status {status}")
+    return elapsed, usage.ru_maxrss * 1024, peak_tree[0], peak_tree[1]
+
+
+def same_dataset(dir_a, classes_a, dir_b, classes_b):
+    """Same multiset of (row, label name), regardless of row order and ids"""
+    names = []
+    for d, c in ((dir_a, classes_a), (dir_b, classes_b)):
+        with open(c) as f:
+            inv = {v: k for k, v in json.load(f).items()}
+        X = np.load(os.path.join(d, "X.npy"), mmap_mode="r")
+        y = np.load(os.path.join(d, "y.npy"))
+        # Hash rows in blocks to stay within memory
+        digests = []
+        for i in range(0, len(y), 8192):
+            block = np.ascontiguousarray(X[i:i + 8192])
+            digests.extend(hash((row.tobytes(), inv[int(label)])) for row, label in zip(block, y[i:i + 8192]))
+        names.append(sorted(digests))
+    return names[0] == names[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gb", type=float, default=2.0, help="Size of the generated JSONL corpus")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--workdir", default="/tmp/bench_create_dataset")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only run the streaming pipeline")
+    parser.add_argument("--legacy", nargs=2, metavar=("RAW_GLOB", "OUT_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.legacy:
+        legacy_create_dataset(*args.legacy)
+        return
+
+    raw_dir = os.path.join(args.workdir, "data_raw")
+    raw_glob = os.path.join(raw_dir, "*.jsonl")
+    if not glob(raw_glob):
+        print(f"Generating {args.gb} GB of JSONL in {raw_dir}...")
+        rows = generate_corpus(raw_dir, args.gb)
+        print(f"  {rows} frames")
+    corpus = sum(os.path.getsize(p) for p in glob(raw_glob))
+    print(f"Corpus: {corpus / 2**30:.2f} GB, {os.cpu_count()} CPUs")
+
+    results = {}
+    legacy_dir = os.path.join(args.workdir, "legacy")
+    if not args.skip_legacy:
+        results["original"] = measure(
+            [sys.executable, os.path.abspath(__file__), "--legacy", raw_glob, legacy_dir], PROJECT_DIR)
+
+    stream_dir = os.path.join(args.workdir, "streaming")
+    stream_classes = os.path.join(stream_dir, "classes.json")
+    os.makedirs(stream_dir, exist_ok=True)
+    cmd = [sys.executable, os.path.join(PROJECT_DIR, "preprocess", "create_dataset.py"),
+           "--raw", raw_glob, "--out-dir", stream_dir, "--classes", stream_classes, "--reset-classes"]
+    if args.workers:
+        cmd += ["--workers", str(args.workers)]
+    results["streaming"] = measure(cmd, PROJECT_DIR)
+
+    print(f"\n{'pipeline':<10} {'wall s':>8} {'MB/s':>8} {'peak RSS main MB':>17} {'peak RSS tree MB':>17} {'tree anon MB':>13}")
+    for name, (wall, rss, tree, anon) in results.items():
+        print(f"{name:<10} {wall:>8.1f} {corpus / 2**20 / wall:>8.1f} {rss / 2**20:>17.0f} {tree / 2**20:>17.0f} "
+              f"{anon / 2**20:>13.0f}")
+
+    if "original" in results:
+        ok = same_dataset(legacy_dir, os.path.join(legacy_dir, "classes.json"), stream_dir, stream_classes)
+        print(f"\nSame rows and labels: {ok}")
+        if not ok:
+            sys.exit(1)
+    shutil.rmtree(legacy_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
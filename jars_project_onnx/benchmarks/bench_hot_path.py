@@ -0,0 +1,101 @@
+"""
+MICROBENCHMARKS: The serving hot path, one function at a time
+PURPOSE: Track the per-call cost of what server.py does for every frame /
+         batch, isolated from sockets and scheduling:
+           normalize_vector   one frame into a reused row (server path)
+           softmax            (N, classes) logits, N = each batch size
+           session.run        (N, dim) rows, N = each batch size
+         Results are saved in the bench_results.py format, so a run can be
+         compared with an earlier one (--compare) to catch regressions.
+TIMING: median over --repeats rounds of the mean call time in a round, one
+        ORT intra-op thread (the per-core cost) unless --threads is given
+USAGE (from jars_project_onnx/):
+  python benchmarks/bench_hot_path.py [--batch-sizes 1 8 32] [--out results/hot_path.json]
+  python benchmarks/bench_hot_path.py --out results/new.json --compare results/base.json
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+from bench_normalize import make_frames  # noqa: E402
+from bench_results import build_results, load_results, metric, print_comparison, save_results  # noqa: E402
+from preprocess.normalize import normalize_vector  # noqa: E402
+from serving.session import create_session, softmax  # noqa: E402
+
+
+def time_us(fn, calls, repeats):
+    """Median (over repeats) of the mean per-call time in microseconds"""
+    for _ in range(min(calls, 10)):
+        fn()
+    rounds = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        rounds.append((time.perf_counter() - t0) / calls * 1e6)
+    return float(np.median(rounds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.path.join(PROJECT_DIR, "model", "model.onnx"))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--threads", type=int, default=1, help="ORT intra-op threads")
+    parser.add_argument("--calls", type=int, default=2000, help="Calls per round (divided by N for session.run)")
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Save results here (bench_results.py format)")
+    parser.add_argument("--compare", default=None, help="Result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    session = create_session(args.model, intra_op_threads=args.threads)
+    model_input = session.get_inputs()[0]
+    dim = model_input.shape[-1]
+    num_classes = session.get_outputs()[0].shape[-1]
+    frames = make_frames(rng, 256)[:, :dim] if dim <= 1530 else rng.random((256, dim), dtype=np.float32)
+    row = np.empty(dim, dtype=np.float32)
+    metrics = {}
+
+    i = [0]
+
+    def normalize_one():
+        normalize_vector(frames[i[0] % len(frames)], out=row)
+        i[0] += 1
+
+    us = time_us(normalize_one, args.calls, args.repeats)
+    metrics["normalize_vector_us"] = metric(us, "lower", "us")
+    print(f"normalize_vector: {us:.2f} us/frame ({dim} values)")
+
+    print(f"{'batch':>5} {'softmax us':>11} {'run us':>9} {'run us/frame':>13}")
+    for n in args.batch_sizes:
+        logits = rng.standard_normal((n, num_classes)).astype(np.float32)
+        x = np.ascontiguousarray(frames[np.arange(n) % len(frames)])
+        feeds = {model_input.name: x}
+        soft = time_us(lambda: softmax(logits), args.calls, args.repeats)
+        run = time_us(lambda: session.run(None, feeds), max(10, args.calls // n), args.repeats)
+        metrics[f"softmax_b{n}_us"] = metric(soft, "lower", "us")
+        metrics[f"session_run_b{n}_us"] = metric(run, "lower", "us")
+        metrics[f"session_run_b{n}_us_per_frame"] = metric(run / n, "lower", "us")
+        print(f"{n:>5} {soft:>11.2f} {run:>9.1f} {run / n:>13.2f}")
+
+    config = {"model": os.path.relpath(args.model, PROJECT_DIR), "dim": dim, "classes": num_classes,
+              "threads": args.threads, "batch_sizes": args.batch_sizes}
+    result = build_results("hot_path", config, metrics)
+    if args.out:
+        save_results(args.out, result)
+        print(f"Saved {args.out}")
+    if args.compare:
+        ok = print_comparison(load_results(args.compare), result, args.tolerance)
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
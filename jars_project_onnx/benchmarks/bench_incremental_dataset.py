@@ -0,0 +1,79 @@
+"""
+BENCHMARK: Incremental create_dataset.py builds
+PURPOSE: Show that adding one new recording to a large corpus costs about the
+         same no matter how large the corpus already is, while a full build
+         grows with it
+WORKFLOW (for each corpus size):
+  1. Generate the corpus (5 labels, bench_create_dataset.generate_corpus)
+  2. Full build (--full)
+  3. No-op build (nothing changed: stat checks only)
+  4. Add one ~300-frame recording with a new label, incremental build
+  5. --verify
+USAGE (from jars_project_onnx/):
+  python benchmarks/bench_incremental_dataset.py [--gb 0.25 0.5 1] [--workdir /tmp/bench_incremental]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+from bench_create_dataset import generate_corpus  # noqa: E402
+
+SCRIPT = os.path.join(PROJECT_DIR, "preprocess", "create_dataset.py")
+
+
+def write_recording(path, label, frames=300, seed=1):
+    """One save_landmarks.py-sized session"""
+    rng = np.random.default_rng(seed)
+    with open(path, "w") as f:
+        for i in range(frames):
+            vec = np.zeros(1530, dtype=np.float32)
+            vec[:63] = rng.random(63)
+            vec[126:] = rng.random(1404)
+            f.write(json.dumps({"timestamp": i * 0.033, "label": label, "vector": [float(v) for v in vec]}) + "\n")
+
+
+def timed(args):
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, SCRIPT] + args, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gb", type=float, nargs="+", default=[0.25, 0.5, 1.0], help="Corpus sizes")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--workdir", default="/tmp/bench_incremental")
+    args = parser.parse_args()
+
+    print(f"{'corpus GB':>9} {'rows':>8} {'full s':>8} {'no-op s':>8} {'+1 file s':>10} {'verify s':>9}")
+    for gb in args.gb:
+        root = os.path.join(args.workdir, f"{gb:g}gb")
+        shutil.rmtree(root, ignore_errors=True)
+        raw_dir = os.path.join(root, "data_raw")
+        generate_corpus(raw_dir, gb)
+        common = ["--raw", os.path.join(raw_dir, "*.jsonl"), "--out-dir", os.path.join(root, "out"),
+                  "--classes", os.path.join(root, "classes.json")]
+        if args.workers:
+            common += ["--workers", str(args.workers)]
+
+        full = timed(common + ["--full"])
+        noop = timed(common)
+        write_recording(os.path.join(raw_dir, "data_Please.jsonl"), "Please")
+        add_one = timed(common)
+        verify = timed(common + ["--verify"])
+        rows = len(np.load(os.path.join(root, "out", "y.npy"), mmap_mode="r"))
+        print(f"{gb:>9g} {rows:>8} {full:>8.1f} {noop:>8.2f} {add_one:>10.2f} {verify:>9.1f}")
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
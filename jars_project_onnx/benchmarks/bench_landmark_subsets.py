@@ -0,0 +1,158 @@
+"""
+BENCHMARK: Landmark subsets - bytes on the wire, server CPU and accuracy
+PURPOSE: Decide which subset (preprocess/landmark_subsets.py) to train and
+         serve: what each one saves per frame and what it costs in accuracy
+WORKFLOW (per subset):
+  1. Build a dataset with create_dataset.py --subset from the same recordings
+  2. Train the default SignMLP (train.py loader + training.fit with early
+     stopping) and export it with the subset in its metadata
+  3. Payload: Socket.IO packet bytes of one frame as json / f32 / f16 / i16q
+  4. Server CPU per frame, one thread: normalize_vector + session.run at
+     batch 1, and per frame of a batch of 32; "map us" is the extra np.take
+     for clients that still send full 1530-value frames
+  5. Held-out accuracy of the exported model (train.py's 80/20 split)
+RECORDINGS: --raw "data_raw/*" for real captures. Without it synthetic
+  recordings from bench_recording_format.py are used; their labels are
+  separable by construction, so the accuracy column then only checks the
+  pipeline, while bytes and CPU are representative either way.
+USAGE (from jars_project_onnx/):
+  python benchmarks/bench_landmark_subsets.py [--raw "data_raw/*"] [--subsets full hands hands_anchors]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+import torch
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, os.path.join(PROJECT_DIR, "model"))
+from bench_recording_format import generate_recordings  # noqa: E402
+from build_variants import accuracy  # noqa: E402
+from preprocess.landmark_subsets import LANDMARK_SUBSETS, subset_columns, subset_dim  # noqa: E402
+from preprocess.normalize import VECTOR_DIM, normalize_vector  # noqa: E402
+from serving.session import create_session  # noqa: E402
+from serving.wire import BINARY_DTYPES, encode_binary  # noqa: E402
+from sweep import held_out  # noqa: E402
+from train import SignMLP, export_onnx, load_dataset  # noqa: E402
+from training import fit  # noqa: E402
+
+CREATE_DATASET = os.path.join(PROJECT_DIR, "preprocess", "create_dataset.py")
+BATCH = 32
+
+
+def build(raw_glob, root, subset):
+    out_dir = os.path.join(root, subset)
+    subprocess.run([sys.executable, CREATE_DATASET, "--raw", raw_glob, "--out-dir", out_dir,
+                    "--classes", os.path.join(root, "classes.json"), "--subset", subset, "--full"],
+                   check=True, stdout=subprocess.DEVNULL)
+    return out_dir
+
+
+def train(data_dir, num_classes, onnx_path, epochs, seed):
+    torch.manual_seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        _, num_features, train_loader, test_loader = load_dataset(data_dir, seed=seed)
+        model = SignMLP(num_features, num_classes)
+        fit(model, train_loader, test_loader, epochs, patience=3)
+        export_onnx(model, num_features, onnx_path)
+
+
+def payload_bytes(vec):
+    """Socket.IO packet size of one frame per wire format"""
+    sizes = {"json": len(("42" + json.dumps(["landmark", {"vector": vec.tolist(), "normalized": False}])).encode())}
+    header = len('451-["landmark",{"_placeholder":true,"num":0}]')
+    for fmt in BINARY_DTYPES:
+        sizes[fmt] = header + len(encode_binary(vec, fmt))
+    return sizes
+
+
+def cpu_us(fn, runs):
+    """Process CPU time per call in microseconds"""
+    for _ in range(10):
+        fn()
+    t0 = time.process_time()
+    for _ in range(runs):
+        fn()
+    return (time.process_time() - t0) / runs * 1e6
+
+
+def server_cpu(session, frames, columns, runs):
+    """(map us, batch 1 us, per-frame us in a batch of 32)"""
+    name = session.get_inputs()[0].name
+    dim = session.get_inputs()[0].shape[-1]
+    row = np.empty(dim, dtype=np.float32)
+    batch = np.empty((BATCH, dim), dtype=np.float32)
+    subset_frames = frames if columns is None else np.ascontiguousarray(frames[:, columns])
+    full = frames[0]
+
+    def map_full():
+        np.take(full, columns, out=row)
+
+    def one():
+        session.run(None, {name: normalize_vector(subset_frames[0], out=row)[None]})
+
+    def batched():
+        for i in range(BATCH):
+            normalize_vector(subset_frames[i], out=batch[i])
+        session.run(None, {name: batch})
+
+    mapped = cpu_us(map_full, runs * 10) if columns is not None else 0.0
+    return mapped, cpu_us(one, runs), cpu_us(batched, max(1, runs // 4)) / BATCH
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--raw", default=None, help="Glob of recordings (default: synthetic recordings)")
+    parser.add_argument("--frames", type=int, default=20000, help="Synthetic frames over all labels")
+    parser.add_argument("--subsets", nargs="+", default=list(LANDMARK_SUBSETS), choices=list(LANDMARK_SUBSETS))
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=2000, help="Timed batch-1 calls per subset")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default="/tmp/bench_landmark_subsets")
+    args = parser.parse_args()
+
+    shutil.rmtree(args.workdir, ignore_errors=True)
+    raw_glob = args.raw
+    if raw_glob is None:
+        raw_dir = os.path.join(args.workdir, "raw")
+        generate_recordings(raw_dir, args.frames, args.seed)
+        raw_glob = os.path.join(raw_dir, "*")
+
+    results = []
+    for subset in args.subsets:
+        t0 = time.perf_counter()
+        data_dir = build(raw_glob, args.workdir, subset)
+        with open(os.path.join(args.workdir, "classes.json")) as f:
+            num_classes = len(json.load(f))
+        onnx_path = os.path.join(args.workdir, f"{subset}.onnx")
+        train(data_dir, num_classes, onnx_path, args.epochs, args.seed)
+        X_test, y_test = held_out(data_dir)
+        session = create_session(onnx_path, intra_op_threads=1)
+        # Raw (unnormalized) full frames for the CPU measurement
+        frames = np.random.default_rng(args.seed).random((BATCH, VECTOR_DIM), dtype=np.float32)
+        columns = None if subset == "full" else subset_columns(subset)
+        mapped, one, batched = server_cpu(session, frames, columns, args.runs)
+        sample = frames[0] if columns is None else frames[0, columns]
+        results.append((subset, subset_dim(subset), payload_bytes(sample), mapped, one, batched,
+                        accuracy(session, X_test, y_test), time.perf_counter() - t0))
+
+    print(f"{'subset':<14} {'values':>6} {'json B':>7} {'f32 B':>6} {'f16 B':>6} {'i16q B':>6} "
+          f"{'map us':>7} {'b1 us':>7} {'b32 us':>7} {'accuracy':>9} {'build+train s':>14}")
+    for subset, dim, sizes, mapped, one, batched, acc, seconds in results:
+        print(f"{subset:<14} {dim:>6} {sizes['json']:>7} {sizes['f32']:>6} {sizes['f16']:>6} {sizes['i16q']:>6} "
+              f"{mapped:>7.1f} {one:>7.1f} {batched:>7.1f} {acc:>9.2%} {seconds:>14.1f}")
+
+    shutil.rmtree(args.workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
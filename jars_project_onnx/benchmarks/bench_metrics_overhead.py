@@ -0,0 +1,78 @@
+"""
+BENCHMARK: Per-frame cost of the hot-path instrumentation (serving/metrics.py)
+PURPOSE: Check that leaving /metrics on stays within a few microseconds per
+         frame. Replays exactly the calls server.py makes for one frame
+         (frame_in, start, decode / normalize / submit / handler laps, then
+         start + emit lap + frame_out on delivery, plus one session_run /
+         softmax lap pair per batch of 32) with instrumentation enabled and
+         disabled, against an empty loop of the same shape.
+USAGE (from jars_project_onnx/):
+  python benchmarks/bench_metrics_overhead.py [--frames 200000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from serving.metrics import HotPathMetrics  # noqa: E402
+
+STAGES = ("decode", "normalize", "submit", "session_run", "softmax", "emit", "handler")
+BATCH = 32
+
+
+def instrumented(metrics, frames):
+    for i in range(frames):
+        metrics.frame_in()
+        t0 = t = metrics.start()
+        t = metrics.lap("decode", t)
+        t = metrics.lap("normalize", t)
+        metrics.lap("submit", t)
+        metrics.lap("handler", t0)
+        if i % BATCH == 0:
+            t = metrics.start()
+            t = metrics.batch_lap("session_run", t)
+            metrics.batch_lap("softmax", t)
+        t = metrics.start()
+        metrics.lap("emit", t)
+        metrics.frame_out()
+
+
+def baseline(frames):
+    for i in range(frames):
+        if i % BATCH == 0:
+            pass
+
+
+def ns_per_frame(fn, frames, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(frames)
+        best = min(best, time.perf_counter() - t0)
+    return best / frames * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=200000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    enabled = HotPathMetrics(STAGES, enabled=True)
+    disabled = HotPathMetrics(STAGES, enabled=False)
+    base = ns_per_frame(baseline, args.frames, args.repeats)
+    on = ns_per_frame(lambda n: instrumented(enabled, n), args.frames, args.repeats)
+    off = ns_per_frame(lambda n: instrumented(disabled, n), args.frames, args.repeats)
+
+    print(f"{'mode':<10} {'ns/frame':>9} {'overhead ns':>12}")
+    print(f"{'none':<10} {base:>9.0f} {0:>12.0f}")
+    print(f"{'disabled':<10} {off:>9.0f} {off - base:>12.0f}")
+    print(f"{'enabled':<10} {on:>9.0f} {on - base:>12.0f}")
+    print(f"Recorded {enabled.stages['handler'].count} handler samples; "
+          f"render() of the full exposition: {len(enabled.render())} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+BENCHMARK + CHECK: Batched normalize_batch vs the original per-frame normalize_vector
+PURPOSE:
+  1. Parity: the vectorized version matches the original loop implementation,
+     on a uniform [0, 1) mix and on clustered two-hands-plus-face frames
+     (small or distant faces: every point within a few thousandths of ~0.7,
+     where summing raw squares would cancel)
+  2. Throughput for a single frame (serving) and 10k frames (preprocessing)
+USAGE (from jars_project_onnx/):
+  python benchmarks/bench_normalize.py [--frames 10000]
+Exits non-zero if the parity check fails.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocess.normalize import normalize_batch, normalize_vector  # noqa: E402
+
+
+def legacy_normalize_vector(vec):
+    """Original one-frame implementation (copy of the pre-vectorization code)"""
+    arr = np.asarray(vec, dtype=np.float32)
+    pts = arr.reshape(-1, 3)
+    hand_pts = pts[:42]
+    face_pts = pts[42:]
+    if np.any(face_pts):
+        ref = np.mean(face_pts, axis=0)
+    else:
+        ref = np.mean(hand_pts, axis=0)
+    pts[:, :2] = pts[:, :2] - ref[:2]
+    std = np.std(pts[:, :2])
+    if std > 1e-6:
+        pts[:, :2] = pts[:, :2] / std
+    return pts.flatten().astype(np.float32)
+
+
+def make_frames(rng, n):
+    """Mix of realistic frames: one hand + face, hand only, two hands, empty"""
+    x = np.zeros((n, 510, 3), dtype=np.float32)
+    kind = rng.integers(0, 4, size=n)
+    x[:, :21] = rng.random((n, 21, 3), dtype=np.float32)
+    x[kind == 2, 21:42] = rng.random((int(np.sum(kind == 2)), 21, 3), dtype=np.float32)
+    has_face = kind != 1
+    x[has_face, 42:] = rng.random((int(has_face.sum()), 468, 3), dtype=np.float32)
+    x[kind == 3] = 0.0
+    return x.reshape(n, -1)
+
+
+def make_clustered_frames(rng, n, spreads=(0.05, 0.01, 0.002)):
+    """Two hands + face, no zero padding, points spread around ~0.7 (z around 0)"""
+    spread = np.repeat(np.asarray(spreads, dtype=np.float32), -(-n // len(spreads)))[:n]
+    center = 0.7 + rng.uniform(-0.05, 0.05, size=(n, 1, 3)).astype(np.float32)
+    center[:, :, 2] = 0.0
+    x = center + spread[:, None, None] * rng.standard_normal((n, 510, 3), dtype=np.float32)
+    return x.astype(np.float32).reshape(n, -1)
+
+
+def exact_normalize_vector(vec):
+    """The same transform in float64: the truth both implementations are held to"""
+    pts = np.asarray(vec, dtype=np.float64).reshape(-1, 3).copy()
+    ref = np.mean(pts[42:], axis=0) if np.any(pts[42:]) else np.mean(pts[:42], axis=0)
+    pts[:, :2] -= ref[:2]
+    std = np.std(pts[:, :2])
+    if std > 1e-6:
+        pts[:, :2] /= std
+    return pts.reshape(-1)
+
+
+def check_parity(name, x, exact=False):
+    """
+    normalize_batch / normalize_vector against the legacy loop, or (exact=True,
+    for clustered frames whose float32 inputs alone cost both versions
+    ~1e-4) no further from the float64 result than the legacy loop is
+    """
+    expected = np.stack([legacy_normalize_vector(row.copy()) for row in x])
+    got = normalize_batch(x)
+    np.testing.assert_allclose(normalize_batch(x.reshape(-1, 510, 3)).reshape(x.shape), got, rtol=0, atol=0)
+    np.testing.assert_allclose(normalize_vector(x[0]), got[0], rtol=1e-6, atol=1e-6)
+    if exact:
+        truth = np.stack([exact_normalize_vector(row) for row in x])
+        legacy_error = np.max(np.abs(expected - truth), axis=1)
+        error = np.max(np.abs(got - truth), axis=1)
+        worst = int(np.argmax(error - 1.5 * legacy_error))
+        assert error[worst] <= max(1e-5, 1.5 * legacy_error[worst]), \
+            f"{name} frame {worst}: error {error[worst]:.2e}, legacy {legacy_error[worst]:.2e}"
+        print(f"Parity OK on {len(x)} {name} frames (max error vs float64 {error.max():.2e}, "
+              f"legacy {legacy_error.max():.2e})")
+    else:
+        np.testing.assert_allclose(got, expected, rtol=1e-5, atol=1e-5)
+        print(f"Parity OK on {len(x)} {name} frames (max abs diff {np.max(np.abs(got - expected)):.2e})")
+
+
+def best_of(fn, repeats=5):
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=10000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    x = make_frames(rng, args.frames)
+
+    # ============ PARITY ============
+    check_parity("mixed", x)
+    check_parity("clustered", make_clustered_frames(rng, min(args.frames, 3000)), exact=True)
+    print()
+
+    # ============ THROUGHPUT ============
+    one = x[0].copy()
+    out_one = np.empty_like(one)
+    out_all = np.empty_like(x)
+    reps = 2000
+    rows = [
+        ("1 frame, legacy", best_of(lambda: [legacy_normalize_vector(one.copy()) for _ in range(reps)]) / reps, 1),
+        ("1 frame, normalize_vector(out=)", best_of(lambda: [normalize_vector(one, out=out_one) for _ in range(reps)]) / reps, 1),
+        (f"{args.frames} frames, legacy loop", best_of(lambda: [legacy_normalize_vector(r.copy()) for r in x], 2), args.frames),
+        (f"{args.frames} frames, normalize_batch(out=)", best_of(lambda: normalize_batch(x, out=out_all)), args.frames),
+    ]
+    print(f"{'case':<40} {'total ms':>10} {'frames/s':>12}")
+    for label, seconds, frames in rows:
+        print(f"{label:<40} {seconds * 1e3:>10.3f} {frames / seconds:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+BENCHMARK: JSONL vs chunked binary (.lmk) landmark recordings
+PURPOSE: Compare file size, conversion cost and load speed of the recording
+         formats create_dataset.py / train.py accept
+WORKFLOW:
+  1. Generate JSONL recordings of smooth landmark motion (random walk around a
+     pose, face dropped out in some frames - closer to real captures than
+     independent random frames, which do not compress)
+  2. Convert them to .lmk: float16/float32 x zlib/uncompressed
+  3. For every format: size on disk, full load into a float32 (N, 1530) array,
+     streaming every chunk through an mmap, and a full create_dataset.py build
+USAGE (from jars_project_onnx/):
+  python benchmarks/bench_recording_format.py [--frames 20000] [--workdir /tmp/bench_recording]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+from preprocess.recording import RecordingReader, convert_jsonl  # noqa: E402
+
+CREATE_DATASET = os.path.join(PROJECT_DIR, "preprocess", "create_dataset.py")
+LABELS = ["Hello", "Yes", "No", "Thank You", "I Love You"]
+# (name, dtype, zlib level)
+FORMATS = [("lmk f16 zlib", "f16", 1), ("lmk f16 raw", "f16", 0),
+           ("lmk f32 zlib", "f32", 1), ("lmk f32 raw", "f32", 0)]
+
+
+def generate_recordings(raw_dir, frames, seed=0):
+    """One JSONL per label, frames split evenly, 30 fps timestamps"""
+    os.makedirs(raw_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    per_label = frames // len(LABELS)
+    for label in LABELS:
+        pose = rng.random(1530).astype(np.float32)
+        with open(os.path.join(raw_dir, f"data_{label}.jsonl"), "w") as f:
+            for i in range(per_label):
+                pose += rng.normal(0, 0.002, 1530).astype(np.float32)
+                vec = pose.copy()
+                if i % 50 >= 40:
+                    vec[126:] = 0.0                      # Face lost for a few frames
+                row = {"timestamp": i / 30, "label": label, "vector": vec.tolist()}
+                f.write(json.dumps(row) + "\n")
+    return per_label * len(LABELS)
+
+
+def load_jsonl(raw_dir):
+    blocks = []
+    for name in sorted(os.listdir(raw_dir)):
+        with open(os.path.join(raw_dir, name)) as f:
+            blocks.append(np.asarray([json.loads(line)["vector"] for line in f], dtype=np.float32))
+    return np.concatenate(blocks)
+
+
+def load_lmk(raw_dir):
+    blocks = []
+    for name in sorted(os.listdir(raw_dir)):
+        with RecordingReader(os.path.join(raw_dir, name)) as reader:
+            blocks.append(reader.read_all()[2])
+    return np.concatenate(blocks)
+
+
+def stream_lmk(raw_dir):
+    """Touch every chunk as create_dataset.py workers do; returns frames seen"""
+    frames = 0
+    for name in sorted(os.listdir(raw_dir)):
+        with RecordingReader(os.path.join(raw_dir, name)) as reader:
+            for _, _, vectors in reader.chunks():
+                frames += len(vectors)
+                del vectors
+    return frames
+
+
+def dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - t0, result
+
+
+def build_seconds(raw_dir, root):
+    out_dir = os.path.join(root, "out_" + os.path.basename(raw_dir))
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, CREATE_DATASET, "--raw", os.path.join(raw_dir, "*"), "--out-dir", out_dir,
+                    "--classes", os.path.join(root, "classes.json"), "--full"],
+                   check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=20000, help="Total frames over all labels")
+    parser.add_argument("--workdir", default="/tmp/bench_recording")
+    args = parser.parse_args()
+
+    shutil.rmtree(args.workdir, ignore_errors=True)
+    jsonl_dir = os.path.join(args.workdir, "jsonl")
+    frames = generate_recordings(jsonl_dir, args.frames)
+    jsonl_size = dir_bytes(jsonl_dir)
+    reference = load_jsonl(jsonl_dir)
+
+    print(f"{frames} frames, JSONL {jsonl_size / 2**20:.1f} MB")
+    print(f"{'format':<13} {'MB':>7} {'ratio':>6} {'convert s':>10} {'load s':>7} {'stream s':>9} "
+          f"{'build s':>8} {'max err':>8}")
+    load_s, _ = timed(load_jsonl, jsonl_dir)
+    print(f"{'jsonl':<13} {jsonl_size / 2**20:>7.1f} {1:>6.1f} {'-':>10} {load_s:>7.2f} {'-':>9} "
+          f"{build_seconds(jsonl_dir, args.workdir):>8.2f} {0:>8.1e}")
+
+    for name, dtype, level in FORMATS:
+        lmk_dir = os.path.join(args.workdir, name.replace(" ", "_"))
+        os.makedirs(lmk_dir)
+        t0 = time.perf_counter()
+        for src in sorted(os.listdir(jsonl_dir)):
+            convert_jsonl(os.path.join(jsonl_dir, src),
+                          os.path.join(lmk_dir, os.path.splitext(src)[0] + ".lmk"),
+                          dtype=dtype, compress=level)
+        convert_s = time.perf_counter() - t0
+        size = dir_bytes(lmk_dir)
+        load_s, loaded = timed(load_lmk, lmk_dir)
+        stream_s, _ = timed(stream_lmk, lmk_dir)
+        error = float(np.abs(loaded - reference).max())
+        print(f"{name:<13} {size / 2**20:>7.1f} {jsonl_size / size:>6.1f} {convert_s:>10.2f} {load_s:>7.2f} "
+              f"{stream_s:>9.2f} {build_seconds(lmk_dir, args.workdir):>8.2f} {error:>8.1e}")
+
+    shutil.rmtree(args.workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
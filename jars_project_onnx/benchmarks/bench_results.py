@@ -0,0 +1,119 @@
+"""
+BENCHMARK RESULTS: Machine-readable result files and regression comparison
+PURPOSE: load_test_socketio.py and bench_hot_path.py save their numbers in
+         one JSON layout so two runs (e.g. before / after a commit) can be
+         diffed and a CI job can fail on a regression
+FILE LAYOUT:
+  {"benchmark": "load_test_socketio", "created": unix time,
+   "git": {"commit": "...", "dirty": bool}, "host": {...}, "config": {...},
+   "metrics": {"latency_p99_ms": {"value": 12.3, "better": "lower"}, ...}}
+USAGE (from jars_project_onnx/):
+  python benchmarks/bench_results.py base.json new.json [--tolerance 0.1]
+Exits 1 when any metric is worse than the base by more than the tolerance.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def metric(value, better="lower", unit=""):
+    """One result entry; better = "lower" | "higher" | "info" (never a regression)"""
+    return {"value": float(value), "better": better, "unit": unit}
+
+
+def git_state():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=PROJECT_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "."))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def host_info():
+    return {"cpus": os.cpu_count(), "machine": platform.machine(), "python": platform.python_version(),
+            "platform": platform.platform()}
+
+
+def build_results(benchmark, config, metrics):
+    return {"benchmark": benchmark, "created": time.time(), "git": git_state(), "host": host_info(),
+            "config": config, "metrics": metrics}
+
+
+def save_results(path, result):
+    """Write a result file (parent directories are created)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_results(base, new, tolerance=0.1):
+    """
+    Rows (name, base value, new value, relative change, status) for every
+    metric in both files; status is "regression" when the change goes the
+    wrong way by more than tolerance (fraction), "improved" beyond it the
+    other way, else "ok" (or "info")
+    """
+    rows = []
+    for name in sorted(set(base["metrics"]) & set(new["metrics"])):
+        old, cur = base["metrics"][name], new["metrics"][name]
+        better = cur.get("better", "lower")
+        a, b = old["value"], cur["value"]
+        change = (b - a) / abs(a) if a else (0.0 if b == a else float("inf"))
+        status = "info" if better == "info" else "ok"
+        if better in ("lower", "higher"):
+            worse = change if better == "lower" else -change
+            if worse > tolerance:
+                status = "regression"
+            elif worse < -tolerance:
+                status = "improved"
+        rows.append((name, a, b, change, status))
+    return rows
+
+
+def print_comparison(base, new, tolerance=0.1):
+    """Print the comparison table; returns True when nothing regressed"""
+    if base.get("benchmark") != new.get("benchmark"):
+        print(f"Warning: comparing {base.get('benchmark')} with {new.get('benchmark')}")
+    for label, result in (("base", base), ("new", new)):
+        commit = (result.get("git") or {}).get("commit") or "?"
+        dirty = "+dirty" if (result.get("git") or {}).get("dirty") else ""
+        print(f"{label}: {commit[:10]}{dirty}  {result.get('host', {}).get('cpus')} CPUs")
+    changed_config = {k for k in set(base.get("config", {})) | set(new.get("config", {}))
+                      if base.get("config", {}).get(k) != new.get("config", {}).get(k)}
+    if changed_config:
+        print(f"Config differs: {', '.join(sorted(changed_config))}")
+    rows = compare_results(base, new, tolerance)
+    print(f"{'metric':<32} {'base':>12} {'new':>12} {'change':>8}  status")
+    for name, a, b, change, status in rows:
+        print(f"{name:<32} {a:>12.3f} {b:>12.3f} {change:>+8.1%}  {status}")
+    regressions = [r[0] for r in rows if r[4] == "regression"]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {tolerance:.0%}: {', '.join(regressions)}")
+    return not regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative change (0.1 = 10%%)")
+    args = parser.parse_args()
+    ok = print_comparison(load_results(args.base), load_results(args.new), args.tolerance)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+BENCHMARK: eventlet (server.py) vs asyncio (server_asgi.py) serving modes
+PURPOSE: Run the same load_test_socketio.py scenario against both serving
+         modes at increasing connection counts, one fresh server per run,
+         and print them side by side: latency percentiles, delivered frames
+         per second, lost / failed clients and server CPU per frame
+USAGE (from jars_project_onnx/):
+  python benchmarks/bench_serving_modes.py [--clients 100 500 1000] [--fps 2] [--wire f32]
+  python benchmarks/bench_serving_modes.py --out results/modes.json
+The load generator shares the machine with the server unless --processes /
+--url point it elsewhere; watch for its "saturated" warning in the output.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+from bench_results import build_results, load_results, print_comparison, save_results  # noqa: E402
+
+MODES = {"eventlet": "server.py", "asyncio": "server_asgi.py"}
+COLUMNS = (
+    ("latency_p50_ms", "p50 ms"),
+    ("latency_p99_ms", "p99 ms"),
+    ("throughput_fps", "frames/s"),
+    ("lost_rate", "lost"),
+    ("connect_failure_rate", "conn fail"),
+    ("server_cpu_ms_per_frame", "cpu ms/fr"),
+    ("server_rss_max_mb", "RSS MiB"),
+)
+
+
+def run_load_test(args, mode, clients, out_path):
+    cmd = [sys.executable, os.path.join(PROJECT_DIR, "benchmarks", "load_test_socketio.py"), "--spawn-server",
+           "--server-script", MODES[mode], "--port", str(args.port), "--clients", str(clients),
+           "--processes", str(args.processes), "--wire", args.wire, "--fps", str(args.fps),
+           "--ramp", str(args.ramp), "--duration", str(args.duration), "--out", out_path]
+    if args.server_env:
+        cmd += ["--server-env", *args.server_env]
+    print(f"== {mode}, {clients} clients")
+    subprocess.run(cmd, cwd=PROJECT_DIR, check=True)
+    return load_results(out_path)["metrics"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=list(MODES))
+    parser.add_argument("--processes", type=int, default=max(1, min(8, (os.cpu_count() or 1))))
+    parser.add_argument("--wire", choices=["json", "f32", "f16", "i16q"], default="f32")
+    parser.add_argument("--fps", type=float, default=2.0, help="Frames per second per client")
+    parser.add_argument("--ramp", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--server-env", nargs="*", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="serving_modes_")
+    results = {}
+    for clients in args.clients:
+        for mode in args.modes:
+            results[mode, clients] = run_load_test(args, mode, clients,
+                                                   os.path.join(workdir, f"{mode}_{clients}.json"))
+
+    print(f"\n{'mode':<9} {'clients':>7} " + " ".join(f"{label:>10}" for _, label in COLUMNS))
+    metrics = {}
+    for (mode, clients), row in results.items():
+        cells = [f"{row[name]['value']:>10.3f}" if name in row else f"{'-':>10}" for name, _ in COLUMNS]
+        print(f"{mode:<9} {clients:>7} " + " ".join(cells))
+        metrics.update({f"{mode}_c{clients}_{name}": entry for name, entry in row.items()})
+
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "compare", "tolerance")}
+    result = build_results("serving_modes", config, metrics)
+    if args.out:
+        save_results(args.out, result)
+        print(f"Saved {args.out}")
+    if args.compare:
+        ok = print_comparison(load_results(args.compare), result, args.tolerance)
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
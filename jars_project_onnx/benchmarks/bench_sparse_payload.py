@@ -0,0 +1,102 @@
+"""
+BENCHMARK + CHECK: Sparse landmark payloads vs dense zero-padded frames
+PURPOSE:
+  1. Prove the frame rebuilt by decode_sparse() is bit-for-bit identical to the
+     zero-padded dense frame for every hand/face presence combination
+  2. Compare payload size and server decode time against json and f32
+USAGE (from jars_project_onnx/):
+  python benchmarks/bench_sparse_payload.py [--frames 2000]
+Exits non-zero if the parity check fails.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from serving.wire import (  # noqa: E402
+    LANDMARK_BLOCKS,
+    NUM_POINTS,
+    decode_binary,
+    decode_sparse,
+    encode_binary,
+    encode_sparse,
+)
+
+DIM = NUM_POINTS * 3
+
+# Frame shapes seen in practice: (label, blocks present)
+SCENARIOS = (
+    ("one hand, no face", ("hand1",)),
+    ("one hand + face", ("hand1", "face")),
+    ("two hands + face", ("hand1", "hand2", "face")),
+    ("face only", ("face",)),
+    ("nothing", ()),
+)
+
+
+def make_frame(rng, present):
+    """Dense zero-padded frame with random landmarks in the present blocks"""
+    pts = np.zeros((NUM_POINTS, 3), dtype=np.float32)
+    for name, start, end in LANDMARK_BLOCKS:
+        if name in present:
+            pts[start:end] = rng.random((end - start, 3), dtype=np.float32)
+    return pts.reshape(-1)
+
+
+def check_parity(rng, frames):
+    """Bit-for-bit comparison of rebuilt vs padded frames (reused buffer)"""
+    out = np.full((NUM_POINTS, 3), np.nan, dtype=np.float32)  # Dirty on purpose
+    checked = 0
+    for _ in range(frames):
+        for _, present in SCENARIOS:
+            dense = make_frame(rng, present)
+            rebuilt = decode_sparse(encode_sparse(dense), out).reshape(-1)
+            if not np.array_equal(rebuilt.view(np.uint32), dense.view(np.uint32)):
+                raise AssertionError(f"Sparse frame differs from padded frame for blocks {present}")
+            checked += 1
+    return checked
+
+
+def time_per_frame(fn, payloads, repeats=3):
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        for p in payloads:
+            fn(p)
+    return (time.perf_counter() - t0) / (repeats * len(payloads))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=1000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    checked = check_parity(rng, args.frames)
+    print(f"Parity OK: {checked} rebuilt frames are bit-for-bit equal to the padded frames\n")
+
+    out = np.zeros((NUM_POINTS, 3), dtype=np.float32)
+    print(f"{'scenario':<18} {'json B':>8} {'f32 B':>7} {'sparse B':>9} {'json us':>8} {'f32 us':>7} {'sparse us':>10}")
+    for label, present in SCENARIOS:
+        frames = [make_frame(rng, present) for _ in range(args.frames)]
+        js = [json.dumps({"vector": f.tolist(), "normalized": False}) for f in frames]
+        f32 = [encode_binary(f, "f32") for f in frames]
+        sparse = [encode_sparse(f) for f in frames]
+
+        t_json = time_per_frame(lambda p: np.asarray(json.loads(p)["vector"], dtype=np.float32), js)
+        # f32 must be copied before in-place normalization, as in server.py
+        t_f32 = time_per_frame(lambda p: decode_binary(p, "f32", DIM).copy(), f32)
+        t_sparse = time_per_frame(lambda p: decode_sparse(p, out), sparse)
+
+        print(
+            f"{label:<18} {np.mean([len(p) for p in js]):>8.0f} {len(f32[0]):>7} {len(sparse[0]):>9} "
+            f"{t_json * 1e6:>8.1f} {t_f32 * 1e6:>7.1f} {t_sparse * 1e6:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+BENCHMARK: Page-load bursts vs landmark latency (serving/static.py)
+PURPOSE: One signer streams "landmark" frames at --fps while the server is
+         quiet, then while --page-loaders threads load the page --page-rate
+         times a second between them (index.html, everything it references
+         and the frontend/mediapipe bundles, Accept-Encoding: gzip, br,
+         keep-alive connections): the same burst for every server version.
+         --returning makes the loaders returning visitors whose cache keeps
+         immutable responses and revalidates the rest by ETag.
+         Reports the signer's latency in both phases, page loads per second
+         and the bytes one page load puts on the wire.
+         The mediapipe/*.js bundles are empty in the repo; --bundle-kb fills
+         a copy of frontend/ with bundles of that size (JavaScript-like text)
+         so the burst carries realistic weight.
+         --ref measures another git revision (a temporary worktree), for
+         before / after numbers.
+USAGE (from jars_project_onnx/):
+  python benchmarks/bench_static_assets.py [--bundle-kb 300] [--page-loaders 8] [--out results/static.json]
+  python benchmarks/bench_static_assets.py --ref HEAD~1 --out results/static_before.json
+  python benchmarks/bench_static_assets.py --server-script server_asgi.py --compare results/static_before.json
+"""
+
+import argparse
+import gzip
+import http.client
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+from bench_results import build_results, load_results, metric, print_comparison, save_results  # noqa: E402
+from load_test_socketio import spawn_server  # noqa: E402
+
+LOCAL_REFERENCE = re.compile(r'\b(?:src|href)="([^"#:]+)"')
+REQUEST_HEADERS = {"Accept-Encoding": "gzip, br"}
+
+
+def fill_bundles(frontend_dir, bundle_kb):
+    """
+    Overwrite frontend_dir/mediapipe/*.js with bundle_kb KiB of JavaScript-like
+    text: script.js's tokens in random order with random short identifiers
+    and numbers, which compresses about as well as minified code (3-4x)
+    """
+    with open(os.path.join(frontend_dir, "script.js"), "rb") as f:
+        tokens = re.findall(rb"\w+|[^\w\s]", f.read())
+    rng = np.random.default_rng(0)
+    mediapipe_dir = os.path.join(frontend_dir, "mediapipe")
+    for name in sorted(os.listdir(mediapipe_dir)):
+        if name.endswith(".js"):
+            words = []
+            for i in rng.integers(len(tokens), size=bundle_kb * 256):
+                if rng.random() < 0.3:
+                    words.append(b"%s%d" % (b"abcdefghij"[i % 10:i % 10 + 1], rng.integers(1000)))
+                else:
+                    words.append(tokens[i])
+            with open(os.path.join(mediapipe_dir, name), "wb") as f:
+                f.write(b"".join(words)[:bundle_kb * 1024].ljust(bundle_kb * 1024, b";"))
+
+
+# ============ TRAFFIC ============
+class PageLoader(threading.Thread):
+    """
+    Loads the page and its assets every interval_s over one keep-alive
+    connection (a thread). returning=True caches like a browser: immutable
+    responses are not requested again, the rest are revalidated with their
+    ETag (If-None-Match)
+    """
+
+    def __init__(self, port, bundles, interval_s, stop_at, returning=False):
+        super().__init__(daemon=True)
+        self.port = port
+        self.bundles = bundles
+        self.interval_s = interval_s
+        self.stop_at = stop_at
+        self.returning = returning
+        self.cache = {}                                 # path -> (immutable, etag, body)
+        self.pages = self.bytes = self.errors = 0
+
+    def get(self, conn, path, decode=False):
+        """(bytes on the wire, body); only decoded when asked (the client shares the CPU)"""
+        cached = self.cache.get(path)
+        if cached and cached[0]:
+            return 0, cached[2]
+        headers = dict(REQUEST_HEADERS)
+        if cached and cached[1]:
+            headers["If-None-Match"] = cached[1]
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+        if response.status == 304 and cached:
+            return len(body), cached[2]
+        if response.status != 200:
+            raise OSError(f"{path}: HTTP {response.status}")
+        size = len(body)
+        encoding = response.getheader("Content-Encoding") if decode else None
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "br":
+            import brotli
+            body = brotli.decompress(body)
+        if self.returning:
+            immutable = "immutable" in (response.getheader("Cache-Control") or "")
+            self.cache[path] = (immutable, response.getheader("ETag"), body)
+        return size, body
+
+    def run(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+        next_at = time.perf_counter()
+        while next_at < self.stop_at:
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+            next_at += self.interval_s
+            try:
+                size, page = self.get(conn, "/", decode=True)
+                for path in [*LOCAL_REFERENCE.findall(page.decode("utf-8")), *self.bundles]:
+                    size += self.get(conn, "/" + path.lstrip("/"))[0]
+                self.pages += 1
+                self.bytes += size
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+        conn.close()
+
+
+def load_pages(port, bundles, loaders, interval_s, start_at, stop_at, returning, results):
+    """
+    Process entry: `loaders` PageLoaders from start_at to stop_at
+    (perf_counter), in a process of their own so their reads do not hold the
+    signer's GIL; puts [(pages, bytes, errors)] on results
+    """
+    time.sleep(max(0.0, start_at - time.perf_counter()))
+    threads = [PageLoader(port, bundles, interval_s, stop_at, returning) for _ in range(loaders)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put([(thread.pages, thread.bytes, thread.errors) for thread in threads])
+
+
+def stream_landmarks(url, fps, stop_at):
+    """(sent at, latency s) of every frame one signer streams until stop_at (perf_counter)"""
+    import socketio
+    sio = socketio.Client(reconnection=False)
+    sent, samples = [], []
+
+    def on_prediction(data):
+        # One reply per frame, in order (spawn_server's EMIT_MODE=every, no dedup)
+        sent_at = sent[len(samples)]
+        samples.append((sent_at, time.perf_counter() - sent_at))
+
+    sio.on("prediction", on_prediction)
+    sio.connect(url, transports=["websocket"], wait_timeout=30)
+    frames = np.random.default_rng(0).random((64, 1530), dtype=np.float32)
+    i, next_at = 0, time.perf_counter()
+    while time.perf_counter() < stop_at:
+        time.sleep(max(0.0, next_at - time.perf_counter()))
+        sent.append(time.perf_counter())
+        sio.emit("landmark", {"vector": frames[i % len(frames)].tolist(), "normalized": False})
+        i += 1
+        next_at += 1.0 / fps
+    time.sleep(1.0)
+    sio.disconnect()
+    return samples
+
+
+def percentiles(latencies):
+    values = np.asarray(latencies) * 1000.0
+    return (float(np.percentile(values, 50)), float(np.percentile(values, 99))) if len(values) else (0.0, 0.0)
+
+
+# ============ MAIN ============
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ref", default=None, help="Git revision to measure instead of the working tree")
+    parser.add_argument("--server-script", default="server.py", help="server_asgi.py for the asyncio mode")
+    parser.add_argument("--server-env", nargs="*", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--bundle-kb", type=int, default=300, help="Size of each mediapipe/*.js bundle")
+    parser.add_argument("--page-loaders", type=int, default=8, help="Concurrent page-loading threads")
+    parser.add_argument("--page-rate", type=float, default=10.0, help="Page loads per second, all loaders")
+    parser.add_argument("--returning", action="store_true",
+                        help="Loaders cache like browsers (returning visitors) instead of always fetching")
+    parser.add_argument("--fps", type=float, default=20.0, help="Frames per second of the signer")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per phase (quiet, burst)")
+    parser.add_argument("--port", type=int, default=5078)
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="static_assets_")
+    project_dir, repo_root = PROJECT_DIR, None
+    if args.ref:
+        repo_root = subprocess.run(["git", "rev-parse", "--show-toplevel"], cwd=PROJECT_DIR, capture_output=True,
+                                   text=True, check=True).stdout.strip()
+        tree = os.path.join(workdir, "tree")
+        subprocess.run(["git", "worktree", "add", "--detach", tree, args.ref], cwd=repo_root, check=True,
+                       capture_output=True)
+        project_dir = os.path.join(tree, os.path.relpath(PROJECT_DIR, repo_root))
+        frontend_dir = os.path.join(project_dir, "frontend")  # A throwaway checkout: fill it in place
+    else:
+        frontend_dir = os.path.join(workdir, "frontend")
+        shutil.copytree(os.path.join(PROJECT_DIR, "frontend"), frontend_dir)
+    fill_bundles(frontend_dir, args.bundle_kb)
+    bundles = [f"mediapipe/{name}" for name in sorted(os.listdir(os.path.join(frontend_dir, "mediapipe")))
+               if name.endswith(".js")]
+
+    extra = dict(kv.split("=", 1) for kv in args.server_env)
+    extra["FRONTEND_DIR"] = frontend_dir
+    script = os.path.join(project_dir, args.server_script)
+    server = None
+    try:
+        server, url = spawn_server(args.port, extra, os.path.join(workdir, "server.log"), script)
+        time.sleep(3.0)                                 # Background loading (model, assets) settles
+        start = time.perf_counter()
+        burst_at, stop_at = start + args.duration, start + 2 * args.duration
+        results = multiprocessing.Queue()
+        loaders = multiprocessing.Process(target=load_pages, args=(
+            args.port, bundles, args.page_loaders, args.page_loaders / args.page_rate, burst_at, stop_at,
+            args.returning, results))
+        loaders.start()
+        samples = stream_landmarks(url, args.fps, stop_at)
+        counts = results.get(timeout=60)
+        loaders.join()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+        if repo_root:
+            subprocess.run(["git", "worktree", "remove", "--force", os.path.join(workdir, "tree")], cwd=repo_root,
+                           capture_output=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    quiet = [latency for sent_at, latency in samples if sent_at < burst_at]
+    burst = [latency for sent_at, latency in samples if sent_at >= burst_at]
+    pages, wire_bytes, errors = (sum(column) for column in zip(*counts))
+    quiet_p50, quiet_p99 = percentiles(quiet)
+    burst_p50, burst_p99 = percentiles(burst)
+    metrics = {
+        "quiet_p50_ms": metric(quiet_p50, "lower", "ms"),
+        "quiet_p99_ms": metric(quiet_p99, "lower", "ms"),
+        "burst_p50_ms": metric(burst_p50, "lower", "ms"),
+        "burst_p99_ms": metric(burst_p99, "lower", "ms"),
+        "page_loads_per_s": metric(pages / args.duration, "higher", "pages/s"),
+        "kib_per_page_load": metric(wire_bytes / max(1, pages) / 1024, "lower", "KiB"),
+        "page_load_errors": metric(errors, "lower"),
+    }
+    print(f"{args.server_script}" + (f" at {args.ref}" if args.ref else "") +
+          f": {len(samples)} frames, {pages} page loads by {args.page_loaders} loaders, bundles {args.bundle_kb} KiB")
+    for name, entry in metrics.items():
+        print(f"  {name:<18} {entry['value']:>10.3f} {entry['unit']}")
+
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "compare", "tolerance")}
+    result = build_results("static_assets", config, metrics)
+    if args.out:
+        save_results(args.out, result)
+        print(f"Saved {args.out}")
+    if args.compare:
+        ok = print_comparison(load_results(args.compare), result, args.tolerance)
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
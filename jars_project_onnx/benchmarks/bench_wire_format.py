@@ -0,0 +1,88 @@
+"""
+BENCHMARK: JSON vs binary landmark wire formats
+PURPOSE: Compare bytes on the wire and server decode CPU per frame
+USAGE (from jars_project_onnx/):
+  python benchmarks/bench_wire_format.py [--frames 5000]
+MEASURES:
+  - Socket.IO packet size per frame (text packet + binary attachment)
+  - Server-side decode time per frame: packet parse + numpy array creation
+  - Max absolute error introduced by the lossy formats (f16, i16q)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from serving.wire import BINARY_DTYPES, decode_binary, encode_binary  # noqa: E402
+
+DIM = 1530
+
+
+def make_frame(rng):
+    """Realistic frame: one hand (21 pts) + face (468 pts), rest zero padded"""
+    vec = np.zeros(DIM, dtype=np.float32)
+    vec[:63] = rng.random(63, dtype=np.float32)
+    vec[126:] = rng.random(DIM - 126, dtype=np.float32)
+    return vec
+
+
+def bench_json(frames, repeats):
+    # Socket.IO text packet exactly as the browser sends it: 42["landmark",{...}]
+    packets = [
+        "42" + json.dumps(["landmark", {"vector": f.tolist(), "normalized": False}])
+        for f in frames
+    ]
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        for p in packets:
+            event = json.loads(p[2:])
+            np.asarray(event[1]["vector"], dtype=np.float32)
+    elapsed = time.perf_counter() - t0
+    size = np.mean([len(p.encode()) for p in packets])
+    return size, elapsed / (repeats * len(packets)), 0.0
+
+
+def bench_binary(frames, fmt, repeats):
+    # Binary events are a placeholder text packet plus one binary frame
+    header = '451-["landmark",{"_placeholder":true,"num":0}]'
+    payloads = [encode_binary(f, fmt) for f in frames]
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        for b in payloads:
+            json.loads(header[4:])
+            decode_binary(b, fmt, DIM)
+    elapsed = time.perf_counter() - t0
+    size = len(header) + np.mean([len(b) for b in payloads])
+    err = max(float(np.max(np.abs(decode_binary(b, fmt, DIM) - f))) for b, f in zip(payloads, frames))
+    return size, elapsed / (repeats * len(payloads)), err
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [make_frame(rng) for _ in range(args.frames)]
+
+    rows = [("json",) + bench_json(frames, args.repeats)]
+    for fmt in BINARY_DTYPES:
+        rows.append((fmt,) + bench_binary(frames, fmt, args.repeats))
+
+    base_size, base_time = rows[0][1], rows[0][2]
+    print(f"{'format':<6} {'bytes/frame':>12} {'vs json':>8} {'decode us':>10} {'speedup':>8} {'max err':>10}")
+    for fmt, size, per_frame, err in rows:
+        print(
+            f"{fmt:<6} {size:>12.0f} {size / base_size:>7.1%} {per_frame * 1e6:>10.1f} "
+            f"{base_time / per_frame:>7.1f}x {err:>10.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
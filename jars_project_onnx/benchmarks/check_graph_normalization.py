@@ -0,0 +1,148 @@
+"""
+CHECK: ONNX graph with folded normalization vs normalize_batch + plain MLP
+PURPOSE: Prove that a model exported with `train.py --fold-normalization`
+         gives the same logits on raw vectors as the current serving path
+         (NumPy normalization, then the plain exported model).
+         Normalized input: the folded graph normalizes again, which is not
+         idempotent on hand-only frames (their zero face padding is
+         non-zero once centered), so server.py must refuse frames a client
+         marks normalized. Reports how far such frames would drift, and
+         with --server checks that a running server serving the folded
+         model (MODELS_DIR=<dir with v1/model.onnx>) rejects them and
+         answers raw frames with the expected label.
+USAGE (from jars_project_onnx/):
+  cd model && python train.py --export-only --fold-normalization --output /tmp/folded.onnx && cd ..
+  python benchmarks/check_graph_normalization.py --folded /tmp/folded.onnx [--server http://127.0.0.1:5000]
+  (uses recorded frames from data_raw/*.jsonl; synthetic frames if none exist)
+Exits non-zero if logits or predicted labels disagree, or the server
+accepts a normalized frame.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from glob import glob
+
+import numpy as np
+import onnxruntime as ort
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+from preprocess.normalize import normalize_batch  # noqa: E402
+
+
+def load_frames(pattern, limit):
+    """Raw (unnormalized) vectors from recorded JSONL files"""
+    vectors = []
+    for path in sorted(glob(pattern)):
+        with open(path) as f:
+            for line in f:
+                vectors.append(json.loads(line)["vector"])
+                if len(vectors) >= limit:
+                    return np.asarray(vectors, dtype=np.float32)
+    return np.asarray(vectors, dtype=np.float32).reshape(-1, 1530)
+
+
+def synthetic_frames(n, seed=0):
+    """Fallback: one hand + optional face in MediaPipe's [0, 1] image space"""
+    rng = np.random.default_rng(seed)
+    x = np.zeros((n, 510, 3), dtype=np.float32)
+    x[:, :21] = rng.random((n, 21, 3), dtype=np.float32)
+    has_face = rng.random(n) < 0.6
+    x[has_face, 42:] = rng.random((int(has_face.sum()), 468, 3), dtype=np.float32)
+    return x.reshape(n, -1)
+
+
+def run(session, x):
+    name = session.get_inputs()[0].name
+    return session.run(None, {name: x})[0]
+
+
+def has_face(x):
+    return np.any(x.reshape(len(x), 510, 3)[:, 42:], axis=(1, 2))
+
+
+def check_server(url, raw, expected, classes_path, frames=20):
+    """Normalized frames get an error; raw hand-only and face frames get the expected label"""
+    import socketio
+    with open(classes_path) as f:
+        labels = {v: k for k, v in json.load(f).items()}
+    replies = []
+    client = socketio.Client(reconnection=False)
+    client.on("prediction", replies.append)
+    client.connect(url, transports=["websocket"], wait_timeout=10)
+
+    def ask(vector, normalized):
+        count = len(replies)
+        client.emit("landmark", {"vector": vector.tolist(), "normalized": normalized})
+        deadline = time.time() + 5
+        while len(replies) == count and time.time() < deadline:
+            time.sleep(0.01)
+        return replies[-1] if len(replies) > count else None
+
+    try:
+        picks = [*np.flatnonzero(~has_face(raw))[:frames // 2], *np.flatnonzero(has_face(raw))[:frames // 2]]
+        for i in picks:
+            reply = ask(raw[i], False)
+            label = labels.get(int(np.argmax(expected[i])), "unknown")
+            if not reply or reply.get("label") != label:
+                raise AssertionError(f"Raw frame {i}: expected {label!r}, server sent {reply}")
+            reply = ask(normalize_batch(raw[i:i + 1])[0], True)
+            if not reply or "error" not in reply:
+                raise AssertionError(f"Server accepted a normalized frame for a folded model: {reply}")
+    finally:
+        client.disconnect()
+    print(f"Server {url}: refused {len(picks)} normalized frames, labelled the raw ones as expected")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plain", default=os.path.join(PROJECT_DIR, "model", "model.onnx"))
+    parser.add_argument("--folded", required=True)
+    parser.add_argument("--data", default=os.path.join(PROJECT_DIR, "data_raw", "*.jsonl"))
+    parser.add_argument("--limit", type=int, default=5000)
+    parser.add_argument("--server", default=None, help="Also check a server running the folded model")
+    parser.add_argument("--classes", default=os.path.join(PROJECT_DIR, "classes.json"))
+    args = parser.parse_args()
+
+    raw = load_frames(args.data, args.limit)
+    source = "recorded"
+    if raw.shape[0] == 0:
+        raw, source = synthetic_frames(args.limit), "synthetic"
+    print(f"Comparing on {raw.shape[0]} {source} frames")
+
+    plain = ort.InferenceSession(args.plain, providers=["CPUExecutionProvider"])
+    folded = ort.InferenceSession(args.folded, providers=["CPUExecutionProvider"])
+    meta = folded.get_modelmeta().custom_metadata_map
+    print("Folded model metadata:", meta)
+
+    t0 = time.perf_counter()
+    expected = run(plain, normalize_batch(raw))
+    t_plain = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    got = run(folded, raw)
+    t_folded = time.perf_counter() - t0
+
+    np.testing.assert_allclose(got, expected, rtol=1e-3, atol=1e-3)
+    agree = np.mean(np.argmax(got, axis=1) == np.argmax(expected, axis=1))
+    if agree < 1.0:
+        raise AssertionError(f"Predicted labels differ on {(1 - agree):.2%} of frames")
+    print(f"Parity OK: max abs logit diff {np.max(np.abs(got - expected)):.2e}, labels agree on 100%")
+    print(f"numpy normalize + plain graph: {t_plain * 1e3:.1f} ms, folded graph: {t_folded * 1e3:.1f} ms")
+
+    # ============ NORMALIZED INPUT (normalized twice) ============
+    twice = run(folded, normalize_batch(raw))
+    face = has_face(raw)
+    for name, rows in (("hand-only", ~face), ("with face", face)):
+        if rows.any():
+            drift = np.max(np.abs(twice[rows] - expected[rows]))
+            flipped = np.mean(np.argmax(twice[rows], axis=1) != np.argmax(expected[rows], axis=1))
+            print(f"Normalized input, {name} frames: max abs logit drift {drift:.2e}, labels change on {flipped:.2%}")
+    if args.server:
+        check_server(args.server, raw, expected, args.classes)
+
+
+if __name__ == "__main__":
+    main()
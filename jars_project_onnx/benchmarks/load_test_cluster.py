@@ -0,0 +1,220 @@
+"""
+LOAD TEST: Scale-out of the Socket.IO tier (serving/cluster.py)
+PURPOSE: Show what adding nodes buys. For each node count N, start a
+         LocalBroker, N server nodes (NODE_ID n0..n{N-1}, joined by the
+         local:// message queue) and the sticky router in front of them,
+         then run load_test_socketio.py through the router with
+         --clients-per-node * N clients. Prints connections, delivered
+         frames/s and latency per N with the scaling efficiency against
+         one node, plus how the router spread the sessions.
+         After the load, two cluster checks on the largest N:
+           broadcast  probe clients on every node receive an event emitted
+                      from outside the cluster through the queue
+           drain      POST /drain on n0 moves its probe clients to the other
+                      nodes (their new sids name another node)
+USAGE (from jars_project_onnx/):
+  python benchmarks/load_test_cluster.py [--nodes 1 2 4] [--clients-per-node 100] [--fps 2]
+  python benchmarks/load_test_cluster.py --server-script server.py --out results/cluster.json
+Near-linear scaling needs a core per node (and the load generator elsewhere,
+or on cores of its own): on one machine the nodes, router and clients share
+the CPUs, and the efficiency column shows when they run out.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import socketio
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+from bench_results import build_results, load_results, metric, print_comparison, save_results  # noqa: E402
+from load_test_socketio import spawn_server  # noqa: E402
+from serving import cluster  # noqa: E402
+
+PROBES_PER_NODE = 3
+COLUMNS = (
+    ("connected", "connected"),
+    ("throughput_fps", "frames/s"),
+    ("latency_p50_ms", "p50 ms"),
+    ("latency_p99_ms", "p99 ms"),
+    ("lost_rate", "lost"),
+    ("connect_failure_rate", "conn fail"),
+)
+
+
+def get_json(url, method="GET", timeout=5):
+    request = urllib.request.Request(url, method=method)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)
+
+
+class Cluster:
+    """Broker + nodes + router as child processes; logs in workdir"""
+
+    def __init__(self, args, nodes, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.queue_url = f"local://127.0.0.1:{args.base_port}"
+        self.router_url = f"http://127.0.0.1:{args.base_port + 1}"
+        self.processes = []
+        self.node_urls = []
+        self.start(nodes)
+
+    def spawn(self, name, cmd):
+        log = open(os.path.join(self.workdir, f"{name}.log"), "w")
+        proc = subprocess.Popen(cmd, cwd=PROJECT_DIR, stdout=log, stderr=subprocess.STDOUT)
+        self.processes.append(proc)
+        return proc
+
+    def start(self, nodes):
+        self.spawn("broker", [sys.executable, "-m", "serving.cluster", "broker", "--port", str(self.args.base_port)])
+        extra = dict(kv.split("=", 1) for kv in self.args.server_env)
+        for i in range(nodes):
+            port = self.args.base_port + 2 + i
+            env = dict(extra, NODE_ID=f"n{i}", MESSAGE_QUEUE=self.queue_url)
+            proc, url = spawn_server(port, env, os.path.join(self.workdir, f"n{i}.log"), self.args.server_script)
+            self.processes.append(proc)
+            self.node_urls.append(url)
+        router_port = str(self.args.base_port + 1)
+        self.spawn("router", [sys.executable, "-m", "serving.router", "--port", router_port, "--nodes",
+                              *self.node_urls])
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                if all(n["state"] == "ready" for n in self.nodes()):
+                    return
+            except OSError:
+                pass
+            time.sleep(0.25)
+        raise SystemExit(f"Cluster did not become ready; see logs in {self.workdir}")
+
+    def nodes(self):
+        return get_json(self.router_url + "/router/nodes")["nodes"]
+
+    def stop(self):
+        for proc in reversed(self.processes):
+            proc.terminate()
+        for proc in self.processes:
+            proc.wait(10)
+
+
+def run_load(args, cluster_, clients, out_path):
+    cmd = [sys.executable, os.path.join(PROJECT_DIR, "benchmarks", "load_test_socketio.py"), "--url",
+           cluster_.router_url, "--clients", str(clients), "--processes", str(args.processes), "--wire", args.wire,
+           "--fps", str(args.fps), "--ramp", str(args.ramp), "--duration", str(args.duration), "--out", out_path]
+    subprocess.run(cmd, cwd=PROJECT_DIR, check=True)
+    return load_results(out_path)["metrics"]
+
+
+# ============ CLUSTER CHECKS ============
+def connect_probes(cluster_, count):
+    probes = []
+    for _ in range(count):
+        client = socketio.Client(reconnection_delay=0.2, reconnection_delay_max=1.0)
+        client.received = []
+        client.on("announce", client.received.append)
+        client.connect(cluster_.router_url, transports=["websocket"])
+        probes.append(client)
+    return probes
+
+
+def check_broadcast(cluster_, probes):
+    """Share of probe clients (spread over every node) reached by an emit from outside the cluster"""
+    cluster.client_manager(cluster_.queue_url, write_only=True).emit("announce", {"text": "load test"})
+    deadline = time.time() + 5
+    while time.time() < deadline and not all(p.received for p in probes):
+        time.sleep(0.05)
+    return sum(bool(p.received) for p in probes) / len(probes)
+
+
+def check_drain(cluster_, probes, seconds):
+    """Drain n0; share of its probe clients that came back on another node"""
+    moving = [p for p in probes if cluster.node_of(p.get_sid()) == "n0"]
+    print(f"Draining n0 ({len(moving)} probe clients) over {seconds:.1f}s")
+    get_json(cluster_.node_urls[0] + f"/drain?seconds={seconds}", method="POST")
+    deadline = time.time() + seconds + 15
+    moved = 0
+    while time.time() < deadline:
+        sids = [p.get_sid() if p.connected else None for p in moving]
+        moved = sum(1 for sid in sids if sid and cluster.node_of(sid) != "n0")
+        if moved == len(moving):
+            break
+        time.sleep(0.2)
+    return moved / max(1, len(moving))
+
+
+# ============ MAIN ============
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients-per-node", type=int, default=100)
+    parser.add_argument("--server-script", default="server_asgi.py", help="Node script (server.py for eventlet)")
+    parser.add_argument("--server-env", nargs="*", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--processes", type=int, default=max(1, min(8, (os.cpu_count() or 1))))
+    parser.add_argument("--wire", choices=["json", "f32", "f16", "i16q"], default="f32")
+    parser.add_argument("--fps", type=float, default=2.0, help="Frames per second per client")
+    parser.add_argument("--ramp", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--drain-seconds", type=float, default=2.0)
+    parser.add_argument("--base-port", type=int, default=6400, help="Broker port; router +1, nodes +2...")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="cluster_")
+    results, spread = {}, {}
+    checks = {}
+    for n in sorted(args.nodes):
+        print(f"== {n} node(s), {args.clients_per_node * n} clients")
+        logs = os.path.join(workdir, f"n{n}")
+        os.makedirs(logs)
+        cluster_ = Cluster(args, n, logs)
+        try:
+            row = run_load(args, cluster_, args.clients_per_node * n, os.path.join(workdir, f"load_{n}.json"))
+            row["connected"] = metric((1 - row["connect_failure_rate"]["value"]) * args.clients_per_node * n,
+                                      "higher", "clients")
+            results[n] = row
+            spread[n] = {node["id"]: node["sessions"] for node in cluster_.nodes()}
+            if n == max(args.nodes) and n > 1:
+                probes = connect_probes(cluster_, PROBES_PER_NODE * n)
+                try:
+                    checks["broadcast_delivery"] = metric(check_broadcast(cluster_, probes), "higher")
+                    checks["drain_moved"] = metric(check_drain(cluster_, probes, args.drain_seconds), "higher")
+                finally:
+                    for probe in probes:
+                        probe.disconnect()
+        finally:
+            cluster_.stop()
+
+    base = results[min(results)]
+    print(f"\n{'nodes':>5} " + " ".join(f"{label:>10}" for _, label in COLUMNS) + f" {'efficiency':>10}  sessions")
+    metrics = dict(checks)
+    for n, row in results.items():
+        # Delivered frames/s per node against one node's (1.0 = linear)
+        efficiency = row["throughput_fps"]["value"] / max(1e-9, base["throughput_fps"]["value"] * n / min(results))
+        cells = [f"{row[name]['value']:>10.3f}" if name in row else f"{'-':>10}" for name, _ in COLUMNS]
+        print(f"{n:>5} " + " ".join(cells) + f" {efficiency:>10.2f}  {spread[n]}")
+        row["scaling_efficiency"] = metric(efficiency, "higher")
+        metrics.update({f"n{n}_{name}": entry for name, entry in row.items()})
+    for name, entry in checks.items():
+        print(f"{name:<20} {entry['value']:.2f}")
+
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "compare", "tolerance")}
+    result = build_results("cluster", config, metrics)
+    if args.out:
+        save_results(args.out, result)
+        print(f"Saved {args.out}")
+    if args.compare:
+        ok = print_comparison(load_results(args.compare), result, args.tolerance)
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
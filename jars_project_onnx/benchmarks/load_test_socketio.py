@@ -0,0 +1,451 @@
+"""
+LOAD TEST: Many simulated signers against server.py over Socket.IO
+PURPOSE: test_client.py sends one frame over one polling connection; this
+         drives hundreds to thousands of concurrent clients through the whole
+         serving path (transport, decode, batching, emit) and reports what a
+         signer would feel plus what it costs the server
+WORKFLOW:
+  1. Optionally start server.py itself (--spawn-server; --server-script
+     server_asgi.py for the asyncio mode) with per-frame emission
+     (EMIT_MODE=every, no dedup) so every frame gets one reply
+  2. Split --clients over --processes worker processes (this script with
+     --worker); each runs its clients as eventlet green threads, on
+     websocket or polling transports (--transport / --polling-fraction)
+  3. Clients connect spread over --ramp seconds, then stream frames:
+     replayed recordings (--recordings, at their recorded frame spacing
+     times --speed) or synthetic frames at --fps
+  4. Only frames sent in the --duration window after the ramp are measured:
+     end-to-end latency (emit -> "prediction"), replies/s, error and lost
+     rates. Replies are matched to frames in order, per client.
+  5. Server CPU (utime + stime of server.py and its child processes) and
+     RSS are sampled from /proc during the window (Linux)
+  6. Results go to --out in the bench_results.py format; --compare diffs
+     them against an earlier file and exits 1 on a regression
+USAGE (from jars_project_onnx/):
+  python benchmarks/load_test_socketio.py --spawn-server --clients 200 --duration 30 --out results/load.json
+  python benchmarks/load_test_socketio.py --url http://10.0.0.5:5000 --server-pid 4242 \\
+      --clients 2000 --processes 4 --recordings "data_raw/*.lmk" --wire f16
+  python benchmarks/load_test_socketio.py ... --out results/new.json --compare results/load.json
+  (thousands of clients need `ulimit -n` above the per-process client count
+  on both ends)
+"""
+
+import sys
+
+if __name__ == "__main__" and "--worker" in sys.argv:
+    # Worker processes run every client as a green thread
+    import eventlet
+    eventlet.monkey_patch()
+
+import argparse
+import collections
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+from bench_normalize import make_frames  # noqa: E402
+from bench_results import build_results, load_results, metric, print_comparison, save_results  # noqa: E402
+
+# Server settings that keep one "prediction" per frame (required for matching)
+SERVER_ENV = {"EMIT_MODE": "every", "SMOOTHING": "none", "DEDUP_THRESHOLD": "0"}
+STREAM_FRAMES = 512         # Frames kept per stream (recordings are cycled)
+DRAIN_S = 5.0               # How long clients wait for outstanding replies
+
+
+# ============ FRAME STREAMS ============
+def recording_streams(pattern, limit):
+    """[(vectors (n, dim), gaps_s (n,))] from recordings, at their recorded spacing"""
+    from preprocess.recording import list_recordings
+    from score_archive import read_recording
+    streams = []
+    for path in list_recordings(pattern)[:limit]:
+        stamps, _, vectors = read_recording(path)
+        if len(vectors) < 2:
+            continue
+        vectors, stamps = vectors[:STREAM_FRAMES], stamps[:STREAM_FRAMES]
+        gaps = np.clip(np.diff(stamps, prepend=stamps[0] - np.median(np.diff(stamps))), 0.001, 1.0)
+        streams.append((np.ascontiguousarray(vectors, dtype=np.float32), gaps))
+    if not streams:
+        raise SystemExit(f"No usable recordings match {pattern!r}")
+    return streams
+
+
+def synthetic_streams(count, fps, seed):
+    """Random frames (hand / face mixes) at fps with +-10% jitter"""
+    rng = np.random.default_rng(seed)
+    streams = []
+    for _ in range(count):
+        vectors = make_frames(rng, STREAM_FRAMES)
+        gaps = rng.uniform(0.9, 1.1, size=STREAM_FRAMES) / fps
+        streams.append((vectors, gaps))
+    return streams
+
+
+def encode_payloads(vectors, wire):
+    """What a client emits per frame: the JSON dict or the binary attachment"""
+    if wire == "json":
+        return [{"vector": v.tolist(), "normalized": False} for v in vectors]
+    from serving.wire import encode_binary
+    return [encode_binary(v, wire) for v in vectors]
+
+
+# ============ ONE SIMULATED CLIENT ============
+class SimulatedClient:
+    """One signer: connect, negotiate the wire format, stream, collect replies"""
+
+    def __init__(self, transport, payloads, gaps, wire, offset):
+        import socketio
+        self.sio = socketio.Client(reconnection=False)
+        self.transport = transport
+        self.payloads = payloads
+        self.gaps = gaps
+        self.wire = wire
+        self.offset = offset
+        self.pending = collections.deque()      # (sent perf_counter, measured)
+        self.latencies = []
+        self.sent = self.measured = self.received = self.lost = self.unexpected = 0
+        self.errors = collections.Counter()
+        self.connected = False
+        self.rate_control = 0
+        self.sio.on("prediction", self.on_prediction)
+        self.sio.on("rate_control", self.on_rate_control)
+
+    def on_prediction(self, data):
+        now = time.perf_counter()
+        if not self.pending:
+            self.unexpected += 1
+            return
+        sent_at, measured = self.pending.popleft()
+        if not measured:
+            return
+        if "error" in data:
+            self.errors[str(data["error"])[:60]] += 1
+        else:
+            self.received += 1
+            self.latencies.append(now - sent_at)
+
+    def on_rate_control(self, data):
+        self.rate_control += 1
+
+    def run(self, url, connect_at, window_start, window_end):
+        time.sleep(max(0.0, connect_at - time.time()))
+        try:
+            self.sio.connect(url, transports=[self.transport], wait_timeout=10)
+            if self.wire != "json":
+                ack = self.sio.call("wire_format", {"format": self.wire}, timeout=10)
+                if not ack.get("ok"):
+                    raise RuntimeError(ack)
+            self.connected = True
+        except Exception as e:
+            self.errors[f"connect: {type(e).__name__}"] += 1
+            return
+        i = self.offset
+        next_at = time.time()
+        while next_at < window_end:
+            time.sleep(max(0.0, next_at - time.time()))
+            k = i % len(self.payloads)
+            measured = window_start <= time.time() < window_end
+            self.pending.append((time.perf_counter(), measured))
+            try:
+                self.sio.emit("landmark", self.payloads[k])
+            except Exception as e:
+                self.pending.pop()
+                self.errors[f"emit: {type(e).__name__}"] += 1
+                break
+            self.sent += 1
+            self.measured += measured
+            next_at += self.gaps[k]
+            i += 1
+        deadline = time.time() + DRAIN_S
+        while self.pending and time.time() < deadline:
+            time.sleep(0.05)
+        self.lost = sum(1 for _, measured in self.pending if measured)
+        self.sio.disconnect()
+
+
+def run_worker(config_path):
+    """Entry point of one worker process (--worker): run its clients, write a summary"""
+    with open(config_path) as f:
+        cfg = json.load(f)
+    if cfg["recordings"]:
+        streams = recording_streams(cfg["recordings"], cfg["max_streams"])
+    else:
+        streams = synthetic_streams(min(cfg["max_streams"], len(cfg["transports"])), cfg["fps"], cfg["seed"])
+    payloads = [encode_payloads(vectors, cfg["wire"]) for vectors, _ in streams]
+    speed = cfg["speed"]
+
+    rng = np.random.default_rng(cfg["seed"])
+    clients, threads = [], []
+    n = len(cfg["transports"])
+    for i, transport in enumerate(cfg["transports"]):
+        s = (cfg["first_client"] + i) % len(streams)
+        client = SimulatedClient(transport, payloads[s], streams[s][1] / speed, cfg["wire"],
+                                 offset=int(rng.integers(len(payloads[s]))))
+        connect_at = cfg["start_at"] + cfg["ramp_s"] * (cfg["first_client"] + i) / max(1, cfg["total_clients"])
+        thread = threading.Thread(target=client.run, args=(cfg["url"], connect_at, cfg["window_start"],
+                                                           cfg["window_end"]), daemon=True)
+        thread.start()
+        clients.append(client)
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    latencies = np.asarray([x for c in clients for x in c.latencies], dtype=np.float64)
+    np.save(cfg["latency_path"], latencies)
+    errors = collections.Counter()
+    for c in clients:
+        errors.update(c.errors)
+    summary = {
+        "clients": n,
+        "connected": sum(c.connected for c in clients),
+        "sent": sum(c.sent for c in clients),
+        "measured": sum(c.measured for c in clients),
+        "received": sum(c.received for c in clients),
+        "lost": sum(c.lost for c in clients),
+        "unexpected": sum(c.unexpected for c in clients),
+        "rate_control_events": sum(c.rate_control for c in clients),
+        "errors": dict(errors),
+    }
+    with open(cfg["summary_path"], "w") as f:
+        json.dump(summary, f)
+
+
+# ============ SERVER PROCESS ============
+def process_tree(pid):
+    """pid and all of its descendants (server.py + inference workers)"""
+    children = collections.defaultdict(list)
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children[ppid].append(int(entry))
+    tree, todo = [], [pid]
+    while todo:
+        p = todo.pop()
+        tree.append(p)
+        todo.extend(children.get(p, ()))
+    return tree
+
+
+def cpu_rss(pids):
+    """(utime + stime seconds, RSS bytes) summed over pids"""
+    ticks, rss = 0, 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{pid}/status") as f:
+                vm = next((line for line in f if line.startswith("VmRSS:")), "VmRSS: 0 kB")
+        except OSError:
+            continue
+        ticks += int(fields[11]) + int(fields[12])
+        rss += int(vm.split()[1]) * 1024
+    return ticks / os.sysconf("SC_CLK_TCK"), rss
+
+
+class ResourceSampler:
+    """Sample the server's CPU and RSS every interval_s between start_at and end_at"""
+
+    def __init__(self, pid, start_at, end_at, interval_s=0.5):
+        self.pid = pid
+        self.start_at = start_at
+        self.end_at = end_at
+        self.interval_s = interval_s
+        self.rss = []
+        self.cpu_s = 0.0
+        self.wall_s = 0.0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        time.sleep(max(0.0, self.start_at - time.time()))
+        cpu0, _ = cpu_rss(process_tree(self.pid))
+        t0 = time.time()
+        while time.time() < self.end_at:
+            time.sleep(self.interval_s)
+            cpu, rss = cpu_rss(process_tree(self.pid))
+            self.rss.append(rss)
+            self.cpu_s, self.wall_s = cpu - cpu0, time.time() - t0
+
+
+def spawn_server(port, extra_env, log_path, script="server.py"):
+    env = dict(os.environ, PORT=str(port), HOST="127.0.0.1", **SERVER_ENV, **extra_env)
+    log = open(log_path, "w")
+    proc = subprocess.Popen([sys.executable, script], cwd=PROJECT_DIR, env=env, stdout=log,
+                            stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"{script} exited with {proc.returncode}; see {log_path}")
+        try:
+            urllib.request.urlopen(url + "/stats", timeout=1).read()
+            return proc, url
+        except OSError:
+            time.sleep(0.25)
+    proc.terminate()
+    raise SystemExit(f"{script} did not come up within 120 s; see {log_path}")
+
+
+# ============ DRIVER ============
+def transports_for(args, rng):
+    if args.transport != "mixed":
+        return [args.transport] * args.clients
+    return ["polling" if rng.random() < args.polling_fraction else "websocket" for _ in range(args.clients)]
+
+
+def summarize(summaries, latencies, duration_s):
+    """bench_results.py metrics from the worker summaries"""
+    total = collections.Counter()
+    errors = collections.Counter()
+    for s in summaries:
+        total.update({k: v for k, v in s.items() if k != "errors"})
+        errors.update(s["errors"])
+    ms = latencies * 1000.0
+    pct = (lambda q: float(np.percentile(ms, q))) if len(ms) else (lambda q: 0.0)
+    measured = max(1, total["measured"])
+    error_count = sum(v for k, v in errors.items() if not k.startswith("connect"))
+    metrics = {
+        "latency_p50_ms": metric(pct(50), "lower", "ms"),
+        "latency_p95_ms": metric(pct(95), "lower", "ms"),
+        "latency_p99_ms": metric(pct(99), "lower", "ms"),
+        "latency_max_ms": metric(float(ms.max()) if len(ms) else 0.0, "info", "ms"),
+        "throughput_fps": metric(total["received"] / duration_s, "higher", "frames/s"),
+        "offered_fps": metric(total["measured"] / duration_s, "info", "frames/s"),
+        "error_rate": metric(error_count / measured, "lower"),
+        "lost_rate": metric(total["lost"] / measured, "lower"),
+        "connect_failure_rate": metric(1 - total["connected"] / max(1, total["clients"]), "lower"),
+    }
+    return metrics, total, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--spawn-server", action="store_true", help="Start server.py for the run")
+    parser.add_argument("--port", type=int, default=5055, help="Port of the spawned server")
+    parser.add_argument("--server-script", default="server.py",
+                        help="Script --spawn-server starts (server_asgi.py for the asyncio mode)")
+    parser.add_argument("--server-env", nargs="*", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the spawned server (e.g. INFERENCE_WORKERS=2)")
+    parser.add_argument("--server-pid", type=int, default=None, help="PID of a running server to sample")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--processes", type=int, default=max(1, min(8, (os.cpu_count() or 1))))
+    parser.add_argument("--transport", choices=["websocket", "polling", "mixed"], default="websocket")
+    parser.add_argument("--polling-fraction", type=float, default=0.2, help="Share of polling clients when mixed")
+    parser.add_argument("--wire", choices=["json", "f32", "f16", "i16q"], default="json")
+    parser.add_argument("--recordings", default=None, help="Glob of .lmk / .jsonl recordings to replay")
+    parser.add_argument("--max-streams", type=int, default=64, help="Distinct streams loaded per worker")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed factor for recordings")
+    parser.add_argument("--fps", type=float, default=10.0, help="Per-client rate of synthetic streams")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which clients connect")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds after the ramp")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Save results here (bench_results.py format)")
+    parser.add_argument("--compare", default=None, help="Result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    server, url, pid = None, args.url, args.server_pid
+    if args.spawn_server:
+        extra = dict(kv.split("=", 1) for kv in args.server_env)
+        server, url = spawn_server(args.port, extra, os.path.join(workdir, "server.log"), args.server_script)
+        pid = server.pid
+    try:
+        rng = np.random.default_rng(args.seed)
+        transports = transports_for(args, rng)
+        processes = max(1, min(args.processes, args.clients))
+        # Leave time for every worker to start and load its streams
+        start_at = time.time() + 3.0 + (2.0 if args.recordings else 0.0)
+        window_start = start_at + args.ramp
+        window_end = window_start + args.duration
+        workers = []
+        per_worker = -(-args.clients // processes)
+        for w in range(processes):
+            first = w * per_worker
+            if first >= args.clients:
+                break
+            cfg = {
+                "url": url, "transports": transports[first:first + per_worker], "first_client": first,
+                "total_clients": args.clients, "wire": args.wire, "recordings": args.recordings,
+                "max_streams": args.max_streams, "speed": args.speed, "fps": args.fps,
+                "seed": args.seed + w, "start_at": start_at, "ramp_s": args.ramp,
+                "window_start": window_start, "window_end": window_end,
+                "latency_path": os.path.join(workdir, f"latency_{w}.npy"),
+                "summary_path": os.path.join(workdir, f"summary_{w}.json"),
+            }
+            config_path = os.path.join(workdir, f"worker_{w}.json")
+            with open(config_path, "w") as f:
+                json.dump(cfg, f)
+            workers.append((subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker", config_path],
+                                             cwd=PROJECT_DIR), cfg))
+        sampler = None
+        if pid is not None and os.path.isdir("/proc"):
+            sampler = ResourceSampler(pid, window_start, window_end)
+            sampler.thread.start()
+        print(f"{args.clients} clients ({args.transport}, {args.wire}) in {processes} processes -> {url}; "
+              f"ramp {args.ramp:.0f}s, measuring {args.duration:.0f}s")
+
+        summaries, latencies = [], []
+        for proc, cfg in workers:
+            if proc.wait() != 0 or not os.path.exists(cfg["summary_path"]):
+                raise SystemExit(f"Load test worker failed (exit {proc.returncode})")
+            with open(cfg["summary_path"]) as f:
+                summaries.append(json.load(f))
+            latencies.append(np.load(cfg["latency_path"]))
+        if sampler is not None:
+            sampler.thread.join()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+
+    metrics, total, errors = summarize(summaries, np.concatenate(latencies), args.duration)
+    if sampler is not None and sampler.wall_s:
+        metrics["server_cpu_percent"] = metric(sampler.cpu_s / sampler.wall_s * 100.0, "lower", "%")
+        metrics["server_rss_max_mb"] = metric(max(sampler.rss) / 2 ** 20, "lower", "MiB")
+        metrics["server_cpu_ms_per_frame"] = metric(
+            sampler.cpu_s * 1000.0 / max(1, total["received"]), "lower", "ms")
+
+    print(f"connected {total['connected']}/{total['clients']}, sent {total['sent']} "
+          f"({total['measured']} measured), replies {total['received']}, lost {total['lost']}, "
+          f"rate_control events {total['rate_control_events']}")
+    for name, entry in metrics.items():
+        print(f"  {name:<26} {entry['value']:>12.3f} {entry['unit']}")
+    if errors:
+        print("Errors:", dict(errors.most_common(10)))
+    if not args.recordings and total["measured"] < 0.9 * args.clients * args.fps * args.duration:
+        # Frames went out late: the latencies include the generator's own backlog
+        print(f"Warning: offered {metrics['offered_fps']['value']:.0f} frames/s of the "
+              f"{args.clients * args.fps:.0f} requested; the load generator is saturated "
+              "(use more --processes or another machine)")
+
+    config = {k: v for k, v in vars(args).items()
+              if k not in ("out", "compare", "tolerance", "worker", "server_pid", "url")}
+    result = build_results("load_test_socketio", config, metrics)
+    if args.out:
+        save_results(args.out, result)
+        print(f"Saved {args.out}")
+    if args.compare:
+        ok = print_comparison(load_results(args.compare), result, args.tolerance)
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+LOAD TEST: Inference throughput vs number of worker processes
+PURPOSE: Show that the shared-memory WorkerPool scales with worker count on a
+         multi-core box. Frames are pushed straight into the pool (no
+         sockets), so the numbers isolate the inference tier itself.
+USAGE (from jars_project_onnx/):
+  python benchmarks/load_test_workers.py [--frames 20000] [--workers 1 2 4 8]
+OUTPUT: frames/s and per-worker efficiency for each worker count
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+from serving.batching import QueueFull  # noqa: E402
+from serving.workers import WorkerPool  # noqa: E402
+
+
+def run(model, workers, frames, max_batch, capacity):
+    done = threading.Event()
+    completed = [0]
+    errors = [0]
+
+    def deliver(sid, probs, error):
+        completed[0] += 1
+        if error is not None:
+            errors[0] += 1
+        if completed[0] >= frames:
+            done.set()
+
+    pool = WorkerPool(model, 1530, 5, deliver, workers=workers, intra_op_threads=1,
+                      capacity=capacity, max_batch_size=max_batch, pin_cpus=True, cwd=PROJECT_DIR)
+    pool.start()
+    pool.wait_ready()
+    rows = np.random.default_rng(0).random((256, 1530), dtype=np.float32)
+
+    t0 = time.perf_counter()
+    backpressure = 0
+    for i in range(frames):
+        while True:
+            try:
+                pool.submit(i, rows[i % len(rows)])
+                break
+            except QueueFull:
+                backpressure += 1
+                time.sleep(0.0002)
+    done.wait(120)
+    elapsed = time.perf_counter() - t0
+    pool.stop()
+    return frames / elapsed, backpressure, errors[0]
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.path.join(PROJECT_DIR, "model", "model.onnx"))
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=[w for w in (1, 2, 4, 8, 16) if w < cpus] or [1])
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--capacity", type=int, default=256)
+    args = parser.parse_args()
+
+    print(f"{cpus} CPUs, {args.frames} frames, max batch {args.max_batch}, 1 ORT thread per worker")
+    print(f"{'workers':>7} {'frames/s':>10} {'speedup':>8} {'efficiency':>10} {'full-ring waits':>16} {'errors':>7}")
+    base = None
+    for w in args.workers:
+        fps, waits, errors = run(args.model, w, args.frames, args.max_batch, args.capacity)
+        base = base or fps / w
+        print(f"{w:>7} {fps:>10.0f} {fps / base:>7.2f}x {fps / (base * w):>10.0%} {waits:>16} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ PURPOSE: Capture video from webcam, extract landmarks using MediaPipe,
 WORKFLOW: 
   1. Start webcam and get video stream
   2. For each frame: Extract hand+face landmarks using MediaPipe Holistic
-  3. Flatten landmarks to 1D vector (1530 values)
+  3. Flatten landmarks to 1D vector (1530 values, or the model's landmark subset)
   4. Send vector to backend via SocketIO
   5. Receive prediction and display on screen
 */
@@ -19,12 +19,66 @@ const scoreBox = document.getElementById("score"); // Shows confidence score
 // ============ PERFORMANCE TUNING ============
 // Limit how often we send data to backend (ms)
 const SEND_INTERVAL_MS = 100; // 10 FPS
+// The server may raise or lower this via "rate_control" depending on its load
+let sendIntervalMs = SEND_INTERVAL_MS;
 let lastSentTime = 0;
 
+// ============ WIRE FORMAT ============
+// Binary landmark format requested from the server:
+//   "f32"  - packed Float32Array (6 KB per frame instead of ~20 KB JSON text)
+//   "f16"  - packed float16 (3 KB per frame)
+//   "i16q" - float32 scale header + int16 values (3 KB per frame)
+//   "sparse" - presence flags + only the detected blocks, no zero padding
+//              (~0.3 KB for a hand-only frame, ~5.9 KB for hand + face)
+//   "json" - original {vector: [...]} protocol
+const WIRE_FORMAT = "f32";
+let activeWireFormat = "json"; // Stays "json" until the server accepts
+
+// ============ LANDMARK LAYOUT ============
+// Points the served model reads, announced by the server on connect as
+// indices into the full layout (0-41 hands, 42-509 face). Hand-only or
+// hand + face anchor models need a fraction of the 1530 values; null = send
+// full frames (also what older servers expect). The announcement is emitted
+// by the server's connect handler, so it can be dispatched just before our
+// "connect" callback: the layout is only forgotten on disconnect.
+let landmarkPoints = null;
+
 // ============ SOCKETIO CONNECTION ============
 // Connect to backend server via WebSocket (real-time communication)
 const sio = io("http://localhost:5000");
 
+// Negotiate the binary format on every (re)connect; fall back to JSON if the
+// server is older or rejects the format
+sio.on("connect", () => {
+  activeWireFormat = "json";
+  if (WIRE_FORMAT === "json") return;
+  sio.emit("wire_format", { format: WIRE_FORMAT, normalized: false }, (ack) => {
+    if (ack && ack.ok) activeWireFormat = ack.format;
+  });
+});
+
+// A draining server node refuses the session and drops the connection;
+// socket.io gives up after a refused session, so retry (through the router,
+// onto another node)
+sio.on("connect_error", () => {
+  if (!sio.active) setTimeout(() => sio.connect(), 1000);
+});
+
+// The next connection (maybe another server node) announces its own layout
+sio.on("disconnect", () => {
+  landmarkPoints = null;
+});
+
+// Model landmark subset: send only its points from now on
+sio.on("landmark_layout", (data) => {
+  landmarkPoints = data && data.subset !== "full" ? data.points : null;
+});
+
+// Server-advertised send interval: back off when its inference queue fills up
+sio.on("rate_control", (data) => {
+  if (data && data.send_interval_ms > 0) sendIntervalMs = data.send_interval_ms;
+});
+
 // Listen for "prediction" event from backend
 sio.on("prediction", (data) => {
   // Receive prediction results from server
@@ -139,7 +193,7 @@ function flattenLandmarks(arr) {
  */
 function sendToServer() {
   const now = performance.now();
-  if (now - lastSentTime < SEND_INTERVAL_MS) {
+  if (now - lastSentTime < sendIntervalMs) {
     return;
   }
   // ============ VALIDATION: CHECK IF HAND DETECTED ============
@@ -150,6 +204,13 @@ function sendToServer() {
     return; // Exit early, don't send empty vector
   }
 
+  // ============ SPARSE FORMAT: SKIP ZERO PADDING ============
+  if (activeWireFormat === "sparse") {
+    sio.emit("landmark", encodeSparse(handLandmarks, faceLandmarks));
+    lastSentTime = now;
+    return;
+  }
+
   // ============ FLATTEN LANDMARKS ============
   // Convert hand landmark objects to flat array: [x1, y1, z1, x2, y2, z2, ...]
   let handVec = flattenLandmarks(handLandmarks);
@@ -169,12 +230,112 @@ function sendToServer() {
   // ============ COMBINE INTO SINGLE VECTOR ============
   // Concatenate: [hand (126) + face (1404) = 1530 total]
   const full = handVec.concat(faceVec).slice(0, 1530);
+  // Landmark subset model: keep only the points it reads
+  const vector = landmarkPoints ? selectPoints(full, landmarkPoints) : full;
 
   // ============ SEND TO BACKEND ============
-  // Emit SocketIO event with landmark vector
-  sio.emit("landmark", {
-    vector: full, // 1530-dimensional vector
-    normalized: false, // Backend will normalize it
-  });
+  if (activeWireFormat === "json") {
+    // Emit SocketIO event with landmark vector as JSON
+    sio.emit("landmark", {
+      vector: vector, // 1530 values, or 3 per layout point
+      normalized: false, // Backend will normalize it
+    });
+  } else {
+    // Emit packed binary attachment in the negotiated format
+    sio.emit("landmark", encodeVector(vector, activeWireFormat));
+  }
   lastSentTime = now;
 }
+
+/**
+ * x, y, z of the given points (indices into the 510-point layout) of a full
+ * 1530-value vector, in order
+ */
+function selectPoints(full, points) {
+  const out = new Array(points.length * 3);
+  for (let i = 0; i < points.length; i++) {
+    const src = points[i] * 3;
+    out[3 * i] = full[src];
+    out[3 * i + 1] = full[src + 1];
+    out[3 * i + 2] = full[src + 2];
+  }
+  return out;
+}
+
+// ============ BINARY ENCODING ============
+/**
+ * Pack a landmark vector into the negotiated binary wire format
+ * OUTPUT: ArrayBuffer sent as a Socket.IO binary attachment (little-endian)
+ */
+function encodeVector(values, format) {
+  if (format === "f32") {
+    return new Float32Array(values).buffer;
+  }
+  if (format === "f16") {
+    const out = new DataView(new ArrayBuffer(values.length * 2));
+    for (let i = 0; i < values.length; i++) {
+      out.setUint16(i * 2, toFloat16Bits(values[i]), true);
+    }
+    return out.buffer;
+  }
+  // i16q: float32 scale header followed by int16 values (value = q * scale)
+  let peak = 0;
+  for (const v of values) peak = Math.max(peak, Math.abs(v));
+  const scale = peak > 0 ? Math.fround(peak / 32767) : 1;
+  const out = new DataView(new ArrayBuffer(4 + values.length * 2));
+  out.setFloat32(0, scale, true);
+  for (let i = 0; i < values.length; i++) {
+    out.setInt16(4 + i * 2, Math.round(values[i] / scale), true);
+  }
+  return out.buffer;
+}
+
+/**
+ * Sparse format: [flags, 0, 0, 0] header then float32 x,y,z of present blocks
+ *   bit 0: hand 1 (21 points), bit 1: hand 2 (21 points), bit 2: face (468 points)
+ * This client tracks one hand, so it only ever sets hand 1 and face
+ */
+function encodeSparse(hand, face) {
+  const handPts = Math.min(hand.length, 21);
+  const facePts = face.length >= 468 ? 468 : 0; // Partial faces are not sent
+  const flags = (handPts > 0 ? 1 : 0) | (facePts > 0 ? 4 : 0);
+  const out = new Float32Array(1 + (handPts > 0 ? 63 : 0) + facePts * 3);
+  new Uint8Array(out.buffer)[0] = flags;
+  let i = 1;
+  if (handPts > 0) {
+    for (let k = 0; k < 21; k++) {
+      const pt = hand[k];
+      if (k < handPts) {
+        out[i] = pt.x;
+        out[i + 1] = pt.y;
+        out[i + 2] = pt.z;
+      }
+      i += 3; // Missing points stay zero, like the dense padding
+    }
+  }
+  for (let k = 0; k < facePts; k++) {
+    out[i++] = face[k].x;
+    out[i++] = face[k].y;
+    out[i++] = face[k].z;
+  }
+  return out.buffer;
+}
+
+// Convert a JS number to IEEE 754 half-precision bits (round to nearest)
+const f32Scratch = new Float32Array(1);
+const u32Scratch = new Uint32Array(f32Scratch.buffer);
+function toFloat16Bits(value) {
+  f32Scratch[0] = value;
+  const x = u32Scratch[0];
+  const sign = (x >>> 16) & 0x8000;
+  const exp = ((x >>> 23) & 0xff) - 127 + 15;
+  const mant = x & 0x7fffff;
+  if (exp <= 0) {
+    // Subnormal half (or zero)
+    if (exp < -10) return sign;
+    const m = (mant | 0x800000) >> (1 - exp);
+    return sign | ((m + 0x1000) >> 13);
+  }
+  if (exp >= 31) return sign | 0x7c00; // Overflow -> infinity
+  return sign | ((exp << 10) + ((mant + 0x1000) >> 13));
+}
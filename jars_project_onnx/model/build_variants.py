@@ -0,0 +1,198 @@
+"""
+MODEL VARIANT BUILD SCRIPT: Quantize, pre-optimize and benchmark model.onnx
+PURPOSE: Produce faster/smaller variants of the exported model and record how
+         much accuracy each one costs, so server.py can pick one safely
+WORKFLOW:
+  1. Load X.npy / y.npy and rebuild train.py's held-out split (80/20, seed 42)
+  2. fp32:        the model.onnx written by train.py
+  3. dynamic_int8: int8 weights, activations quantized at runtime
+  4. static_int8:  int8 weights + activations, calibrated on training rows
+  5. Save an ORT-format (.ort) pre-optimized copy of every variant
+  6. Measure held-out accuracy, p50/p99 latency (batch 1 and batch 64), size
+  7. Write variants/report.json (read by server.py via MODEL_VARIANT), with
+     the fingerprint of the model.onnx the variants came from: serving
+     refuses them once that file changes
+USAGE (from model/):
+  python build_variants.py [--calibration-rows 2000]
+Models that normalize in their graph (train.py --fold-normalization) are
+refused: X.npy holds normalized rows, the raw ones they need are not kept.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import onnx
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    QuantFormat,
+    QuantType,
+    quantize_dynamic,
+    quantize_static,
+)
+from sklearn.model_selection import train_test_split
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(MODEL_DIR)
+sys.path.insert(0, PROJECT_DIR)
+from serving.session import create_session, model_metadata, save_ort_format  # noqa: E402
+from serving.variants import BASELINE_VARIANT, REPORT_NAME, model_fingerprint  # noqa: E402
+
+# ============ CONFIG ============
+ONNX_PATH = os.path.join(MODEL_DIR, "model.onnx")
+VARIANTS_DIR = os.path.join(MODEL_DIR, "variants")
+DATA_DIR = os.path.join(PROJECT_DIR, "data_processed")
+
+
+# ============ CALIBRATION DATA ============
+class RowReader(CalibrationDataReader):
+    """Feed calibration rows to quantize_static in fixed-size batches"""
+
+    def __init__(self, input_name, rows, batch_size=64):
+        self.input_name = input_name
+        self.batches = iter([rows[i:i + batch_size] for i in range(0, len(rows), batch_size)])
+
+    def get_next(self):
+        batch = next(self.batches, None)
+        return None if batch is None else {self.input_name: batch}
+
+
+def prepare_for_quantization(model_path, out_path):
+    """
+    Self-contained copy of the model without stale value_info
+    The torch exporter records intermediate/initializer shapes that the
+    quantizer's shape inference rejects; ORT re-infers them anyway
+    """
+    model = onnx.load(model_path)               # Pulls in external weight data
+    del model.graph.value_info[:]
+    onnx.save(model, out_path)
+    return out_path
+
+
+# ============ MEASUREMENTS ============
+def file_size(path):
+    """Model size including an external-data sidecar if there is one"""
+    size = os.path.getsize(path)
+    if os.path.exists(path + ".data"):
+        size += os.path.getsize(path + ".data")
+    return size
+
+
+def accuracy(session, X, y, batch_size=1024):
+    name = session.get_inputs()[0].name
+    correct = 0
+    for i in range(0, len(X), batch_size):
+        logits = session.run(None, {name: X[i:i + batch_size]})[0]
+        correct += int(np.sum(np.argmax(logits, axis=1) == y[i:i + batch_size]))
+    return correct / max(1, len(X))
+
+
+def latency(session, rows, runs):
+    """p50/p99 latency in ms of session.run on a fixed input"""
+    name = session.get_inputs()[0].name
+    for _ in range(10):
+        session.run(None, {name: rows})  # Warm up allocations
+    times = np.empty(runs)
+    for i in range(runs):
+        t0 = time.perf_counter()
+        session.run(None, {name: rows})
+        times[i] = time.perf_counter() - t0
+    return {"p50": float(np.percentile(times, 50) * 1e3), "p99": float(np.percentile(times, 99) * 1e3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and benchmark quantized model variants")
+    parser.add_argument("--model", default=ONNX_PATH, help="fp32 model exported by train.py")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Directory with X.npy and y.npy")
+    parser.add_argument("--out-dir", default=VARIANTS_DIR)
+    parser.add_argument("--calibration-rows", type=int, default=2000)
+    parser.add_argument("--latency-runs", type=int, default=500)
+    args = parser.parse_args()
+    os.makedirs(args.out_dir, exist_ok=True)
+    # X.npy holds normalized rows: a graph that normalizes again would be
+    # calibrated and scored on rows normalized twice
+    session = create_session(args.model)
+    if model_metadata(session, args.model).get("landmark_normalization") == "graph":
+        raise SystemExit(f"{args.model} normalizes raw vectors in its graph, but {args.data_dir}/X.npy holds "
+                         f"normalized rows; build variants from an external-normalization export "
+                         f"(train.py --export-only without --fold-normalization)")
+    input_name = session.get_inputs()[0].name
+
+    # ============ HELD-OUT SPLIT (same as train.py) ============
+    X = np.load(os.path.join(args.data_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(args.data_dir, "y.npy"))
+    train_idx, test_idx = train_test_split(np.arange(len(y)), test_size=0.2, random_state=42)
+    X_test = np.ascontiguousarray(X[np.sort(test_idx)], dtype=np.float32)
+    y_test = y[np.sort(test_idx)]
+    rng = np.random.default_rng(0)
+    calib_idx = np.sort(rng.choice(train_idx, size=min(args.calibration_rows, len(train_idx)), replace=False))
+    X_calib = np.ascontiguousarray(X[calib_idx], dtype=np.float32)
+
+    # ============ BUILD VARIANTS ============
+    paths = {BASELINE_VARIANT: os.path.abspath(args.model)}
+    source = prepare_for_quantization(args.model, os.path.join(args.out_dir, "quant_source.onnx"))
+
+    print("Quantizing: dynamic int8...")
+    paths["dynamic_int8"] = os.path.join(args.out_dir, "dynamic_int8.onnx")
+    quantize_dynamic(source, paths["dynamic_int8"], weight_type=QuantType.QInt8)
+
+    print(f"Quantizing: static int8 (calibrated on {len(X_calib)} training rows)...")
+    paths["static_int8"] = os.path.join(args.out_dir, "static_int8.onnx")
+    quantize_static(
+        source,
+        paths["static_int8"],
+        RowReader(input_name, X_calib),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+
+    # ============ MEASURE ============
+    report = {"source_sha256": model_fingerprint(args.model), "held_out_rows": int(len(y_test)), "variants": {}}
+    single = X_test[:1]
+    batch = np.ascontiguousarray(np.resize(X_test, (64, X_test.shape[1])))
+    baseline_acc = None
+    for name, path in paths.items():
+        ort_path = os.path.join(args.out_dir, f"{name}.ort")
+        save_ort_format(path, ort_path)
+        session = create_session(path)
+        acc = accuracy(session, X_test, y_test)
+        if baseline_acc is None:
+            baseline_acc = acc
+        report["variants"][name] = {
+            "path": os.path.relpath(path, args.out_dir),
+            "ort_path": os.path.relpath(ort_path, args.out_dir),
+            "size_bytes": file_size(path),
+            "ort_size_bytes": file_size(ort_path),
+            "accuracy": acc,
+            "accuracy_drop": baseline_acc - acc,
+            "latency_ms": {
+                "batch_1": latency(session, single, args.latency_runs),
+                "batch_64": latency(session, batch, max(50, args.latency_runs // 10)),
+            },
+        }
+
+    report_path = os.path.join(args.out_dir, REPORT_NAME)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    os.remove(source)
+
+    # ============ PRINT SUMMARY ============
+    print(f"\nHeld-out rows: {len(y_test)}")
+    print(f"{'variant':<14} {'size KB':>9} {'accuracy':>9} {'drop':>7} {'b1 p50':>8} {'b1 p99':>8} {'b64 p50':>8} {'b64 p99':>8}")
+    for name, info in report["variants"].items():
+        lat = info["latency_ms"]
+        print(
+            f"{name:<14} {info['size_bytes'] / 1024:>9.0f} {info['accuracy']:>9.2%} {info['accuracy_drop']:>7.2%} "
+            f"{lat['batch_1']['p50']:>8.3f} {lat['batch_1']['p99']:>8.3f} "
+            f"{lat['batch_64']['p50']:>8.3f} {lat['batch_64']['p99']:>8.3f}"
+        )
+    print(f"\nSaved {report_path}")
+
+
+if __name__ == "__main__":
+    main()
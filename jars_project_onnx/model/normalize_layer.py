@@ -0,0 +1,68 @@
+"""
+NORMALIZATION LAYER: preprocess/normalize.py expressed as PyTorch ops
+PURPOSE: Let train.py export a model whose ONNX graph normalizes raw landmark
+         vectors itself, so server.py feeds raw vectors straight to ORT and the
+         whole pipeline (normalize + MLP) runs as one fused graph
+MATH (per row, identical to normalize_batch):
+  1. View (N, 1530) as (N, 510, 3) - or (N, 3P) as (N, P, 3) for a landmark
+     subset (hands first, P - 42 face points after them)
+  2. Reference = mean of face points (42:) if any face value is non-zero,
+     else mean of hand points (:42)
+  3. Center x,y on the reference (z unchanged)
+  4. Divide x,y by their std when it is > 1e-6
+"""
+
+import torch
+import torch.nn as nn
+
+# Model metadata key/value that tells server.py the graph already normalizes
+NORMALIZATION_METADATA_KEY = "landmark_normalization"
+NORMALIZATION_IN_GRAPH = "graph"
+NORMALIZATION_EXTERNAL = "external"
+
+NUM_HAND_POINTS = 42
+NUM_POINTS = 510
+STD_EPS = 1e-6
+
+
+class LandmarkNormalization(nn.Module):
+    """Parameter-free layer: raw (N, 3 * num_points) landmarks -> normalized, same shape"""
+
+    def __init__(self, num_points=NUM_POINTS):
+        super().__init__()
+        self.num_points = num_points
+
+    def forward(self, x):
+        pts = x.reshape(-1, self.num_points, 3)
+        xy = pts[:, :, :2]
+        z = pts[:, :, 2:]
+
+        if self.num_points > NUM_HAND_POINTS:
+            # Face visible if any of its values is non-zero (ReduceMax exports cleanly)
+            face_present = pts[:, NUM_HAND_POINTS:].abs().amax(dim=(1, 2)) > 0
+            ref = torch.where(
+                face_present.unsqueeze(1),
+                xy[:, NUM_HAND_POINTS:].mean(dim=1),
+                xy[:, :NUM_HAND_POINTS].mean(dim=1),
+            )
+        else:
+            ref = xy.mean(dim=1)                # Hand-only subset
+
+        xy = xy - ref.unsqueeze(1)
+        std = xy.reshape(xy.shape[0], -1).std(dim=1, unbiased=False)
+        std = torch.where(std > STD_EPS, std, torch.ones_like(std))
+        xy = xy / std.reshape(-1, 1, 1)
+
+        return torch.cat([xy, z], dim=2).reshape(x.shape[0], -1)
+
+
+class NormalizedClassifier(nn.Module):
+    """Wrap a classifier so it takes raw landmark vectors"""
+
+    def __init__(self, classifier, num_points=NUM_POINTS):
+        super().__init__()
+        self.normalize = LandmarkNormalization(num_points)
+        self.classifier = classifier
+
+    def forward(self, x):
+        return self.classifier(self.normalize(x))
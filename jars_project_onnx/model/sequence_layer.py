@@ -0,0 +1,82 @@
+"""
+SEQUENCE MODEL: Classify a gesture from the last K frames instead of one
+PURPOSE: Signs that depend on motion cannot be told apart from a single frame,
+         and per-frame predictions flicker. This model looks at a window of
+         the K most recent normalized frames.
+ARCHITECTURE:
+  frame (1530) -> encoder MLP -> embedding (E)          [once per frame]
+  last K embeddings (K, E) -> Conv1d(kernel=K) -> ReLU -> Linear -> logits
+STREAMING:
+  The encoder is the expensive part and only ever sees the newest frame, so
+  the exported step graph takes (frame, state) where state holds the K-1
+  previous embeddings, and returns (logits, new_state). Each new frame costs
+  one encoder pass plus a small (K x E) convolution, never a re-run of the
+  whole window. Training runs the same encoder/conv on full windows, and
+  missing history (start of a recording) is zero embeddings in both, so the
+  streamed output equals the windowed one exactly.
+"""
+
+import torch
+import torch.nn as nn
+
+# Model metadata keys read by server.py
+MODEL_TYPE_METADATA_KEY = "model_type"
+MODEL_TYPE_SEQUENCE = "sequence"
+WINDOW_METADATA_KEY = "sequence_window"
+EMBED_METADATA_KEY = "sequence_embed"
+
+DEFAULT_WINDOW = 16
+DEFAULT_EMBED = 64
+
+
+class SignSequenceNet(nn.Module):
+    """
+    Windowed gesture classifier
+    forward(frames, mask): frames (N, K, 1530), mask (N, K) 1 = real frame,
+    0 = padding before the start of the recording
+    """
+
+    def __init__(self, in_features, num_classes, window=DEFAULT_WINDOW, embed=DEFAULT_EMBED, hidden=128):
+        super().__init__()
+        self.window = window
+        self.embed = embed
+        # Per-frame encoder: 1530 -> 256 -> E
+        self.encoder = nn.Sequential(
+            nn.Linear(in_features, 256),
+            nn.ReLU(),
+            nn.Linear(256, embed),
+            nn.ReLU(),
+        )
+        # One convolution spanning the whole window -> (N, hidden, 1)
+        self.temporal = nn.Conv1d(embed, hidden, kernel_size=window)
+        self.head = nn.Sequential(
+            nn.ReLU(),
+            nn.Linear(hidden, num_classes),
+        )
+
+    def classify(self, embeddings):
+        """(N, K, E) embeddings, oldest first -> (N, num_classes) logits"""
+        h = self.temporal(embeddings.transpose(1, 2)).squeeze(-1)
+        return self.head(h)
+
+    def forward(self, frames, mask):
+        embeddings = self.encoder(frames) * mask.unsqueeze(-1)
+        return self.classify(embeddings)
+
+
+class StreamingSequenceStep(nn.Module):
+    """
+    Export wrapper: one frame in, one prediction out, state carried outside
+    INPUT:  frame (N, 1530), state (N, K-1, E) previous embeddings, oldest first
+    OUTPUT: logits (N, num_classes), state_out (N, K-1, E)
+    A new client starts from an all-zero state (= no history)
+    """
+
+    def __init__(self, net):
+        super().__init__()
+        self.net = net
+
+    def forward(self, frame, state):
+        newest = self.net.encoder(frame).unsqueeze(1)
+        window = torch.cat([state, newest], dim=1)
+        return self.net.classify(window), window[:, 1:]
@@ -0,0 +1,302 @@
+"""
+ARCHITECTURE SWEEP: Train many SignMLP variants in parallel and compare them
+PURPOSE: Find out whether a smaller / cheaper network serves as accurately as
+         the default 1530 -> 512 -> 256 -> classes MLP at lower latency
+WORKFLOW:
+  1. Build the trial grid: hidden sizes x dropout x input feature subset x
+     learning rate (randomly sampled down to --trials)
+  2. Train trials in parallel worker processes (train.py's memory-mapped
+     loader + training.fit with early stopping), export each to ONNX
+  3. Measure every exported model one at a time, on an otherwise idle
+     machine: held-out accuracy and ORT latency at batch 1 and batch 64
+     (same session settings as server.py, same helpers as build_variants.py)
+  4. Print the trials sorted by latency and mark the Pareto front (no other
+     trial is both faster and more accurate); save sweep/results.json.
+     A trial that fails is recorded there with its error and left out of
+     the front and the promotion; the other trials still count
+  5. --promote: copy the winner to model/model.onnx (+ model.pth) with its
+     architecture and measurements in the model metadata. The winner is the
+     fastest Pareto trial within --max-accuracy-drop of the best accuracy,
+     or the trial named with --promote <trial>.
+FEATURE SUBSETS (the model takes the full vector and selects columns itself):
+  all     every value (1530)
+  hands   the 42 hand points (126)
+  faceN   hands + every N-th face point, e.g. face4, face16
+USAGE (from model/):
+  python sweep.py [--workers 4] [--trials 24] [--hidden 512,256 256,128 128]
+                  [--dropout 0 0.2] [--subsets all hands face4] [--lr 0.001 0.003] [--promote]
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import time
+import traceback
+from multiprocessing import Pool
+
+import numpy as np
+import onnx
+import torch
+from sklearn.model_selection import train_test_split
+
+from build_variants import accuracy, file_size, latency
+from normalize_layer import NORMALIZATION_METADATA_KEY
+from train import (
+    BATCH_SIZE, CLASSES_PATH, DATA_DIR, EPOCHS, MODEL_DIR, ONNX_PATH, PATIENCE, PROJECT_DIR, PTH_PATH, SEED,
+    SignMLP, export_onnx, load_dataset,
+)
+from training import fit
+
+sys.path.insert(0, PROJECT_DIR)
+from preprocess.normalize import NUM_HAND_POINTS, VECTOR_DIM  # noqa: E402
+from serving.dedup import subset_indices  # noqa: E402
+from serving.session import create_session  # noqa: E402
+
+# ============ CONFIG ============
+SWEEP_DIR = os.path.join(MODEL_DIR, "sweep")
+RESULTS_NAME = "results.json"
+ARCHITECTURE_METADATA_KEY = "architecture"      # JSON: hidden, dropout, feature_subset
+SWEEP_METADATA_KEY = "sweep"                    # JSON: trial id and its measurements
+HAND_VALUES = NUM_HAND_POINTS * 3
+
+
+def feature_subset(name):
+    """Column indices into the 1530 vector, or None for all of them"""
+    if name == "all":
+        return None
+    if name == "hands":
+        return np.arange(HAND_VALUES)
+    if name.startswith("face") and name[4:].isdigit():
+        return subset_indices(face_stride=int(name[4:]))
+    raise ValueError(f"Unknown feature subset {name!r} (all, hands, face<N>)")
+
+
+def build_grid(hidden, dropout, subsets, lrs, trials, seed):
+    """All combinations, randomly sampled down to `trials` (0 = all)"""
+    grid = [{"hidden": list(h), "dropout": d, "subset": s, "lr": lr}
+            for h, d, s, lr in itertools.product(hidden, dropout, subsets, lrs)]
+    if trials and trials < len(grid):
+        grid = random.Random(seed).sample(grid, trials)
+    for i, trial in enumerate(grid):
+        trial["trial"] = f"t{i:03d}"
+    return grid
+
+
+# ============ TRIAL WORKER ============
+def run_trial(job):
+    """
+    Train and export one configuration (runs in a worker process)
+    Never raises: a failed trial comes back with "error" (and the tail of
+    its output) so the rest of the sweep is kept
+    """
+    trial, opts = job
+    log = io.StringIO()
+    try:
+        return train_trial(trial, opts, log)
+    except Exception as e:
+        return dict(trial, error=f"{type(e).__name__}: {e}",
+                    log=(log.getvalue() + traceback.format_exc())[-4000:])
+
+
+def train_trial(trial, opts, log):
+    """run_trial's work; per-epoch and exporter output go to log"""
+    torch.set_num_threads(opts["threads"])
+    torch.manual_seed(opts["seed"])
+    indices = feature_subset(trial["subset"])
+    onnx_path = os.path.join(opts["out_dir"], f"{trial['trial']}.onnx")
+    t0 = time.perf_counter()
+    # Per-epoch and exporter output would interleave across workers
+    with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        _, num_features, train_loader, test_loader = load_dataset(opts["data_dir"], opts["batch_size"], opts["seed"])
+        if indices is not None and num_features != VECTOR_DIM:
+            raise ValueError(f"Feature subset {trial['subset']!r} needs a full-landmark dataset, "
+                             f"{opts['data_dir']} has {num_features} values per row")
+        config = {"in_features": num_features, "hidden": trial["hidden"], "dropout": trial["dropout"],
+                  "feature_indices": None if indices is None else indices.tolist()}
+        model = SignMLP(num_features, opts["num_classes"], trial["hidden"], trial["dropout"], indices)
+        history = fit(model, train_loader, test_loader, opts["epochs"], lr=trial["lr"], patience=opts["patience"])
+        train_s = time.perf_counter() - t0
+        torch.save({"config": config, "state": model.state_dict()}, onnx_path[:-len(".onnx")] + ".pth")
+        export_onnx(model, num_features, onnx_path)
+    return dict(trial, onnx=onnx_path, epochs=len(history), train_s=round(train_s, 2),
+                parameters=sum(p.numel() for p in model.parameters()),
+                inputs=num_features if indices is None else len(indices))
+
+
+# ============ MEASURE ============
+def held_out(data_dir):
+    """train.py's held-out split as contiguous float32 arrays"""
+    X = np.load(os.path.join(data_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(data_dir, "y.npy"))
+    _, test_idx = train_test_split(np.arange(len(y)), test_size=0.2, random_state=42)
+    test_idx = np.sort(test_idx)
+    return np.ascontiguousarray(X[test_idx], dtype=np.float32), y[test_idx]
+
+
+def measure(result, X_test, y_test, runs):
+    session = create_session(result["onnx"])
+    batch = np.ascontiguousarray(np.resize(X_test, (64, X_test.shape[1])))
+    result["accuracy"] = accuracy(session, X_test, y_test)
+    result["latency_ms"] = {"batch_1": latency(session, X_test[:1], runs),
+                            "batch_64": latency(session, batch, max(50, runs // 10))}
+    result["size_bytes"] = file_size(result["onnx"])
+    return result
+
+
+def mark_pareto(results):
+    """Sort by batch-1 p50 latency; a trial is on the front if it beats every faster one"""
+    results.sort(key=lambda r: (r["latency_ms"]["batch_1"]["p50"], -r["accuracy"]))
+    best = -1.0
+    for r in results:
+        r["pareto"] = r["accuracy"] > best
+        best = max(best, r["accuracy"])
+    return results
+
+
+def pick_winner(results, max_drop):
+    """Fastest Pareto trial within max_drop of the best accuracy"""
+    top = max(r["accuracy"] for r in results)
+    return next(r for r in results if r["pareto"] and r["accuracy"] >= top - max_drop)
+
+
+def print_failures(results):
+    for r in results:
+        if "error" in r:
+            print(f"{r['trial']:<6} FAILED: {r['error']}")
+
+
+def print_table(results):
+    print(f"\n{'trial':<6} {'hidden':<14} {'drop':>5} {'subset':<7} {'lr':>7} {'params':>9} {'epochs':>6} "
+          f"{'accuracy':>9} {'b1 p50':>8} {'b64 p50':>8} {'pareto':>6}")
+    for r in results:
+        lat = r["latency_ms"]
+        print(f"{r['trial']:<6} {'-'.join(map(str, r['hidden'])):<14} {r['dropout']:>5g} {r['subset']:<7} "
+              f"{r['lr']:>7g} {r['parameters']:>9} {r['epochs']:>6} {r['accuracy']:>9.2%} "
+              f"{lat['batch_1']['p50']:>8.3f} {lat['batch_64']['p50']:>8.3f} {'*' if r['pareto'] else '':>6}")
+
+
+# ============ PROMOTE ============
+def promote(result, onnx_path=ONNX_PATH, pth_path=PTH_PATH):
+    """Install a trial as the served model, recording what it is in the metadata"""
+    model = onnx.load(result["onnx"])               # Pulls in external weight data
+    props = {p.key: p.value for p in model.metadata_props}
+    props[ARCHITECTURE_METADATA_KEY] = json.dumps(
+        {"hidden": result["hidden"], "dropout": result["dropout"], "feature_subset": result["subset"]})
+    props[SWEEP_METADATA_KEY] = json.dumps({
+        "trial": result["trial"], "lr": result["lr"], "accuracy": result["accuracy"],
+        "latency_b1_p50_ms": result["latency_ms"]["batch_1"]["p50"],
+        "latency_b64_p50_ms": result["latency_ms"]["batch_64"]["p50"],
+    })
+    onnx.helper.set_model_props(model, props)
+    tmp = onnx_path + ".tmp"
+    onnx.save(model, tmp)                           # Self-contained: no .data sidecar
+    os.replace(tmp, onnx_path)
+    if os.path.exists(onnx_path + ".data"):
+        os.remove(onnx_path + ".data")              # Sidecar of the previous export
+    shutil.copyfile(result["onnx"][:-len(".onnx")] + ".pth", pth_path)
+    print(f"Promoted {result['trial']} to {onnx_path} "
+          f"(normalization: {props.get(NORMALIZATION_METADATA_KEY, 'external')})")
+    print("Re-run build_variants.py: model/variants/ still describes the previous model")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel architecture / hyperparameter sweep for SignMLP")
+    parser.add_argument("--hidden", nargs="+", default=["512,256", "256,128", "128", "256,128,64"],
+                        help="Hidden layer sizes per trial, comma separated")
+    parser.add_argument("--dropout", type=float, nargs="+", default=[0.0, 0.2])
+    parser.add_argument("--subsets", nargs="+", default=["all", "face4", "hands"],
+                        help="Input feature subsets: all, hands, face<N>")
+    parser.add_argument("--lr", type=float, nargs="+", default=[0.001, 0.003])
+    parser.add_argument("--trials", type=int, default=0, help="Randomly sample this many configurations (0 = all)")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel training processes (default: all cores)")
+    parser.add_argument("--threads", type=int, default=None, help="Torch threads per trial (default: cores / workers)")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--patience", type=int, default=PATIENCE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--fold-normalization", action="store_true",
+                        help="Not supported: trials are measured on X.npy's normalized rows")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--out-dir", default=SWEEP_DIR)
+    parser.add_argument("--latency-runs", type=int, default=500)
+    parser.add_argument("--promote", nargs="?", const="auto", default=None,
+                        help="Install the winner (or the given trial id) as model/model.onnx")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.005,
+                        help="Automatic winner: fastest Pareto trial within this of the best accuracy")
+    args = parser.parse_args()
+    if args.fold_normalization:
+        # A folded graph would normalize X.npy's already normalized rows again
+        parser.error("--fold-normalization: held-out rows are normalized, trials must take normalized input; "
+                     "fold the winner after --promote with train.py --export-only --fold-normalization")
+
+    with open(CLASSES_PATH) as f:
+        num_classes = len(json.load(f))
+    for name in args.subsets:
+        feature_subset(name)                        # Fail before training anything
+    hidden = [tuple(int(v) for v in h.split(",")) for h in args.hidden]
+    grid = build_grid(hidden, args.dropout, args.subsets, args.lr, args.trials, args.seed)
+    workers = min(args.workers or os.cpu_count() or 1, len(grid))
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+    os.makedirs(args.out_dir, exist_ok=True)
+    opts = {"threads": threads, "seed": args.seed, "data_dir": args.data_dir, "batch_size": args.batch_size,
+            "num_classes": num_classes, "epochs": args.epochs, "patience": args.patience,
+            "out_dir": args.out_dir}
+
+    # ============ TRAIN (parallel) ============
+    print(f"Training {len(grid)} trials on {workers} workers x {threads} threads...")
+    t0 = time.perf_counter()
+    results = []
+    with Pool(workers) as pool:
+        for result in pool.imap_unordered(run_trial, [(trial, opts) for trial in grid]):
+            results.append(result)
+            status = (f"FAILED: {result['error']}" if "error" in result
+                      else f"{result['epochs']} epochs in {result['train_s']}s")
+            print(f"  [{len(results)}/{len(grid)}] {result['trial']} {result['hidden']} dropout {result['dropout']} "
+                  f"{result['subset']} lr {result['lr']}: {status}")
+    print(f"Trained in {time.perf_counter() - t0:.1f}s")
+    if all("error" in r for r in results):
+        print_failures(results)
+        raise SystemExit(f"All {len(results)} trials failed")
+
+    # ============ MEASURE (serial, so trials do not slow each other down) ============
+    X_test, y_test = held_out(args.data_dir)
+    print(f"Measuring accuracy on {len(y_test)} held-out rows and ORT latency...")
+    for result in results:
+        if "error" in result:
+            continue
+        try:
+            measure(result, X_test, y_test, args.latency_runs)
+        except Exception as e:
+            result.update(error=f"{type(e).__name__}: {e}", log=traceback.format_exc()[-4000:])
+    measured = mark_pareto([r for r in results if "error" not in r])
+    failed = [r for r in results if "error" in r]
+    print_table(measured)
+    print_failures(failed)
+    results_path = os.path.join(args.out_dir, RESULTS_NAME)
+    with open(results_path, "w") as f:
+        json.dump({"held_out_rows": int(len(y_test)), "trials": measured + failed}, f, indent=2)
+    print(f"\nSaved {results_path}")
+    if not measured:
+        raise SystemExit(f"All {len(failed)} trials failed")
+
+    # ============ PROMOTE ============
+    if args.promote:
+        if args.promote == "auto":
+            winner = pick_winner(measured, args.max_accuracy_drop)
+        else:
+            winner = next((r for r in measured if r["trial"] == args.promote), None)
+            if winner is None:
+                failure = next((r["error"] for r in failed if r["trial"] == args.promote), None)
+                raise SystemExit(f"Trial {args.promote!r} failed: {failure}" if failure
+                                 else f"No trial {args.promote!r} in this sweep")
+        promote(winner)
+
+
+if __name__ == "__main__":
+    main()
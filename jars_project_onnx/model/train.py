@@ -2,133 +2,284 @@
 MODEL TRAINING SCRIPT: Train and export gesture recognition model
 PURPOSE: Train PyTorch neural network on landmark data and export to ONNX
 WORKFLOW:
-  1. Load preprocessed features (X.npy) and labels (y.npy)
-  2. Split into train/test sets
-  3. Train MLP neural network for 30 epochs
-  4. Save PyTorch model (.pth)
+  1. Memory-map preprocessed features (X.npy) and load labels (y.npy)
+  2. Split into train/test sets (seed 42)
+  3. Train MLP neural network: large preshuffled batches gathered from the
+     memmap, held-out evaluation every epoch, early stopping, a checkpoint
+     after every epoch (see training.py)
+  4. Save PyTorch model (.pth) with the best held-out weights
   5. Export to ONNX format for deployment
+USAGE (from model/):
+  python train.py                         # train + export
+  python train.py --threads 8 --batch-size 1024 --patience 5
+  python train.py --resume                # continue an interrupted run from checkpoint.pt
+  python train.py --fold-normalization    # export graph that normalizes raw vectors
+  python train.py --export-only [--fold-normalization]   # re-export model.pth
+  python train.py --sequence [--window 16]    # streaming sequence model -> sequence.onnx
+  python train.py --data-dir ../data_processed_hands   # landmark subset dataset
+  python train.py --sequence --subset hands
+The landmark subset (preprocess/landmark_subsets.py) follows from the width of
+X.npy - or --subset for --sequence - and is written into the ONNX metadata,
+where server.py picks it up.
 """
 
+import argparse
 import json
+import os
+import sys
 import numpy as np
 import torch
 import torch.nn as nn
-from torch.utils.data import TensorDataset, DataLoader
+from torch.utils.data import Dataset, DataLoader
 from sklearn.model_selection import train_test_split
 import onnx
 
-# ============ LOAD DATASET ============
-# Load preprocessed landmark vectors
-X = np.load("../data_processed/X.npy")    # shape: (num_samples, 1530) - landmark features
-y = np.load("../data_processed/y.npy")    # shape: (num_samples,) - gesture labels (0,1,2,...)
-
-# Get input/output dimensions
-num_features = X.shape[1]                  # 1530 (42 hand + 468 face landmarks * 3 coords)
-
-# ============ LOAD CLASS INFORMATION ============
-# Load class label mapping (e.g., {0: "Hello", 1: "Yes", ...})
-with open("../classes.json") as f:
-    classes = json.load(f)
-num_classes = len(classes)                 # Number of gesture classes to predict
-
-print(f"Dataset: {X.shape[0]} samples, {num_features} features, {num_classes} classes")
-
-# ============ CONVERT TO PYTORCH TENSORS ============
-# Convert numpy arrays to PyTorch tensors
-X = torch.tensor(X, dtype=torch.float32)
-y = torch.tensor(y, dtype=torch.long)
-
-# ============ TRAIN/TEST SPLIT ============
-# Split data: 80% train, 20% test (for validation)
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
+from normalize_layer import (
+    NORMALIZATION_EXTERNAL,
+    NORMALIZATION_IN_GRAPH,
+    NORMALIZATION_METADATA_KEY,
+    NormalizedClassifier,
+)
+from sequence_layer import (
+    DEFAULT_WINDOW,
+    EMBED_METADATA_KEY,
+    MODEL_TYPE_METADATA_KEY,
+    MODEL_TYPE_SEQUENCE,
+    WINDOW_METADATA_KEY,
+    SignSequenceNet,
+    StreamingSequenceStep,
 )
+from training import MemmapBatches, evaluate, fit
+
+# ============ CONFIG ============
+# Resolve paths relative to this file so it works from any working directory
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(MODEL_DIR)
+DATA_DIR = os.path.join(PROJECT_DIR, "data_processed")        # X.npy / y.npy
+CLASSES_PATH = os.path.join(PROJECT_DIR, "classes.json")
+PTH_PATH = os.path.join(MODEL_DIR, "model.pth")
+ONNX_PATH = os.path.join(MODEL_DIR, "model.onnx")
+CHECKPOINT_PATH = os.path.join(MODEL_DIR, "checkpoint.pt")
+TRAIN_LOG_PATH = os.path.join(MODEL_DIR, "train_log.jsonl")   # One line per epoch, appended
+EPOCHS = 30                 # Upper bound; early stopping usually ends sooner
+BATCH_SIZE = 512
+LEARNING_RATE = 0.001
+PATIENCE = 5                # Epochs without a better held-out accuracy before stopping
+SEED = 42
+# Sequence model: raw timestamped recordings in, streaming ONNX graph out
+RAW_GLOB = os.path.join(PROJECT_DIR, "data_raw", "*")
+SEQUENCE_PTH_PATH = os.path.join(MODEL_DIR, "sequence.pth")
+SEQUENCE_ONNX_PATH = os.path.join(MODEL_DIR, "sequence.onnx")
+SEQUENCE_CHECKPOINT_PATH = os.path.join(MODEL_DIR, "sequence_checkpoint.pt")
+# Frames further apart than this (seconds) start a new segment: no window
+# spans a pause in the recording
+SEQUENCE_GAP_S = 1.0
 
-# Create PyTorch datasets
-train_ds = TensorDataset(X_train, y_train)
-test_ds  = TensorDataset(X_test, y_test)
+sys.path.insert(0, PROJECT_DIR)
+from preprocess.landmark_subsets import (  # noqa: E402
+    DEFAULT_SUBSET,
+    LANDMARK_SUBSETS,
+    select_subset,
+    subset_for_dim,
+    subset_metadata,
+)
+from preprocess.normalize import normalize_batch  # noqa: E402
+from preprocess.recording import RECORDING_EXT, RecordingReader, list_recordings  # noqa: E402
 
-# Create data loaders (batch training for efficiency)
-train_loader = DataLoader(train_ds, batch_size=32, shuffle=True)
-test_loader  = DataLoader(test_ds, batch_size=32)
 
 # ============ NEURAL NETWORK ARCHITECTURE ============
 """
 MLP (Multi-Layer Perceptron) for gesture classification
-Architecture:
+Default architecture:
   Input (1530) -> Hidden1 (512) -> ReLU -> Hidden2 (256) -> ReLU -> Output (num_classes)
-  
+
 ReLU: Rectified Linear Unit activation (adds non-linearity)
 Final layer outputs logits (raw scores) - softmax applied later
+Optional (used by sweep.py): other hidden sizes / depth, dropout after each
+hidden layer, and feature_indices - the model still takes the full 1530-value
+vector and selects those columns itself, so server.py is unchanged.
+The default configuration keeps the original state_dict keys (net.0/2/4).
 """
+DEFAULT_HIDDEN = (512, 256)
+
+
 class SignMLP(nn.Module):
-    def __init__(self, in_features, num_classes):
+    def __init__(self, in_features, num_classes, hidden=DEFAULT_HIDDEN, dropout=0.0, feature_indices=None):
         super(SignMLP, self).__init__()
-        # Define network layers
-        self.net = nn.Sequential(
-            # Layer 1: Reduce 1530 features to 512
-            nn.Linear(in_features, 512),
-            # Activation: ReLU (non-linearity)
-            nn.ReLU(),
-            # Layer 2: Reduce 512 to 256 features
-            nn.Linear(512, 256),
-            # Activation: ReLU
-            nn.ReLU(),
-            # Output layer: 256 features to num_classes (one score per gesture)
-            nn.Linear(256, num_classes)
-        )
+        self.in_features = in_features
+        if feature_indices is not None:
+            # Saved with the weights and exported as a Gather on the input
+            self.register_buffer("feature_index", torch.as_tensor(feature_indices, dtype=torch.long))
+            width = len(feature_indices)
+        else:
+            self.feature_index = None
+            width = in_features
+        layers = []
+        for size in hidden:
+            # Linear -> ReLU (-> Dropout) per hidden layer
+            layers += [nn.Linear(width, size), nn.ReLU()]
+            if dropout > 0:
+                layers.append(nn.Dropout(dropout))
+            width = size
+        # Output layer: one score per gesture
+        layers.append(nn.Linear(width, num_classes))
+        self.net = nn.Sequential(*layers)
 
     def forward(self, x):
+        if self.feature_index is not None:
+            x = x.index_select(1, self.feature_index)
         # Pass input through network and return predictions (logits)
         return self.net(x)
 
-# ============ INITIALIZE MODEL ============
-model = SignMLP(num_features, num_classes)
 
-# ============ TRAINING SETUP ============
-# Loss function: Cross Entropy for multi-class classification
-loss_fn = nn.CrossEntropyLoss()
-# Optimizer: Adam (adaptive learning rate)
-optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
+def load_mlp(path, num_classes):
+    """
+    Rebuild a SignMLP from model.pth: either a plain state_dict (default
+    architecture) or {"config": SignMLP kwargs, "state": state_dict} as
+    written by sweep.py --promote
+    """
+    saved = torch.load(path, map_location="cpu")
+    if "config" in saved:
+        config = dict(saved["config"])
+        model = SignMLP(config.pop("in_features"), num_classes, **config)
+        model.load_state_dict(saved["state"])
+    else:
+        model = SignMLP(saved["net.0.weight"].shape[1], num_classes)
+        model.load_state_dict(saved)
+    return model
+
+# ============ LOAD DATASET ============
+def load_dataset(data_dir=DATA_DIR, batch_size=BATCH_SIZE, seed=SEED, pin_memory=False):
+    """Memory-map X.npy / y.npy and build train/test batch iterators"""
+    # Rows are read from disk batch by batch, never converted all at once
+    X = np.load(os.path.join(data_dir, "X.npy"), mmap_mode="r")   # (num_samples, 1530 or subset) float32
+    y = np.load(os.path.join(data_dir, "y.npy"))                  # (num_samples,) gesture labels
+
+    # ============ TRAIN/TEST SPLIT ============
+    # Split row indices: 80% train, 20% test (same split as splitting X itself)
+    train_idx, test_idx = train_test_split(np.arange(len(y)), test_size=0.2, random_state=42)
+
+    train_loader = MemmapBatches(X, y, train_idx, batch_size, shuffle=True, seed=seed, pin_memory=pin_memory)
+    test_loader = MemmapBatches(X, y, np.sort(test_idx), batch_size, pin_memory=pin_memory)
+    return X.shape[0], X.shape[1], train_loader, test_loader
+
+
+# ============ LOAD SEQUENCES ============
+def load_sequences(classes, raw_glob=RAW_GLOB, window=DEFAULT_WINDOW, gap_s=SEQUENCE_GAP_S, subset=DEFAULT_SUBSET):
+    """
+    Load data_raw recordings (.jsonl / .lmk) as timestamp-ordered, normalized frames
+    OUTPUT:
+      frames:  float32 (M, subset dim), every recording back to back
+      windows: int64 (M, K) row indices into frames of each frame's window,
+               oldest first; -1 where it reaches before its segment's start
+      labels:  int64 (M,) class id of each window's newest frame
+    Labels not in classes.json are skipped so ids match the frame model
+    """
+    frame_blocks, window_blocks, label_blocks = [], [], []
+    offsets = np.arange(window) - (window - 1)      # -(K-1) .. 0
+    total = 0
+    skipped = 0
+    for path in list_recordings(raw_glob):
+        if path.endswith(RECORDING_EXT):
+            with RecordingReader(path) as reader:
+                stamps, names, vectors = reader.read_all()
+            known = np.array([name in classes for name in names], dtype=bool)
+            skipped += int((~known).sum())
+            stamps, vectors = stamps[known], vectors[known]
+            labels = [classes[name] for name in names if name in classes]
+        else:
+            stamps, vectors, labels = [], [], []
+            with open(path) as f:
+                for i, line in enumerate(f):
+                    row = json.loads(line)
+                    if row["label"] not in classes:
+                        skipped += 1
+                        continue
+                    # Older recordings without timestamps keep their line order
+                    stamps.append(row.get("timestamp", i))
+                    vectors.append(row["vector"])
+                    labels.append(classes[row["label"]])
+        if not len(vectors):
+            continue
+
+        # Stable sort keeps line order for equal timestamps
+        stamps = np.asarray(stamps, dtype=np.float64)
+        order = np.argsort(stamps, kind="stable")
+        block = select_subset(np.asarray(vectors, dtype=np.float32)[order], subset)
+        normalize_batch(block, out=block)
+        stamps = stamps[order]
+
+        # Index of the first frame of the segment each frame belongs to
+        n = len(block)
+        positions = np.arange(n)
+        segment_start = np.zeros(n, dtype=bool)
+        segment_start[0] = True
+        segment_start[1:] = np.diff(stamps) > gap_s
+        first = np.maximum.accumulate(np.where(segment_start, positions, 0))
+
+        local = positions[:, None] + offsets
+        window_blocks.append(np.where(local >= first[:, None], local + total, -1))
+        frame_blocks.append(block)
+        label_blocks.append(np.asarray(labels, dtype=np.int64)[order])
+        total += n
+
+    if skipped:
+        print(f"Skipped {skipped} frames whose label is not in classes.json")
+    if not frame_blocks:
+        raise SystemExit(f"No recordings found matching {raw_glob}")
+    return np.concatenate(frame_blocks), np.concatenate(window_blocks), np.concatenate(label_blocks)
+
+
+class WindowDataset(Dataset):
+    """Gather (K, 1530) windows on the fly instead of materializing them"""
+
+    def __init__(self, frames, windows, labels):
+        self.frames = torch.from_numpy(frames)
+        self.windows = torch.from_numpy(windows)
+        self.labels = torch.from_numpy(labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, i):
+        idx = self.windows[i]
+        mask = (idx >= 0).float()
+        return (self.frames[idx.clamp(min=0)], mask), self.labels[i]
+
+
+def load_sequence_dataset(classes, raw_glob=RAW_GLOB, window=DEFAULT_WINDOW, batch_size=32, seed=SEED,
+                          subset=DEFAULT_SUBSET):
+    """Build train/test window loaders (same 80/20, seed 42 split as load_dataset)"""
+    frames, windows, labels = load_sequences(classes, raw_glob, window, subset=subset)
+    train_idx, test_idx = train_test_split(np.arange(len(labels)), test_size=0.2, random_state=42)
+    train_ds = WindowDataset(frames, windows[train_idx], labels[train_idx])
+    test_ds = WindowDataset(frames, windows[test_idx], labels[test_idx])
+    train_loader = DataLoader(train_ds, batch_size=batch_size, shuffle=True,
+                              generator=torch.Generator().manual_seed(seed))
+    test_loader = DataLoader(test_ds, batch_size=batch_size)
+    return len(labels), frames.shape[1], train_loader, test_loader
+
 
 # ============ TRAINING LOOP ============
-EPOCHS = 30
-print("Training started...")
-
-for epoch in range(EPOCHS):
-    # Set model to training mode
-    model.train()
-    total_loss = 0
-
-    # Iterate through batches
-    for xb, yb in train_loader:
-        # Clear previous gradients
-        optimizer.zero_grad()
-        
-        # Forward pass: compute predictions
-        preds = model(xb)
-        
-        # Compute loss
-        loss = loss_fn(preds, yb)
-        
-        # Backward pass: compute gradients
-        loss.backward()
-        
-        # Update weights
-        optimizer.step()
-        
-        # Accumulate loss for this epoch
-        total_loss += loss.item()
-
-    # Print progress
-    print(f"Epoch {epoch+1}/{EPOCHS}, Loss: {total_loss:.4f}")
-
-print("Training completed.")
-
-# ============ SAVE PYTORCH MODEL ============
-# Save model weights for later use
-torch.save(model.state_dict(), "model.pth")
-print("Saved model.pth")
+# fit / evaluate live in training.py: Adam + cross entropy, evaluation on the
+# held-out split every epoch, early stopping and per-epoch checkpoints
+
+
+def configure_torch(args):
+    """Threads, seed and device for this run"""
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(args.seed)
+    device = args.device or ("cuda" if torch.cuda.is_available() else "cpu")
+    print(f"Device: {device}, {torch.get_num_threads()} CPU threads, batch size {args.batch_size}")
+    return device
+
+
+def fit_args(args, device, checkpoint_path, log_info):
+    """Keyword arguments for fit() from the command line"""
+    return dict(epochs=args.epochs, lr=args.lr, patience=args.patience, checkpoint_path=checkpoint_path,
+                resume=args.resume, log_path=TRAIN_LOG_PATH, log_info=log_info, device=device)
+
 
 # ============ EXPORT TO ONNX ============
 """
@@ -137,18 +288,168 @@ ONNX: Open Neural Network Exchange format
 - Can run on CPUs without PyTorch
 - Smaller file size, faster inference
 - Used in server.py for real-time prediction
+With fold_normalization=True the landmark normalization is prepended as ONNX
+operators, so server.py can feed raw vectors and ORT runs one fused graph.
+The choice is recorded in the model metadata (landmark_normalization key),
+next to the landmark subset the input width corresponds to.
 """
-# Create dummy input for export (shape: 1 sample, 1530 features)
-dummy = torch.randn(1, num_features)
-
-# Export model
-torch.onnx.export(
-    model,                    # Model to export
-    dummy,                    # Dummy input (for shape inference)
-    "model.onnx",            # Output file
-    input_names=['input'],   # Input node name
-    output_names=['output'], # Output node name
-    opset_version=11         # ONNX opset version (compatibility)
-)
+def export_onnx(model, num_features, path=ONNX_PATH, fold_normalization=False):
+    model.eval()
+    subset = subset_for_dim(num_features)
+    export_model = NormalizedClassifier(model, num_features // 3) if fold_normalization else model
+
+    # Create dummy input for export (shape: 1 sample, 1530 features)
+    dummy = torch.randn(1, num_features)
+    # Mark dim 0 as a symbolic "batch" axis so server.py can score (N, 1530)
+    # micro-batches in one session.run call instead of one call per frame
+    dynamic_axes = {"input": {0: "batch"}, "output": {0: "batch"}}
+
+    # Export model
+    torch.onnx.export(
+        export_model,             # Model to export
+        dummy,                    # Dummy input (for shape inference)
+        path,                     # Output file
+        input_names=['input'],   # Input node name
+        output_names=['output'], # Output node name
+        dynamic_axes=dynamic_axes,  # Variable batch size
+        opset_version=11         # ONNX opset version (compatibility)
+    )
+
+    # Record whether the graph normalizes its input and which landmarks it
+    # takes (read by server.py)
+    graph = onnx.load(path, load_external_data=False)
+    onnx.helper.set_model_props(graph, {
+        NORMALIZATION_METADATA_KEY: NORMALIZATION_IN_GRAPH if fold_normalization else NORMALIZATION_EXTERNAL,
+        **subset_metadata(subset),
+    })
+    onnx.save(graph, path)
+    print(f"Saved {path} (normalization: {'in graph' if fold_normalization else 'external'}, "
+          f"landmarks: {subset})")
+
+
+def export_sequence_onnx(net, num_features, path=SEQUENCE_ONNX_PATH):
+    """
+    Export the streaming step graph: (input, state) -> (output, state_out)
+    server.py keeps state_out per client and feeds it back with the next frame
+    """
+    net.eval()
+    step = StreamingSequenceStep(net).eval()
+    dummy_frame = torch.randn(1, num_features)
+    dummy_state = torch.zeros(1, net.window - 1, net.embed)
+    torch.onnx.export(
+        step,
+        (dummy_frame, dummy_state),
+        path,
+        input_names=["input", "state"],
+        output_names=["output", "state_out"],
+        dynamic_axes={name: {0: "batch"} for name in ("input", "state", "output", "state_out")},
+        opset_version=11,
+    )
+
+    graph = onnx.load(path, load_external_data=False)
+    onnx.helper.set_model_props(graph, {
+        NORMALIZATION_METADATA_KEY: NORMALIZATION_EXTERNAL,
+        MODEL_TYPE_METADATA_KEY: MODEL_TYPE_SEQUENCE,
+        WINDOW_METADATA_KEY: str(net.window),
+        EMBED_METADATA_KEY: str(net.embed),
+        **subset_metadata(subset_for_dim(num_features)),
+    })
+    onnx.save(graph, path)
+    print(f"Saved {path} (window {net.window}, state {net.window - 1}x{net.embed}, "
+          f"landmarks: {subset_for_dim(num_features)})")
+
+
+def main_sequence(args, classes):
+    """--sequence: train/export the streaming sequence model"""
+    num_classes = len(classes)
+    output = args.output if args.output != ONNX_PATH else SEQUENCE_ONNX_PATH
+    if args.export_only:
+        checkpoint = torch.load(SEQUENCE_PTH_PATH, map_location="cpu")
+        config = checkpoint["config"]
+        net = SignSequenceNet(config["in_features"], num_classes, config["window"], config["embed"])
+        net.load_state_dict(checkpoint["state"])
+        num_features = config["in_features"]
+    else:
+        device = configure_torch(args)
+        num_windows, num_features, train_loader, test_loader = load_sequence_dataset(
+            classes, args.raw, args.window, args.batch_size, args.seed, args.subset)
+        print(f"Sequences: {num_windows} windows of {args.window} frames, {num_features} features, {num_classes} classes")
+        net = SignSequenceNet(num_features, num_classes, window=args.window)
+        fit(net, train_loader, test_loader, **fit_args(args, device, SEQUENCE_CHECKPOINT_PATH, {
+            "model": "sequence", "classes": num_classes, "samples": num_windows, "batch_size": args.batch_size,
+            "threads": torch.get_num_threads()}))
+        print(f"Held-out accuracy: {evaluate(net, test_loader)[0]:.2%}")
+        torch.save({
+            "config": {"in_features": num_features, "window": net.window, "embed": net.embed},
+            "state": net.state_dict(),
+        }, SEQUENCE_PTH_PATH)
+        print("Saved sequence.pth")
+    export_sequence_onnx(net, num_features, output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the gesture MLP and export it to ONNX")
+    parser.add_argument("--fold-normalization", action="store_true",
+                        help="Prepend landmark normalization to the ONNX graph (server feeds raw vectors)")
+    parser.add_argument("--export-only", action="store_true",
+                        help="Skip training and export the weights saved in model.pth")
+    parser.add_argument("--output", default=ONNX_PATH, help="ONNX output path")
+    parser.add_argument("--sequence", action="store_true",
+                        help="Train the windowed sequence model on data_raw recordings (exports sequence.onnx)")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="Frames per sequence window")
+    parser.add_argument("--raw", default=RAW_GLOB, help="Glob of raw recordings (.jsonl / .lmk) for --sequence")
+    parser.add_argument("--subset", default=DEFAULT_SUBSET, choices=sorted(LANDMARK_SUBSETS),
+                        help="Landmark subset for --sequence (the MLP uses the subset of X.npy)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Directory holding X.npy / y.npy")
+    parser.add_argument("--epochs", type=int, default=EPOCHS, help="Maximum number of epochs")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help=f"Rows per batch (default: {BATCH_SIZE}, 32 for --sequence)")
+    parser.add_argument("--lr", type=float, default=LEARNING_RATE, help="Adam learning rate")
+    parser.add_argument("--patience", type=int, default=PATIENCE,
+                        help="Stop after this many epochs without a better held-out accuracy (0 = never)")
+    parser.add_argument("--threads", type=int, default=0, help="torch.set_num_threads (default: PyTorch's choice)")
+    parser.add_argument("--seed", type=int, default=SEED, help="Weight init and shuffling seed")
+    parser.add_argument("--device", default=None, help="cpu / cuda (default: cuda when available)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue from the last checkpoint (checkpoint.pt / sequence_checkpoint.pt)")
+    args = parser.parse_args()
+    if args.batch_size is None:
+        args.batch_size = 32 if args.sequence else BATCH_SIZE
+
+    # ============ LOAD CLASS INFORMATION ============
+    # Load class label mapping (e.g., {0: "Hello", 1: "Yes", ...})
+    with open(CLASSES_PATH) as f:
+        classes = json.load(f)
+    num_classes = len(classes)                 # Number of gesture classes to predict
+
+    if args.sequence:
+        main_sequence(args, classes)
+        return
+
+    if args.export_only:
+        # ============ LOAD SAVED WEIGHTS ============
+        model = load_mlp(PTH_PATH, num_classes)
+        num_features = model.in_features
+    else:
+        device = configure_torch(args)
+        num_samples, num_features, train_loader, test_loader = load_dataset(
+            args.data_dir, args.batch_size, args.seed, pin_memory=device.startswith("cuda"))
+        print(f"Dataset: {num_samples} samples, {num_features} features "
+              f"({subset_for_dim(num_features)} landmarks), {num_classes} classes")
+
+        # ============ INITIALIZE MODEL ============
+        model = SignMLP(num_features, num_classes)
+        fit(model, train_loader, test_loader, **fit_args(args, device, CHECKPOINT_PATH, {
+            "model": "mlp", "classes": num_classes, "samples": num_samples, "batch_size": args.batch_size,
+            "threads": torch.get_num_threads()}))
+
+        # ============ SAVE PYTORCH MODEL ============
+        # Save the best held-out weights for later use
+        torch.save(model.state_dict(), PTH_PATH)
+        print("Saved model.pth")
+
+    export_onnx(model, num_features, args.output, fold_normalization=args.fold_normalization)
+
 
-print("Saved model.onnx")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+TRAINING LOOP: Memory-mapped batches, per-epoch evaluation, early stopping
+PURPOSE: Keep training cost flat as X.npy grows - rows are gathered straight
+         from the memory-mapped file into reused (pinned) batch buffers
+         instead of converting the whole dataset to tensors first - and make
+         runs reproducible and resumable
+PIECES:
+  MemmapBatches: (xb, yb) batches of selected rows, reshuffled every epoch
+                 from (seed, epoch) so a resumed run sees the same order
+  fit:           train / evaluate every epoch, keep the best weights, stop
+                 after `patience` epochs without improvement, checkpoint
+                 after every epoch, log epoch time and samples/s
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+
+class MemmapBatches:
+    """
+    Iterate (xb, yb) batches of X[indices] / y[indices]
+
+    INPUT:
+      X: (N, D) array, typically np.load(..., mmap_mode="r")
+      y: (N,) int labels
+      indices: rows to use (e.g. the train split)
+      batch_size: rows per batch
+      shuffle: reshuffle every epoch (set_epoch) from seed + epoch
+      pin_memory: gather into page-locked buffers (faster host -> GPU copies)
+    The yielded tensors are views of reused buffers; they are valid until the
+    next batch is requested, which is all a training step needs.
+    """
+
+    def __init__(self, X, y, indices, batch_size, shuffle=False, seed=0, pin_memory=False):
+        self.X = X
+        self.y = np.asarray(y, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        rows = min(batch_size, len(self.indices))
+        self._xbuf = torch.empty((rows, X.shape[1]), dtype=torch.float32, pin_memory=pin_memory)
+        self._ybuf = torch.empty(rows, dtype=torch.long, pin_memory=pin_memory)
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __len__(self):
+        return (len(self.indices) + self.batch_size - 1) // self.batch_size
+
+    def order(self):
+        """Row order of the current epoch"""
+        if not self.shuffle:
+            return self.indices
+        rng = np.random.default_rng((self.seed, self.epoch))
+        return self.indices[rng.permutation(len(self.indices))]
+
+    def __iter__(self):
+        order = self.order()
+        xbuf, ybuf = self._xbuf.numpy(), self._ybuf.numpy()
+        for start in range(0, len(order), self.batch_size):
+            # Sorted rows read the memmap front to back; row order inside a
+            # batch does not change the (mean) loss
+            rows = np.sort(order[start:start + self.batch_size])
+            n = len(rows)
+            np.take(self.X, rows, axis=0, out=xbuf[:n])
+            np.take(self.y, rows, out=ybuf[:n])
+            yield self._xbuf[:n], self._ybuf[:n]
+
+
+def _forward(model, xb):
+    # Sequence batches are (frames, mask)
+    return model(*xb) if isinstance(xb, (list, tuple)) else model(xb)
+
+
+def _to(xb, device):
+    if isinstance(xb, (list, tuple)):
+        return [t.to(device) for t in xb]
+    return xb.to(device)
+
+
+def evaluate(model, test_loader, device="cpu"):
+    """(held-out accuracy, mean loss)"""
+    loss_fn = nn.CrossEntropyLoss(reduction="sum")
+    model.eval()
+    correct = total = 0
+    loss = 0.0
+    with torch.no_grad():
+        for xb, yb in test_loader:
+            xb, yb = _to(xb, device), yb.to(device)
+            preds = _forward(model, xb)
+            loss += float(loss_fn(preds, yb))
+            correct += int((preds.argmax(dim=1) == yb).sum())
+            total += len(yb)
+    return correct / max(1, total), loss / max(1, total)
+
+
+def save_checkpoint(path, state):
+    """Write atomically, so an interrupted save never corrupts the last checkpoint"""
+    tmp = path + ".tmp"
+    torch.save(state, tmp)
+    os.replace(tmp, path)
+
+
+def fit(model, train_loader, test_loader, epochs, lr=0.001, patience=0, checkpoint_path=None,
+        resume=False, log_path=None, log_info=None, device="cpu"):
+    """
+    Train with Adam + cross entropy, evaluating on test_loader after every epoch
+
+    INPUT:
+      epochs: maximum number of epochs
+      patience: stop after this many epochs without a better held-out
+                accuracy (0 = never stop early)
+      checkpoint_path: model/optimizer/early-stopping state saved here after
+                       every epoch; resume=True continues from it
+      log_path: one JSON line per epoch appended here (loss, accuracy,
+                epoch seconds, samples/s, plus the log_info dict - e.g. the
+                number of classes, to track cost as the vocabulary grows)
+    OUTPUT: history (list of per-epoch dicts); model holds the best weights
+    """
+    model.to(device)
+    loss_fn = nn.CrossEntropyLoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    start_epoch, best_acc, best_state, stale, history = 0, -1.0, None, 0, []
+
+    if resume and checkpoint_path and os.path.exists(checkpoint_path):
+        checkpoint = torch.load(checkpoint_path, map_location=device)
+        model.load_state_dict(checkpoint["model"])
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        start_epoch = checkpoint["epoch"] + 1
+        best_acc, best_state = checkpoint["best_accuracy"], checkpoint["best_state"]
+        stale, history = checkpoint["stale_epochs"], checkpoint["history"]
+        print(f"Resuming from {checkpoint_path} at epoch {start_epoch + 1} (best accuracy {best_acc:.2%})")
+        if patience and stale >= patience:
+            start_epoch = epochs                # Had already stopped early
+
+    print("Training started...")
+    for epoch in range(start_epoch, epochs):
+        if hasattr(train_loader, "set_epoch"):
+            train_loader.set_epoch(epoch)
+        model.train()
+        t0 = time.perf_counter()
+        total_loss = torch.zeros((), device=device)
+        samples = 0
+        for xb, yb in train_loader:
+            xb, yb = _to(xb, device), yb.to(device)
+            optimizer.zero_grad(set_to_none=True)
+            loss = loss_fn(_forward(model, xb), yb)
+            loss.backward()
+            optimizer.step()
+            # Accumulated on the device: no per-batch synchronization
+            total_loss += loss.detach() * len(yb)
+            samples += len(yb)
+        train_s = time.perf_counter() - t0
+        accuracy, test_loss = evaluate(model, test_loader, device)
+        epoch_s = time.perf_counter() - t0
+
+        if accuracy > best_acc:
+            best_acc, stale = accuracy, 0
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+        else:
+            stale += 1
+        record = {"epoch": epoch + 1, "loss": round(float(total_loss) / max(1, samples), 5),
+                  "test_loss": round(test_loss, 5), "test_accuracy": round(accuracy, 5),
+                  "epoch_s": round(epoch_s, 3), "samples_per_s": round(samples / max(train_s, 1e-9), 1)}
+        history.append(record)
+        print(f"Epoch {epoch + 1}/{epochs}, Loss: {record['loss']:.4f}, Test loss: {test_loss:.4f}, "
+              f"Test accuracy: {accuracy:.2%}, {epoch_s:.2f}s ({record['samples_per_s']:.0f} samples/s)")
+        if log_path:
+            with open(log_path, "a") as f:
+                f.write(json.dumps(dict(log_info or {}, **record)) + "\n")
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, {
+                "epoch": epoch, "model": model.state_dict(), "optimizer": optimizer.state_dict(),
+                "best_accuracy": best_acc, "best_state": best_state, "stale_epochs": stale, "history": history,
+            })
+        if patience and stale >= patience:
+            print(f"Early stopping: no improvement for {patience} epochs")
+            break
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    model.to("cpu")
+    print(f"Training completed. Best test accuracy: {best_acc:.2%}")
+    return history
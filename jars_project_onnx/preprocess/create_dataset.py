@@ -1,74 +1,444 @@
 """
 PREPROCESS SCRIPT: Create dataset from raw landmark data
 PURPOSE: Load raw JSONL files, normalize landmarks, create training dataset
-INPUT: Raw JSON files with landmarks (data_raw/*.jsonl)
+INPUT: Raw recordings with landmarks (data_raw/*.jsonl, or chunked binary
+       data_raw/*.lmk from save_landmarks.py / recording.py convert)
 OUTPUT: X.npy (features), y.npy (labels), classes.json (label mapping)
+PIPELINE (streaming, bounded memory):
+  1. Split every JSONL file into ~CHUNK_BYTES byte ranges on line boundaries,
+     and every .lmk file into runs of its compressed chunks
+  2. Worker processes parse/decode their ranges into (rows, 1530) float32 blocks and
+     normalize each block with normalize_batch (vectorized, in place)
+  3. The parent appends blocks, in file order, to X.npy/y.npy memory maps
+     that grow in chunks (npy_writer.GrowableNpy) - no list of all frames
+  4. Class ids: labels already in classes.json keep their id; new labels get
+     the next ids in sorted name order, so ids never depend on glob order
+SUBSETS: --subset hands / hands_anchors / ... (preprocess/landmark_subsets.py)
+  keeps only that subset's points. Recordings may hold full vectors or any
+  subset containing it; the manifest records the subset, and switching it
+  rebuilds everything.
+INCREMENTAL: data_processed/manifest.json records each file's sha256, row
+  count and row range. Later runs parse only new or changed files: new files
+  are appended to the existing arrays, changed/removed ones are spliced out
+  by copying the kept ranges. --full forces a from-scratch build, --verify
+  checks the manifest against the arrays and raw files.
+USAGE (from preprocess/):
+  python create_dataset.py [--workers N] [--raw "../data_raw/*.jsonl"] [--out-dir ../data_processed]
+  python create_dataset.py --subset hands --out-dir ../data_processed_hands
+  python create_dataset.py --verify
 """
 
+import argparse
 import json
-import numpy as np
-from glob import glob
 import os
-from normalize import normalize_vector
+import time
+from functools import partial
+from multiprocessing import Pool
+
+import numpy as np
+
+from manifest import (
+    MANIFEST_NAME,
+    check_ranges,
+    file_digest,
+    load_manifest,
+    new_manifest,
+    plan_build,
+    save_manifest,
+    source_key,
+)
+from landmark_subsets import (
+    DEFAULT_SUBSET,
+    LANDMARK_SUBSETS,
+    column_map,
+    select_subset,
+    subset_dim,
+    subset_for_dim,
+)
+from normalize import normalize_batch
+from npy_writer import GrowableNpy, is_growable, read_growable_header
+from recording import RECORDING_EXT, RecordingReader, list_recordings, read_frame
 
 # ============ CONFIG ============
-# Path pattern to find all raw JSONL files
-RAW_PATH = "../data_raw/*.jsonl"
+# Resolve paths relative to this file so it works from any working directory
+PREPROCESS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(PREPROCESS_DIR)
+# Path pattern to find all raw recordings (.jsonl and .lmk)
+RAW_PATH = os.path.join(PROJECT_DIR, "data_raw", "*")
+OUT_DIR = os.path.join(PROJECT_DIR, "data_processed")
+CLASSES_PATH = os.path.join(PROJECT_DIR, "classes.json")
+# Work unit for one worker task (~1600 frames of ~20 KB JSON each)
+CHUNK_BYTES = 32 * 1024 * 1024
+# .lmk work unit: consecutive chunks adding up to about this many frames
+TASK_FRAMES = 2048
+# X.npy grows by this many rows at a time
+GROW_ROWS = 65536
 
-# ============ INITIALIZE STORAGE ============
-X = []           # Feature vectors (landmarks)
-y = []           # Labels (gesture names mapped to integers)
-classes = {}     # Mapping of gesture name to class ID
 
-print("Loading raw data...")
+# ============ SPLIT FILES INTO WORK UNITS ============
+def split_file(path, chunk_bytes=CHUNK_BYTES):
+    """
+    Work units (path, start, end) covering the file
+    JSONL: byte ranges, lines are assigned by start offset
+    .lmk:  chunk number ranges of about TASK_FRAMES frames
+    """
+    if path.endswith(RECORDING_EXT):
+        with RecordingReader(path) as reader:
+            tasks, first, frames = [], 0, 0
+            for i, entry in enumerate(reader.chunk_index):
+                frames += entry[1]
+                if frames >= TASK_FRAMES:
+                    tasks.append((path, first, i + 1))
+                    first, frames = i + 1, 0
+            if first < len(reader.chunk_index):
+                tasks.append((path, first, len(reader.chunk_index)))
+            return tasks
+    size = os.path.getsize(path)
+    return [(path, start, min(start + chunk_bytes, size)) for start in range(0, size, chunk_bytes)]
 
-# ============ LOAD RAW DATA ============
-# Iterate through all JSONL files in data_raw/
-for file in glob(RAW_PATH):
-    print(f"Processing {file}...")
-    with open(file) as f:
-        for line in f:
+
+# ============ WORKER: PARSE + NORMALIZE ONE RANGE ============
+def subset_columns_for(path, vector_dim, subset):
+    """Columns of `subset` in a recording's vectors (None = all of them)"""
+    try:
+        return column_map(subset_for_dim(vector_dim), subset)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from e
+
+
+def parse_range(task, subset=DEFAULT_SUBSET):
+    """
+    Parse every line that starts inside [start, end) of one JSONL file
+    OUTPUT: (block float32 (rows, subset_dim) normalized, labels list of str)
+    Rows are parsed one line at a time into a preallocated block, so only one
+    line's Python floats are alive at once
+    """
+    path, start, end = task
+    if path.endswith(RECORDING_EXT):
+        return decode_chunks(path, start, end, subset)
+    block = None
+    labels = []
+    with open(path, "rb") as f:
+        if start:
+            # Skip the line that straddles `start`; its owner is the previous range
+            f.seek(start - 1)
+            f.readline()
+        pos = f.tell()
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            if not line.strip():
+                continue
             # Parse JSON line
             row = json.loads(line)
-
-            # Extract landmark vector from JSON
+            if block is None:
+                # Width of the recorded vectors (1530, or a subset's)
+                block = np.empty((1024, len(row["vector"])), dtype=np.float32)
+            elif len(labels) == len(block):
+                block = np.resize(block, (2 * len(block), block.shape[1]))
             # Vector is 1D array of 1530 values (42 hand + 468 face landmarks * 3)
-            vec = np.array(row["vector"], dtype=np.float32)
-            
-            # Normalize landmarks (center, scale) for consistent model input
-            vec = normalize_vector(vec)
-
-            # Extract gesture label (e.g., "Hello", "Yes", "No")
-            label = row["label"]
-
-            # Create new class ID if this label hasn't been seen before
-            if label not in classes:
-                classes[label] = len(classes)  # Assign next integer ID
-
-            # Store normalized vector and class ID
-            X.append(vec)
-            y.append(classes[label])
-
-# ============ CONVERT TO NUMPY ARRAYS ============
-# Stack all vectors into single 2D array: (num_samples, 1530)
-X = np.stack(X)
-# Convert labels to numpy array
-y = np.array(y, dtype=np.int64)
-
-# ============ SAVE PROCESSED DATA ============
-# Create output directory if it doesn't exist
-os.makedirs("../data_processed", exist_ok=True)
-
-# Save feature vectors
-np.save("../data_processed/X.npy", X)
-# Save labels
-np.save("../data_processed/y.npy", y)
-
-# ============ SAVE CLASS MAPPING ============
-# Save class label mapping for later reference
-with open("../classes.json", "w") as f:
-    json.dump(classes, f, indent=2)
-
-print("Saved X.npy, y.npy and classes.json")
-print("Dataset size:", X.shape, y.shape)
-print("Classes:", classes)
+            block[len(labels)] = row["vector"]
+            # Gesture label (e.g., "Hello", "Yes", "No")
+            labels.append(row["label"])
+
+    if block is None:
+        return np.empty((0, subset_dim(subset)), dtype=np.float32), labels
+    block = block[:len(labels)]
+    columns = subset_columns_for(path, block.shape[1], subset)
+    if columns is not None:
+        block = block[:, columns]
+    # Normalize the whole range at once (center, scale) - vectorized, in place
+    normalize_batch(block, out=block)
+    return block, labels
+
+
+def decode_chunks(path, first, stop, subset=DEFAULT_SUBSET):
+    """Decode chunks [first, stop) of a .lmk recording into a normalized float32 block"""
+    with RecordingReader(path) as reader:
+        columns = subset_columns_for(path, reader.vector_dim, subset)
+        frames = sum(entry[1] for entry in reader.chunk_index[first:stop])
+        block = np.empty((frames, subset_dim(subset)), dtype=np.float32)
+        labels = []
+        pos = 0
+        for i in range(first, stop):
+            _, chunk_labels, vectors = reader.read_chunk(i)
+            block[pos:pos + len(vectors)] = vectors if columns is None else vectors[:, columns]
+            labels.extend(chunk_labels)
+            pos += len(vectors)
+            del vectors                     # Release the zero-copy view before close
+    normalize_batch(block, out=block)
+    return block, labels
+
+
+# ============ STABLE CLASS IDS ============
+def assign_class_ids(labels, existing=None):
+    """
+    Final label -> id mapping
+    Labels already in `existing` keep their ids; the rest follow in sorted order
+    """
+    classes = dict(existing or {})
+    next_id = max(classes.values(), default=-1) + 1
+    for label in sorted(set(labels) - set(classes)):
+        classes[label] = next_id
+        next_id += 1
+    return classes
+
+
+def count_rows(path):
+    """Rows a recording contributes: frames of a .lmk, non-empty lines of a JSONL"""
+    if path.endswith(RECORDING_EXT):
+        with RecordingReader(path) as reader:
+            return reader.frames
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def nth_row(path, n):
+    """The n-th row of a recording as a {"vector", "label", ...} dict"""
+    if path.endswith(RECORDING_EXT):
+        return read_frame(path, n)
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                if n == 0:
+                    return json.loads(line)
+                n -= 1
+    raise IndexError(f"{path} has fewer rows than expected")
+
+
+def load_existing(out_dir, classes_path, existing_classes, subset=DEFAULT_SUBSET):
+    """
+    Manifest of the previous build if it still matches the arrays on disk and
+    the requested subset, else None (full rebuild)
+    """
+    manifest = load_manifest(os.path.join(out_dir, MANIFEST_NAME))
+    if manifest is None:
+        return None
+    x_path = os.path.join(out_dir, "X.npy")
+    y_path = os.path.join(out_dir, "y.npy")
+    if not (is_growable(x_path) and is_growable(y_path)):
+        print("Existing arrays were not written by the streaming builder; rebuilding everything")
+        return None
+    x_rows = read_growable_header(x_path)[0][0]
+    y_rows = read_growable_header(y_path)[0][0]
+    if manifest.get("subset", DEFAULT_SUBSET) != subset:
+        print(f"Existing dataset holds the {manifest.get('subset', DEFAULT_SUBSET)!r} subset; "
+              f"rebuilding everything for {subset!r}")
+        return None
+    if manifest["vector_dim"] != subset_dim(subset) or not x_rows == y_rows == manifest["rows"]:
+        print("Manifest does not match X.npy / y.npy; rebuilding everything")
+        return None
+    if manifest["classes"] != existing_classes:
+        print(f"{classes_path} changed since the last build; rebuilding everything")
+        return None
+    return manifest
+
+
+def build_dataset(raw_glob=RAW_PATH, out_dir=OUT_DIR, classes_path=CLASSES_PATH, workers=None,
+                  chunk_bytes=CHUNK_BYTES, reset_classes=False, full=False, rehash=False, subset=DEFAULT_SUBSET):
+    """
+    Run the streaming pipeline; returns (rows, classes)
+    X.npy holds the `subset` columns of every recording (1530 for "full")
+    Incremental unless full=True: with a valid manifest only new or changed
+    files are parsed. New files are appended in place; when files changed or
+    disappeared, the kept row ranges are copied (not re-parsed) into fresh
+    arrays and the re-parsed files appended after them.
+    """
+    files = list_recordings(raw_glob)
+    if not files:
+        raise SystemExit(f"No raw files match {raw_glob}")
+    raw_dir = os.path.dirname(os.path.abspath(raw_glob))
+
+    existing = None
+    if not reset_classes and os.path.exists(classes_path):
+        with open(classes_path) as f:
+            existing = json.load(f)
+
+    os.makedirs(out_dir, exist_ok=True)
+    x_path = os.path.join(out_dir, "X.npy")
+    y_path = os.path.join(out_dir, "y.npy")
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = None if (full or reset_classes) else load_existing(out_dir, classes_path, existing or {}, subset)
+
+    kept, todo, removed = plan_build(files, manifest, raw_dir, rehash)
+    if manifest is not None and not todo and not removed:
+        manifest["files"].update(kept)
+        save_manifest(manifest_path, manifest)
+        print(f"Dataset is up to date ({manifest['rows']} rows from {len(kept)} files)")
+        return manifest["rows"], manifest["classes"]
+
+    # New files only: add rows at the end of the existing arrays.
+    # Anything else: copy kept ranges into new arrays, then add parsed files.
+    append = manifest is not None and not removed and all(key not in manifest["files"] for key, *_ in todo)
+    target_x = x_path if append else x_path + ".tmp"
+    target_y = y_path if append else y_path + ".tmp"
+    entries = {}
+    for key in removed:
+        print(f"Removed: {key}")
+
+    # Labels are numbered in first-seen order while streaming and remapped to
+    # the stable ids at the end (y is 8 bytes per row, X is never touched)
+    seen = {}
+    workers = workers or os.cpu_count() or 1
+    tasks = [(key, task) for key, path, _, _ in todo for task in split_file(path, chunk_bytes)]
+    print(f"Parsing {len(todo)} of {len(files)} files ({len(tasks)} chunks, {workers} workers), "
+          f"{'appending' if append else 'rewriting'} arrays...")
+    with GrowableNpy(target_x, (subset_dim(subset),), np.float32, GROW_ROWS, append=append) as X, \
+            GrowableNpy(target_y, (), np.int64, GROW_ROWS, append=append) as y:
+        if append:
+            entries.update(kept)
+        elif kept:
+            # Splice: copy unchanged files' rows block by block from the old arrays
+            old_x = np.load(x_path, mmap_mode="r")
+            old_y = np.load(y_path, mmap_mode="r")
+            for key, entry in sorted(kept.items(), key=lambda item: item[1]["start"]):
+                start = X.rows
+                for i in range(entry["start"], entry["stop"], GROW_ROWS):
+                    stop = min(i + GROW_ROWS, entry["stop"])
+                    X.append(old_x[i:stop])
+                    y.append(old_y[i:stop])
+                entries[key] = dict(entry, start=start, stop=X.rows)
+            del old_x, old_y
+
+        parsed_from = X.rows
+        info = {key: (digest, st) for key, _, digest, st in todo}
+        with Pool(workers) as pool:
+            # imap keeps file/chunk order, so the output is deterministic
+            results = pool.imap(partial(parse_range, subset=subset), [task for _, task in tasks])
+            for (key, _), (block, labels) in zip(tasks, results):
+                if key not in entries:
+                    digest, st = info[key]
+                    entries[key] = {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                    "rows": 0, "start": X.rows, "stop": X.rows}
+                    print(f"Processing {key}...")
+                if not labels:
+                    continue
+                ids = np.fromiter((seen.setdefault(label, len(seen)) for label in labels),
+                                  dtype=np.int64, count=len(labels))
+                X.append(block)
+                y.append(ids)
+                entries[key]["rows"] += len(labels)
+                entries[key]["stop"] = X.rows
+
+        for key, _, digest, st in todo:
+            if key not in entries:      # Empty file: no chunks, no rows
+                entries[key] = {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                "rows": 0, "start": X.rows, "stop": X.rows}
+
+        classes = assign_class_ids(seen, existing)
+        if seen:
+            lut = np.empty(len(seen), dtype=np.int64)
+            for label, temp_id in seen.items():
+                lut[temp_id] = classes[label]
+            new_ids = y.view()[parsed_from:]
+            new_ids[:] = lut[new_ids]
+        rows = X.rows
+
+    if not append:
+        os.replace(target_x, x_path)
+        os.replace(target_y, y_path)
+
+    # ============ SAVE CLASS MAPPING + MANIFEST ============
+    # The manifest is written last: if anything above failed, the next build
+    # sees a manifest that does not match the arrays and starts over
+    with open(classes_path, "w") as f:
+        json.dump(classes, f, indent=2)
+    manifest = new_manifest(subset_dim(subset))
+    manifest.update(subset=subset, rows=rows, classes=classes, files=entries)
+    save_manifest(manifest_path, manifest)
+    return rows, classes
+
+
+# ============ VERIFY ============
+def verify_dataset(raw_glob=RAW_PATH, out_dir=OUT_DIR, classes_path=CLASSES_PATH, samples=8):
+    """
+    Check the manifest against the arrays and the raw files
+      - X.npy / y.npy row counts and the manifest's row ranges agree
+      - every recorded file still exists with the same sha256 and row count
+      - no raw file is missing from the manifest
+      - `samples` random rows per file re-parse to the stored row and label
+    Returns a list of problems (empty = consistent)
+    """
+    manifest = load_manifest(os.path.join(out_dir, MANIFEST_NAME))
+    if manifest is None:
+        return [f"No {MANIFEST_NAME} in {out_dir}; run a build first"]
+    X = np.load(os.path.join(out_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(out_dir, "y.npy"), mmap_mode="r")
+    problems = []
+    if len(X) != len(y):
+        problems.append(f"X.npy has {len(X)} rows but y.npy has {len(y)}")
+    problems += check_ranges(manifest, len(X))
+    with open(classes_path) as f:
+        classes = json.load(f)
+    if manifest["classes"] != classes:
+        problems.append(f"{classes_path} differs from the classes recorded at build time")
+
+    raw_dir = os.path.dirname(os.path.abspath(raw_glob))
+    on_disk = {source_key(path, raw_dir) for path in list_recordings(raw_glob)}
+    for key in sorted(on_disk - set(manifest["files"])):
+        problems.append(f"{key}: not in the manifest (run a build)")
+
+    rng = np.random.default_rng(0)
+    subset = manifest.get("subset", DEFAULT_SUBSET)
+    for key, entry in sorted(manifest["files"].items()):
+        path = os.path.join(raw_dir, key)
+        if not os.path.exists(path):
+            problems.append(f"{key}: recorded in the manifest but missing")
+            continue
+        if file_digest(path) != entry["sha256"]:
+            problems.append(f"{key}: content changed since the build")
+            continue
+        count = count_rows(path)
+        if count != entry["rows"]:
+            problems.append(f"{key}: has {count} rows, manifest says {entry['rows']}")
+            continue
+        for n in sorted(rng.choice(count, size=min(samples, count), replace=False)) if count else []:
+            parsed = nth_row(path, int(n))
+            row = select_subset(np.asarray(parsed["vector"], dtype=np.float32).reshape(1, -1), subset)
+            normalize_batch(row, out=row)
+            stored = entry["start"] + int(n)
+            if stored >= len(X) or not np.allclose(X[stored], row[0], rtol=1e-5, atol=1e-5):
+                problems.append(f"{key}: row {n} does not match X.npy[{stored}]")
+            elif classes.get(parsed["label"]) != int(y[stored]):
+                problems.append(f"{key}: row {n} label {parsed['label']!r} does not match y.npy[{stored}]")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build X.npy / y.npy / classes.json from raw JSONL recordings")
+    parser.add_argument("--raw", default=RAW_PATH, help="Glob of raw recordings (.jsonl / .lmk)")
+    parser.add_argument("--out-dir", default=OUT_DIR, help="Where X.npy and y.npy are written")
+    parser.add_argument("--classes", default=CLASSES_PATH, help="classes.json to read and update")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: all cores)")
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_BYTES / 2**20, help="Bytes of JSONL per task")
+    parser.add_argument("--reset-classes", action="store_true",
+                        help="Ignore the existing classes.json and number labels in sorted order (full build)")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and rebuild everything")
+    parser.add_argument("--rehash", action="store_true",
+                        help="Hash every raw file even when its size and mtime are unchanged")
+    parser.add_argument("--subset", default=DEFAULT_SUBSET, choices=sorted(LANDMARK_SUBSETS),
+                        help="Landmark points to keep (see preprocess/landmark_subsets.py)")
+    parser.add_argument("--verify", action="store_true", help="Check manifest, arrays and raw files; build nothing")
+    parser.add_argument("--verify-samples", type=int, default=8, help="Rows per file re-parsed by --verify")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.verify:
+        problems = verify_dataset(args.raw, args.out_dir, args.classes, args.verify_samples)
+        for problem in problems:
+            print("MISMATCH:", problem)
+        print(f"Verify {'failed' if problems else 'passed'} in {time.perf_counter() - t0:.1f}s")
+        raise SystemExit(1 if problems else 0)
+
+    rows, classes = build_dataset(args.raw, args.out_dir, args.classes, args.workers,
+                                  int(args.chunk_mb * 2**20), args.reset_classes, args.full, args.rehash,
+                                  args.subset)
+    print(f"Saved X.npy, y.npy and classes.json in {time.perf_counter() - t0:.1f}s")
+    print("Dataset size:", (rows, subset_dim(args.subset)), (rows,), f"subset {args.subset!r}")
+    print("Classes:", classes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+LANDMARK SUBSETS: Which of the 510 MediaPipe points a model is trained on
+PURPOSE: Hand-only or hand + a few face anchors models need a fraction of the
+         1530-value full vector - smaller frames on the wire, less to
+         normalize and a narrower first layer - so the subset is chosen once
+         and carried from capture to serving:
+           save_landmarks.py --subset   records only the subset's values
+           create_dataset.py --subset   selects the subset from any recording
+                                        that contains it
+           train.py                     writes the subset into the ONNX metadata
+           server.py                    validates expected_dim against it, maps
+                                        full vectors down and tells the browser
+                                        which points to send
+LAYOUT: A subset vector is its points in full-layout order, x,y,z per point.
+        Every subset keeps the 42 hand points first, so normalize_batch (face
+        centroid if any face value is non-zero, else hand centroid) works on
+        any of them unchanged.
+"""
+
+import json
+
+import numpy as np
+
+# Full layout (same as normalize.py; no imports, so create_dataset.py's
+# workers can load this module from preprocess/ directly)
+NUM_HAND_POINTS = 42
+NUM_POINTS = 510
+
+# ONNX metadata written by train.py and checked by server.py
+SUBSET_METADATA_KEY = "landmark_subset"
+POINTS_METADATA_KEY = "landmark_points"     # JSON list of full-layout point indices
+DEFAULT_SUBSET = "full"
+
+# Named MediaPipe face mesh points (indices into the 468-point face mesh;
+# left / right as seen in the mirrored preview)
+FACE_ANCHORS = {
+    "forehead": 10,
+    "nose_tip": 1,
+    "chin": 152,
+    "left_eye_outer": 33,
+    "left_eye_inner": 133,
+    "right_eye_inner": 362,
+    "right_eye_outer": 263,
+    "left_brow": 70,
+    "right_brow": 300,
+    "left_cheek": 234,
+    "right_cheek": 454,
+    "mouth_left": 61,
+    "mouth_right": 291,
+    "upper_lip": 13,
+    "lower_lip": 14,
+}
+
+# Subset name -> face anchors kept next to the hands (None = the whole mesh)
+LANDMARK_SUBSETS = {
+    "full": None,
+    "hands": (),
+    "hands_anchors": tuple(FACE_ANCHORS),
+    "hands_mouth": ("nose_tip", "chin", "mouth_left", "mouth_right", "upper_lip", "lower_lip"),
+}
+
+
+def subset_points(name):
+    """Full-layout point indices (0-41 hands, 42+ face) of a subset, ascending"""
+    if name not in LANDMARK_SUBSETS:
+        raise ValueError(f"Unknown landmark subset {name!r}; choose from {sorted(LANDMARK_SUBSETS)}")
+    anchors = LANDMARK_SUBSETS[name]
+    if anchors is None:
+        return np.arange(NUM_POINTS)
+    face = sorted(NUM_HAND_POINTS + FACE_ANCHORS[anchor] for anchor in anchors)
+    return np.concatenate([np.arange(NUM_HAND_POINTS), np.asarray(face, dtype=np.int64)])
+
+
+def subset_columns(name):
+    """Indices of the subset's values in a full 1530-value vector"""
+    points = subset_points(name)
+    return (points[:, None] * 3 + np.arange(3)).reshape(-1)
+
+
+def subset_dim(name):
+    return len(subset_points(name)) * 3
+
+
+def subset_for_dim(dim):
+    """The subset whose vectors have `dim` values (the dims are all distinct)"""
+    for name in LANDMARK_SUBSETS:
+        if subset_dim(name) == dim:
+            return name
+    raise ValueError(f"No landmark subset has {dim}-value vectors "
+                     f"(known: {', '.join(f'{n}={subset_dim(n)}' for n in LANDMARK_SUBSETS)})")
+
+
+def column_map(src, dst):
+    """
+    Indices that pick subset `dst` out of a `src` vector, or None when they are
+    the same subset. Raises ValueError when `src` lacks some of dst's points
+    (e.g. a hand-only recording cannot feed a hands_anchors model).
+    """
+    if src == dst:
+        return None
+    src_points = subset_points(src)
+    dst_points = subset_points(dst)
+    position = np.full(NUM_POINTS, -1, dtype=np.int64)
+    position[src_points] = np.arange(len(src_points))
+    pos = position[dst_points]
+    if (pos < 0).any():
+        raise ValueError(f"{src!r} vectors do not contain every point of the {dst!r} subset")
+    return (pos[:, None] * 3 + np.arange(3)).reshape(-1)
+
+
+def select_subset(x, name):
+    """
+    Reduce (..., D) landmark vectors of any known subset to subset `name`
+    Returns x itself when it already has that layout, else a new array
+    """
+    x = np.asarray(x, dtype=np.float32)
+    columns = column_map(subset_for_dim(x.shape[-1]), name)
+    return x if columns is None else np.take(x, columns, axis=-1)
+
+
+def subset_metadata(name):
+    """ONNX metadata_props entries describing the subset"""
+    return {SUBSET_METADATA_KEY: name, POINTS_METADATA_KEY: json.dumps(subset_points(name).tolist())}
+
+
+def subset_from_metadata(metadata, input_dim):
+    """
+    Subset a model was trained on, checked against its input width
+    Models exported before subsets existed carry no metadata; they are named
+    after their input width (1530 = full).
+    """
+    name = metadata.get(SUBSET_METADATA_KEY) or subset_for_dim(input_dim)
+    points = subset_points(name)
+    if POINTS_METADATA_KEY in metadata and json.loads(metadata[POINTS_METADATA_KEY]) != points.tolist():
+        raise ValueError(f"Model metadata lists different points than the {name!r} subset defines")
+    if input_dim != len(points) * 3:
+        raise ValueError(f"Model input has {input_dim} values but the {name!r} subset has {len(points) * 3}")
+    return name
+
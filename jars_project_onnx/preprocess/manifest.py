@@ -0,0 +1,105 @@
+"""
+DATASET MANIFEST: Which raw file produced which rows of X.npy / y.npy
+PURPOSE: Let create_dataset.py rebuild incrementally - only new or changed
+         JSONL files are parsed, everything else is kept or copied as is
+FORMAT (data_processed/manifest.json):
+  {
+    "version": 1,
+    "vector_dim": 1530,                  # values per X row (subset_dim(subset))
+    "subset": "full",                    # landmark subset, see landmark_subsets.py
+    "rows": 123456,                      # must equal len(X) == len(y)
+    "classes": {"Hello": 0, ...},        # classes.json at build time
+    "files": {
+      "data_Hello.jsonl": {              # path relative to the raw directory
+        "sha256": "...", "size": 123, "mtime_ns": 456,
+        "rows": 800, "start": 0, "stop": 800
+      }, ...
+    }
+  }
+A file whose size and mtime are unchanged is trusted without re-hashing.
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_digest(path, block_size=1 << 20):
+    """sha256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def new_manifest(vector_dim):
+    return {"version": MANIFEST_VERSION, "vector_dim": vector_dim, "rows": 0, "classes": {}, "files": {}}
+
+
+def load_manifest(path):
+    """Manifest dict, or None when missing or written by another version"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(path, manifest):
+    """Write atomically, so a crash never leaves a half-written manifest"""
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def source_key(path, raw_dir):
+    return os.path.relpath(os.path.abspath(path), raw_dir)
+
+
+def plan_build(files, manifest, raw_dir, rehash=False):
+    """
+    Compare the raw files on disk with the manifest
+    OUTPUT:
+      kept:    {key: manifest entry} still valid (mtime refreshed if re-hashed)
+      todo:    [(key, path, sha256, stat)] new or changed files to parse
+      removed: [key] in the manifest but gone from disk
+    """
+    known = manifest["files"] if manifest else {}
+    kept, todo = {}, []
+    for path in files:
+        key = source_key(path, raw_dir)
+        st = os.stat(path)
+        entry = known.get(key)
+        if entry and not rehash and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            kept[key] = entry
+            continue
+        digest = file_digest(path)
+        if entry and entry["sha256"] == digest:
+            kept[key] = dict(entry, size=st.st_size, mtime_ns=st.st_mtime_ns)   # Touched, not changed
+        else:
+            todo.append((key, path, digest, st))
+    current = {source_key(path, raw_dir) for path in files}
+    removed = [key for key in known if key not in current]
+    return kept, todo, removed
+
+
+def check_ranges(manifest, rows):
+    """Problems with the row ranges: gaps, overlaps, or a total != rows"""
+    problems = []
+    position = 0
+    for key, entry in sorted(manifest["files"].items(), key=lambda item: item[1]["start"]):
+        if entry["start"] != position:
+            problems.append(f"{key}: starts at row {entry['start']}, expected {position}")
+        if entry["stop"] - entry["start"] != entry["rows"]:
+            problems.append(f"{key}: range {entry['start']}:{entry['stop']} does not hold {entry['rows']} rows")
+        position = entry["stop"]
+    if position != rows or manifest["rows"] != rows:
+        problems.append(f"ranges cover {position} rows, manifest says {manifest['rows']}, arrays hold {rows}")
+    return problems
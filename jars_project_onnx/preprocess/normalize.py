@@ -1,63 +1,124 @@
 """
 NORMALIZE FUNCTION: Standardize landmark vectors for consistent model input
 PURPOSE: Ensure all landmarks are centered, scaled, and aligned for better predictions
+USED BY: preprocess/create_dataset.py (training data) AND server.py (serving),
+         so both sides always apply exactly the same transform
 """
 
 import numpy as np
 
-def normalize_vector(vec):
+# ============ LANDMARK LAYOUT ============
+NUM_HAND_POINTS = 42        # 21 per hand * 2 hands
+NUM_POINTS = 510            # 42 hand + 468 face points
+VECTOR_DIM = NUM_POINTS * 3  # 1530 values (x, y, z per point)
+STD_EPS = 1e-6              # Skip scaling below this std (avoid division by zero)
+
+
+def normalize_batch(x, out=None):
     """
-    Normalize a landmark vector by centering and scaling
-    
+    Normalize many landmark frames at once (fully vectorized, no Python loop)
+
+    INPUT:
+      x:   float32 array of shape (N, 1530) or (N, 510, 3) - or any landmark
+           subset (preprocess/landmark_subsets.py): (N, 3P) / (N, P, 3) with
+           the 42 hand points first and P - 42 face points after them
+      out: optional float32 array with the same shape as x that receives the
+           result. Pass out=x to normalize in place; nothing of size N*1530
+           is allocated besides out itself.
+
+    PROCESS (per row, same math as the original single-frame version):
+      1. View as (N, P, 3) - each row is P [x, y, z] points (510 for full)
+      2. Reference point: mean of the face points (42:) if ANY face value is
+         non-zero, else mean of the hand points (:42)
+      3. Center: subtract the reference from x,y (z is left unchanged)
+      4. Scale: divide x,y by their standard deviation when it is > 1e-6
+
+    OUTPUT:
+      out (or a new array) with the same shape as x
+    """
+    x = np.asarray(x, dtype=np.float32)
+    if out is None:
+        out = x.copy()
+    elif out is not x:
+        np.copyto(out, x)
+    if out.size == 0:
+        return out
+
+    width = out.shape[-1] * (out.shape[-2] if out.ndim == 3 else 1)
+    if out.ndim not in (2, 3) or width % 3 or width < NUM_HAND_POINTS * 3:
+        raise ValueError(f"Expected vectors of length {VECTOR_DIM} (or a landmark subset), got shape {x.shape}")
+    num_points = width // 3
+    num_face = num_points - NUM_HAND_POINTS
+    pts = out.reshape(-1, num_points, 3)        # (N, 510, 3) view for full vectors
+    if not np.shares_memory(pts, out):
+        raise ValueError("out must be C-contiguous so it can be normalized in place")
+
+    n = pts.shape[0]
+    hand_pts = pts[:, :NUM_HAND_POINTS]         # (N, 42, 3)
+    face_pts = pts[:, NUM_HAND_POINTS:]         # (N, 468, 3) for full vectors
+
+    # ============ PER-ROW STATISTICS (float64 accumulators) ============
+    # einsum reductions cast each float32 value to float64 before it is
+    # multiplied or added: the reference point is exact before it is rounded,
+    # and the expanded variance below does not cancel when the points are
+    # tightly clustered (small or distant faces), as float32 sums would
+    hand_sum = np.einsum("npk->nk", hand_pts, dtype=np.float64)                       # (N, 3)
+    face_sum = np.einsum("npk->nk", face_pts, dtype=np.float64)
+    xy = pts[:, :, :2]
+    sq_xy = np.einsum("npk,npk->n", xy, xy, dtype=np.float64)
+
+    # ============ FIND REFERENCE POINT PER ROW ============
+    # Face centroid if any face value is non-zero, else hand centroid
+    # (hand-only subsets have no face points and always use the hands)
+    face_present = np.any(face_pts, axis=(1, 2))                                       # (N,)
+    ref = np.where(
+        face_present[:, None],
+        face_sum / max(num_face, 1),
+        hand_sum / NUM_HAND_POINTS,
+    )[:, :2]                                                                           # (N, 2)
+
+    # ============ STD OF THE CENTERED X,Y (from the sums) ============
+    # sum((v - r)^2) = sum(v^2) - 2 r sum(v) + P r^2, summed over x and y
+    count = num_points * 2
+    col_sum = (hand_sum + face_sum)[:, :2]
+    centered_sum = (col_sum - num_points * ref).sum(axis=1)
+    centered_sq = sq_xy - 2.0 * (ref * col_sum).sum(axis=1) + num_points * (ref * ref).sum(axis=1)
+    mean = centered_sum / count
+    var = centered_sq / count - mean * mean
+    std = np.sqrt(np.maximum(var, 0.0))
+    std[std <= STD_EPS] = 1.0
+
+    # ============ CENTER + SCALE IN TWO CONTIGUOUS PASSES ============
+    # z gets shift 0 and scale 1, so it stays unchanged
+    shift = np.zeros((n, 1, 3), dtype=np.float32)
+    shift[:, 0, :2] = ref
+    scale = np.ones((n, 1, 3), dtype=np.float32)
+    scale[:, 0, :2] = (1.0 / std)[:, None]
+    np.subtract(pts, shift, out=pts)
+    np.multiply(pts, scale, out=pts)
+    return out
+
+
+def normalize_vector(vec, out=None):
+    """
+    Normalize a single landmark vector by centering and scaling
+
     INPUT:
       vec: Flattened array of shape (1530,)
            - First 126 values: 42 hand points * 3 coordinates (x, y, z)
            - Next 1404 values: 468 face points * 3 coordinates (x, y, z)
-    
-    PROCESS:
-      1. Reshape to (510, 3) - each row is one [x, y, z] point
-      2. Split into hand (first 42) and face (remaining 468)
-      3. Choose reference point: mean of face (if visible) or hand
-      4. Center: Subtract reference point from all x,y coordinates
-      5. Scale: Divide by standard deviation to normalize magnitude
-    
+           Landmark subsets keep the 126 hand values and fewer face points
+      out: optional float32 array of vec's shape for the result (may be vec itself)
+
     OUTPUT:
-      Normalized flattened array (1530,) ready for model input
-    
+      Normalized flattened array (same length as vec) ready for model input
+
     WHY normalize?
       - Handles different hand positions/sizes in frame
       - Makes model predictions consistent regardless of hand distance/angle
       - Improves training stability and generalization
     """
-
-    # Reshape from 1D (1530,) to 2D (510, 3)
-    # Each row = [x, y, z] coordinates of one landmark point
-    pts = vec.reshape(-1, 3)  # (510, 3)
-
-    # ============ SPLIT LANDMARKS ============
-    # Hand: First 42 points (21 per hand * 2 hands) = 126 values
-    hand_pts = pts[:42]
-    # Face: Remaining 468 points = 1404 values
-    face_pts = pts[42:]
-
-    # ============ FIND REFERENCE POINT (CENTER) ============
-    # Choose reference: face center if face visible, else hand center
-    if np.any(face_pts):                    # If face landmarks exist
-        ref = np.mean(face_pts, axis=0)    # Average all face points
-    else:                                   # Fallback to hand centroid
-        ref = np.mean(hand_pts, axis=0)    # Average all hand points
-
-    # ============ CENTER: TRANSLATE TO ORIGIN ============
-    # Subtract reference point from x,y (keep z unchanged)
-    pts[:, :2] -= ref[:2]
-
-    # ============ SCALE: NORMALIZE MAGNITUDE ============
-    # Calculate standard deviation of x,y coordinates
-    std = np.std(pts[:, :2])
-    # If std is very small, skip scaling (avoid division by zero)
-    if std > 1e-6:
-        pts[:, :2] /= std  # Divide by std to normalize magnitude
-
-    # ============ RETURN FLATTENED ARRAY ============
-    # Flatten back to 1D and convert to float32 for model
-    return pts.flatten().astype(np.float32)
+    arr = np.asarray(vec, dtype=np.float32).reshape(1, -1)
+    if out is not None:
+        out = np.asarray(out).reshape(1, -1)
+    return normalize_batch(arr, out=out).reshape(-1)
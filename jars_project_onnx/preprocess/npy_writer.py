@@ -0,0 +1,134 @@
+"""
+GROWABLE .NPY WRITER: Append rows to a memory-mapped .npy without holding them
+PURPOSE: create_dataset.py streams normalized blocks straight to disk instead of
+         collecting Python lists and concatenating at the end
+FORMAT: a standard .npy file (np.load / mmap_mode="r" read it as usual). The
+        header is written with a fixed 128-byte length, so it can be rewritten
+        with the final row count once writing is done. The file grows in
+        chunks with ftruncate and the data area is re-mapped, never copied.
+"""
+
+import os
+import struct
+
+import numpy as np
+
+HEADER_BYTES = 128                       # Multiple of 64, as the .npy spec asks
+_MAGIC = b"\x93NUMPY\x01\x00"
+
+
+def npy_header(dtype, shape):
+    """Version 1.0 .npy header padded to exactly HEADER_BYTES"""
+    header = repr({"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                   "fortran_order": False,
+                   "shape": tuple(shape)})
+    body_len = HEADER_BYTES - len(_MAGIC) - 2
+    if len(header) + 1 > body_len:
+        raise ValueError(f"Shape {shape} does not fit a {HEADER_BYTES}-byte .npy header")
+    header = header.ljust(body_len - 1) + "\n"
+    return _MAGIC + struct.pack("<H", body_len) + header.encode("latin1")
+
+
+def read_growable_header(path):
+    """(shape, dtype) of a .npy file, or None if its header is not HEADER_BYTES long"""
+    with open(path, "rb") as f:
+        if np.lib.format.read_magic(f) != (1, 0):
+            return None
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        if fortran_order or f.tell() != HEADER_BYTES:
+            return None
+    return shape, dtype
+
+
+def is_growable(path):
+    """True when path can be reopened with GrowableNpy(..., append=True)"""
+    return os.path.exists(path) and read_growable_header(path) is not None
+
+
+class GrowableNpy:
+    """
+    Append-only (rows, *row_shape) .npy file backed by np.memmap
+
+    INPUT:
+      path: output .npy
+      row_shape: shape of one row, e.g. (1530,) or () for labels
+      dtype: element type
+      chunk_rows: file grows by at least this many rows at a time
+      append: keep the rows of an existing file written by GrowableNpy
+              (see is_growable) and add to its end
+    USAGE:
+      with GrowableNpy("X.npy", (1530,), np.float32) as out:
+          out.append(block)
+    """
+
+    def __init__(self, path, row_shape, dtype, chunk_rows=65536, append=False):
+        self.path = path
+        self.row_shape = tuple(row_shape)
+        self.dtype = np.dtype(dtype)
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.row_bytes = int(np.prod(self.row_shape, dtype=np.int64)) * self.dtype.itemsize
+        self.rows = 0
+        self.capacity = 0
+        self._map = None
+        self.appending = append
+        if append:
+            header = read_growable_header(path)
+            if header is None or header[0][1:] != self.row_shape or header[1] != self.dtype:
+                raise ValueError(f"{path} is not a growable .npy of {self.dtype} rows shaped {self.row_shape}")
+            rows = header[0][0]
+            self._file = open(path, "rb+")
+            self._file.truncate(HEADER_BYTES + rows * self.row_bytes)
+            if rows:
+                self._grow(rows)
+            self.rows = rows
+        else:
+            self._file = open(path, "wb+")
+            self._file.write(npy_header(self.dtype, (0,) + self.row_shape))
+        self._initial_rows = self.rows
+
+    def _grow(self, needed):
+        """Extend the file (sparse, no copy) so it holds at least `needed` rows"""
+        capacity = max(needed, self.capacity + self.chunk_rows)
+        self._map = None                            # Drop the old mapping first
+        self._file.truncate(HEADER_BYTES + capacity * self.row_bytes)
+        self.capacity = capacity
+        self._map = np.memmap(self._file, dtype=self.dtype, mode="r+", offset=HEADER_BYTES,
+                              shape=(capacity,) + self.row_shape)
+
+    def append(self, block):
+        """Copy a (n, *row_shape) block to the end of the file"""
+        n = len(block)
+        if n == 0:
+            return
+        if self.rows + n > self.capacity:
+            self._grow(self.rows + n)
+        self._map[self.rows:self.rows + n] = block
+        self.rows += n
+
+    def view(self):
+        """Writable memmap of the rows written so far"""
+        if self._map is None:
+            return np.zeros((0,) + self.row_shape, dtype=self.dtype)
+        return self._map[:self.rows]
+
+    def close(self):
+        """Trim unused capacity and write the final shape into the header"""
+        if self._file.closed:
+            return
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+        self._file.truncate(HEADER_BYTES + self.rows * self.row_bytes)
+        self._file.seek(0)
+        self._file.write(npy_header(self.dtype, (self.rows,) + self.row_shape))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.appending:
+            self.rows = self._initial_rows      # Drop the half-written append
+        self.close()
+        if exc_type is not None and not self.appending:
+            os.remove(self.path)
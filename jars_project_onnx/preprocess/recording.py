@@ -0,0 +1,327 @@
+"""
+LANDMARK RECORDING FORMAT (.lmk): Chunked, compressed, append-only frames
+PURPOSE: Replace data_<label>.jsonl recordings (~20 KB of text per frame, all
+         held in memory until exit) with a binary file written while
+         capturing. Memory stays flat and a crash loses at most the frames of
+         the chunk that was not flushed yet.
+LAYOUT (little-endian):
+  file header   b"LMKREC01" | u16 version | u16 dtype (1 = f16, 2 = f32) | u32 vector_dim
+  chunk * N     b"CHNK" | u32 frames | u32 stored_bytes | u32 raw_bytes | u32 crc32(stored)
+                | u16 codec (0 = none, 1 = zlib) | u16 labels_bytes | labels (JSON list)
+                | payload: f64 timestamps[frames] | u16 label_index[frames]
+                           | vectors[frames, vector_dim] (byte-shuffled when compressed)
+  index         b"LMKINDEX" | u32 chunks | (u64 offset, u32 frames, f64 first_ts, f64 last_ts) * chunks
+  footer        u64 index_offset | b"LMKEND01"
+Byte shuffling stores the 1st byte of every float, then the 2nd, ... so the
+slowly changing exponent bytes sit together and zlib compresses them well.
+The index is written on close(); a file without one (crash) is recovered by
+scanning chunk headers and dropping a truncated or corrupt last chunk.
+USAGE:
+  python recording.py convert ../data_raw/*.jsonl [--dtype f16]   # JSONL -> .lmk
+  python recording.py info ../data_raw/data_Hello.lmk
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import zlib
+from glob import glob
+
+import numpy as np
+
+RECORDING_EXT = ".lmk"
+JSONL_EXT = ".jsonl"
+FILE_MAGIC = b"LMKREC01"
+CHUNK_MAGIC = b"CHNK"
+INDEX_MAGIC = b"LMKINDEX"
+END_MAGIC = b"LMKEND01"
+VERSION = 1
+DTYPES = {"f16": (1, np.float16), "f32": (2, np.float32)}
+_DTYPE_BY_CODE = {code: np.dtype(dt) for code, dt in DTYPES.values()}
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+
+_FILE_HEADER = struct.Struct("<8sHHI")
+_CHUNK_HEADER = struct.Struct("<4sIIIIHH")
+_INDEX_ENTRY = struct.Struct("<QIdd")
+_FOOTER = struct.Struct("<Q8s")
+
+
+def _shuffle(raw, itemsize):
+    """Group byte k of every element together (inverse: _unshuffle)"""
+    return np.frombuffer(raw, dtype=np.uint8).reshape(-1, itemsize).T.tobytes()
+
+
+def _unshuffle(data, itemsize):
+    return np.frombuffer(data, dtype=np.uint8).reshape(itemsize, -1).T.tobytes()
+
+
+# ============ WRITER ============
+class RecordingWriter:
+    """
+    Append frames to a .lmk file, one compressed chunk per chunk_frames
+
+    INPUT:
+      path: output file (overwritten)
+      vector_dim: values per frame (1530)
+      dtype: "f16" or "f32" storage for the landmark values
+      chunk_frames: frames buffered before a chunk is written (and lost at most)
+      compress: zlib level (0 = store uncompressed, memory-mappable)
+      fsync: also fsync after every chunk (survives power loss, not just crashes)
+    """
+
+    def __init__(self, path, vector_dim=1530, dtype="f16", chunk_frames=64, compress=1, fsync=False):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {sorted(DTYPES)}")
+        self.path = path
+        self.vector_dim = int(vector_dim)
+        self.dtype_code, self.dtype = DTYPES[dtype][0], np.dtype(DTYPES[dtype][1])
+        self.chunk_frames = max(1, int(chunk_frames))
+        self.compress = int(compress)
+        self.fsync = fsync
+        # Preallocated buffers for the chunk being filled
+        self._vectors = np.zeros((self.chunk_frames, self.vector_dim), dtype=self.dtype)
+        self._timestamps = np.zeros(self.chunk_frames, dtype=np.float64)
+        self._label_index = np.zeros(self.chunk_frames, dtype=np.uint16)
+        self._labels = []
+        self._pending = 0
+        self._index = []
+        self.frames = 0
+        self._file = open(path, "wb")
+        self._file.write(_FILE_HEADER.pack(FILE_MAGIC, VERSION, self.dtype_code, self.vector_dim))
+
+    def append(self, vector, label, timestamp):
+        """Add one frame; writes a chunk every chunk_frames frames"""
+        i = self._pending
+        self._vectors[i] = vector
+        self._timestamps[i] = timestamp
+        if label not in self._labels:
+            self._labels.append(label)
+        self._label_index[i] = self._labels.index(label)
+        self._pending += 1
+        self.frames += 1
+        if self._pending == self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        """Write buffered frames as one chunk"""
+        n = self._pending
+        if n == 0:
+            return
+        vectors = self._vectors[:n].tobytes()
+        codec = CODEC_NONE
+        if self.compress:
+            vectors = _shuffle(vectors, self.dtype.itemsize)
+            codec = CODEC_ZLIB
+        raw = self._timestamps[:n].tobytes() + self._label_index[:n].tobytes() + vectors
+        stored = zlib.compress(raw, self.compress) if codec == CODEC_ZLIB else raw
+        labels = json.dumps(self._labels).encode()
+        offset = self._file.tell()
+        self._file.write(_CHUNK_HEADER.pack(CHUNK_MAGIC, n, len(stored), len(raw), zlib.crc32(stored),
+                                            codec, len(labels)))
+        self._file.write(labels)
+        self._file.write(stored)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._index.append((offset, n, float(self._timestamps[0]), float(self._timestamps[n - 1])))
+        self._pending = 0
+        self._labels = []
+
+    def close(self):
+        """Flush the last chunk and write the index + footer"""
+        if self._file.closed:
+            return
+        self.flush()
+        index_offset = self._file.tell()
+        self._file.write(INDEX_MAGIC + struct.pack("<I", len(self._index)))
+        for entry in self._index:
+            self._file.write(_INDEX_ENTRY.pack(*entry))
+        self._file.write(_FOOTER.pack(index_offset, END_MAGIC))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# ============ READER ============
+class RecordingReader:
+    """
+    Read a .lmk file through a read-only memory map
+
+    chunk_index: [(offset, frames, first_ts, last_ts)] from the footer, or
+                 rebuilt by scanning when the file was never closed
+    read_chunk(i) -> (timestamps f64, labels [str], vectors) where vectors is
+                 a zero-copy view into the map for uncompressed files
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, dtype_code, self.vector_dim = _FILE_HEADER.unpack_from(self._map, 0)
+        if magic != FILE_MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} landmark recording")
+        self.dtype = _DTYPE_BY_CODE[dtype_code]
+        self.recovered = False
+        self.chunk_index = self._read_index()
+        if self.chunk_index is None:
+            self.chunk_index = self._scan()
+            self.recovered = True
+        self.frames = sum(entry[1] for entry in self.chunk_index)
+
+    def _read_index(self):
+        size = len(self._map)
+        if size < _FILE_HEADER.size + _FOOTER.size:
+            return None
+        index_offset, end = _FOOTER.unpack_from(self._map, size - _FOOTER.size)
+        if end != END_MAGIC or self._map[index_offset:index_offset + 8] != INDEX_MAGIC:
+            return None
+        (count,) = struct.unpack_from("<I", self._map, index_offset + 8)
+        start = index_offset + 12
+        return [_INDEX_ENTRY.unpack_from(self._map, start + i * _INDEX_ENTRY.size) for i in range(count)]
+
+    def _scan(self):
+        """Walk chunk headers from the start; stop at the first bad chunk"""
+        index = []
+        offset = _FILE_HEADER.size
+        size = len(self._map)
+        while offset + _CHUNK_HEADER.size <= size:
+            magic, n, stored, _, crc, _, labels_bytes = _CHUNK_HEADER.unpack_from(self._map, offset)
+            payload = offset + _CHUNK_HEADER.size + labels_bytes
+            if magic != CHUNK_MAGIC or payload + stored > size:
+                break
+            if zlib.crc32(self._map[payload:payload + stored]) != crc:
+                break
+            timestamps = self._decode(offset)[0]
+            index.append((offset, n, float(timestamps[0]), float(timestamps[-1])))
+            offset = payload + stored
+        return index
+
+    def _decode(self, offset):
+        magic, n, stored, raw_bytes, _, codec, labels_bytes = _CHUNK_HEADER.unpack_from(self._map, offset)
+        if magic != CHUNK_MAGIC:
+            raise ValueError(f"{self.path}: no chunk at offset {offset}")
+        start = offset + _CHUNK_HEADER.size
+        labels = json.loads(bytes(self._map[start:start + labels_bytes]))
+        start += labels_bytes
+        if codec == CODEC_NONE:
+            raw = memoryview(self._map)[start:start + stored]
+            vectors_raw = raw[n * 10:]
+        else:
+            raw = zlib.decompress(self._map[start:start + stored])
+            vectors_raw = _unshuffle(raw[n * 10:], self.dtype.itemsize)
+        timestamps = np.frombuffer(raw, dtype=np.float64, count=n)
+        label_index = np.frombuffer(raw, dtype=np.uint16, count=n, offset=n * 8)
+        vectors = np.frombuffer(vectors_raw, dtype=self.dtype).reshape(n, self.vector_dim)
+        return timestamps, label_index, labels, vectors
+
+    def read_chunk(self, i):
+        timestamps, label_index, labels, vectors = self._decode(self.chunk_index[i][0])
+        return timestamps, [labels[j] for j in label_index], vectors
+
+    def chunks(self):
+        """Stream (timestamps, labels, vectors) chunk by chunk"""
+        for i in range(len(self.chunk_index)):
+            yield self.read_chunk(i)
+
+    def read_all(self, dtype=np.float32):
+        """Whole recording as (timestamps (N,), labels [N], vectors (N, dim) dtype)"""
+        timestamps = np.empty(self.frames, dtype=np.float64)
+        vectors = np.empty((self.frames, self.vector_dim), dtype=dtype)
+        labels = []
+        pos = 0
+        for ts, chunk_labels, chunk_vectors in self.chunks():
+            n = len(ts)
+            timestamps[pos:pos + n] = ts
+            vectors[pos:pos + n] = chunk_vectors
+            labels.extend(chunk_labels)
+            pos += n
+        return timestamps, labels, vectors
+
+    def close(self):
+        try:
+            self._map.close()
+        except BufferError:
+            pass            # Zero-copy chunk views still alive; the map closes with them
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# ============ FINDING RECORDINGS ============
+def list_recordings(pattern):
+    """
+    Sorted .jsonl / .lmk files matching a glob pattern
+    A .lmk converted from a .jsonl (same name) replaces it, so a converted
+    corpus is never counted twice
+    """
+    files = [p for p in glob(pattern) if p.endswith((JSONL_EXT, RECORDING_EXT))]
+    converted = {os.path.splitext(p)[0] for p in files if p.endswith(RECORDING_EXT)}
+    return sorted(p for p in files if p.endswith(RECORDING_EXT) or os.path.splitext(p)[0] not in converted)
+
+
+def read_frame(path, n):
+    """The n-th frame of a .lmk file as a JSONL-style dict"""
+    with RecordingReader(path) as reader:
+        for i, (_, frames, _, _) in enumerate(reader.chunk_index):
+            if n < frames:
+                timestamps, labels, vectors = reader.read_chunk(i)
+                return {"timestamp": float(timestamps[n]), "label": labels[n],
+                        "vector": np.asarray(vectors[n], dtype=np.float32)}
+            n -= frames
+    raise IndexError(f"{path} has fewer frames than expected")
+
+
+# ============ JSONL CONVERSION ============
+def convert_jsonl(jsonl_path, out_path=None, dtype="f16", chunk_frames=64, compress=1):
+    """Stream a data_<label>.jsonl recording into a .lmk file; returns (out_path, frames)"""
+    out_path = out_path or os.path.splitext(jsonl_path)[0] + RECORDING_EXT
+    with open(jsonl_path) as f, RecordingWriter(out_path, dtype=dtype, chunk_frames=chunk_frames,
+                                                compress=compress) as writer:
+        for i, line in enumerate(f):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            writer.append(row["vector"], row["label"], row.get("timestamp", i))
+    return out_path, writer.frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Landmark recording (.lmk) tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="Convert JSONL recordings to .lmk")
+    convert.add_argument("inputs", nargs="+")
+    convert.add_argument("--dtype", choices=sorted(DTYPES), default="f16")
+    convert.add_argument("--chunk-frames", type=int, default=64)
+    convert.add_argument("--level", type=int, default=1, help="zlib level, 0 = uncompressed")
+    info = sub.add_parser("info", help="Describe .lmk files")
+    info.add_argument("inputs", nargs="+")
+    args = parser.parse_args()
+
+    for path in args.inputs:
+        if args.command == "convert":
+            out_path, frames = convert_jsonl(path, dtype=args.dtype, chunk_frames=args.chunk_frames,
+                                             compress=args.level)
+            ratio = os.path.getsize(path) / max(1, os.path.getsize(out_path))
+            print(f"{path} -> {out_path}: {frames} frames, {ratio:.1f}x smaller")
+        else:
+            with RecordingReader(path) as reader:
+                first = reader.chunk_index[0][2] if reader.chunk_index else 0.0
+                last = reader.chunk_index[-1][3] if reader.chunk_index else 0.0
+                print(f"{path}: {reader.frames} frames in {len(reader.chunk_index)} chunks, "
+                      f"{reader.dtype} x {reader.vector_dim}, {last - first:.1f}s"
+                      f"{' (recovered: no index)' if reader.recovered else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,131 +1,406 @@
 """
-DATA COLLECTION SCRIPT: Record gesture landmarks from webcam
+DATA COLLECTION SCRIPT: Record gesture landmarks from a webcam, video or images
 PURPOSE: Capture hand and face landmarks for training data
-WORKFLOW:
-  1. Open webcam
-  2. For each frame: Extract hand (21 pts) and face (468 pts) landmarks
-  3. Convert to fixed-size vector (1530 values)
-  4. Save to JSONL file with gesture label
-  5. Close on 'q' key press
-OUTPUT: data_<label>.jsonl file with recorded landmark sequences
+PIPELINE (one thread per stage, connected by bounded queues):
+  capture  -> read frames from the webcam / video file / image directory
+  detect   -> hand (21 pts x 2) and face (468 pts) detection run concurrently,
+              combined into a fixed-size vector (1530 values)
+  write    -> append to the recording as it is captured (a crash loses at most
+              the last unflushed chunk)
+  The main thread shows the preview and stops on 'q' (or end of input / Ctrl+C).
+BACKPRESSURE:
+  Webcam: when a queue is full the frame is dropped and counted, so a slow
+          stage never stalls the camera
+  Video file / image directory: stages wait instead, every frame is kept
+OUTPUT: data_<label>.lmk (chunked float16 recording, see preprocess/recording.py)
+        or data_<label>.jsonl with --format jsonl, plus per-stage latency
+SUBSETS: --subset hands / hands_anchors / ... (preprocess/landmark_subsets.py)
+        records only that subset's points; "hands" skips face detection
+        entirely. Such recordings can only build datasets of the same subset
+        or a smaller one - keep "full" when unsure.
+USAGE:
+  python save_landmarks.py                                   # webcam 0, asks for the label
+  python save_landmarks.py --source clip.mp4 --label Hello --no-preview
+  python save_landmarks.py --source frames/ --label Yes --fps 30
+  python save_landmarks.py --label Hello --subset hands_anchors
 """
 
-import cv2
-import mediapipe as mp
+import argparse
 import json
+import os
+import queue
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import mediapipe as mp
 import numpy as np
 
+from preprocess.landmark_subsets import DEFAULT_SUBSET, LANDMARK_SUBSETS, subset_columns, subset_dim, subset_points
+from preprocess.normalize import NUM_HAND_POINTS, VECTOR_DIM
+from preprocess.recording import RECORDING_EXT, RecordingWriter
+
+# ============ CONFIGURATION ============
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+HAND_VALUES = NUM_HAND_POINTS * 3           # 126: hand block at the start of the vector
+NUM_FACE_POINTS = 468
+DETECT_QUEUE = 4                            # Frames waiting for detection
+WRITE_QUEUE = 64                            # Vectors waiting to be written
+REPORT_EVERY_S = 5.0                        # Progress line interval
+_DONE = None                                # End-of-stream marker passed down the queues
+
+
 # ============ INITIALIZE MEDIAPIPE ============
-# Load pre-trained hand detection model
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(
-    static_image_mode=False,        # Video mode (not static images)
-    max_num_hands=2,                # Detect up to 2 hands
-    min_detection_confidence=0.6    # 60% confidence threshold
-)
-
-# Load pre-trained face mesh model
-mp_face = mp.solutions.face_mesh
-face = mp_face.FaceMesh(
-    static_image_mode=False,        # Video mode
-    max_num_faces=1,                # Detect 1 face
-    min_detection_confidence=0.6    # 60% confidence threshold
-)
-
-# ============ SETUP WEBCAM ============
-# Open webcam (0 = default camera)
-cap = cv2.VideoCapture(0)
-
-# ============ GET GESTURE LABEL ============
-# Ask user what gesture they're recording
-label = input("Enter label for this recording (e.g., 'Hello', 'Yes', 'No'): ").strip()
-out = []
-
-print("Recording... press 'q' to stop")
-
-# ============ MAIN RECORDING LOOP ============
-while True:
-    # Capture frame from webcam
-    ret, img = cap.read()
-    if not ret: 
-        break
-    
-    # Convert BGR (OpenCV) to RGB (MediaPipe)
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    hres, wres = img.shape[:2]  # Image resolution
-
-    # ============ DETECT LANDMARKS ============
-    # Detect hand landmarks
-    hand_res = hands.process(img_rgb)
-    # Detect face landmarks
-    face_res = face.process(img_rgb)
-
-    # ============ BUILD FIXED-SIZE VECTOR ============
+def create_detectors(static_images=False, face=True):
+    """Hand and face models (face None when not needed); each is only ever used from one thread"""
+    hands = mp.solutions.hands.Hands(
+        static_image_mode=static_images,    # Video mode unless frames are unrelated images
+        max_num_hands=2,                    # Detect up to 2 hands
+        min_detection_confidence=0.6        # 60% confidence threshold
+    )
+    if not face:
+        return hands, None
+    face = mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=static_images,
+        max_num_faces=1,                    # Detect 1 face
+        min_detection_confidence=0.6
+    )
+    return hands, face
+
+
+# ============ BUILD FIXED-SIZE VECTOR ============
+def landmarks_to_vector(hand_res, face_res):
     """
     Create consistent 1530-element vector regardless of detections:
       - Hand: 42 points (21 per hand * 2) * 3 coords = 126 values
       - Face: 468 points * 3 coords = 1404 values
-      - Total: 1530 values
-    Missing detections are padded with zeros
+    Missing detections (or face_res None) are left as zeros, extra points
+    are truncated
     """
-    
-    # Extract hand landmarks
-    hand_landmarks = []
+    vec = np.zeros(VECTOR_DIM, dtype=np.float32)
     if hand_res.multi_hand_landmarks:
-        # Loop through detected hands
-        for lm in hand_res.multi_hand_landmarks:
-            # Extract x, y, z for each landmark
-            for p in lm.landmark:
-                hand_landmarks.append([p.x, p.y, p.z])
-    
-    # Ensure exactly 42 hand points (pad with zeros if missing)
-    while len(hand_landmarks) < 42:
-        hand_landmarks.append([0.0, 0.0, 0.0])
-    # Truncate if more than 42 (shouldn't happen but safe guard)
-    hand_landmarks = hand_landmarks[:42]
-    
-    # Extract face landmarks
-    face_land = []
-    if face_res.multi_face_landmarks:
-        # Get first (only) detected face
-        for p in face_res.multi_face_landmarks[0].landmark:
-            face_land.append([p.x, p.y, p.z])
-    
-    # Ensure exactly 468 face points (pad with zeros if missing)
-    while len(face_land) < 468:
-        face_land.append([0.0, 0.0, 0.0])
-    face_land = face_land[:468]
-
-    # ============ COMBINE INTO VECTOR ============
-    # Concatenate hand and face landmarks, flatten to 1D, convert to float32
-    vec = np.concatenate([
-        np.array(hand_landmarks).flatten(),  # 126 values
-        np.array(face_land).flatten()        # 1404 values
-    ]).astype(np.float32)
-
-    # Store frame data
-    out.append({
-        "timestamp": time.time(),   # When was this captured
-        "label": label,             # Gesture name
-        "vector": vec.tolist()      # Landmark vector (converted to list for JSON)
-    })
-
-    # Display video feed
-    cv2.imshow("Recording: " + label, img)
-    
-    # Exit on 'q' key press
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-# ============ SAVE DATA ============
-# Save all recorded frames to JSONL file (one JSON per line)
-with open(f"data_{label}.jsonl", "w") as f:
-    for row in out:
-        f.write(json.dumps(row) + "\n")
-
-print(f"Saved {len(out)} frames to data_{label}.jsonl")
-
-# Cleanup
-cap.release()
-cv2.destroyAllWindows()
+        points = [(p.x, p.y, p.z) for lm in hand_res.multi_hand_landmarks for p in lm.landmark]
+        points = points[:NUM_HAND_POINTS]
+        vec[:len(points) * 3] = np.asarray(points, dtype=np.float32).ravel()
+    if face_res is not None and face_res.multi_face_landmarks:
+        points = [(p.x, p.y, p.z) for p in face_res.multi_face_landmarks[0].landmark][:NUM_FACE_POINTS]
+        vec[HAND_VALUES:HAND_VALUES + len(points) * 3] = np.asarray(points, dtype=np.float32).ravel()
+    return vec
+
+
+# ============ FRAME SOURCES ============
+def iter_capture(cap, live):
+    """(timestamp, BGR frame) from a cv2.VideoCapture until it runs out"""
+    try:
+        while True:
+            ret, img = cap.read()
+            if not ret:
+                break
+            # Webcam: wall clock; video: position in the file
+            timestamp = time.time() if live else cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            yield timestamp, img
+    finally:
+        cap.release()
+
+
+def iter_images(directory, fps):
+    """(timestamp, BGR frame) for every image in a directory, in name order"""
+    names = sorted(n for n in os.listdir(directory) if n.lower().endswith(IMAGE_EXTENSIONS))
+    for i, name in enumerate(names):
+        img = cv2.imread(os.path.join(directory, name))
+        if img is None:
+            print(f"Skipping unreadable image {name}")
+            continue
+        yield i / fps, img
+
+
+def open_source(source, fps=30.0):
+    """
+    Frame iterator for a webcam index ("0"), video file or image directory
+    OUTPUT: (frames, live, static_images) - live sources drop frames under backpressure
+    """
+    if os.path.isdir(source):
+        return iter_images(source, fps), False, True
+    live = source.isdigit()
+    if not live and not os.path.exists(source):
+        raise SystemExit(f"No such video file or directory: {source}")
+    cap = cv2.VideoCapture(int(source) if live else source)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open {source}")
+    return iter_capture(cap, live), live, False
+
+
+# ============ OUTPUT ============
+class JsonlWriter:
+    """Streaming data_<label>.jsonl output with the RecordingWriter interface"""
+
+    def __init__(self, path):
+        self.frames = 0
+        self._file = open(path, "w")
+
+    def append(self, vector, label, timestamp):
+        self._file.write(json.dumps({"timestamp": timestamp, "label": label, "vector": vector.tolist()}) + "\n")
+        self.frames += 1
+
+    def close(self):
+        self._file.close()
+
+
+# ============ PIPELINE ============
+class StageTimer:
+    """Latency samples of one stage (the most recent `keep` are kept for percentiles)"""
+
+    def __init__(self, keep=4096):
+        self.samples = deque(maxlen=keep)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        ms = np.asarray(self.samples) * 1000.0
+        return {"count": self.count,
+                "mean_ms": round(self.total * 1000.0 / self.count, 2),
+                "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                "p95_ms": round(float(np.percentile(ms, 95)), 2),
+                "max_ms": round(float(ms.max()), 2)}
+
+
+class CapturePipeline:
+    """
+    capture -> detect -> write threads for one recording
+
+    INPUT:
+      frames: iterator of (timestamp, BGR frame), see open_source
+      live: drop frames when a queue is full instead of waiting
+      detectors: (hands, face) from create_detectors
+      writer: object with append(vector, label, timestamp), e.g. RecordingWriter
+      label: gesture label stored with every frame
+      max_frames: stop after this many captured frames (0 = no limit)
+      columns: values of the full vector to record (a landmark subset's
+               subset_columns), None = all 1530
+    """
+
+    STAGES = ("capture", "hands", "face", "detect", "write", "end_to_end")
+
+    def __init__(self, frames, live, detectors, writer, label, max_frames=0,
+                 detect_queue=DETECT_QUEUE, write_queue=WRITE_QUEUE, columns=None):
+        self.frames = frames
+        self.live = live
+        self.hands, self.face = detectors
+        self.writer = writer
+        self.label = label
+        self.max_frames = max_frames
+        self.columns = columns
+        self.detect_q = queue.Queue(maxsize=detect_queue)
+        self.write_q = queue.Queue(maxsize=write_queue)
+        self.stop_event = threading.Event()
+        self.timers = {name: StageTimer() for name in self.STAGES}
+        self.captured = self.detected = self.written = 0
+        self.dropped = {"detect": 0, "write": 0}
+        self.errors = []
+        self.preview = None                 # Latest detected frame, shown by the main thread
+        self._threads = [threading.Thread(target=self._run, args=(name, fn), name=f"landmarks-{name}", daemon=True)
+                         for name, fn in (("capture", self._capture), ("detect", self._detect),
+                                          ("write", self._write))]
+
+    def start(self):
+        self.started = time.perf_counter()
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        """Stop capturing; frames already captured are still detected and written"""
+        self.stop_event.set()
+
+    def running(self):
+        return self._threads[-1].is_alive()
+
+    def join(self, timeout=None):
+        self._threads[-1].join(timeout)
+
+    def _run(self, name, fn):
+        try:
+            fn()
+        except Exception as e:
+            self.errors.append(f"{name}: {e!r}")
+            self.stop_event.set()
+            # Keep consuming the input so the upstream stage never blocks
+            source = {"detect": self.detect_q, "write": self.write_q}.get(name)
+            while source is not None and source.get() is not _DONE:
+                pass
+
+    def _put(self, q, item, stage):
+        """Live sources drop (and count) on a full queue; offline ones wait"""
+        if not self.live:
+            q.put(item)
+            return
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            self.dropped[stage] += 1
+
+    def _capture(self):
+        timer = self.timers["capture"]
+        try:
+            while not self.stop_event.is_set():
+                t0 = time.perf_counter()
+                item = next(self.frames, None)
+                if item is None:
+                    break
+                timer.add(time.perf_counter() - t0)
+                self.captured += 1
+                self._put(self.detect_q, (t0, *item), "detect")
+                if self.max_frames and self.captured >= self.max_frames:
+                    break
+        finally:
+            self.detect_q.put(_DONE)
+
+    def _detect(self):
+        hands_timer, face_timer, timer = self.timers["hands"], self.timers["face"], self.timers["detect"]
+
+        def run_face(img_rgb):
+            t0 = time.perf_counter()
+            result = self.face.process(img_rgb)
+            face_timer.add(time.perf_counter() - t0)
+            return result
+
+        # MediaPipe releases the GIL while a graph runs, so both models overlap
+        try:
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="landmarks-face") as face_pool:
+                while True:
+                    item = self.detect_q.get()
+                    if item is _DONE:
+                        break
+                    captured_at, timestamp, img = item
+                    t0 = time.perf_counter()
+                    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)      # BGR (OpenCV) -> RGB (MediaPipe)
+                    face_future = face_pool.submit(run_face, img_rgb) if self.face is not None else None
+                    hand_res = self.hands.process(img_rgb)
+                    hands_timer.add(time.perf_counter() - t0)
+                    face_res = face_future.result() if face_future is not None else None
+                    vec = landmarks_to_vector(hand_res, face_res)
+                    if self.columns is not None:
+                        vec = vec[self.columns]
+                    timer.add(time.perf_counter() - t0)
+                    self.detected += 1
+                    self.preview = img
+                    self._put(self.write_q, (captured_at, timestamp, vec), "write")
+        finally:
+            self.write_q.put(_DONE)
+
+    def _write(self):
+        timer, end_to_end = self.timers["write"], self.timers["end_to_end"]
+        while True:
+            item = self.write_q.get()
+            if item is _DONE:
+                break
+            captured_at, timestamp, vec = item
+            t0 = time.perf_counter()
+            self.writer.append(vec, self.label, timestamp)
+            done = time.perf_counter()
+            timer.add(done - t0)
+            end_to_end.add(done - captured_at)
+            self.written += 1
+
+    def stats(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {"elapsed_s": round(elapsed, 2),
+                "captured": self.captured,
+                "detected": self.detected,
+                "written": self.written,
+                "dropped": dict(self.dropped),
+                "fps_in": round(self.captured / elapsed, 1),
+                "fps_out": round(self.written / elapsed, 1),
+                "queues": {"detect": self.detect_q.qsize(), "write": self.write_q.qsize()},
+                "latency": {name: timer.summary() for name, timer in self.timers.items()},
+                "errors": list(self.errors)}
+
+
+def print_report(stats):
+    print(f"\nCaptured {stats['captured']} frames, wrote {stats['written']} in {stats['elapsed_s']}s "
+          f"({stats['fps_out']} fps), dropped {stats['dropped']}")
+    print(f"{'stage':<11} {'count':>7} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for name, s in stats["latency"].items():
+        if s["count"]:
+            print(f"{name:<11} {s['count']:>7} {s['mean_ms']:>8} {s['p50_ms']:>8} {s['p95_ms']:>8} {s['max_ms']:>8}")
+    for error in stats["errors"]:
+        print(f"ERROR in {error}")
+
+
+# ============ MAIN ============
+def main():
+    parser = argparse.ArgumentParser(description="Record gesture landmarks from a webcam, video or image directory")
+    parser.add_argument("--source", default="0", help="Webcam index, video file or image directory (default: 0)")
+    parser.add_argument("--label", help="Gesture label (asked for when omitted)")
+    parser.add_argument("--out", help="Output file (default: data_<label>.lmk / .jsonl)")
+    parser.add_argument("--format", choices=["lmk", "jsonl"], default="lmk",
+                        help="lmk: chunked binary recording (default), jsonl: one JSON object per line")
+    parser.add_argument("--dtype", choices=["f16", "f32"], default="f16", help="Landmark precision for --format lmk")
+    parser.add_argument("--chunk-frames", type=int, default=64,
+                        help="Frames per .lmk chunk (at most this many are lost on a crash)")
+    parser.add_argument("--subset", default=DEFAULT_SUBSET, choices=sorted(LANDMARK_SUBSETS),
+                        help="Landmark points to record (see preprocess/landmark_subsets.py)")
+    parser.add_argument("--fps", type=float, default=30.0, help="Timestamp spacing for image directories")
+    parser.add_argument("--max-frames", type=int, default=0, help="Stop after this many frames (0 = no limit)")
+    parser.add_argument("--no-preview", action="store_true", help="Do not open a preview window")
+    args = parser.parse_args()
+
+    # Ask user what gesture they're recording
+    label = args.label or input("Enter label for this recording (e.g., 'Hello', 'Yes', 'No'): ").strip()
+    frames, live, static_images = open_source(args.source, args.fps)
+
+    if args.format == "lmk":
+        out_path = args.out or f"data_{label}{RECORDING_EXT}"
+        writer = RecordingWriter(out_path, vector_dim=subset_dim(args.subset), dtype=args.dtype,
+                                 chunk_frames=args.chunk_frames)
+    else:
+        out_path = args.out or f"data_{label}.jsonl"
+        writer = JsonlWriter(out_path)
+
+    # Face detection only runs when the subset keeps face points
+    needs_face = len(subset_points(args.subset)) > NUM_HAND_POINTS
+    columns = None if args.subset == DEFAULT_SUBSET else subset_columns(args.subset)
+    pipeline = CapturePipeline(frames, live, create_detectors(static_images, face=needs_face), writer, label,
+                               args.max_frames, columns=columns)
+    print("Recording... press 'q' to stop" if not args.no_preview else "Recording... Ctrl+C to stop")
+    pipeline.start()
+    last_report = time.perf_counter()
+    try:
+        while pipeline.running():
+            if args.no_preview:
+                pipeline.join(timeout=0.2)
+            else:
+                # GUI calls stay on the main thread
+                if pipeline.preview is not None:
+                    cv2.imshow("Recording: " + label, pipeline.preview)
+                if cv2.waitKey(15) & 0xFF == ord('q'):
+                    pipeline.stop()
+            if time.perf_counter() - last_report >= REPORT_EVERY_S:
+                last_report = time.perf_counter()
+                s = pipeline.stats()
+                print(f"  {s['written']} frames, {s['fps_in']} fps in / {s['fps_out']} fps out, "
+                      f"dropped {s['dropped']}, queued {s['queues']}")
+    except KeyboardInterrupt:
+        pipeline.stop()
+        pipeline.join()
+    finally:
+        # Flush the last partial chunk and write the index
+        writer.close()
+        if not args.no_preview:
+            cv2.destroyAllWindows()
+
+    stats = pipeline.stats()
+    print_report(stats)
+    print(f"Saved {stats['written']} frames to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+OFFLINE SCORING CLI: Extract landmarks from videos and score whole archives
+PURPOSE: Re-score every recording after a model update without opening
+         thousands of sockets. Uses the same session factory, normalization,
+         variant resolution and softmax as server.py, so offline scores match
+         what clients would have been sent.
+INPUT: directories / files of
+  - videos (.mp4 .avi .mov .mkv .webm): landmarks extracted with MediaPipe,
+    exactly as save_landmarks.py does (optionally kept as .lmk, --landmarks-out).
+    The label is the name of the directory holding the video (used for
+    accuracy when it is a class in classes.json)
+  - recordings (.lmk / .jsonl): landmarks read directly, labels used for accuracy
+WORKFLOW:
+  1. Files are fanned out over a process pool (largest first), one
+     InferenceSession per worker with a single intra-op thread
+  2. Each worker extracts / reads all frames of a file, reduces them to the
+     model's landmark subset, normalizes them (unless the model normalizes
+     in its graph) and scores them in batches
+  3. The parent appends per-frame results to column files and collects the
+     per-file summaries
+OUTPUT (--out, default scores/):
+  frames_file.npy  int32    index into files.json entries
+  frames_index.npy int32    frame number within the file
+  frames_time.npy  float64  capture timestamp
+  frames_pred.npy  int16    predicted class id
+  frames_score.npy float32  its probability
+  frames_label.npy int16    recorded class id (-1: not in classes.json)
+  frames_probs.npy float16  (N, classes) probabilities, with --probs
+  files.json       per-file summaries (columns) + run information
+USAGE:
+  python score_archive.py archive/ [more/ file.mp4 ...] [--workers N] [--variant dynamic_int8]
+"""
+
+import argparse
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from preprocess.landmark_subsets import select_subset, subset_from_metadata
+from preprocess.normalize import VECTOR_DIM, normalize_batch
+from preprocess.npy_writer import GrowableNpy
+from preprocess.recording import JSONL_EXT, RECORDING_EXT, RecordingReader, RecordingWriter
+from serving.session import create_session, model_metadata, softmax
+from serving.variants import resolve_variant
+
+# ============ CONFIGURATION ============
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "model", "model.onnx")
+VARIANTS_DIR = os.path.join(BASE_DIR, "model", "variants")
+CLASSES_PATH = os.path.join(BASE_DIR, "classes.json")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+BATCH_SIZE = 256                    # Frames per session.run
+SEQUENCE_RESET_S = 1.0              # Same default as server.py SEQUENCE_RESET_MS
+UNKNOWN_LABEL = -1
+COLUMNS = {                         # name: (row shape, dtype)
+    "file": ((), np.int32),
+    "index": ((), np.int32),
+    "time": ((), np.float64),
+    "pred": ((), np.int16),
+    "score": ((), np.float32),
+    "label": ((), np.int16),
+}
+
+
+# ============ INPUT DISCOVERY ============
+def find_inputs(paths):
+    """Videos and recordings under paths; a .lmk replaces the .jsonl it was converted from"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                found.extend(os.path.join(root, n) for n in names)
+        else:
+            found.append(path)
+    found = [p for p in found if p.lower().endswith(VIDEO_EXTENSIONS + (RECORDING_EXT, JSONL_EXT))]
+    converted = {os.path.splitext(p)[0] for p in found if p.endswith(RECORDING_EXT)}
+    found = [p for p in found if not (p.endswith(JSONL_EXT) and os.path.splitext(p)[0] in converted)]
+    # Largest first so one long video does not finish last on an idle pool
+    return sorted(set(found), key=lambda p: (-os.path.getsize(p), p))
+
+
+# ============ LANDMARK SOURCES ============
+def read_recording(path):
+    """(timestamps, label names, float32 vectors) of a .lmk or .jsonl recording"""
+    if path.endswith(RECORDING_EXT):
+        with RecordingReader(path) as reader:
+            return reader.read_all()
+    stamps, labels, vectors = [], [], []
+    with open(path) as f:
+        for i, line in enumerate(f):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            stamps.append(row.get("timestamp", i))
+            labels.append(row["label"])
+            vectors.append(row["vector"])
+    # Full 1530-value frames, or the subset the recording was made with
+    width = len(vectors[0]) if vectors else VECTOR_DIM
+    return (np.asarray(stamps, dtype=np.float64), labels,
+            np.asarray(vectors, dtype=np.float32).reshape(-1, width))
+
+
+def extract_video(path, landmarks_out=None):
+    """Run the save_landmarks.py detectors over every frame of a video"""
+    # Imported here: scoring recordings needs neither OpenCV nor MediaPipe
+    import cv2
+    from save_landmarks import create_detectors, landmarks_to_vector, open_source
+
+    label = os.path.basename(os.path.dirname(os.path.abspath(path)))
+    frames, _, _ = open_source(path)
+    hands, face = create_detectors()
+    writer = None
+    if landmarks_out:
+        name = os.path.splitext(os.path.basename(path))[0] + RECORDING_EXT
+        writer = RecordingWriter(os.path.join(landmarks_out, name))
+    stamps, vectors = [], []
+    try:
+        for timestamp, img in frames:
+            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)      # BGR (OpenCV) -> RGB (MediaPipe)
+            vec = landmarks_to_vector(hands.process(img_rgb), face.process(img_rgb))
+            stamps.append(timestamp)
+            vectors.append(vec)
+            if writer is not None:
+                writer.append(vec, label, timestamp)
+    finally:
+        hands.close()
+        face.close()
+        if writer is not None:
+            writer.close()
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, VECTOR_DIM)
+    return np.asarray(stamps, dtype=np.float64), [label] * len(vectors), vectors
+
+
+# ============ WORKER PROCESS ============
+_worker = {}
+
+
+def init_worker(model_path, batch_size, landmarks_out):
+    """One session per process; the pool provides the parallelism"""
+    session = create_session(model_path, intra_op_threads=1)
+    metadata = model_metadata(session, model_path)
+    _worker.update(
+        session=session,
+        subset=subset_from_metadata(metadata, session.get_inputs()[0].shape[-1]),
+        input_name=session.get_inputs()[0].name,
+        output_name=session.get_outputs()[0].name,
+        graph_normalizes=metadata.get("landmark_normalization") == "graph",
+        sequence=metadata.get("model_type") == "sequence",
+        metadata=metadata,
+        batch_size=batch_size,
+        landmarks_out=landmarks_out,
+    )
+
+
+def score_frames(x, stamps):
+    """(N, classes) probabilities for normalized (or raw, graph-normalized) frames"""
+    session, input_name, output_name = _worker["session"], _worker["input_name"], _worker["output_name"]
+    if not _worker["sequence"]:
+        batch = _worker["batch_size"]
+        logits = [session.run([output_name], {input_name: x[i:i + batch]})[0] for i in range(0, len(x), batch)]
+        return softmax(np.concatenate(logits).astype(np.float32))
+    # Sequence model: one streaming step per frame, state reset after a gap
+    metadata = _worker["metadata"]
+    state_shape = (1, int(metadata["sequence_window"]) - 1, int(metadata["sequence_embed"]))
+    state = np.zeros(state_shape, dtype=np.float32)
+    logits = []
+    for i in range(len(x)):
+        if i and stamps[i] - stamps[i - 1] > SEQUENCE_RESET_S:
+            state = np.zeros(state_shape, dtype=np.float32)
+        out, state = session.run([output_name, "state_out"], {input_name: x[i:i + 1], "state": state})
+        logits.append(out)
+    return softmax(np.concatenate(logits).astype(np.float32))
+
+
+def score_file(path):
+    """Worker task: extract / read, normalize and score one file"""
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    try:
+        if path.lower().endswith(VIDEO_EXTENSIONS):
+            stamps, labels, x = extract_video(path, _worker["landmarks_out"])
+        else:
+            stamps, labels, x = read_recording(path)
+        cpu1 = time.process_time()
+        if len(x):
+            x = select_subset(x, _worker["subset"])
+        if len(x) and not _worker["graph_normalizes"]:
+            normalize_batch(x, out=x)
+        probs = score_frames(x, stamps) if len(x) else np.zeros((0, 0), dtype=np.float32)
+        error = None
+    except Exception as e:
+        stamps, labels, probs, error, cpu1 = np.zeros(0), [], np.zeros((0, 0), dtype=np.float32), repr(e), cpu0
+    cpu2 = time.process_time()
+    return {"path": path, "timestamps": stamps, "labels": labels, "probs": probs, "error": error,
+            "extract_cpu_s": cpu1 - cpu0, "score_cpu_s": cpu2 - cpu1, "wall_s": time.perf_counter() - t0}
+
+
+# ============ PARENT: OUTPUT ============
+def summarize(result, file_id, start, preds, scores, label_ids, inv_classes):
+    """One files.json row"""
+    n = len(preds)
+    summary = {"file": file_id, "path": result["path"], "frames": n, "start": start, "stop": start + n,
+               "top_label": None, "top_share": 0.0, "mean_score": 0.0, "accuracy": None,
+               "extract_cpu_s": round(result["extract_cpu_s"], 3), "score_cpu_s": round(result["score_cpu_s"], 3),
+               "error": result["error"]}
+    if n:
+        counts = np.bincount(preds, minlength=len(inv_classes))
+        summary["top_label"] = inv_classes.get(int(counts.argmax()))
+        summary["top_share"] = round(float(counts.max() / n), 4)
+        summary["mean_score"] = round(float(scores.mean()), 4)
+        known = label_ids >= 0
+        if known.any():
+            summary["accuracy"] = round(float((preds[known] == label_ids[known]).mean()), 4)
+    return summary
+
+
+def score_archive(paths, out_dir, model_path, classes_path=CLASSES_PATH, workers=None,
+                  batch_size=BATCH_SIZE, save_probs=False, landmarks_out=None):
+    """
+    Score every input file; returns the run information written to files.json
+    """
+    files = find_inputs(paths)
+    if not files:
+        raise SystemExit(f"No videos or recordings found in {paths}")
+    with open(classes_path) as f:
+        classes_map = json.load(f)
+    inv_classes = {int(v): k for k, v in classes_map.items()}
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+    if landmarks_out:
+        os.makedirs(landmarks_out, exist_ok=True)
+
+    columns = {name: GrowableNpy(os.path.join(out_dir, f"frames_{name}.npy"), shape, dtype)
+               for name, (shape, dtype) in COLUMNS.items()}
+    probs_out = None
+    if save_probs:
+        probs_out = GrowableNpy(os.path.join(out_dir, "frames_probs.npy"), (len(inv_classes),), np.float16)
+    summaries = []
+    rows = 0
+    extract_cpu = score_cpu = 0.0
+    print(f"Scoring {len(files)} files with {workers} workers ({model_path})")
+    t0 = time.perf_counter()
+    try:
+        with Pool(workers, initializer=init_worker, initargs=(model_path, batch_size, landmarks_out)) as pool:
+            for file_id, result in enumerate(pool.imap_unordered(score_file, files)):
+                probs = result["probs"]
+                n = len(probs)
+                preds = probs.argmax(axis=1).astype(np.int16) if n else np.zeros(0, dtype=np.int16)
+                scores = probs.max(axis=1).astype(np.float32) if n else np.zeros(0, dtype=np.float32)
+                label_ids = np.asarray([classes_map.get(name, UNKNOWN_LABEL) for name in result["labels"]],
+                                       dtype=np.int16)
+                columns["file"].append(np.full(n, file_id, dtype=np.int32))
+                columns["index"].append(np.arange(n, dtype=np.int32))
+                columns["time"].append(result["timestamps"])
+                columns["pred"].append(preds)
+                columns["score"].append(scores)
+                columns["label"].append(label_ids)
+                if probs_out is not None and n:
+                    probs_out.append(probs.astype(np.float16))
+                summaries.append(summarize(result, file_id, rows, preds, scores, label_ids, inv_classes))
+                rows += n
+                extract_cpu += result["extract_cpu_s"]
+                score_cpu += result["score_cpu_s"]
+                status = f"ERROR {result['error']}" if result["error"] else f"{n} frames"
+                print(f"  [{file_id + 1}/{len(files)}] {result['path']}: {status}")
+    finally:
+        for column in columns.values():
+            column.close()
+        if probs_out is not None:
+            probs_out.close()
+    wall = time.perf_counter() - t0
+
+    cpu = extract_cpu + score_cpu
+    run = {
+        "model": model_path,
+        "classes": classes_map,
+        "files": len(files),
+        "frames": rows,
+        "workers": workers,
+        "wall_s": round(wall, 3),
+        "frames_per_s": round(rows / wall, 1),
+        "frames_per_s_per_core": round(rows / cpu, 1) if cpu else None,
+        "extract_cpu_s": round(extract_cpu, 3),
+        "score_cpu_s": round(score_cpu, 3),
+        "errors": sum(1 for s in summaries if s["error"]),
+    }
+    # Summaries stored column-wise, like the frame columns
+    table = {key: [s[key] for s in summaries] for key in summaries[0]}
+    with open(os.path.join(out_dir, "files.json"), "w") as f:
+        json.dump({"run": run, "summaries": table}, f, indent=1)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score videos and landmark recordings offline")
+    parser.add_argument("inputs", nargs="+", help="Files or directories (searched recursively)")
+    parser.add_argument("--out", default="scores", help="Output directory for the column files")
+    parser.add_argument("--model", default=MODEL_PATH, help="Model for the fp32 variant (default: model/model.onnx)")
+    parser.add_argument("--variant", default="fp32", help="Variant from model/variants/report.json")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01)
+    parser.add_argument("--classes", default=CLASSES_PATH)
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--probs", action="store_true", help="Also store all class probabilities (float16)")
+    parser.add_argument("--landmarks-out", help="Save landmarks extracted from videos as .lmk here")
+    args = parser.parse_args()
+
+    model_path, _ = resolve_variant(args.variant, args.model, VARIANTS_DIR, args.max_accuracy_drop)
+    run = score_archive(args.inputs, args.out, model_path, args.classes, args.workers,
+                        args.batch_size, args.probs, args.landmarks_out)
+    print(f"\nScored {run['frames']} frames from {run['files']} files in {run['wall_s']}s "
+          f"({run['frames_per_s']} frames/s, {run['frames_per_s_per_core']} frames/s per core, "
+          f"{run['errors']} errors)")
+    print(f"Results in {args.out}/ (frames_*.npy, files.json)")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,191 +6,998 @@ WORKFLOW: Frontend captures video -> Mediapipe extracts landmarks ->
 """
 
 # ============ IMPORTS ============
-import eventlet
-eventlet.monkey_patch()  # Monkey patch for eventlet async support
+if __name__ == "__main__":
+    # Monkey patch for eventlet async support, before anything else imports
+    # socket / threading. Only when run as a script: importing this module
+    # (tests, tools, a WSGI server worker that patches itself) has no side
+    # effects - create_app() below does the work.
+    import eventlet
+    eventlet.monkey_patch()
 
-import json
+import functools
 import os
+import time
 import numpy as np
-from flask import Flask, request, send_from_directory
-from flask_socketio import SocketIO, emit
-import onnxruntime as ort
+from flask import Blueprint, Flask, Response, request
+from flask_socketio import SocketIO
+from socketio.exceptions import ConnectionRefusedError
+
+from preprocess.normalize import VECTOR_DIM, normalize_vector
+from serving import cluster
+from serving.batching import MicroBatcher, QueueFull
+from serving.dedup import FrameDeduplicator
+from serving.metrics import HotPathMetrics
+from serving.rate_control import RateController
+from serving.registry import STATIC_VERSION, ModelRegistry, NoModelLoaded, load_version, parse_routes
+from serving.sequence import SequenceStates
+from serving.smoothing import NO_LABEL, PredictionSmoother
+from serving.session import create_session, ort_is_current, save_ort_format, softmax
+from serving.static import StaticAssets
+from serving.variants import resolve_variant
+from serving.workers import WorkerPool
+from serving.wire import (
+    JSON_FORMAT,
+    SPARSE_FORMAT,
+    SUPPORTED_FORMATS,
+    WireFormat,
+    binary_values,
+    decode_binary,
+    decode_sparse,
+)
 
 # ============ CONFIG ============
 # Resolve paths relative to this file so it works from any working directory
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # Path to pre-trained ONNX model (compiled neural network for inference)
 MODEL_PATH = os.path.join(BASE_DIR, "model", "model.onnx")
+# Model variant built by model/build_variants.py ("fp32" = model.onnx above);
+# variants whose recorded held-out accuracy drop exceeds MAX_ACCURACY_DROP
+# (fraction, 0.01 = 1 point) are refused at startup
+VARIANTS_DIR = os.getenv("VARIANTS_DIR", os.path.join(BASE_DIR, "model", "variants"))
+MODEL_VARIANT = os.getenv("MODEL_VARIANT", "fp32")
+MAX_ACCURACY_DROP = float(os.getenv("MAX_ACCURACY_DROP", "0.01"))
+# Pre-optimized ORT-format copy of the fp32 model (skips graph parsing and
+# optimization at load): MODEL_ORT=auto loads model/model.ort when it is newer
+# than model.onnx, =build also (re)creates it first, =0 always loads model.onnx
+MODEL_ORT = os.getenv("MODEL_ORT", "auto")
 # Path to class labels mapping (gesture names like "Hello", "Yes", "No")
 CLASSES_PATH = os.path.join(BASE_DIR, "classes.json")
+# Micro-batching window: at most BATCH_MAX_SIZE frames per ONNX call, and no
+# frame waits longer than BATCH_MAX_WAIT_MS for the batch to fill up
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+# Frames allowed to wait for inference before new ones are rejected
+BATCH_MAX_QUEUE = int(os.getenv("BATCH_MAX_QUEUE", "1024"))
+# INFERENCE_WORKERS > 0 moves session.run into that many worker processes fed
+# through shared-memory rings; this process then only does Socket.IO I/O
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+INFERENCE_WORKER_THREADS = int(os.getenv("INFERENCE_WORKER_THREADS", "1"))
+INFERENCE_WORKER_RING = int(os.getenv("INFERENCE_WORKER_RING", "256"))
+INFERENCE_WORKER_PIN_CPUS = os.getenv("INFERENCE_WORKER_PIN_CPUS", "0") == "1"
+# SEQUENCE_MODEL=1 serves model/sequence.onnx (train.py --sequence), which
+# classifies each client's last K frames with per-socket streaming state.
+# A client silent for SEQUENCE_RESET_MS starts a fresh window.
+SEQUENCE_MODEL = os.getenv("SEQUENCE_MODEL", "0") == "1"
+SEQUENCE_MODEL_PATH = os.getenv("SEQUENCE_MODEL_PATH", os.path.join(BASE_DIR, "model", "sequence.onnx"))
+SEQUENCE_MAX_CLIENTS = int(os.getenv("SEQUENCE_MAX_CLIENTS", "1024"))
+SEQUENCE_RESET_MS = float(os.getenv("SEQUENCE_RESET_MS", "1000"))
+# Per-connection post-processing of probabilities (serving/smoothing.py):
+# SMOOTHING=none|ema|vote, hysteresis thresholds on the smoothed score, and
+# EMIT_MODE=change to emit only label changes plus a heartbeat. The defaults
+# keep one plain argmax "prediction" per frame.
+SMOOTHING = os.getenv("SMOOTHING", "none")
+SMOOTHING_ALPHA = float(os.getenv("SMOOTHING_ALPHA", "0.5"))
+SMOOTHING_WINDOW = int(os.getenv("SMOOTHING_WINDOW", "5"))
+HYSTERESIS_ENTER = float(os.getenv("HYSTERESIS_ENTER", "0.0"))
+HYSTERESIS_EXIT = float(os.getenv("HYSTERESIS_EXIT", "0.0"))
+EMIT_MODE = os.getenv("EMIT_MODE", "every")
+EMIT_HEARTBEAT_MS = float(os.getenv("EMIT_HEARTBEAT_MS", "1000"))
+# Near-duplicate frames (max landmark delta on a downsampled subset at most
+# DEDUP_THRESHOLD, in model-row units) reuse the last prediction instead of
+# running ONNX; 0 disables it. DEDUP_MAX_AGE_MS forces a refresh when still.
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0"))
+DEDUP_MAX_AGE_MS = float(os.getenv("DEDUP_MAX_AGE_MS", "1000"))
+# Adaptive client send interval, advertised via the "rate_control" event and
+# re-evaluated every RATE_CONTROL_PERIOD_MS from the inference queue depth.
+# By default it only backs off and recovers to SEND_INTERVAL_MS; a lower
+# SEND_INTERVAL_MIN_MS lets an idle server ask for faster sending
+RATE_CONTROL = os.getenv("RATE_CONTROL", "1") == "1"
+RATE_CONTROL_PERIOD_MS = float(os.getenv("RATE_CONTROL_PERIOD_MS", "500"))
+SEND_INTERVAL_MS = float(os.getenv("SEND_INTERVAL_MS", "100"))
+SEND_INTERVAL_MIN_MS = float(os.getenv("SEND_INTERVAL_MIN_MS", SEND_INTERVAL_MS))
+SEND_INTERVAL_MAX_MS = float(os.getenv("SEND_INTERVAL_MAX_MS", "1000"))
 
-# ============ NORMALIZATION FUNCTION ============
-"""
-PURPOSE: Normalize landmark vectors for consistent model input
-INPUT: vec - raw 1D array of 1530 values (42 hand landmarks * 3 + 468 face landmarks * 3)
-PROCESS:
-  1. Reshape to (510, 3) where each row is [x, y, z] coordinate
-  2. Split into hand (first 42 pts) and face (remaining 468 pts)
-  3. Find reference point (mean of face or hand)
-  4. Center all points relative to reference
-  5. Normalize by standard deviation to scale consistently
-OUTPUT: Flattened normalized array (1530 values) ready for model
-"""
-def normalize_vector(vec):
-    # Convert input to numpy float32 array
-    arr = np.asarray(vec, dtype=np.float32)
-    if arr.size == 0:
-        return arr
+# ============ MODEL REGISTRY / HOT RELOAD ============
+# MODELS_DIR: directory of model versions (serving/registry.py), re-scanned
+# every MODELS_POLL_S. New or changed versions load and warm up off the event
+# loop and are swapped in without dropping a connection. MODEL_ROUTES
+# "v1:90,v2:10" splits traffic between versions (a routes.json in MODELS_DIR
+# overrides it); a client can pin a version with ?model_version=v2 on connect
+# or the "model_version" event. Without MODELS_DIR the single model below is
+# served as version "default" and nothing is watched.
+MODELS_DIR = os.getenv("MODELS_DIR", "")
+MODELS_POLL_S = float(os.getenv("MODELS_POLL_S", "2"))
+MODEL_ROUTES = os.getenv("MODEL_ROUTES", "")
+RETIRE_DRAIN_S = float(os.getenv("RETIRE_DRAIN_S", "5"))
+# Hot-path instrumentation (serving/metrics.py) scraped from /metrics.
+# METRICS=0 starts with it off; POST /metrics/enabled?on=1|0 flips it at
+# runtime. /metrics/profile records an ORT profile into PROFILE_DIR.
+METRICS = os.getenv("METRICS", "1") == "1"
+METRICS_LAG_INTERVAL_MS = float(os.getenv("METRICS_LAG_INTERVAL_MS", "500"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILE_MAX_S = 60.0
+# Clustered deployment (serving/cluster.py): NODE_ID names this node in every
+# session id so serving/router.py keeps a session on its node; MESSAGE_QUEUE
+# (local://, redis://, amqp://, ...) joins the nodes for emits that start
+# elsewhere. POST /drain?seconds=DRAIN_S moves this node's clients away.
+NODE_ID = os.getenv("NODE_ID", "")
+MESSAGE_QUEUE = os.getenv("MESSAGE_QUEUE", "")
+DRAIN_S = float(os.getenv("DRAIN_S", "10"))
+# Frontend files, held in memory precompressed (serving/static.py); loaded in
+# the background at startup, reloaded when a file changes on disk
+FRONTEND_DIR = os.getenv("FRONTEND_DIR", os.path.join(BASE_DIR, "frontend"))
+
+# ============ FLASK + SOCKETIO SETUP ============
+# Flask: Web framework to serve frontend and handle HTTP requests
+# SocketIO: Real-time bidirectional communication between client & server
+# HTTP routes hang off a blueprint and event handlers off an unbound SocketIO,
+# so importing this module builds nothing; create_app() (bottom of the file)
+# attaches both to a Flask app and loads the model in the background.
+routes = Blueprint("serving", __name__)
+socketio = SocketIO()
+# The serving code below reaches the async framework only through these
+# hooks, set by create_app() (eventlet) or server_asgi.create_app() (asyncio):
+#   run_blocking(fn, *args)   blocking call (session.run, model loading) off
+#                             the event loop: tpool.execute / bounded executor
+#   send_event(event, data, to=None)   Socket.IO emit, from any task or thread
+#   spawn(fn, *args), sleep(s)         background tasks and their sleeps
+#   to_loop(fn, *args)        runs a batcher thread's delivery on the event
+#                             loop; None when batchers are green threads already
+#   close_client(sid)         closes a client's transport (it reconnects)
+run_blocking = None
+send_event = None
+spawn = None
+sleep = None
+to_loop = None
+close_client = None
+
+# Per-frame stages: decode -> normalize -> submit (dedup + queue) in the
+# handler, emit on delivery; per-batch: session_run -> softmax
+metrics = HotPathMetrics(
+    ("decode", "normalize", "submit", "session_run", "softmax", "emit", "handler"),
+    enabled=METRICS,
+    lag_interval_s=METRICS_LAG_INTERVAL_MS / 1000.0,
+)
+static_assets = StaticAssets(FRONTEND_DIR)
+
+# ============ ROUTES ============
+@routes.route("/")
+def index():
+    """Serve the main HTML page"""
+    return static_response("")
+
+@routes.route("/<path:path>")
+def static_files(path):
+    """Serve static files (CSS, JS, MediaPipe models)"""
+    return static_response(path)
+
+
+def static_response(path):
+    # From memory, precompressed, with ETags / 304 / ranges (serving/static.py).
+    # HEAD is answered as GET: werkzeug drops the body but keeps its length
+    method = "GET" if request.method == "HEAD" else request.method
+    headers, version = request.headers, request.args.get("v")
+    result = static_assets.respond(path, method, headers, version, load=False)
+    if result is None:
+        # Not loaded yet (or changed on disk): read and compress off the hub
+        result = run_blocking(static_assets.respond, path, method, headers, version)
+    status, response_headers, body = result
+    return Response(body, status, response_headers)
+
+
+# ============ SOFTMAX FUNCTION ============
+# softmax (serving/session.py) converts logits to probabilities; it is shared
+# with the inference worker processes so both modes report the same scores
+
+# ============ MICRO-BATCHED INFERENCE ============
+def run_batch(version, x):
+    """
+    Score a whole (N, 1530) batch with one ONNX call
+    session.run goes through run_blocking (eventlet's thread pool, or the
+    asyncio mode's executor) so the event loop keeps serving sockets while
+    ORT is busy
+    """
+    t = metrics.start()
+    outputs = run_blocking(version.session.run, [version.output_name], {version.input_name: x})
+    t = metrics.batch_lap("session_run", t)
+    probs = softmax(np.asarray(outputs[0], dtype=np.float32))
+    metrics.batch_lap("softmax", t)
+    return probs
+
+
+def run_sequence_batch(version, x, sids):
+    """Score a batch with the sequence model, advancing each sid's window"""
+    def run_step(frames, states):
+        # One streaming step: (frames, states) -> (logits, state_out)
+        return run_blocking(version.session.run, [version.output_name, "state_out"],
+                            {version.input_name: frames, "state": states})
+
+    t = metrics.start()
+    logits = version.sequence_states.step(run_step, x, sids)
+    t = metrics.batch_lap("session_run", t)
+    probs = softmax(np.asarray(logits, dtype=np.float32))
+    metrics.batch_lap("softmax", t)
+    return probs
+
+
+# sids of connected sockets: deliveries to anyone else are dropped
+connected_clients = set()
+# Version each client's frames last went to; per-client state (smoothing,
+# dedup, sequence window) lives in that version and is dropped on a switch
+client_versions = {}
+
+
+def deliver_prediction(version, sid, probs, error, cached=False):
+    """Route one row of a batch (or a cached result) back to its client"""
+    if sid not in connected_clients:
+        return  # Client left while its frame was queued
+    if error is not None:
+        version.metrics.errors += 1
+        metrics.error(type(error).__name__)
+        version.dedup.discard(sid)
+        send_event("prediction", {"error": str(error)}, to=sid)
+        return
+    version.metrics.record(probs, cached)
+    if not cached:
+        version.dedup.store(sid, probs)
+    # Smooth over recent frames; None = nothing new worth sending
+    result = version.smoother.update(sid, probs)
+    if result is None:
+        return
+    idx, score = result
+    label = version.inv_classes.get(idx, "unknown") if idx != NO_LABEL else "unknown"
+    t = metrics.start()
+    send_event("prediction", {"label": label, "score": score}, to=sid)
+    metrics.lap("emit", t)
+    metrics.frame_out()
+
+
+# ============ PER-VERSION SERVING STATE ============
+def load_model(version_id, path, classes_path, signature=None):
+    """Session + metadata checks + warm-up batches (blocking; runs through run_blocking)"""
     try:
-        # Reshape from 1D (1530,) to 2D (510, 3) - each landmark has x,y,z
-        pts = arr.reshape(-1, 3)
-    except Exception as e:
-        raise ValueError(f"Expected vector length 1530, got {arr.size}") from e
+        return load_version(version_id, path, classes_path, BATCH_MAX_SIZE, signature=signature)
+    except ValueError as e:
+        raise RuntimeError(f"{path}: {e}") from e
+
 
-    # Separate hand and face landmarks
-    hand_pts = pts[:42]        # First 42 landmarks are hand points
-    face_pts = pts[42:]        # Remaining 468 landmarks are face points
+def activate_version(version):
+    """Attach a batcher, smoother and dedup cache to a loaded version"""
+    metadata = version.metadata
+    # Sequence models carry per-client state between frames (see serving/sequence.py)
+    if version.is_sequence:
+        if INFERENCE_WORKERS > 0:
+            raise RuntimeError("The sequence model keeps per-client state in this process; set INFERENCE_WORKERS=0")
+        version.sequence_states = SequenceStates(
+            window=int(metadata["sequence_window"]),
+            embed=int(metadata["sequence_embed"]),
+            max_clients=SEQUENCE_MAX_CLIENTS,
+            reset_after_s=SEQUENCE_RESET_MS / 1000.0,
+        )
+    elif SEQUENCE_MODEL:
+        raise RuntimeError(f"{version.path} is not a sequence model; export one with `train.py --sequence`")
+    # A symbolic batch axis ("batch") allows (N, 1530) inputs; a fixed one does not
+    max_batch_size = BATCH_MAX_SIZE
+    if isinstance(version.batch_dim, int):
+        print(f"Model {version.id} has a fixed batch size of {version.batch_dim}; "
+              "re-export with a dynamic batch axis to enable batching")
+        max_batch_size = min(BATCH_MAX_SIZE, version.batch_dim)
 
-    # Choose reference point: center of face if visible, else center of hand
-    if np.any(face_pts):
-        ref = np.mean(face_pts, axis=0)  # Average all face points
+    # ============ NORMALIZATION ============
+    # normalize_vector comes from preprocess/normalize.py, the same module that
+    # builds the training data, so serving and training can never drift apart.
+    # Each frame is normalized into one reused row (the batcher copies it at
+    # submit time), so the hot path allocates nothing for normalization.
+    version.normalized_row = np.zeros(version.expected_dim, dtype=np.float32)
+    # Full frames sent to a subset model are gathered into this reused row first
+    version.subset_row = np.zeros(version.expected_dim, dtype=np.float32)
+
+    version.smoother = PredictionSmoother(
+        num_classes=version.num_classes,
+        method=SMOOTHING,
+        alpha=SMOOTHING_ALPHA,
+        window=SMOOTHING_WINDOW,
+        enter_threshold=HYSTERESIS_ENTER,
+        exit_threshold=HYSTERESIS_EXIT,
+        emit_mode=EMIT_MODE,
+        heartbeat_s=EMIT_HEARTBEAT_MS / 1000.0,
+    )
+    # Still signers: reuse the last prediction for near-identical frames. The
+    # sequence model needs every frame in its window, so it never deduplicates.
+    version.dedup = FrameDeduplicator(
+        threshold=DEDUP_THRESHOLD if version.sequence_states is None else 0.0,
+        max_age_s=DEDUP_MAX_AGE_MS / 1000.0,
+        dim=version.expected_dim,
+        num_classes=version.num_classes,
+    )
+
+    deliver = functools.partial(deliver_prediction, version)
+    if to_loop is not None:
+        # Per-client state (smoothing, dedup) is only touched on the event loop
+        deliver = functools.partial(to_loop, deliver)
+    if INFERENCE_WORKERS > 0:
+        # Multi-process mode: same submit()/snapshot() interface as MicroBatcher
+        version.batcher = WorkerPool(
+            version.path,
+            dim=version.expected_dim,
+            num_classes=version.num_classes,
+            deliver=deliver,
+            workers=INFERENCE_WORKERS,
+            intra_op_threads=INFERENCE_WORKER_THREADS,
+            capacity=INFERENCE_WORKER_RING,
+            max_batch_size=max_batch_size,
+            pin_cpus=INFERENCE_WORKER_PIN_CPUS,
+            cwd=BASE_DIR,
+        )
     else:
-        ref = np.mean(hand_pts, axis=0)  # Average all hand points
+        version.batcher = MicroBatcher(
+            functools.partial(run_batch if version.sequence_states is None else run_sequence_batch, version),
+            deliver,
+            dim=version.expected_dim,
+            max_batch_size=max_batch_size,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            max_queue=BATCH_MAX_QUEUE,
+            pass_sids=version.sequence_states is not None,
+        )
+    version.batcher.start()
 
-    # Translate: Move all points so reference is at origin (subtract reference from x,y)
-    pts[:, :2] = pts[:, :2] - ref[:2]
+    print(f"Model {version.id}: {version.path}")
+    print("  Input:", version.input_name, "Output:", version.output_name)
+    print("  Normalization:", "in ONNX graph" if version.graph_normalizes else "NumPy (normalize_vector)")
+    print(f"  Landmarks: {version.landmark_subset} ({len(version.landmark_points)} points, "
+          f"{version.expected_dim} values)")
+    if version.sequence_states is not None:
+        print(f"  Sequence model: window {version.sequence_states.window} frames, "
+              f"{version.sequence_states.bytes_per_client} state bytes per client")
+    if INFERENCE_WORKERS > 0:
+        print(f"  Inference runs in {INFERENCE_WORKERS} worker processes ({INFERENCE_WORKER_THREADS} ORT threads each)")
 
-    # Scale: Normalize by standard deviation for consistent magnitude
-    std = np.std(pts[:, :2])
-    if std > 1e-6:  # Avoid division by zero
-        pts[:, :2] = pts[:, :2] / std
 
-    # Return as flat array of shape (1530,)
-    return pts.flatten().astype(np.float32)
+def retire_version(version):
+    """A version left the routing table: finish its queued frames, then stop it"""
+    def drain():
+        deadline = time.monotonic() + RETIRE_DRAIN_S
+        while version.batcher.queue_depth() and time.monotonic() < deadline:
+            sleep(0.05)
+        version.batcher.stop()
+        print(f"Model version {version.id} retired ({version.metrics.frames} frames served)")
 
+    spawn(drain)
 
-# ============ LOAD CLASSES MAPPING ============
-# Load JSON file that maps class indices to gesture names
-# Example: {"0": "Hello", "1": "Yes", "2": "No", "3": "Thank You"}
-with open(CLASSES_PATH, "r") as f:
-    classes_map = json.load(f)
-# Invert mapping: {0: "Hello", 1: "Yes", ...} for quick lookup by prediction index
-inv_classes = {int(v): k for k, v in classes_map.items()}
 
-# ============ LOAD ONNX MODEL ============
+# ============ LOAD ONNX MODEL(S) ============
 # ONNX: Open Neural Network Exchange format (portable, optimized inference)
-# Load pre-trained model for real-time inference on landmarks
-print("Loading ONNX model...")
-session_options = ort.SessionOptions()
-session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
-cpu_count = os.cpu_count() or 1
-session_options.intra_op_num_threads = max(1, cpu_count - 1)
-session_options.inter_op_num_threads = 1
-session = ort.InferenceSession(
-    MODEL_PATH,
-    sess_options=session_options,
-    providers=["CPUExecutionProvider"],
-)
-# Cache input/output metadata
-onnx_input = session.get_inputs()[0]
-onnx_output = session.get_outputs()[0]
-onnx_input_name = onnx_input.name
-onnx_output_name = onnx_output.name
-expected_dim = onnx_input.shape[-1]
-print("Loaded model:", MODEL_PATH)
-print("Input:", onnx_input_name, "Output:", onnx_output_name)
+# Load pre-trained model for real-time inference on landmarks. This runs as a
+# background task started by create_app(): the server accepts connections
+# right away and /readyz reports 200 once a warmed-up model is serving.
+registry = None         # ModelRegistry, built by create_app()
+startup = {"state": "starting", "created_at": None, "ready_s": None, "error": None}
 
-# ============ FLASK + SOCKETIO SETUP ============
-# Flask: Web framework to serve frontend and handle HTTP requests
-# SocketIO: Real-time bidirectional communication between client & server
-app = Flask(__name__, static_folder="frontend")  # Serve files from frontend/ folder
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode="eventlet")
 
-# ============ ROUTES ============
-@app.route("/")
-def index():
-    """Serve the main HTML page"""
-    return send_from_directory("frontend", "index.html")
+def static_model_path():
+    """Model file served without MODELS_DIR, and its variant report entry"""
+    if SEQUENCE_MODEL:
+        # Quantized variants are built for the per-frame model only
+        return SEQUENCE_MODEL_PATH, {}
+    model_path, variant_info = resolve_variant(MODEL_VARIANT, MODEL_PATH, VARIANTS_DIR, MAX_ACCURACY_DROP)
+    if model_path == MODEL_PATH and MODEL_ORT != "0":
+        ort_path = os.path.splitext(MODEL_PATH)[0] + ".ort"
+        # Only copies that carry the model's metadata (serving/session.py)
+        fresh = ort_is_current(ort_path, MODEL_PATH)
+        if MODEL_ORT == "build" and not fresh:
+            save_ort_format(MODEL_PATH, ort_path)
+            fresh = True
+        if fresh:
+            model_path = ort_path
+    return model_path, variant_info
 
-@app.route("/<path:path>")
-def static_files(path):
-    """Serve static files (CSS, JS, MediaPipe models)"""
-    return send_from_directory("frontend", path)
 
+def load_models():
+    """Background task: load, warm up and activate the model(s), then report ready"""
+    print("Loading ONNX model...")
+    startup["state"] = "loading"
+    try:
+        if MODELS_DIR:
+            # First scan loads every version right away (later ones wait until
+            # their files stop changing)
+            registry.poll(require_stable=False)
+            if not registry.versions():
+                raise RuntimeError(f"No loadable model versions in {MODELS_DIR} (expected <version>/model.onnx)")
+        else:
+            model_path, variant_info = run_blocking(static_model_path)
+            registry.add(run_blocking(load_model, STATIC_VERSION, model_path, CLASSES_PATH))
+            print(f"Loaded model: {model_path}" + ("" if SEQUENCE_MODEL else f" (variant {MODEL_VARIANT})"))
+            if variant_info:
+                print(f"Variant accuracy {variant_info['accuracy']:.2%} (drop {variant_info['accuracy_drop']:.2%})")
+        # Inference worker processes build and warm up their own sessions
+        for version in registry.versions():
+            wait_ready = getattr(version.batcher, "wait_ready", None)
+            if wait_ready is not None and not run_blocking(wait_ready):
+                raise RuntimeError(f"Inference workers for model {version.id} did not start")
+    except Exception as e:
+        startup.update(state="failed", error=repr(e))
+        print(f"Model loading failed: {e!r}")
+        return
+    startup.update(state="ready", ready_s=round(time.time() - startup["created_at"], 3))
+    print(f"Ready in {startup['ready_s']:.2f}s")
+    if MODELS_DIR:
+        spawn(registry.watch, sleep)
+        print(f"Watching {MODELS_DIR} for new model versions every {MODELS_POLL_S}s")
 
-# ============ SOFTMAX FUNCTION ============
-"""
-Convert model logits (raw output scores) to probabilities (0-1 range, sum to 1)
-Used to get confidence scores for each gesture prediction
-"""
-def softmax(x):
-    # Subtract max for numerical stability (prevents overflow)
-    ex = np.exp(x - np.max(x))
-    # Divide by sum to normalize to probability distribution
-    return ex / ex.sum(axis=-1, keepdims=True)
-
-# ============ SOCKETIO EVENT HANDLER ============
-# Receives landmark vectors from frontend, runs inference, returns prediction
-@socketio.on("landmark")
-def handle_landmark(data):
+
+# ============ HTTP REPORTS ============
+# Each route body is a plain function returning (JSON-able body, status), so
+# the Flask routes below and server_asgi.py serve the same responses
+def health_report():
+    """Liveness: the process answers HTTP (500 once model loading has failed)"""
+    failed = startup["state"] == "failed"
+    return {"status": "failed" if failed else "ok", "error": startup["error"]}, 500 if failed else 200
+
+
+def readiness_report():
+    """Readiness: 503 until a warmed-up model is serving (and once draining), so traffic waits for it"""
+    body = dict(startup, node=NODE_ID or None, clients=len(connected_clients),
+                versions=sorted(v.id for v in registry.versions()) if registry is not None else [])
+    return body, 200 if startup["state"] == "ready" else 503
+
+
+# ============ DRAIN ============
+def draining():
+    return startup["state"] in ("draining", "drained")
+
+
+def drain_node(seconds):
+    """
+    Background task: take this node out of service without dropping frames.
+    /readyz turns 503 and new sessions are refused (see on_connect), then the
+    connected clients' transports are closed one by one over `seconds` (so
+    the other nodes see a ramp, not a stampede); Socket.IO clients reconnect
+    through the router elsewhere. Queued frames finish before the state is
+    "drained".
+    """
+    startup["state"] = "draining"
+    sids = list(connected_clients)
+    print(f"Draining node {NODE_ID or '(untagged)'}: moving {len(sids)} clients over {seconds:.1f}s")
+    for sid in sids:
+        if sid in connected_clients:
+            close_client(sid)
+        sleep(seconds / len(sids))
+    deadline = time.monotonic() + RETIRE_DRAIN_S
+    while any(v.batcher.queue_depth() for v in registry.versions()) and time.monotonic() < deadline:
+        sleep(0.05)
+    startup["state"] = "drained"
+    print(f"Node drained ({len(connected_clients)} clients still connected)")
+
+
+def drain_report(args):
+    """Start draining: POST /drain?seconds=10; 202 with the clients to move (409 unless ready)"""
+    if startup["state"] != "ready":
+        return {"error": f"Node is {startup['state']}, only a ready node can be drained"}, 409
+    try:
+        seconds = max(float(args.get("seconds", DRAIN_S)), 0.0)
+    except ValueError:
+        return {"error": "seconds must be a number"}, 400
+    spawn(drain_node, seconds)
+    return {"node": NODE_ID or None, "state": "draining", "clients": len(connected_clients),
+            "seconds": seconds}, 202
+
+
+def client_memory():
+    """Per-connection state this process holds, in bytes"""
+    connected = len(connected_clients)
+    wire_bytes = sum(fmt.frame.nbytes for fmt in wire_formats.values() if fmt.frame is not None)
+    total = wire_bytes
+    per_client = {}
+    for version in registry.versions():
+        state_bytes = version.smoother.bytes_per_client + version.dedup.bytes_per_client
+        if version.sequence_states is not None:
+            state_bytes += version.sequence_states.bytes_per_client
+        per_client[version.id] = state_bytes
+        total += state_bytes * sum(1 for v in client_versions.values() if v is version)
+    return {
+        "connected": connected,
+        "state_bytes_per_client": max(per_client.values(), default=0),
+        "wire_buffer_bytes": wire_bytes,
+        "total_bytes": total,
+        "mean_bytes_per_client": (total / connected) if connected else 0.0,
+    }
+
+
+def models_snapshot():
+    """Registry state plus each version's latency and prediction distribution"""
+    body = registry.snapshot()
+    for version in registry.versions():
+        entry = body["versions"][version.id]
+        batching = version.batcher.snapshot()
+        entry["metrics"] = dict(version.metrics.snapshot(version.inv_classes),
+                                inference_ms=batching.get("inference_ms"),
+                                added_latency_ms=batching.get("added_latency_ms"))
+        entry["clients"] = sum(1 for v in client_versions.values() if v is version)
+    return body
+
+
+def stats_report():
+    """Batching metrics, emitted/received frame ratio and per-client memory"""
+    # The top-level sections describe the version serving most traffic
+    try:
+        primary = registry.primary()
+    except NoModelLoaded:
+        return {"startup": startup}, 503
+    body = {
+        "batching": primary.batcher.snapshot(),
+        "emission": primary.smoother.snapshot(),
+        "dedup": primary.dedup.snapshot(),
+        "clients": client_memory(),
+        "landmarks": {"subset": primary.landmark_subset, "dim": primary.expected_dim},
+        "models": models_snapshot(),
+        "static": static_assets.snapshot(),
+    }
+    if rate_controller is not None:
+        body["rate_control"] = rate_controller.snapshot()
+    if primary.sequence_states is not None:
+        body["sequence"] = primary.sequence_states.snapshot()
+    return body, 200
+
+
+# ============ PROMETHEUS METRICS ============
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def prometheus_text():
+    """Stage latency histograms, loop lag, fps and errors in Prometheus text format"""
+    versions = registry.versions()
+    gauges = [
+        ("connected_clients", "Connected Socket.IO clients", [({}, len(connected_clients))]),
+        ("client_state_bytes", "Per-connection state held by this process",
+         [({}, client_memory()["total_bytes"])]),
+        ("queue_depth", "Frames waiting for inference", [({"version": v.id}, v.batcher.queue_depth())
+                                                          for v in versions]),
+        ("queue_capacity", "Inference queue slots", [({"version": v.id}, v.batcher.queue_capacity())
+                                                      for v in versions]),
+        ("model_frames", "Predictions made by each model version (cached ones included)",
+         [({"version": v.id}, v.metrics.frames) for v in versions]),
+        ("model_route_weight", "Share of unpinned traffic routed to each version",
+         [({"version": vid}, round(w, 4)) for vid, w in registry.table.weights.items()]),
+    ]
+    return metrics.render(gauges)
+
+
+def metrics_switch(on=None):
+    """Switch instrumentation at runtime: POST /metrics/enabled?on=1|0 (on=None: just report)"""
+    if on is not None:
+        metrics.enabled = on not in ("0", "false", "off")
+    return {"enabled": metrics.enabled}, 200
+
+
+# Versions whose session is currently replaced by a profiling one
+profiling_versions = set()
+
+
+def profile_report(args):
+    """
+    Record an ORT profile of live traffic: POST /metrics/profile?seconds=5&version=v1
+    The version's session is swapped for a profiling copy of the same model
+    for that long; the response names the Chrome-trace JSON ORT wrote (open
+    it in chrome://tracing or Perfetto for per-node timings). args: the
+    query parameters. Sleeps for the whole recording (run it as a task).
+    """
+    if INFERENCE_WORKERS > 0:
+        return {"error": "Sessions live in the inference workers; profile with INFERENCE_WORKERS=0"}, 409
+    try:
+        seconds = min(max(float(args.get("seconds", "5")), 0.1), PROFILE_MAX_S)
+    except ValueError:
+        return {"error": "seconds must be a number"}, 400
+    versions = {v.id: v for v in registry.versions()}
+    if not versions:
+        return {"error": "No model version is loaded yet"}, 503
+    version_id = args.get("version") or registry.primary().id
+    version = versions.get(version_id)
+    if version is None:
+        return {"error": f"Unknown model version {version_id!r}", "available": sorted(versions)}, 404
+    if version.id in profiling_versions:
+        return {"error": f"Model version {version.id} is already being profiled"}, 409
+
+    profiling_versions.add(version.id)
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        prefix = os.path.join(PROFILE_DIR, f"ort_{version.id}")
+        session = run_blocking(create_session, version.path, None, None, prefix)
+        original, version.session = version.session, session
+        frames = version.batcher.snapshot()["frames"]
+        try:
+            sleep(seconds)
+        finally:
+            version.session = original
+        frames = version.batcher.snapshot()["frames"] - frames
+        profile_path = run_blocking(session.end_profiling)
+    finally:
+        profiling_versions.discard(version.id)
+    return {"version": version.id, "seconds": seconds, "frames": frames, "profile": profile_path}, 200
+
+
+# ============ FLASK ROUTES ============
+# Flask serializes a returned (dict, status) pair as JSON
+@routes.route("/healthz")
+def healthz():
+    return health_report()
+
+
+@routes.route("/readyz")
+def readyz():
+    return readiness_report()
+
+
+@routes.route("/stats")
+def stats():
+    return stats_report()
+
+
+@routes.route("/metrics")
+def prometheus_metrics():
+    return Response(prometheus_text(), mimetype=PROMETHEUS_CONTENT_TYPE)
+
+
+@routes.route("/metrics/enabled", methods=["GET", "POST"])
+def metrics_enabled():
+    return metrics_switch(request.args.get("on", "1") if request.method == "POST" else None)
+
+
+@routes.route("/metrics/profile", methods=["POST"])
+def metrics_profile():
+    return profile_report(request.args)
+
+
+@routes.route("/drain", methods=["POST"])
+def drain():
+    return drain_report(request.args)
+
+
+# ============ WIRE FORMAT NEGOTIATION ============
+# Per-connection wire format, keyed by sid (missing sid = JSON protocol)
+wire_formats = {}
+
+
+def on_wire_format(sid, data):
+    """
+    EVENT: Client asks to switch its "landmark" payloads to a binary format
+    DATA: {"format": "f32" | "f16" | "i16q" | "sparse" | "json", "normalized": bool}
+    RETURNS (Socket.IO ack): {"ok": bool, "format": str, "supported": [...]}
+    """
+    try:
+        fmt = WireFormat(data.get("format", JSON_FORMAT), data.get("normalized", False))
+    except (AttributeError, ValueError) as e:
+        return {"ok": False, "error": str(e), "supported": list(SUPPORTED_FORMATS)}
+    wire_formats[sid] = fmt
+    return {"ok": True, "format": fmt.name, "supported": list(SUPPORTED_FORMATS)}
+
+
+# ============ ADAPTIVE RATE CONTROL ============
+rate_controller = None  # RateController when RATE_CONTROL, built by create_app()
+
+
+def rate_control_loop():
+    """Re-evaluate the advertised send interval and broadcast changes"""
+    while True:
+        sleep(RATE_CONTROL_PERIOD_MS / 1000.0)
+        versions = registry.versions()
+        interval = rate_controller.update(sum(v.batcher.queue_depth() for v in versions),
+                                          sum(v.batcher.queue_capacity() for v in versions))
+        if interval is not None and connected_clients:
+            send_event("rate_control", {"send_interval_ms": interval})
+
+
+# ============ MODEL VERSION PER CLIENT ============
+def release_client(version, sid):
+    """Drop a client's per-version state"""
+    version.smoother.release(sid)
+    version.dedup.release(sid)
+    if version.sequence_states is not None:
+        version.sequence_states.release(sid)
+
+
+def landmark_layout(version):
+    """Points the model reads (indices into the 42 hand + 468 face layout; None = full frames)"""
+    points = version.landmark_points if version.subset_index is not None else None
+    return {"subset": version.landmark_subset, "points": points,
+            "dim": version.expected_dim, "version": version.id}
+
+
+def client_version(sid):
+    """
+    The version this client's next frame goes to. A new client, or one moved
+    to another version (new deployment, changed routes or pin), is told the
+    version's landmark layout; a moved one starts with fresh state there.
+    Clients that honor the layout send only these points instead of full
+    1530-value frames.
+    """
+    version = registry.route(sid)
+    previous = client_versions.get(sid)
+    if previous is not version:
+        client_versions[sid] = version
+        if previous is not None:
+            release_client(previous, sid)
+        if previous is None or previous.landmark_points != version.landmark_points:
+            send_event("landmark_layout", landmark_layout(version), to=sid)
+    return version
+
+
+def on_model_version(sid, data):
+    """
+    EVENT: Pin this connection to one model version (A/B by session)
+    DATA: {"version": "v2"} or {"version": null} to follow the routes again
+    RETURNS (Socket.IO ack): {"ok": bool, "version": str, "available": [...]}
+    """
+    available = sorted(v.id for v in registry.versions())
+    try:
+        registry.pin(sid, (data or {}).get("version"))
+    except (AttributeError, ValueError) as e:
+        return {"ok": False, "error": str(e), "available": available}
+    return {"ok": True, "version": client_version(sid).id, "available": available}
+
+
+def on_connect(sid, requested_version=None):
+    """A client connected, optionally asking for ?model_version=..."""
+    if draining():
+        # Sessions the router sent here before its health check saw the 503:
+        # refused, and the transport dropped so the client retries elsewhere
+        close_client(sid)
+        raise ConnectionRefusedError(f"Node {NODE_ID or '(untagged)'} is {startup['state']}")
+    connected_clients.add(sid)
+    if requested_version:
+        try:
+            registry.pin(sid, requested_version)
+        except ValueError as e:
+            send_event("prediction", {"error": str(e)}, to=sid)
+    if registry.versions():
+        # Sends the client its model's "landmark_layout"; clients connecting
+        # while the model loads get it with the reply to their first frame
+        client_version(sid)
+    if rate_controller is not None:
+        # New clients start at the currently advertised rate
+        send_event("rate_control", {"send_interval_ms": rate_controller.advertised_ms()}, to=sid)
+
+
+def on_disconnect(sid):
+    """Drop per-connection state when a client goes away"""
+    connected_clients.discard(sid)
+    wire_formats.pop(sid, None)
+    registry.release(sid)
+    version = client_versions.pop(sid, None)
+    if version is not None:
+        release_client(version, sid)
+
+
+# ============ LANDMARK FRAMES ============
+# Receives landmark vectors from frontend, queues them for batched inference
+def on_landmark(sid, data):
     """
     EVENT: Receives landmark data from frontend
-    DATA: {"vector": [1530 float values], "normalized": bool}
+    DATA: {"vector": [1530 float values], "normalized": bool}  (JSON protocol)
+          or a binary attachment in the format negotiated via "wire_format"
+          Subset models take their "landmark_layout" points, or a full
+          1530-value frame that is reduced to them here
     PROCESS:
-      1. Extract vector from client message
-      2. Normalize if needed
-      3. Reshape to (1, 1530) for model input
-      4. Run ONNX model inference
-      5. Apply softmax to get probabilities
-      6. Find class with highest probability
-      7. Map class index to gesture name
-      8. Send prediction back to client
+      1. Pick this client's model version (routes / pin, see serving/registry.py)
+      2. Decode the vector (JSON list or zero-copy np.frombuffer)
+      3. Validate the vector length (reduce full frames for subset models)
+      4. Normalize if needed
+      5. Near-duplicate of this client's last inferred frame: re-emit the
+         cached prediction and skip ONNX
+      6. Otherwise queue the row for the version's micro-batcher, tagged
+         with the sid
+      7. The batcher runs ONNX on (N, 1530), applies softmax and emits each
+         row's prediction back to the sid it came from (the sequence model
+         also reads and updates that sid's window state)
+    Each stage is timed into the /metrics histograms (serving/metrics.py)
     """
+    metrics.frame_in()
+    t0 = t = metrics.start()
     try:
-        # Get landmark vector from client
-        vec = data.get("vector")
-        if vec is None:
-            emit("prediction", {"error": "No vector provided"})
-            return
-
-        # Normalize vector if not already normalized
-        if data.get("normalized", False):
-            # Already normalized, just convert to numpy
-            x = np.asarray(vec, dtype=np.float32).reshape(1, -1)
+        version = client_version(sid)
+        expected_dim = version.expected_dim
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            # Binary protocol: format and normalized flag come from negotiation
+            fmt = wire_formats.get(sid)
+            if fmt is None or fmt.name == JSON_FORMAT:
+                metrics.error("wire_format")
+                send_event("prediction", {"error": "Binary payload sent before negotiating a wire_format"},
+                           to=sid)
+                return
+            if fmt.name == SPARSE_FORMAT:
+                # Rebuild the zero-padded frame in this connection's own buffer
+                vec = decode_sparse(data, fmt.frame).reshape(-1)
+            else:
+                dim = binary_values(data, fmt.name)
+                vec = decode_binary(data, fmt.name, dim if dim in (expected_dim, VECTOR_DIM) else expected_dim)
+            normalized = fmt.normalized
         else:
-            # Apply normalization function
-            x = normalize_vector(np.asarray(vec, dtype=np.float32)).reshape(1, -1)
+            # JSON protocol: get landmark vector from client
+            vec = data.get("vector")
+            if vec is None:
+                metrics.error("no_vector")
+                send_event("prediction", {"error": "No vector provided"}, to=sid)
+                return
+            vec = np.asarray(vec, dtype=np.float32)
+            normalized = data.get("normalized", False)
 
         # Validate input dimension
-        if x.shape[1] != expected_dim:
-            emit("prediction", {"error": f"Invalid vector length: expected {expected_dim}, got {x.shape[1]}"})
+        vec = vec.reshape(-1)
+        if version.subset_index is not None and vec.size == VECTOR_DIM:
+            if normalized:
+                # Normalizing depends on which points are present: a full
+                # frame normalized by the client cannot be reduced afterwards
+                metrics.error("normalized_full_frame")
+                send_event("prediction", {"error": f"Send raw frames or {version.landmark_subset} points to "
+                                                   "this model, not normalized full frames"}, to=sid)
+                return
+            vec = np.take(vec, version.subset_index, out=version.subset_row)
+        if version.graph_normalizes and normalized:
+            # Normalizing is not idempotent (a hand-only frame's zero face
+            # padding is non-zero once centered, so a second pass takes the
+            # face as its reference): this graph needs the raw frame
+            metrics.error("normalized_frame")
+            send_event("prediction", {"error": "This model normalizes frames itself; send raw frames "
+                                               "(normalized: false)"}, to=sid)
+            return
+        if vec.size != expected_dim:
+            metrics.error("vector_length")
+            send_event("prediction", {"error": f"Invalid vector length: expected {expected_dim} "
+                                               f"({version.landmark_subset} landmarks), got {vec.size}"}, to=sid)
             return
+        t = metrics.lap("decode", t)
 
-        # Run ONNX model inference
-        # Input: x shape (1, 1530)
-        # Output: logits shape (1, num_classes)
-        outputs = session.run([onnx_output_name], {onnx_input_name: x.astype(np.float32)})
-        logits = np.asarray(outputs[0], dtype=np.float32)[0]  # Extract first (only) result
-        
-        # Convert logits to probabilities
-        probs = softmax(logits)
-        
-        # Get prediction: find gesture with highest probability
-        idx = int(np.argmax(probs))
-        label = inv_classes.get(idx, "unknown")
-        score = float(probs[idx])
-
-        # Send prediction back to client
-        emit("prediction", {"label": label, "score": score})
+        # Normalize vector unless the client did, or the graph does (raw frames only, see above)
+        if version.graph_normalizes or normalized:
+            # Normalized by the client / by ORT, just use it as the model row
+            row = vec
+        else:
+            # Apply normalization into the reused row buffer
+            row = normalize_vector(vec, out=version.normalized_row)
+        t = metrics.lap("normalize", t)
+
+        # Sequence model: claim this client's window (reset after a pause)
+        if version.sequence_states is not None:
+            version.sequence_states.touch(sid)
+
+        # Near-duplicate of the last inferred frame: reuse its prediction
+        cached = version.dedup.lookup(sid, row)
+        if cached is not None:
+            deliver_prediction(version, sid, cached, None, cached=True)
+        else:
+            # Queue for batched inference; the prediction is emitted to this sid
+            try:
+                version.batcher.submit(sid, row)
+            except QueueFull:
+                version.dedup.discard(sid)
+                raise
+        metrics.lap("submit", t)
+        metrics.lap("handler", t0)
     except Exception as e:
         # Send error message if something fails
-        emit("prediction", {"error": str(e)})
+        metrics.error(type(e).__name__)
+        send_event("prediction", {"error": str(e)}, to=sid)
+
+
+# ============ FLASK-SOCKETIO HANDLERS ============
+@socketio.on("connect")
+def handle_connect(*args):
+    return on_connect(request.sid, request.args.get("model_version"))
+
+
+@socketio.on("disconnect")
+def handle_disconnect(*args):
+    on_disconnect(request.sid)
+
+
+@socketio.on("wire_format")
+def handle_wire_format(data):
+    return on_wire_format(request.sid, data)
+
+
+@socketio.on("model_version")
+def handle_model_version(data):
+    return on_model_version(request.sid, data)
+
+
+@socketio.on("landmark")
+def handle_landmark(data):
+    on_landmark(request.sid, data)
+
+
+# ============ APPLICATION FACTORY ============
+def start_serving():
+    """
+    Framework-neutral part of startup, once the hooks are set: the model
+    registry is created and load_models() loads, warms up and activates the
+    model in the background (/readyz turns 200); rate control starts and
+    the frontend files are read and compressed off the loop
+    """
+    global registry, rate_controller
+    startup.update(state="starting", created_at=time.time(), ready_s=None, error=None)
+    registry = ModelRegistry(
+        MODELS_DIR or None,
+        load=load_model,
+        activate=activate_version,
+        retire=retire_version,
+        run_blocking=run_blocking,
+        classes_path=CLASSES_PATH,
+        routes=parse_routes(MODEL_ROUTES),
+        poll_s=MODELS_POLL_S,
+    )
+    if RATE_CONTROL:
+        rate_controller = RateController(
+            initial_interval_ms=SEND_INTERVAL_MS,
+            min_interval_ms=SEND_INTERVAL_MIN_MS,
+            max_interval_ms=SEND_INTERVAL_MAX_MS,
+        )
+        spawn(rate_control_loop)
+    spawn(load_models)
+    spawn(run_blocking, static_assets.preload)
+
+
+def close_flask_client(sid):
+    """
+    Drop a client's Engine.IO transport without sending it a CLOSE packet:
+    Socket.IO clients treat that as a lost connection and reconnect (after a
+    CLOSE, i.e. eio.disconnect(), they would stay disconnected)
+    """
+    eio_sid = socketio.server.manager.eio_sid_from_sid(sid, "/")
+    eio_socket = socketio.server.eio.sockets.pop(eio_sid, None)
+    if eio_socket is not None:
+        eio_socket.close(wait=False, abort=True)
+
+
+def create_app(async_mode="eventlet"):
+    """
+    Build the Flask app and start its background work
+      - routes + Socket.IO handlers are attached to a new Flask app
+      - the hooks point at Flask-SocketIO (eventlet green threads)
+      - start_serving() loads the model; the loop lag probe starts
+    async_mode="threading" runs blocking calls inline (tests, tools).
+    server_asgi.py builds the asyncio alternative.
+    """
+    global run_blocking, send_event, spawn, sleep, to_loop, close_client
+    app = Flask(__name__, static_folder="frontend")  # Serve files from frontend/ folder
+    app.register_blueprint(routes)
+    options = {}
+    if MESSAGE_QUEUE:
+        options["client_manager"] = cluster.client_manager(MESSAGE_QUEUE)
+    socketio.init_app(app, cors_allowed_origins="*", async_mode=async_mode, **options)
+    if NODE_ID:
+        cluster.tag_session_ids(socketio.server.eio, NODE_ID)
+    if async_mode == "eventlet":
+        # Imported here so importing this module never pulls in eventlet
+        from eventlet import tpool
+        run_blocking = tpool.execute
+    else:
+        run_blocking = lambda fn, *args: fn(*args)  # noqa: E731
+    # This node only ever emits to its own clients: keep that off the queue
+    send_event = functools.partial(socketio.emit, ignore_queue=True) if MESSAGE_QUEUE else socketio.emit
+    spawn = socketio.start_background_task
+    sleep = socketio.sleep
+    to_loop = None
+    close_client = close_flask_client
+
+    start_serving()
+    spawn(metrics.lag_loop, sleep)
+    return app
 
 
 # ============ MAIN: START SERVER ============
 if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "5000"))
+    app = create_app()
     print(f"Starting server on http://{host}:{port}")
     # socketio.run: Start Flask+SocketIO server
     # host="0.0.0.0": Listen on all network interfaces
@@ -0,0 +1,181 @@
+"""
+PROJECT: Sign Language Recognition - asyncio (ASGI) serving mode
+PURPOSE: server.py's Socket.IO service without eventlet: python-socketio's
+         AsyncServer under an ASGI server (uvicorn) on the native asyncio
+         loop. Same "landmark" -> "prediction" event contract, HTTP routes
+         and frontend; nothing is monkey-patched, so a blocking call cannot
+         hide behind a green thread, and inference runs in a real, bounded
+         thread pool
+HOW IT MAPS ONTO server.py:
+  Every event handler and route body is server.py's own (on_landmark,
+  stats_report, ...); this module sets its hooks:
+    run_blocking  ThreadPoolExecutor of EXECUTOR_THREADS threads: at most
+                  that many session.run calls / model loads at once
+    send_event    AsyncServer.emit scheduled on the loop (from other
+                  threads through run_coroutine_threadsafe)
+    to_loop       loop.call_soon_threadsafe: batcher threads hand each
+                  prediction back to the loop, so smoothing, dedup and
+                  routing state is only ever touched there
+    spawn, sleep  daemon threads + time.sleep for the slow background work
+                  (model loading, registry polling, rate control, draining)
+    close_client  drops a client's Engine.IO transport on the loop (node drain)
+  Handlers are plain functions run inline by the loop (async_handlers=False):
+  none of them blocks, and each client's frames are handled in order.
+USAGE (from jars_project_onnx/):
+  python server_asgi.py                              (HOST / PORT as server.py)
+  uvicorn --factory server_asgi:create_app --port 5000
+"""
+
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import socketio
+
+import server
+from serving import cluster
+
+# ============ CONFIG ============
+# Threads running session.run and model loading (the bound on concurrent ORT work)
+EXECUTOR_THREADS = int(os.getenv("EXECUTOR_THREADS", "4"))
+
+
+def query_params(query_string):
+    """First value of every query parameter"""
+    return {k: v[0] for k, v in parse_qs(query_string).items()}
+
+
+# ============ HTTP ROUTES ============
+# server.py's report functions, keyed like its Flask routes
+JSON_ROUTES = {
+    ("GET", "/healthz"): lambda args: server.health_report(),
+    ("GET", "/readyz"): lambda args: server.readiness_report(),
+    ("GET", "/stats"): lambda args: server.stats_report(),
+    ("GET", "/metrics/enabled"): lambda args: server.metrics_switch(),
+    ("POST", "/metrics/enabled"): lambda args: server.metrics_switch(args.get("on", "1")),
+    ("POST", "/drain"): server.drain_report,
+}
+
+
+async def respond(send, status, body, content_type=None, headers=()):
+    raw_headers = [(b"content-type", content_type.encode("latin-1"))] if content_type else []
+    raw_headers += [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def http_app(scope, receive, send):
+    """Everything that is not Socket.IO traffic: the routes above, /metrics, then frontend/ files"""
+    if scope["type"] != "http":
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close"})
+        return
+    method, path = scope["method"], scope["path"]
+    args = query_params(scope["query_string"].decode("latin-1"))
+    route = JSON_ROUTES.get((method, path))
+    if route is not None:
+        body, status = route(args)
+        await respond(send, status, json.dumps(body, sort_keys=True).encode(), "application/json")
+    elif (method, path) == ("GET", "/metrics"):
+        await respond(send, 200, server.prometheus_text().encode(), server.PROMETHEUS_CONTENT_TYPE)
+    elif (method, path) == ("POST", "/metrics/profile"):
+        # Sleeps for the whole recording: off the loop
+        body, status = await asyncio.to_thread(server.profile_report, args)
+        await respond(send, status, json.dumps(body, sort_keys=True).encode(), "application/json")
+    else:
+        # Frontend files, as server.py's index / static_files routes: from memory
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        result = server.static_assets.respond(path, method, headers, args.get("v"), load=False)
+        if result is None:
+            # Not loaded yet (or changed on disk): read and compress off the loop
+            result = await asyncio.to_thread(server.static_assets.respond, path, method, headers, args.get("v"))
+        status, response_headers, body = result
+        await respond(send, status, body, headers=response_headers)
+
+
+# ============ APPLICATION FACTORY ============
+def create_app():
+    """
+    Build the ASGI app: Socket.IO events go to server.py's handlers, the rest
+    to http_app. The hooks are set and the model starts loading on ASGI
+    lifespan startup, once the event loop is running.
+    """
+    options = {}
+    if server.MESSAGE_QUEUE:
+        options["client_manager"] = cluster.client_manager(server.MESSAGE_QUEUE, async_mode=True)
+    sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*", async_handlers=False, **options)
+    if server.NODE_ID:
+        cluster.tag_session_ids(sio.eio, server.NODE_ID)
+
+    @sio.on("connect")
+    def handle_connect(sid, environ, auth=None):
+        return server.on_connect(sid, query_params(environ.get("QUERY_STRING", "")).get("model_version"))
+
+    @sio.on("disconnect")
+    def handle_disconnect(sid, *args):
+        server.on_disconnect(sid)
+
+    sio.on("wire_format", server.on_wire_format)
+    sio.on("model_version", server.on_model_version)
+    sio.on("landmark", server.on_landmark)
+
+    # Emit tasks stay referenced until done (the loop only keeps weak references)
+    tasks = set()
+
+    async def start():
+        loop = asyncio.get_running_loop()
+        loop_thread = threading.get_ident()
+        executor = ThreadPoolExecutor(EXECUTOR_THREADS, thread_name_prefix="inference")
+
+        def send_event(event, data, to=None, **kwargs):
+            if threading.get_ident() == loop_thread:
+                task = loop.create_task(sio.emit(event, data, to=to, **kwargs))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            else:
+                asyncio.run_coroutine_threadsafe(sio.emit(event, data, to=to, **kwargs), loop)
+
+        async def drop_transport(eio_sid):
+            # As server.close_flask_client: no CLOSE packet, so the client reconnects
+            eio_socket = sio.eio.sockets.pop(eio_sid, None)
+            if eio_socket is not None:
+                await eio_socket.close(wait=False, abort=True)
+                await eio_socket.queue.put(None)        # Ends the websocket writer / pending poll
+
+        def close_client(sid):
+            # The Engine.IO sid is looked up now: a refused connect forgets sid
+            # before drop_transport runs
+            asyncio.run_coroutine_threadsafe(drop_transport(sio.manager.eio_sid_from_sid(sid, "/")), loop)
+
+        def spawn(fn, *args):
+            thread = threading.Thread(target=fn, args=args, daemon=True)
+            thread.start()
+            return thread
+
+        server.run_blocking = lambda fn, *args: executor.submit(fn, *args).result()
+        # This node only ever emits to its own clients: keep that off the queue
+        server.send_event = functools.partial(send_event, ignore_queue=True) if server.MESSAGE_QUEUE else send_event
+        server.spawn = spawn
+        server.sleep = time.sleep
+        server.to_loop = loop.call_soon_threadsafe
+        server.close_client = close_client
+        server.start_serving()
+        tasks.add(loop.create_task(server.metrics.lag_loop_async()))
+        print(f"asyncio mode: inference in a pool of {EXECUTOR_THREADS} threads")
+
+    return socketio.ASGIApp(sio, other_asgi_app=http_app, on_startup=start)
+
+
+# ============ MAIN: START SERVER ============
+if __name__ == "__main__":
+    import uvicorn
+
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "5000"))
+    print(f"Starting server on http://{host}:{port}")
+    uvicorn.run(create_app(), host=host, port=port)
@@ -0,0 +1,207 @@
+"""
+MICRO-BATCHING SCHEDULER: Share one ONNX call between many connected clients
+PURPOSE: Stop paying the full per-call ONNX overhead for every single frame
+WORKFLOW:
+  1. Socket handlers submit one landmark row per frame, tagged with the client sid
+  2. A background worker waits until max_batch_size rows are pending OR the
+     oldest pending row has waited max_wait_ms
+  3. Rows are copied at submit time into a preallocated ring of slots, so
+     callers may reuse their own scratch buffers straight away
+  4. Pending rows are gathered into a preallocated (max_batch_size, dim)
+     buffer and scored with ONE run_batch() call
+  5. Each result row is handed to deliver() together with its own sid
+METRICS: queue depth, batch size histogram, added (queueing) latency and
+         inference time, so the window can be tuned against p99
+"""
+
+import collections
+import threading
+import time
+
+import numpy as np
+
+
+class QueueFull(RuntimeError):
+    """Raised by MicroBatcher.submit when no ring slot is free"""
+
+
+# ============ PERCENTILE HELPER ============
+def percentiles_ms(samples, qs=(50, 95, 99)):
+    """Summarize a sequence of durations (seconds) as {"p50": ms, ...}"""
+    if not samples:
+        return {f"p{q}": 0.0 for q in qs}
+    arr = np.fromiter(samples, dtype=np.float64) * 1000.0
+    return {f"p{q}": float(np.percentile(arr, q)) for q in qs}
+
+
+# ============ BATCHING STATISTICS ============
+class BatchStats:
+    """
+    Counters for tuning the batching window
+      - batch_sizes[n]: how many batches contained exactly n rows
+      - added_latency:  time each row spent queued before its batch started
+      - inference:      wall time of each run_batch() call
+    Latency samples are kept in bounded deques (recent window only)
+    """
+
+    def __init__(self, max_batch_size, window=4096):
+        self.batch_sizes = [0] * (max_batch_size + 1)
+        self.added_latency = collections.deque(maxlen=window)
+        self.inference = collections.deque(maxlen=window)
+        self.frames = 0
+        self.batches = 0
+        self.errors = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+
+    def snapshot(self, queue_depth):
+        return {
+            "queue_depth": queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "frames": self.frames,
+            "batches": self.batches,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "mean_batch_size": (self.frames / self.batches) if self.batches else 0.0,
+            "batch_size_histogram": {
+                str(n): c for n, c in enumerate(self.batch_sizes) if c
+            },
+            "added_latency_ms": percentiles_ms(self.added_latency),
+            "inference_ms": percentiles_ms(self.inference),
+        }
+
+
+# ============ MICRO-BATCHER ============
+class MicroBatcher:
+    """
+    Collect rows from many clients and score them together
+
+    INPUT:
+      run_batch: fn(x) -> results, x is float32 (N, dim), results has N rows;
+                 with pass_sids=True it is called as fn(x, sids) instead
+      deliver:   fn(sid, row, error) called once per submitted row
+      dim:       feature length of one row (1530 for the full landmark vector)
+      max_batch_size: upper bound on N for one run_batch() call
+      max_wait_ms:    longest time the oldest row may wait for the batch to fill
+      max_queue:      number of ring slots; submit() raises QueueFull beyond it
+      pass_sids:      also hand run_batch the sid of every row (stateful models)
+
+    Uses the threading module, so under eventlet.monkey_patch() the worker is
+    a green thread; wrap run_batch with eventlet.tpool to keep the hub free.
+    Without monkey-patching (server_asgi.py) it is a real thread, and
+    deliver() runs there: hand results to the event loop from it.
+    """
+
+    def __init__(self, run_batch, deliver, dim, max_batch_size=32, max_wait_ms=5.0, max_queue=1024, pass_sids=False):
+        self.run_batch = run_batch
+        self.pass_sids = pass_sids
+        self.deliver = deliver
+        self.dim = int(dim)
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue = max(self.max_batch_size, int(max_queue))
+        self.stats = BatchStats(self.max_batch_size)
+
+        # Preallocated storage: ring of queued rows + input buffer for one batch
+        self._ring = np.zeros((self.max_queue, self.dim), dtype=np.float32)
+        self._free_slots = collections.deque(range(self.max_queue))
+        self._buf = np.zeros((self.max_batch_size, self.dim), dtype=np.float32)
+        self._pending = collections.deque()   # (sid, slot, submit_time)
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    # ============ LIFECYCLE ============
+    def start(self):
+        """Start the background worker (idempotent)"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    # ============ PRODUCER SIDE ============
+    def submit(self, sid, row):
+        """
+        Queue one (dim,) row for the client identified by sid
+        The row is copied, so the caller keeps ownership of its buffer
+        Raises QueueFull when every ring slot is already waiting
+        """
+        with self._cond:
+            if not self._free_slots:
+                self.stats.rejected += 1
+                raise QueueFull(f"Inference queue is full ({self.max_queue} frames pending)")
+            slot = self._free_slots.popleft()
+            self._ring[slot] = row
+            self._pending.append((sid, slot, time.perf_counter()))
+            depth = len(self._pending)
+            if depth > self.stats.max_queue_depth:
+                self.stats.max_queue_depth = depth
+            self._cond.notify()
+
+    def queue_depth(self):
+        return len(self._pending)
+
+    def queue_capacity(self):
+        return self.max_queue
+
+    def snapshot(self):
+        return self.stats.snapshot(self.queue_depth())
+
+    # ============ CONSUMER SIDE ============
+    def _next_batch(self):
+        """Block until a batch is ready; return [] when stopping"""
+        with self._cond:
+            while not self._pending and self._running:
+                self._cond.wait()
+            if not self._running:
+                return []
+            # Let the batch fill until it is full or the oldest row hits max_wait
+            deadline = self._pending[0][2] + self.max_wait
+            while len(self._pending) < self.max_batch_size and self._running:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            n = min(len(self._pending), self.max_batch_size)
+            return [self._pending.popleft() for _ in range(n)]
+
+    def _loop(self):
+        while self._running:
+            batch = self._next_batch()
+            if batch:
+                self._run(batch)
+
+    def _run(self, batch):
+        n = len(batch)
+        x = self._buf[:n]
+        started = time.perf_counter()
+        with self._cond:
+            for i, (_, slot, submitted) in enumerate(batch):
+                x[i] = self._ring[slot]
+                self._free_slots.append(slot)
+                self.stats.added_latency.append(started - submitted)
+
+        try:
+            if self.pass_sids:
+                results = self.run_batch(x, [sid for sid, _, _ in batch])
+            else:
+                results = self.run_batch(x)
+        except Exception as e:
+            self.stats.errors += 1
+            for sid, _, _ in batch:
+                self.deliver(sid, None, e)
+            return
+        finally:
+            self.stats.inference.append(time.perf_counter() - started)
+            self.stats.batch_sizes[n] += 1
+            self.stats.batches += 1
+            self.stats.frames += n
+
+        for i, (sid, _, _) in enumerate(batch):
+            self.deliver(sid, results[i], None)
@@ -0,0 +1,292 @@
+"""
+CLUSTER: Several server.py / server_asgi.py nodes behind one address
+PURPOSE: Scale the Socket.IO tier out past one process. Each client's
+         session (smoothing, dedup, sequence window, model pin) lives on
+         exactly one node; a message queue joins the nodes for whatever has
+         to cross them, and a node can be drained before a deploy.
+PIECES:
+  Session ids name their node
+    tag_session_ids() makes every Engine.IO / Socket.IO sid "<node>.<id>",
+    so a router sends a session's later requests (polling, the websocket
+    upgrade) to the node holding its state without any shared table
+    (serving/router.py, or a proxy routing on the ?sid= prefix).
+  Message queue (MESSAGE_QUEUE, picked by URL scheme in client_manager())
+    local://host:port    LocalBroker below: a stand-in for one host / tests
+    redis://, rediss://  Redis pub/sub
+    amqp://, ...         Kombu (eventlet) / aio-pika (asyncio)
+    kafka://, zmq+tcp:// Kafka / ZeroMQ (eventlet mode only)
+    A node's own emits (predictions, layouts, rate control) are addressed to
+    its own clients and skip the queue (ignore_queue): publishing them would
+    send every frame's reply through the broker to every node. The queue
+    carries emits that start elsewhere - another node, or an emitter outside
+    the cluster (`python -m serving.cluster emit`) - to the clients they name
+    or, for broadcasts, to every client of every node.
+  Drain (server.py POST /drain)
+    The node turns /readyz to 503 and refuses new sessions, then closes its
+    sessions spread over a few seconds; Socket.IO clients reconnect through
+    the router onto the remaining nodes.
+USAGE (from jars_project_onnx/):
+  python -m serving.cluster broker --port 6390
+  MESSAGE_QUEUE=local://127.0.0.1:6390 NODE_ID=n1 PORT=5101 python server.py
+  python -m serving.cluster emit --queue local://127.0.0.1:6390 announce '{"text": "hi"}'
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+NODE_SEPARATOR = "."
+NODE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+CHANNEL = "jars-socketio"
+DEFAULT_BROKER_URL = "local://127.0.0.1:6390"
+RECONNECT_S = 1.0                               # Pause before re-dialing a lost broker
+
+# Broker wire protocol: 4-byte big-endian length + payload per frame; the
+# first frame of a connection names its role
+FRAME_HEADER = struct.Struct(">I")
+ROLE_PUB = b"pub"
+ROLE_SUB = b"sub"
+
+
+# ============ NODE IDS IN SESSION IDS ============
+def check_node_id(node_id):
+    if not NODE_ID_PATTERN.match(node_id):
+        raise ValueError(f"NODE_ID must be letters, digits, '-' or '_', got {node_id!r}")
+    return node_id
+
+
+def tag_session_ids(eio_server, node_id):
+    """Prefix every sid eio_server generates (Engine.IO and Socket.IO ones) with "<node_id>." """
+    check_node_id(node_id)
+    generate = eio_server.generate_id
+    eio_server.generate_id = lambda: f"{node_id}{NODE_SEPARATOR}{generate()}"
+
+
+def node_of(sid):
+    """Node id a tagged sid belongs to (None for untagged sids)"""
+    node_id, sep, _ = sid.partition(NODE_SEPARATOR)
+    return node_id if sep else None
+
+
+# ============ MESSAGE QUEUE BACKENDS ============
+def client_manager(url, async_mode=False, channel=CHANNEL, write_only=False):
+    """
+    Socket.IO client manager for a MESSAGE_QUEUE URL: async_mode=True for
+    socketio.AsyncServer (server_asgi.py), False for Flask-SocketIO.
+    write_only=True builds an emitter for a process outside the cluster.
+    """
+    scheme = url.split("://", 1)[0]
+    if scheme == "local":
+        manager_class = AsyncLocalBrokerManager if async_mode else LocalBrokerManager
+    elif scheme in ("redis", "rediss"):
+        manager_class = socketio.AsyncRedisManager if async_mode else socketio.RedisManager
+    elif scheme == "kafka" or scheme.startswith("zmq"):
+        if async_mode:
+            raise ValueError(f"No asyncio client manager for {scheme}:// queues; use redis:// or amqp://")
+        manager_class = socketio.KafkaManager if scheme == "kafka" else socketio.ZmqManager
+    else:
+        manager_class = socketio.AsyncAioPikaManager if async_mode else socketio.KombuManager
+    return manager_class(url, channel=channel, write_only=write_only)
+
+
+def broker_address(url):
+    host, _, port = url.split("://", 1)[1].rstrip("/").rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def encode_frame(payload):
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def read_frame(stream):
+    """Next payload from a blocking binary file object; None at EOF"""
+    header = stream.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    (size,) = FRAME_HEADER.unpack(header)
+    payload = stream.read(size)
+    return payload if len(payload) == size else None
+
+
+class LocalBrokerManager(socketio.PubSubManager):
+    """
+    PubSubManager over a LocalBroker (blocking sockets: green ones under
+    eventlet). One connection publishes, another listens; both re-dial
+    after the broker restarts.
+    """
+
+    name = "local"
+
+    def __init__(self, url=DEFAULT_BROKER_URL, channel=CHANNEL, write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.address = broker_address(url)
+        self._pub = None
+        self._pub_lock = threading.Lock()
+
+    def _connect(self, role):
+        sock = socket.create_connection(self.address)
+        sock.sendall(encode_frame(role))
+        return sock
+
+    def _publish(self, data):
+        frame = encode_frame(self.json.dumps({"channel": self.channel, "data": data}).encode())
+        with self._pub_lock:
+            for attempt in range(2):
+                try:
+                    if self._pub is None:
+                        self._pub = self._connect(ROLE_PUB)
+                    self._pub.sendall(frame)
+                    return
+                except OSError:
+                    # Broker restarted: re-dial once before giving up
+                    if self._pub is not None:
+                        self._pub.close()
+                    self._pub = None
+                    if attempt:
+                        raise
+
+    def _listen(self):
+        while True:
+            try:
+                with self._connect(ROLE_SUB) as sock, sock.makefile("rb") as stream:
+                    while (payload := read_frame(stream)) is not None:
+                        message = self.json.loads(payload)
+                        if message.get("channel") == self.channel:
+                            yield message["data"]
+            except OSError as e:
+                self._get_logger().warning(f"Message queue {self.address}: {e!r}")
+            time.sleep(RECONNECT_S)
+
+
+class AsyncLocalBrokerManager(AsyncPubSubManager):
+    """LocalBrokerManager for socketio.AsyncServer (asyncio streams)"""
+
+    name = "local"
+
+    def __init__(self, url=DEFAULT_BROKER_URL, channel=CHANNEL, write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.address = broker_address(url)
+        self._pub = None
+        self._pub_lock = None
+
+    async def _connect(self, role):
+        reader, writer = await asyncio.open_connection(*self.address)
+        writer.write(encode_frame(role))
+        await writer.drain()
+        return reader, writer
+
+    async def _publish(self, data):
+        frame = encode_frame(self.json.dumps({"channel": self.channel, "data": data}).encode())
+        if self._pub_lock is None:
+            self._pub_lock = asyncio.Lock()
+        async with self._pub_lock:
+            for attempt in range(2):
+                try:
+                    if self._pub is None:
+                        _, self._pub = await self._connect(ROLE_PUB)
+                    self._pub.write(frame)
+                    await self._pub.drain()
+                    return
+                except OSError:
+                    if self._pub is not None:
+                        self._pub.close()
+                    self._pub = None
+                    if attempt:
+                        raise
+
+    async def _listen(self):
+        while True:
+            try:
+                reader, writer = await self._connect(ROLE_SUB)
+                try:
+                    while True:
+                        (size,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                        message = self.json.loads(await reader.readexactly(size))
+                        if message.get("channel") == self.channel:
+                            yield message["data"]
+                finally:
+                    writer.close()
+            except (OSError, asyncio.IncompleteReadError) as e:
+                self._get_logger().warning(f"Message queue {self.address}: {e!r}")
+            await asyncio.sleep(RECONNECT_S)
+
+
+# ============ LOCAL BROKER ============
+class LocalBroker(socketserver.ThreadingTCPServer):
+    """
+    Fan-out pub/sub over TCP, enough to join the nodes of one host (tests,
+    benchmarks): every frame a publisher sends is copied to every subscriber
+    (the managers filter by channel and skip their own messages)
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=6390):
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.messages = 0
+        super().__init__((host, port), BrokerConnection)
+
+    def fan_out(self, frame):
+        with self.lock:
+            self.messages += 1
+            for sub in list(self.subscribers):
+                try:
+                    sub.sendall(frame)
+                except OSError:
+                    self.subscribers.discard(sub)
+
+
+class BrokerConnection(socketserver.StreamRequestHandler):
+    def handle(self):
+        role = read_frame(self.rfile)
+        if role == ROLE_SUB:
+            with self.server.lock:
+                self.server.subscribers.add(self.request)
+            try:
+                while self.rfile.read(4096):     # Subscribers only listen; wait for EOF
+                    pass
+            finally:
+                with self.server.lock:
+                    self.server.subscribers.discard(self.request)
+        elif role == ROLE_PUB:
+            while (payload := read_frame(self.rfile)) is not None:
+                self.server.fan_out(encode_frame(payload))
+
+
+# ============ CLI ============
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    broker = commands.add_parser("broker", help="Run a LocalBroker (local:// message queue)")
+    broker.add_argument("--host", default="127.0.0.1")
+    broker.add_argument("--port", type=int, default=6390)
+    emit = commands.add_parser("emit", help="Emit an event to the cluster's clients from outside it")
+    emit.add_argument("--queue", default=DEFAULT_BROKER_URL, help="MESSAGE_QUEUE URL of the cluster")
+    emit.add_argument("--to", default=None, help="One client sid (default: every client of every node)")
+    emit.add_argument("event")
+    emit.add_argument("data", nargs="?", default="{}", help="JSON payload")
+    args = parser.parse_args()
+
+    if args.command == "broker":
+        server = LocalBroker(args.host, args.port)
+        print(f"Local message broker on local://{args.host}:{args.port}")
+        server.serve_forever()
+    else:
+        manager = client_manager(args.queue, write_only=True)
+        manager.emit(args.event, json.loads(args.data), to=args.to)
+        print(f"Emitted {args.event!r} to {args.to or 'every client'} via {args.queue}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+FRAME DEDUPLICATION: Reuse the last prediction while the signer holds still
+PURPOSE: A still signer keeps sending near-identical vectors; running ONNX on
+         each of them buys nothing. Each incoming model row is compared with
+         the last row this client actually sent to inference, on a small
+         downsampled subset of landmarks, and the cached probabilities are
+         reused when nothing moved.
+DISTANCE: max |a - b| over the subset (all 42 hand points + every
+          `face_stride`-th face point, x/y/z), about 4% of the vector.
+          Landmark-subset models (hands + a few face anchors) have rows that
+          small already; every value is compared.
+SAFETY: the cache is only used once the reference frame's own result came
+        back, and never for longer than max_age_s in a row
+"""
+
+import time
+
+import numpy as np
+
+from serving.wire import LANDMARK_BLOCKS, NUM_POINTS
+
+
+def subset_indices(face_stride=16):
+    """Flat indices (into the 1530 vector) of the landmarks that are compared"""
+    points = []
+    for name, start, stop in LANDMARK_BLOCKS:
+        step = face_stride if name == "face" else 1
+        points.extend(range(start, stop, step))
+    points = np.asarray(points, dtype=np.intp)
+    return (points[:, None] * 3 + np.arange(3)).reshape(-1)
+
+
+class _DedupState:
+    __slots__ = ("reference", "probs", "valid", "in_flight", "inferred_at")
+
+    def __init__(self, size):
+        self.reference = np.zeros(size, dtype=np.float32)
+        self.probs = None           # Allocated on the first result, then reused
+        self.valid = False
+        self.in_flight = 0
+        self.inferred_at = 0.0
+
+
+class FrameDeduplicator:
+    """
+    Per-connection near-duplicate detector
+
+    INPUT:
+      threshold: largest subset distance still counted as "the same frame";
+                 0 disables deduplication
+      max_age_s: re-run inference at least this often even when still
+      face_stride: face landmark downsampling for the distance
+      dim: model row length; anything but the full 1530 compares every value
+      num_classes: length of the cached probability vector (memory report)
+    USAGE:
+      probs = dedup.lookup(sid, row)  # cached probs, or None -> submit row
+      dedup.store(sid, probs)         # when the submitted row's result arrives
+    """
+
+    def __init__(self, threshold=0.0, max_age_s=1.0, face_stride=16, dim=NUM_POINTS * 3, num_classes=0):
+        self.threshold = float(threshold)
+        self.max_age = float(max_age_s)
+        self.indices = subset_indices(face_stride) if dim == NUM_POINTS * 3 else np.arange(dim)
+        self.num_classes = int(num_classes)
+        self._scratch = np.zeros(len(self.indices), dtype=np.float32)
+        self._states = {}
+        self.skipped = 0
+        self.inferred = 0
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    @property
+    def bytes_per_client(self):
+        """One client's reference row plus its cached probabilities (float32)"""
+        return (len(self.indices) + self.num_classes) * 4 if self.enabled else 0
+
+    def lookup(self, sid, row):
+        """Return cached probabilities for a near-duplicate row, else None"""
+        if not self.enabled:
+            return None
+        state = self._states.get(sid)
+        if state is None:
+            state = self._states[sid] = _DedupState(len(self.indices))
+        now = time.monotonic()
+        subset = self._scratch
+        np.take(row, self.indices, out=subset)
+        if state.valid and state.in_flight == 0 and now - state.inferred_at < self.max_age:
+            np.subtract(subset, state.reference, out=subset)
+            np.abs(subset, out=subset)
+            if subset.max() <= self.threshold:
+                self.skipped += 1
+                return state.probs
+            np.take(row, self.indices, out=subset)
+        # This row becomes the new reference and goes to inference
+        state.reference[:] = subset
+        state.in_flight += 1
+        state.inferred_at = now
+        self.inferred += 1
+        return None
+
+    def store(self, sid, probs):
+        """Cache the result of sid's submitted row (only the newest one counts)"""
+        state = self._states.get(sid)
+        if state is None or state.in_flight == 0:
+            return
+        state.in_flight -= 1
+        if state.in_flight:
+            state.valid = False     # A newer reference is still being scored
+            return
+        if state.probs is None:
+            state.probs = np.empty(len(probs), dtype=np.float32)
+        state.probs[:] = probs
+        state.valid = True
+
+    def discard(self, sid):
+        """A submitted row never produced a result (queue full / error)"""
+        state = self._states.get(sid)
+        if state is not None and state.in_flight:
+            state.in_flight -= 1
+            state.valid = False
+
+    def release(self, sid):
+        self._states.pop(sid, None)
+
+    def snapshot(self):
+        total = self.skipped + self.inferred
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "skipped_inferences": self.skipped,
+            "inferred": self.inferred,
+            "skip_ratio": (self.skipped / total) if total else 0.0,
+        }
@@ -0,0 +1,207 @@
+"""
+HOT-PATH METRICS: Where a frame's time goes, in Prometheus text format
+PURPOSE: Time every stage of a frame (decode, normalize, session.run,
+         softmax, emit) plus event loop lag, frames per second in / out and
+         errors by type, cheaply enough to leave on in production, and serve
+         it all on /metrics for a Prometheus scraper
+COST: A stage is one perf_counter() call and one bisect into a fixed bucket
+      list - no allocation. Per-frame stages run on the event loop (the
+      green threads of one process never preempt each other mid-update), so
+      lap() takes no lock. Per-batch stages use batch_lap(), which does:
+      under server_asgi.py every model version's batcher is a real thread
+      and they record into the same histograms. Disabled, every call
+      returns after one attribute check.
+      benchmarks/bench_metrics_overhead.py measures both.
+USAGE (server.py):
+    t = metrics.start()              # 0.0 when disabled
+    ... decode ...
+    t = metrics.lap("decode", t)     # record since t, restart the clock
+    t = metrics.batch_lap("session_run", t)   # from a batcher thread
+"""
+
+import asyncio
+import math
+import threading
+import time
+from bisect import bisect_left
+from time import perf_counter
+
+# Upper bounds (seconds) of the latency buckets: 5 us .. 1 s
+LATENCY_BUCKETS_S = (
+    5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0,
+)
+METRIC_PREFIX = "jars"
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus semantics (cumulative on render)"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS_S):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)     # Last bucket = +Inf
+        self.sum = 0.0
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class HotPathMetrics:
+    """
+    Stage latencies, counters and event loop lag for one server process
+
+    INPUT:
+      stages: stage names timed with lap() / observe()
+      enabled: initial state; flip .enabled at runtime (the /metrics/enabled route)
+      lag_interval_s: how often the lag probe wakes up (see lag_loop)
+    """
+
+    def __init__(self, stages, enabled=True, lag_interval_s=0.5):
+        self.enabled = enabled
+        self.stages = {name: Histogram() for name in stages}
+        self.batch_lock = threading.Lock()     # Batcher threads' stages (batch_lap)
+        self.loop_lag = Histogram()
+        self.lag_interval_s = lag_interval_s
+        self.frames_in = 0
+        self.frames_out = 0
+        self.errors = {}
+        # Frames per second over the last lag_interval_s (updated by lag_loop)
+        self.fps_in = 0.0
+        self.fps_out = 0.0
+        self.started_at = time.time()
+
+    # ============ HOT PATH ============
+    def start(self):
+        return perf_counter() if self.enabled else 0.0
+
+    def lap(self, stage, t):
+        """Record the time since t under stage; returns the new start time"""
+        if not self.enabled:
+            return 0.0
+        now = perf_counter()
+        if t:                                   # t == 0.0: enabled mid-frame
+            # Histogram.observe inlined: this runs several times per frame
+            hist = self.stages[stage]
+            elapsed = now - t
+            hist.counts[bisect_left(hist.bounds, elapsed)] += 1
+            hist.sum += elapsed
+        return now
+
+    def batch_lap(self, stage, t):
+        """lap() for stages recorded from batcher threads, which may run concurrently"""
+        if not self.enabled:
+            return 0.0
+        with self.batch_lock:
+            return self.lap(stage, t)
+
+    def observe(self, stage, seconds):
+        if self.enabled:
+            self.stages[stage].observe(seconds)
+
+    def frame_in(self):
+        if self.enabled:
+            self.frames_in += 1
+
+    def frame_out(self):
+        if self.enabled:
+            self.frames_out += 1
+
+    def error(self, kind):
+        if self.enabled:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    # ============ BACKGROUND ============
+    def lag_loop(self, sleep):
+        """
+        Event loop lag probe (run as a background task): sleep for
+        lag_interval_s and record how late the wake-up was. A green thread
+        hogging the hub (or a blocking call outside tpool) shows up here.
+        """
+        mark = self._rate_mark(perf_counter())
+        while True:
+            t0 = perf_counter()
+            sleep(self.lag_interval_s)
+            mark = self._lag_sample(t0, mark)
+
+    async def lag_loop_async(self):
+        """lag_loop for an asyncio event loop (server_asgi.py)"""
+        mark = self._rate_mark(perf_counter())
+        while True:
+            t0 = perf_counter()
+            await asyncio.sleep(self.lag_interval_s)
+            mark = self._lag_sample(t0, mark)
+
+    def _rate_mark(self, now):
+        return self.frames_in, self.frames_out, now
+
+    def _lag_sample(self, t0, mark):
+        """Record one wake-up that was due lag_interval_s after t0; returns the new fps mark"""
+        now = perf_counter()
+        if not self.enabled:
+            return self._rate_mark(now)
+        self.loop_lag.observe(max(0.0, now - t0 - self.lag_interval_s))
+        last_in, last_out, last_t = mark
+        elapsed = now - last_t
+        self.fps_in = (self.frames_in - last_in) / elapsed
+        self.fps_out = (self.frames_out - last_out) / elapsed
+        return self._rate_mark(now)
+
+    # ============ EXPOSITION ============
+    def render(self, gauges=()):
+        """
+        Prometheus text exposition (format 0.0.4)
+        gauges: extra (name, help, [(labels dict, value), ...]) families,
+                e.g. connected clients and queue depth sampled at scrape time
+        """
+        p = METRIC_PREFIX
+        lines = []
+        family(lines, f"{p}_metrics_enabled", "gauge", "1 when hot-path instrumentation is on",
+               [({}, int(self.enabled))])
+        family(lines, f"{p}_start_time_seconds", "gauge", "Unix time the server process started",
+               [({}, round(self.started_at, 3))])
+        lines += [f"# HELP {p}_stage_seconds Time per frame (per batch for session_run/softmax) in each stage",
+                  f"# TYPE {p}_stage_seconds histogram"]
+        for stage, hist in self.stages.items():
+            histogram_samples(lines, f"{p}_stage_seconds", {"stage": stage}, hist)
+        lines += [f"# HELP {p}_event_loop_lag_seconds How late the event loop wakes a sleeping green thread",
+                  f"# TYPE {p}_event_loop_lag_seconds histogram"]
+        histogram_samples(lines, f"{p}_event_loop_lag_seconds", {}, self.loop_lag)
+        family(lines, f"{p}_frames_in_total", "counter", "Landmark frames received", [({}, self.frames_in)])
+        family(lines, f"{p}_frames_out_total", "counter", "Predictions emitted", [({}, self.frames_out)])
+        family(lines, f"{p}_frames_in_per_second", "gauge", "Frames received per second (recent)",
+               [({}, round(self.fps_in, 3))])
+        family(lines, f"{p}_frames_out_per_second", "gauge", "Predictions emitted per second (recent)",
+               [({}, round(self.fps_out, 3))])
+        family(lines, f"{p}_errors_total", "counter", "Frames answered with an error, by type",
+               [({"type": kind}, n) for kind, n in sorted(self.errors.items())])
+        for name, help_text, samples in gauges:
+            family(lines, f"{p}_{name}", "gauge", help_text, samples)
+        return "\n".join(lines) + "\n"
+
+
+# ============ TEXT FORMAT HELPERS ============
+def label_text(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def family(lines, name, kind, help_text, samples):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{label_text(labels)} {value}" for labels, value in samples]
+
+
+def histogram_samples(lines, name, labels, hist):
+    cumulative = 0
+    for bound, c in zip(hist.bounds + (math.inf,), hist.counts):
+        cumulative += c
+        le = "+Inf" if bound == math.inf else repr(bound)
+        lines.append(f"{name}_bucket{label_text(dict(labels, le=le))} {cumulative}")
+    lines.append(f"{name}_sum{label_text(labels)} {hist.sum!r}")
+    lines.append(f"{name}_count{label_text(labels)} {hist.count}")
@@ -0,0 +1,71 @@
+"""
+ADAPTIVE RATE CONTROL: Tell clients how often to send frames
+PURPOSE: The frontend throttles itself with a fixed SEND_INTERVAL_MS and never
+         slows down when the server is overloaded. The server periodically
+         looks at its inference queue depth and advertises a send interval
+         ("rate_control" Socket.IO event) that clients adopt.
+POLICY (AIMD-style on the queue fill fraction):
+  fill >= high_water: interval *= backoff      (up to max_interval_ms)
+  fill <= low_water:  interval /= recovery     (down to min_interval_ms,
+                                                by default the initial one)
+  otherwise:          unchanged
+"""
+
+
+class RateController:
+    """
+    Compute the advertised client send interval from queue depth
+
+    INPUT:
+      initial_interval_ms: interval advertised at startup (frontend default)
+      min_interval_ms / max_interval_ms: clamp for the advertised interval
+                       (min None = initial_interval_ms: only back off and recover)
+      low_water / high_water: queue fill fractions (0..1) to speed up / back off
+      backoff / recovery: multiplicative factors (> 1)
+    """
+
+    def __init__(self, initial_interval_ms=100.0, min_interval_ms=None, max_interval_ms=1000.0,
+                 low_water=0.05, high_water=0.25, backoff=1.5, recovery=1.25):
+        if not 0.0 <= low_water < high_water <= 1.0:
+            raise ValueError("Need 0 <= low_water < high_water <= 1")
+        self.min_interval = float(initial_interval_ms if min_interval_ms is None else min_interval_ms)
+        self.max_interval = float(max_interval_ms)
+        self.interval = min(max(float(initial_interval_ms), self.min_interval), self.max_interval)
+        self.low_water = float(low_water)
+        self.high_water = float(high_water)
+        self.backoff = float(backoff)
+        self.recovery = float(recovery)
+        self.last_fill = 0.0
+        self.changes = 0
+
+    def update(self, queue_depth, queue_capacity):
+        """
+        Feed the current queue depth
+        OUTPUT: the new interval in ms if it changed, else None
+        """
+        fill = queue_depth / max(1, queue_capacity)
+        self.last_fill = fill
+        if fill >= self.high_water:
+            interval = min(self.interval * self.backoff, self.max_interval)
+        elif fill <= self.low_water:
+            interval = max(self.interval / self.recovery, self.min_interval)
+        else:
+            return None
+        # Advertise whole milliseconds; ignore sub-ms drift at the clamps
+        if round(interval) == round(self.interval):
+            return None
+        self.interval = interval
+        self.changes += 1
+        return self.advertised_ms()
+
+    def advertised_ms(self):
+        return int(round(self.interval))
+
+    def snapshot(self):
+        return {
+            "advertised_interval_ms": self.advertised_ms(),
+            "min_interval_ms": self.min_interval,
+            "max_interval_ms": self.max_interval,
+            "queue_fill": self.last_fill,
+            "changes": self.changes,
+        }
@@ -0,0 +1,411 @@
+"""
+MODEL REGISTRY: Hot-reloaded model versions with A/B routing
+PURPOSE: Deploy a retrained model without restarting server.py (and dropping
+         every Socket.IO connection), and compare versions on live traffic
+LAYOUT (MODELS_DIR):
+  models/
+    v1/model.onnx          version "v1" (+ model.onnx.data, model.ort, and
+                           optionally its own classes.json; model.ort
+                           is used while it is at least as new as
+                           model.onnx and has its .meta.json)
+    v2/model.onnx
+    routes.json            optional {"v1": 90, "v2": 10}; default 100% newest
+  Directories starting with "." are ignored: copy a new version into
+  models/.v3 and rename it to models/v3 so it never appears half-written.
+WORKFLOW:
+  1. poll() (every poll_s, from a background green thread) scans the
+     directory. A version whose files have not changed since the previous
+     poll and differ from what is loaded gets (re)loaded
+  2. load_version runs through run_blocking (eventlet.tpool in server.py,
+     a thread pool in server_asgi.py):
+     session creation and warm-up batches at every batch size never block
+     the event loop
+  3. activate(version) (server.py: batcher, smoother, ...) runs back on the
+     polling thread (green under eventlet), then a new RoutingTable
+     replaces the old one in a single assignment - routing sees either the
+     old table or the new one
+  4. Versions that left the table are handed to retire(version), which
+     drains their queue before stopping them
+ROUTING:
+  route(sid) -> version. Sessions pinned with pin(sid, version) go to that
+  version; everyone else is placed by a hash of the sid on the weighted
+  routes, so a session stays on one version while the weights are unchanged.
+"""
+
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+
+from preprocess.landmark_subsets import DEFAULT_SUBSET, subset_columns, subset_from_metadata, subset_points
+from serving.session import create_session, model_metadata, ort_is_current
+
+MODEL_NAME = "model.onnx"
+ORT_NAME = "model.ort"                          # Pre-optimized copy, preferred while current
+ROUTES_NAME = "routes.json"
+CLASSES_NAME = "classes.json"
+STATIC_VERSION = "default"                      # Id of the model loaded without MODELS_DIR
+
+
+def version_model_path(directory):
+    """
+    File to load from a version directory: model.ort while it is current for
+    model.onnx (serving/session.py ort_is_current), else model.onnx; a
+    directory with only a model.ort uses it. None when there is neither.
+    """
+    onnx_path = os.path.join(directory, MODEL_NAME)
+    ort_path = os.path.join(directory, ORT_NAME)
+    if os.path.exists(onnx_path):
+        return ort_path if ort_is_current(ort_path, onnx_path) else onnx_path
+    return ort_path if os.path.exists(ort_path) else None
+
+
+class NoModelLoaded(RuntimeError):
+    """Raised when a route is requested before any version has loaded"""
+
+
+# ============ ONE LOADED VERSION ============
+class VersionMetrics:
+    """Per-version prediction distribution (inference latency lives in its batcher)"""
+
+    def __init__(self, num_classes):
+        self.frames = 0
+        self.cached = 0
+        self.errors = 0
+        self.score_sum = 0.0
+        self.predictions = np.zeros(num_classes, dtype=np.int64)
+
+    def record(self, probs, cached=False):
+        idx = int(np.argmax(probs))
+        self.predictions[idx] += 1
+        self.score_sum += float(probs[idx])
+        self.frames += 1
+        self.cached += cached
+
+    def snapshot(self, inv_classes):
+        return {
+            "frames": self.frames,
+            "cached": self.cached,
+            "errors": self.errors,
+            "mean_score": (self.score_sum / self.frames) if self.frames else 0.0,
+            "predictions": {inv_classes.get(i, str(i)): int(c) for i, c in enumerate(self.predictions) if c},
+        }
+
+
+class ModelVersion:
+    """
+    A loaded, warmed-up model and everything derived from its metadata
+    server.py's activate() attaches the serving pieces (batcher, smoother,
+    dedup, sequence_states, row buffers) to the same object.
+    """
+
+    def __init__(self, version_id, path, session, inv_classes, signature=None):
+        self.id = version_id
+        self.path = path
+        self.session = session
+        self.signature = signature
+        self.metadata = model_metadata(session, path)
+        model_input, model_output = session.get_inputs()[0], session.get_outputs()[0]
+        self.input_name = model_input.name
+        self.output_name = model_output.name
+        self.expected_dim = model_input.shape[-1]
+        self.num_classes = model_output.shape[-1]
+        # A symbolic batch axis allows (N, dim) inputs; a fixed one does not
+        self.batch_dim = model_input.shape[0]
+        self.graph_normalizes = self.metadata.get("landmark_normalization") == "graph"
+        self.is_sequence = self.metadata.get("model_type") == "sequence"
+        self.landmark_subset = subset_from_metadata(self.metadata, self.expected_dim)
+        self.landmark_points = subset_points(self.landmark_subset).tolist()
+        # Full 1530-value frames are reduced to these columns (None = full model)
+        self.subset_index = None if self.landmark_subset == DEFAULT_SUBSET else subset_columns(self.landmark_subset)
+        self.inv_classes = inv_classes
+        self.metrics = VersionMetrics(self.num_classes)
+        self.loaded_at = time.time()
+        self.load_s = 0.0
+        self.warmup_s = 0.0
+        # Set by server.py when the version is activated
+        self.batcher = None
+        self.smoother = None
+        self.dedup = None
+        self.sequence_states = None
+        self.normalized_row = None
+        self.subset_row = None
+
+    def describe(self):
+        return {
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+            "load_s": round(self.load_s, 3),
+            "warmup_s": round(self.warmup_s, 3),
+            "landmarks": self.landmark_subset,
+            "dim": self.expected_dim,
+            "classes": self.num_classes,
+            "normalization": "graph" if self.graph_normalizes else "external",
+            "sequence": self.is_sequence,
+        }
+
+
+def load_classes(path):
+    """{class id: label} from a classes.json ({label: id})"""
+    with open(path) as f:
+        return {int(v): k for k, v in json.load(f).items()}
+
+
+def warm_up(session, batch_sizes, runs=2, seed=0):
+    """
+    Run dummy batches of every size the batcher can send, so the first real
+    frames do not pay for ORT's first-run allocations. Every input gets
+    random data of its shape (the sequence model's state included).
+    """
+    rng = np.random.default_rng(seed)
+    for n in batch_sizes:
+        feeds = {}
+        for model_input in session.get_inputs():
+            shape = [n if i == 0 or not isinstance(d, int) else d for i, d in enumerate(model_input.shape)]
+            feeds[model_input.name] = rng.random(shape, dtype=np.float32)
+        for _ in range(runs):
+            session.run(None, feeds)
+
+
+def warmup_batch_sizes(max_batch_size, batch_dim):
+    """1, 2, 4, ... up to max_batch_size (and max_batch_size itself); fixed-batch models: that size only"""
+    if isinstance(batch_dim, int):
+        return [batch_dim]
+    sizes, n = [], 1
+    while n < max_batch_size:
+        sizes.append(n)
+        n *= 2
+    return sizes + [max_batch_size]
+
+
+def load_version(version_id, path, classes_path, max_batch_size=32, intra_op_threads=None, signature=None):
+    """Build, validate and warm a ModelVersion (blocking: call it off the event loop)"""
+    t0 = time.perf_counter()
+    session = create_session(path, intra_op_threads)
+    version = ModelVersion(version_id, path, session, load_classes(classes_path), signature)
+    if isinstance(version.num_classes, int) and version.num_classes != len(version.inv_classes):
+        raise ValueError(f"{path} predicts {version.num_classes} classes but {classes_path} lists "
+                         f"{len(version.inv_classes)}")
+    version.load_s = time.perf_counter() - t0
+    warm_up(session, warmup_batch_sizes(max_batch_size, version.batch_dim))
+    version.warmup_s = time.perf_counter() - t0 - version.load_s
+    return version
+
+
+# ============ ROUTING ============
+class RoutingTable:
+    """Immutable snapshot: loaded versions + normalized weights; replaced, never mutated"""
+
+    def __init__(self, versions, weights):
+        self.versions = dict(versions)
+        weights = {vid: float(w) for vid, w in weights.items() if vid in self.versions and float(w) > 0}
+        if not weights and self.versions:
+            newest = max(self.versions.values(), key=lambda v: (v.signature or (), v.loaded_at))
+            weights = {newest.id: 1.0}
+        total = sum(weights.values())
+        self.weights = {vid: w / total for vid, w in weights.items()}
+        self.cumulative = []
+        acc = 0.0
+        for vid in sorted(self.weights):
+            acc += self.weights[vid]
+            self.cumulative.append((acc, vid))
+
+    def pick(self, sid):
+        """Weighted choice that is stable for a given sid"""
+        point = (zlib.crc32(sid.encode()) % 10000) / 10000.0
+        for bound, vid in self.cumulative:
+            if point < bound:
+                return self.versions[vid]
+        return self.versions[self.cumulative[-1][1]]
+
+
+def parse_routes(text):
+    """"v1:90,v2:10" -> {"v1": 90.0, "v2": 10.0}"""
+    routes = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        vid, _, weight = part.partition(":")
+        routes[vid.strip()] = float(weight or 100)
+    return routes
+
+
+class ModelRegistry:
+    """
+    Versions loaded from models_dir and the routes between them
+
+    INPUT:
+      models_dir: directory of version sub-directories (None = static: only
+                  versions added with add() are served, nothing is watched)
+      load: fn(version_id, path, classes_path, signature) -> ModelVersion, blocking
+      activate / retire: fn(version) called on the event loop
+      run_blocking: fn(callable, *args) running the blocking load elsewhere
+                    (eventlet.tpool.execute in server.py)
+      classes_path: classes.json for versions without their own
+      routes: default weights when models_dir has no routes.json
+    """
+
+    def __init__(self, models_dir, load, activate, retire, run_blocking=None, classes_path=None, routes=None,
+                 poll_s=2.0, log=print):
+        self.models_dir = models_dir
+        self._load = load
+        self._activate = activate
+        self._retire = retire
+        self._run_blocking = run_blocking or (lambda fn, *args: fn(*args))
+        self.classes_path = classes_path
+        self.default_routes = dict(routes or {})
+        self.poll_s = poll_s
+        self.log = log
+        self.table = RoutingTable({}, {})
+        self.routes = dict(self.default_routes)
+        self._pins = {}
+        self._seen = {}             # version id -> signature at the previous poll
+        self._failed = {}           # version id -> signature that failed to load
+        self._routes_mtime = None
+        self.swaps = 0
+
+    # ============ ROUTING ============
+    def route(self, sid):
+        table = self.table
+        pinned = self._pins.get(sid)
+        if pinned is not None and pinned in table.versions:
+            return table.versions[pinned]
+        if not table.cumulative:
+            raise NoModelLoaded("No model version is loaded yet")
+        return table.pick(sid)
+
+    def pin(self, sid, version_id):
+        """Send this session to version_id (None = back to the weighted routes)"""
+        if version_id is None:
+            self._pins.pop(sid, None)
+            return
+        if version_id not in self.table.versions:
+            raise ValueError(f"Unknown model version {version_id!r}, loaded: {sorted(self.table.versions)}")
+        self._pins[sid] = version_id
+
+    def release(self, sid):
+        self._pins.pop(sid, None)
+
+    def versions(self):
+        return list(self.table.versions.values())
+
+    def primary(self):
+        """The version with the largest share of traffic"""
+        table = self.table
+        if not table.weights:
+            raise NoModelLoaded("No model version is loaded yet")
+        return table.versions[max(table.weights, key=table.weights.get)]
+
+    # ============ LOADING ============
+    def add(self, version):
+        """Activate an already loaded version and publish it"""
+        self._activate(version)
+        self._publish(dict(self.table.versions, **{version.id: version}))
+
+    def set_routes(self, routes):
+        self.routes = dict(routes)
+        self._publish(self.table.versions)
+
+    def _publish(self, versions):
+        old = self.table
+        self.table = RoutingTable(versions, self.routes)      # The atomic swap
+        self.swaps += 1
+        for vid, version in old.versions.items():
+            if self.table.versions.get(vid) is not version:
+                self._retire(version)
+
+    def scan(self):
+        """{version id: (model path, signature)} of the version directories on disk"""
+        found = {}
+        for name in sorted(os.listdir(self.models_dir)):
+            directory = os.path.join(self.models_dir, name)
+            if name.startswith(".") or not os.path.isdir(directory):
+                continue
+            path = version_model_path(directory)
+            if path is None:
+                continue
+            files = sorted(os.listdir(directory))
+            stats = [os.stat(os.path.join(directory, f)) for f in files]
+            # Newest file first, so signatures also order versions by age
+            signature = (max(st.st_mtime_ns for st in stats),) + tuple(
+                (f, st.st_size, st.st_mtime_ns) for f, st in zip(files, stats))
+            found[name] = (path, signature)
+        return found
+
+    def poll(self, require_stable=True):
+        """
+        One scan: load new / changed versions, drop removed ones, re-read routes.json
+        require_stable=False loads what is there right away (server startup)
+        """
+        found = self.scan()
+        loaded = self.table.versions
+        versions = dict(loaded)
+        for vid, (path, signature) in found.items():
+            stable = self._seen.get(vid) == signature
+            self._seen[vid] = signature
+            current = loaded.get(vid)
+            if current is not None and current.signature == signature:
+                continue
+            if (require_stable and not stable) or self._failed.get(vid) == signature:
+                continue            # Still being written, or known to be broken
+            version_dir = os.path.dirname(path)
+            classes_path = os.path.join(version_dir, CLASSES_NAME)
+            if not os.path.exists(classes_path):
+                classes_path = self.classes_path
+            self.log(f"Loading model version {vid} from {path}...")
+            try:
+                version = self._run_blocking(self._load, vid, path, classes_path, signature)
+                self._activate(version)
+            except Exception as e:
+                self._failed[vid] = signature
+                self.log(f"Model version {vid} failed to load: {e!r}")
+                continue
+            self.log(f"Model version {vid} ready (load {version.load_s:.2f}s, warm-up {version.warmup_s:.2f}s)")
+            versions[vid] = version
+        for vid in set(loaded) - set(found):
+            if len(versions) > 1:
+                self.log(f"Model version {vid} removed from {self.models_dir}")
+                versions.pop(vid)
+        for vid in set(self._seen) - set(found):
+            self._seen.pop(vid)
+        routes_changed = self._read_routes()
+        if versions != loaded or routes_changed:
+            self._publish(versions)
+
+    def _read_routes(self):
+        """Reload routes.json when it changed; True when the routes changed"""
+        path = os.path.join(self.models_dir, ROUTES_NAME)
+        mtime = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+        if mtime == self._routes_mtime:
+            return False
+        self._routes_mtime = mtime
+        routes = self.default_routes
+        if mtime is not None:
+            try:
+                with open(path) as f:
+                    routes = {str(k): float(v) for k, v in json.load(f).items()}
+            except (OSError, ValueError, AttributeError) as e:
+                self.log(f"Ignoring {path}: {e!r}")
+                return False
+        self.routes = dict(routes)
+        self.log(f"Model routes: {self.routes or 'newest version'}")
+        return True
+
+    def watch(self, sleep=time.sleep):
+        """Poll forever (run as a background task)"""
+        while True:
+            sleep(self.poll_s)
+            try:
+                self.poll()
+            except Exception as e:
+                self.log(f"Model registry poll failed: {e!r}")
+
+    def snapshot(self):
+        table = self.table
+        return {
+            "models_dir": self.models_dir,
+            "routes": {vid: round(w, 4) for vid, w in table.weights.items()},
+            "pinned_sessions": len(self._pins),
+            "swaps": self.swaps,
+            "versions": {vid: v.describe() for vid, v in table.versions.items()},
+        }
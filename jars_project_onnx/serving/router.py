@@ -0,0 +1,178 @@
+"""
+STICKY ROUTER: One address in front of several serving nodes
+PURPOSE: The load balancer of a clustered deployment (serving/cluster.py),
+         small enough to run next to the nodes for tests and benchmarks.
+         Session-aware without shared state:
+           - a request carrying ?sid= (polling requests, the websocket
+             upgrade) goes to the node named by the sid's "<node>." prefix,
+             where that session's smoothing / dedup / sequence state lives
+           - a request without one (a new session, the frontend files) goes
+             to the ready node with the fewest clients (as of its last
+             /readyz, plus the sessions routed to it since)
+           - draining nodes (/readyz 503) get no new sessions but keep
+             serving the ones they hold until they close them
+         Nodes are health-checked on /readyz every --check-interval seconds;
+         GET /router/nodes reports what the router sees.
+PROXYING: the first request head of a connection picks the node, then bytes
+          are piped both ways. Plain HTTP requests are forwarded with
+          "Connection: close", so every polling request is routed on its sid.
+PRODUCTION: any proxy that can route on the sid prefix does the same, e.g.
+            nginx: map $arg_sid $node { "~^(?<id>[^.]+)\\." $id; } and an
+            upstream per node id, falling back to least_conn for "".
+USAGE (from jars_project_onnx/):
+  python -m serving.router --port 5000 --nodes http://127.0.0.1:5101 http://127.0.0.1:5102
+"""
+
+import argparse
+import asyncio
+import json
+import re
+from urllib.parse import parse_qs, urlsplit
+
+from serving.cluster import node_of
+
+HEAD_LIMIT = 64 * 1024                          # Longest request head accepted
+PIPE_CHUNK = 64 * 1024
+CONNECTION_HEADER = re.compile(rb"\r\nconnection:[^\r\n]*", re.IGNORECASE)
+
+
+class Node:
+    """One upstream server and what its last health check said"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.url = url
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.id = None                          # NODE_ID from /readyz
+        self.state = "unknown"                  # /readyz state, or "down"
+        self.clients = 0                        # /readyz clients + new sessions since
+        self.connections = 0                    # Open proxied connections
+        self.sessions = 0                       # New sessions routed here
+
+    def describe(self):
+        return {"url": self.url, "id": self.id, "state": self.state, "clients": self.clients,
+                "connections": self.connections, "sessions": self.sessions}
+
+
+async def http_get_json(host, port, path, timeout):
+    """(status, body) of a small JSON GET; raises OSError / TimeoutError / ValueError"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        # HTTP/1.0: the body comes back unchunked, ended by the close
+        writer.write(f"GET {path} HTTP/1.0\r\nHost: {host}\r\n\r\n".encode())
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), json.loads(body or b"null")
+
+
+async def respond(writer, status, body):
+    payload = json.dumps(body, sort_keys=True).encode()
+    writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                 "Connection: close\r\n\r\n".encode() + payload)
+    await writer.drain()
+    writer.close()
+
+
+async def pipe(reader, writer):
+    try:
+        while data := await reader.read(PIPE_CHUNK):
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, OSError):
+        pass
+
+
+class StickyRouter:
+    def __init__(self, node_urls, check_interval_s=1.0):
+        self.nodes = [Node(url) for url in node_urls]
+        self.check_interval_s = check_interval_s
+
+    # ============ HEALTH ============
+    async def check(self, node):
+        try:
+            _, body = await http_get_json(node.host, node.port, "/readyz", self.check_interval_s)
+            node.id, node.state = body.get("node"), body.get("state", "unknown")
+            node.clients = body.get("clients", 0)
+        except (OSError, ValueError, IndexError, asyncio.TimeoutError):
+            node.state = "down"
+
+    async def check_loop(self):
+        while True:
+            await asyncio.gather(*(self.check(node) for node in self.nodes))
+            await asyncio.sleep(self.check_interval_s)
+
+    # ============ ROUTING ============
+    def pick(self, sid):
+        """Node for a request: the sid's own node, else the least busy ready one"""
+        if sid:
+            node_id = node_of(sid)
+            return next((n for n in self.nodes if n.id == node_id and n.state != "down"), None)
+        ready = [n for n in self.nodes if n.state == "ready"]
+        return min(ready, key=lambda n: n.clients) if ready else None
+
+    async def handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        target = head.split(b" ", 2)[1].decode("latin-1") if head.count(b" ") >= 2 else "/"
+        path, _, query = target.partition("?")
+        if path == "/router/nodes":
+            await respond(writer, "200 OK", {"nodes": [n.describe() for n in self.nodes]})
+            return
+        sid = parse_qs(query).get("sid", [None])[0]
+        node = self.pick(sid)
+        if node is None:
+            # Unknown / dead session: the client's reconnect starts a new one
+            await respond(writer, "503 Service Unavailable",
+                          {"error": f"No node for session {sid}" if sid else "No ready node"})
+            return
+        if b"\r\nupgrade: websocket" not in head.lower():
+            head = CONNECTION_HEADER.sub(b"", head[:-4]) + b"\r\nConnection: close\r\n\r\n"
+        try:
+            up_reader, up_writer = await asyncio.open_connection(node.host, node.port)
+        except OSError:
+            node.state = "down"
+            await respond(writer, "502 Bad Gateway", {"error": f"Node {node.id or node.url} is unreachable"})
+            return
+        node.connections += 1
+        if sid is None:
+            node.sessions += 1
+            node.clients += 1
+        try:
+            up_writer.write(head)
+            # The upstream side ends the exchange (HTTP response sent / websocket closed)
+            upstream = asyncio.ensure_future(pipe(up_reader, writer))
+            downstream = asyncio.ensure_future(pipe(reader, up_writer))
+            await asyncio.wait((upstream, downstream), return_when=asyncio.FIRST_COMPLETED)
+            upstream.cancel()
+            downstream.cancel()
+        finally:
+            node.connections -= 1
+            up_writer.close()
+            writer.close()
+
+    async def serve(self, host, port):
+        await asyncio.gather(*(self.check(node) for node in self.nodes))
+        server = await asyncio.start_server(self.handle, host, port, limit=HEAD_LIMIT)
+        print(f"Routing http://{host}:{port} -> " + ", ".join(f"{n.url} ({n.id}, {n.state})" for n in self.nodes))
+        asyncio.ensure_future(self.check_loop())
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--nodes", nargs="+", required=True, help="Node base URLs (http://host:port)")
+    parser.add_argument("--check-interval", type=float, default=1.0, help="Seconds between /readyz checks")
+    args = parser.parse_args()
+    asyncio.run(StickyRouter(args.nodes, args.check_interval).serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+PER-CLIENT SEQUENCE STATE: Streaming state for the windowed sequence model
+PURPOSE: model/sequence.onnx (train.py --sequence) classifies the last K
+         frames of a client. Its step graph takes (frame, state) and returns
+         (logits, state_out), where state is the encoded history of the K-1
+         previous frames. This module keeps that history for every connected
+         socket in ONE preallocated (max_clients, K-1, E) array.
+WORKFLOW:
+  1. handle_landmark calls touch(sid): a new client gets a zeroed slot, and a
+     client that paused longer than reset_after_s starts a fresh window
+  2. The micro-batcher calls step() with the batch rows and their sids;
+     states are gathered by slot, scored, and state_out scattered back
+  3. release(sid) on disconnect returns the slot to the free list
+Storing the K-1 encoded frames (E floats each) instead of K raw 1530-float
+frames keeps a client at a few KB, and each frame is encoded exactly once.
+"""
+
+import collections
+import threading
+import time
+
+import numpy as np
+
+
+class SessionsFull(RuntimeError):
+    """Raised by SequenceStates.touch when every state slot is taken"""
+
+
+class SequenceStates:
+    """
+    Fixed pool of per-client window states
+
+    INPUT:
+      window: K, frames the model looks at (state holds K-1 of them)
+      embed:  E, encoded size of one frame
+      max_clients: number of preallocated slots
+      reset_after_s: a gap longer than this between two frames clears the window
+
+    touch() / release() run on the socket handlers' loop while step() runs
+    in the batcher, a real thread in asyncio mode (server_asgi.py): slot
+    allocation, the state gather and the write-back hold a lock, the ONNX
+    call does not. step() re-checks slot ownership before writing back in
+    case the client disconnected while it ran.
+    """
+
+    def __init__(self, window, embed, max_clients=1024, reset_after_s=1.0):
+        self.window = int(window)
+        self.embed = int(embed)
+        self.max_clients = int(max_clients)
+        self.reset_after = float(reset_after_s)
+        # One extra row that is never written: the state for rows whose client
+        # is already gone (their output is still delivered, state discarded)
+        self._states = np.zeros((self.max_clients + 1, self.window - 1, self.embed), dtype=np.float32)
+        self._scratch = self.max_clients
+        self._last_seen = np.zeros(self.max_clients, dtype=np.float64)
+        self._slots = {}
+        self._free = collections.deque(range(self.max_clients))
+        self._lock = threading.Lock()
+        self.resets = 0
+        self.rejected = 0
+
+    @property
+    def bytes_per_client(self):
+        return self._states[0].nbytes
+
+    def touch(self, sid):
+        """Make sure sid owns a slot and clear its window after a long pause"""
+        now = time.monotonic()
+        with self._lock:
+            slot = self._slots.get(sid)
+            if slot is None:
+                if not self._free:
+                    self.rejected += 1
+                    raise SessionsFull(f"Sequence state is full ({self.max_clients} clients)")
+                slot = self._free.popleft()
+                self._slots[sid] = slot
+                self._states[slot] = 0.0
+            elif now - self._last_seen[slot] > self.reset_after:
+                self._states[slot] = 0.0
+                self.resets += 1
+            self._last_seen[slot] = now
+
+    def release(self, sid):
+        """Free sid's slot (disconnect)"""
+        with self._lock:
+            slot = self._slots.pop(sid, None)
+            if slot is not None:
+                self._free.append(slot)
+
+    def step(self, run_step, x, sids):
+        """
+        Score one batch and advance every client's window
+        INPUT:
+          run_step: fn(x, states) -> (logits, state_out) for (n, dim) rows
+          x: (N, dim) batch rows, sids: N client ids in submit order
+        OUTPUT: (N, num_classes) logits
+        A client with several frames in one batch needs them in order (frame
+        2 reads the state frame 1 wrote), so such batches run in rounds: the
+        first frame of every client, then the second, ...
+        """
+        rounds = []
+        seen = {}
+        for i, sid in enumerate(sids):
+            r = seen.get(sid, 0)
+            seen[sid] = r + 1
+            if r == len(rounds):
+                rounds.append([])
+            rounds[r].append(i)
+
+        logits = None
+        for rows in rounds:
+            with self._lock:
+                slots = np.fromiter((self._slots.get(sids[i], self._scratch) for i in rows), dtype=np.intp,
+                                    count=len(rows))
+                states = self._states[slots]
+            batch = x if len(rounds) == 1 else x[rows]
+            out, state_out = run_step(batch, states)
+            if logits is None:
+                logits = out if len(rounds) == 1 else np.empty((len(sids), out.shape[1]), dtype=out.dtype)
+            if len(rounds) > 1:
+                logits[rows] = out
+            # Write back only for clients still holding the same slot
+            with self._lock:
+                for j, i in enumerate(rows):
+                    slot = slots[j]
+                    if slot != self._scratch and self._slots.get(sids[i]) == slot:
+                        self._states[slot] = state_out[j]
+        return logits
+
+    def snapshot(self):
+        clients = len(self._slots)
+        return {
+            "window": self.window,
+            "clients": clients,
+            "capacity": self.max_clients,
+            "state_bytes_per_client": self.bytes_per_client,
+            "state_bytes_in_use": clients * self.bytes_per_client,
+            "state_bytes_allocated": self._states.nbytes,
+            "resets": self.resets,
+            "rejected": self.rejected,
+        }
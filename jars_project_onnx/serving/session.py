@@ -0,0 +1,98 @@
+"""
+ONNX SESSION FACTORY: One place that decides how InferenceSessions are built
+PURPOSE: server.py, model/build_variants.py and the benchmarks all score with
+         identically configured sessions, so measured latency matches serving
+"""
+
+import json
+import os
+
+import numpy as np
+
+# onnxruntime is imported by the functions that build sessions: importing it
+# takes a noticeable part of server start-up, which should not pay for it
+# before the model actually loads (and softmax users never need it)
+
+# ORT-format files do not keep the ONNX metadata_props (landmark subset,
+# folded normalization, sequence shape...); save_ort_format copies them here
+ORT_METADATA_SUFFIX = ".meta.json"
+
+
+def default_intra_threads():
+    """Leave one core for the Socket.IO / event loop work"""
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def create_session(model_path, intra_op_threads=None, optimization_level=None, profile_prefix=None):
+    """
+    Build a CPU InferenceSession
+    INPUT:
+      model_path: .onnx file or pre-optimized .ort file
+      intra_op_threads: ORT intra-op pool size (default: cpu_count - 1)
+      optimization_level: ort.GraphOptimizationLevel (default: ORT_ENABLE_ALL)
+      profile_prefix: record an ORT profile (per-node timings, Chrome trace
+                      JSON) to <profile_prefix>_<timestamp>.json; written when
+                      session.end_profiling() is called
+    """
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = (
+        ort.GraphOptimizationLevel.ORT_ENABLE_ALL if optimization_level is None else optimization_level
+    )
+    options.intra_op_num_threads = intra_op_threads or default_intra_threads()
+    options.inter_op_num_threads = 1
+    if profile_prefix:
+        options.enable_profiling = True
+        options.profile_file_prefix = profile_prefix
+    return ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def save_ort_format(model_path, ort_path):
+    """
+    Save a pre-optimized ORT-format copy of model_path
+    Loading the .ort file skips graph parsing and optimization at startup.
+    EXTENDED (not ALL) keeps the file portable across CPUs: ALL may bake in
+    layout transforms specific to the machine that built it.
+    The model's metadata goes to <ort_path>.meta.json (see model_metadata).
+    """
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    options.optimized_model_filepath = ort_path
+    options.add_session_config_entry("session.save_model_format", "ORT")
+    session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+    with open(ort_path + ORT_METADATA_SUFFIX, "w") as f:
+        json.dump(dict(session.get_modelmeta().custom_metadata_map), f, indent=2, sort_keys=True)
+    return ort_path
+
+
+def ort_is_current(ort_path, model_path):
+    """
+    True when ort_path is a usable copy of model_path: it carries the model's
+    metadata (save_ort_format) and is at least as new as the .onnx file, so
+    a replaced model.onnx is never shadowed by the .ort of the old one
+    """
+    return (os.path.exists(ort_path) and os.path.exists(ort_path + ORT_METADATA_SUFFIX)
+            and os.path.getmtime(ort_path) >= os.path.getmtime(model_path))
+
+
+def model_metadata(session, model_path):
+    """ONNX metadata_props of a loaded model; .ort files read the copy saved next to them"""
+    metadata = dict(session.get_modelmeta().custom_metadata_map)
+    sidecar = model_path + ORT_METADATA_SUFFIX
+    if not metadata and model_path.endswith(".ort") and os.path.exists(sidecar):
+        with open(sidecar) as f:
+            metadata = json.load(f)
+    return metadata
+
+
+# ============ SOFTMAX FUNCTION ============
+"""
+Convert model logits (raw output scores) to probabilities (0-1 range, sum to 1)
+Used to get confidence scores for each gesture prediction
+"""
+def softmax(x):
+    # Subtract row max for numerical stability (prevents overflow)
+    ex = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    # Divide by sum to normalize to probability distribution
+    return ex / ex.sum(axis=-1, keepdims=True)
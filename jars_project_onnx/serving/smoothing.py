@@ -0,0 +1,151 @@
+"""
+PREDICTION SMOOTHING: Per-connection post-processing after softmax
+PURPOSE: Raw per-frame predictions flicker, and emitting one "prediction"
+         event per frame makes egress and client re-rendering scale with the
+         frame rate instead of with actual sign changes
+WORKFLOW (per sid, one call per scored frame):
+  1. Smooth the probabilities over recent frames
+       none: use the frame's probabilities as they are
+       ema:  s = alpha * p + (1 - alpha) * s
+       vote: majority vote of the last `window` argmaxes, scored by the mean
+             probability of the winning class over that window
+  2. Hysteresis: a class becomes the stable label once its smoothed score
+     reaches enter_threshold; the stable label is dropped ("unknown") when its
+     own score falls below exit_threshold
+  3. Emission: "every" emits each frame; "change" emits only when the stable
+     label changes or heartbeat_s passed since the last emit
+The defaults (none / 0.0 / 0.0 / every) reproduce plain per-frame argmax.
+"""
+
+import time
+
+import numpy as np
+
+SMOOTHING_METHODS = ("none", "ema", "vote")
+EMIT_MODES = ("every", "change")
+NO_LABEL = -1
+
+
+class SmoothingState:
+    """Smoothing history of one connection"""
+
+    __slots__ = ("ema", "history", "count", "stable", "last_emitted", "last_emit_time")
+
+    def __init__(self, num_classes, window):
+        self.ema = np.zeros(num_classes, dtype=np.float32)
+        self.history = np.zeros((window, num_classes), dtype=np.float32)
+        self.count = 0
+        self.stable = NO_LABEL
+        self.last_emitted = None
+        self.last_emit_time = 0.0
+
+
+class PredictionSmoother:
+    """
+    Smooth, stabilize and rate-limit predictions per connection
+
+    INPUT:
+      num_classes: length of one probability row
+      method: "none" | "ema" | "vote"
+      alpha: EMA weight of the newest frame (0..1]
+      window: frames in the majority vote
+      enter_threshold / exit_threshold: hysteresis on the smoothed score
+      emit_mode: "every" | "change"
+      heartbeat_s: longest silence in "change" mode
+    """
+
+    def __init__(self, num_classes, method="none", alpha=0.5, window=5,
+                 enter_threshold=0.0, exit_threshold=0.0, emit_mode="every", heartbeat_s=1.0):
+        if method not in SMOOTHING_METHODS:
+            raise ValueError(f"Unknown smoothing method {method!r}, expected one of {SMOOTHING_METHODS}")
+        if emit_mode not in EMIT_MODES:
+            raise ValueError(f"Unknown emit mode {emit_mode!r}, expected one of {EMIT_MODES}")
+        if exit_threshold > enter_threshold:
+            raise ValueError("exit_threshold must not exceed enter_threshold")
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError("alpha must be in (0, 1]")
+        self.num_classes = int(num_classes)
+        self.method = method
+        self.alpha = float(alpha)
+        self.window = max(1, int(window)) if method == "vote" else 1
+        self.enter_threshold = float(enter_threshold)
+        self.exit_threshold = float(exit_threshold)
+        self.emit_mode = emit_mode
+        self.heartbeat = float(heartbeat_s)
+        self._states = {}
+        self._votes = np.zeros(self.num_classes, dtype=np.int64)
+        self.received = 0
+        self.emitted = 0
+
+    @property
+    def bytes_per_client(self):
+        return (1 + self.window) * self.num_classes * 4
+
+    def _smooth(self, state, probs):
+        """Smoothed (scores, top class) for this frame"""
+        if self.method == "ema":
+            if state.count == 0:
+                state.ema[:] = probs
+            else:
+                state.ema *= 1.0 - self.alpha
+                state.ema += self.alpha * probs
+            state.count += 1
+            return state.ema, int(np.argmax(state.ema))
+        if self.method == "vote":
+            state.history[state.count % self.window] = probs
+            state.count += 1
+            recent = state.history[:min(state.count, self.window)]
+            votes = self._votes
+            votes[:] = 0
+            np.add.at(votes, np.argmax(recent, axis=1), 1)
+            # Ties go to the class with the higher mean probability
+            means = recent.mean(axis=0)
+            top = int(np.lexsort((means, votes))[-1])
+            return means, top
+        return probs, int(np.argmax(probs))
+
+    def update(self, sid, probs):
+        """
+        Feed one probability row for sid
+        OUTPUT: (label index or NO_LABEL, score) to emit, or None to stay silent
+        """
+        self.received += 1
+        state = self._states.get(sid)
+        if state is None:
+            state = self._states[sid] = SmoothingState(self.num_classes, self.window)
+        scores, top = self._smooth(state, probs)
+
+        # Hysteresis on the stable label
+        if state.stable == NO_LABEL or top != state.stable:
+            if scores[top] >= self.enter_threshold:
+                state.stable = top
+            elif state.stable != NO_LABEL and scores[state.stable] < self.exit_threshold:
+                state.stable = NO_LABEL
+        elif scores[state.stable] < self.exit_threshold:
+            state.stable = NO_LABEL
+
+        label = state.stable
+        score = float(scores[label] if label != NO_LABEL else scores[top])
+
+        if self.emit_mode == "change":
+            now = time.monotonic()
+            if label == state.last_emitted and now - state.last_emit_time < self.heartbeat:
+                return None
+            state.last_emit_time = now
+        state.last_emitted = label
+        self.emitted += 1
+        return label, score
+
+    def release(self, sid):
+        """Forget sid's history (disconnect)"""
+        self._states.pop(sid, None)
+
+    def snapshot(self):
+        return {
+            "method": self.method,
+            "emit_mode": self.emit_mode,
+            "received": self.received,
+            "emitted": self.emitted,
+            "suppressed": self.received - self.emitted,
+            "emitted_ratio": (self.emitted / self.received) if self.received else 1.0,
+        }
@@ -0,0 +1,334 @@
+"""
+STATIC ASSETS: The frontend served from memory, precompressed and cacheable
+PURPOSE: Page loads share the process (and, in eventlet mode, the loop) with
+         the landmark traffic. Reading, compressing and hashing files per
+         request makes every burst of page loads a burst of work in front of
+         the predictions; here that work happens once per file:
+  LOAD (preload() in a background thread at startup, or on the first
+        request for a file added later)
+    - every file under root is read into memory with a content-hash ETag
+    - compressible types get gzip and (if the brotli package is installed)
+      brotli variants, kept only when smaller; `python -m serving.static
+      build` writes them next to the files ahead of time (.gz / .br), and
+      those are used while newer than their source
+    - HTML pages have their local src= / href= references rewritten to
+      "file?v=<hash>", so the page always names the current version of
+      each asset
+  SERVE (respond(): a dict lookup plus an os.stat of the file, and of
+         the assets a page names)
+    - Accept-Encoding picks br > gzip > identity (Vary: Accept-Encoding)
+    - If-None-Match -> 304; ?v=<current hash> -> immutable for a year,
+      anything else (index.html, unversioned URLs) -> no-cache, i.e.
+      revalidated by ETag on every use
+    - Range: bytes=... -> 206 on the identity bytes (If-Range honoured),
+      416 when unsatisfiable
+  A file edited on disk is reloaded on its next request (mtime / size).
+USAGE (from jars_project_onnx/):
+  python -m serving.static build frontend
+"""
+
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import threading
+
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Files are loaded in real OS threads (eventlet's tpool, asyncio.to_thread)
+# while green threads / the event loop only read the dict, so the load lock
+# must be an OS lock even under eventlet.monkey_patch()
+if "eventlet" in sys.modules:
+    from eventlet.patcher import original as _original
+    _threading = _original("threading")
+else:
+    _threading = threading
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+PRECOMPRESSED = {"br": ".br", "gzip": ".gz"}
+COMPRESSIBLE = re.compile(r"^(text/|application/(javascript|json|xml|wasm|manifest\+json)|image/svg\+xml)")
+LOCAL_REFERENCE = re.compile(r'\b(src|href)="([^"?#:]+)"')
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encodings():
+    """Content codings this process can produce, preferred first"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def accepted_encodings(header):
+    """Codings named in an Accept-Encoding header with q > 0"""
+    accepted = set()
+    for item in (header or "").split(","):
+        name, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def byte_range(header, size):
+    """(start, stop) for a single "bytes=a-b" range; None to ignore it, False when unsatisfiable"""
+    unit, _, spec = (header or "").partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None                                 # Other units / multipart ranges: send it all
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            start, stop = max(0, size - int(last)), size    # Suffix: the last N bytes
+        else:
+            start, stop = int(first), min(size, int(last) + 1) if last else size
+    except ValueError:
+        return None
+    return (start, stop) if start < stop else False
+
+
+class Asset:
+    """One file: its bytes, compressed variants and validators"""
+
+    __slots__ = ("path", "stat", "content_type", "hash", "body", "variants", "dependencies")
+
+    def __init__(self, path, stat, content_type, body, dependencies=None):
+        self.path = path
+        self.stat = stat                            # (mtime_ns, size) the bytes came from
+        self.content_type = content_type
+        self.hash = hashlib.sha256(body).hexdigest()[:20]
+        self.body = body
+        self.variants = {}                          # coding -> bytes
+        self.dependencies = dependencies or {}      # Referenced asset -> hash baked into body
+
+    def etag(self, encoding=None):
+        return f'"{self.hash}-{encoding}"' if encoding else f'"{self.hash}"'
+
+    def matches(self, if_none_match):
+        """If-None-Match hit on any representation of this content"""
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or any(t.strip('"').split("-", 1)[0] == self.hash for t in tags)
+
+
+class StaticAssets:
+    """In-memory, precompressed copy of the files under root"""
+
+    def __init__(self, root, index="index.html"):
+        self.root = os.path.abspath(root)
+        self.index = index
+        self.assets = {}
+        self.lock = _threading.RLock()             # Held across a page's loads of its assets
+        self.loads = 0
+
+    # ============ LOADING ============
+    def preload(self):
+        """Load every file under root (background work at startup)"""
+        for path in self.files():
+            self.get(path)
+        total = sum(len(a.body) for a in self.assets.values())
+        print(f"Static assets: {len(self.assets)} files, {total / 1024:.0f} KiB in memory "
+              f"(precompressed: {', '.join(encodings())})")
+
+    def files(self):
+        for directory, _, names in os.walk(self.root):
+            for name in sorted(names):
+                if not name.endswith(tuple(PRECOMPRESSED.values())):
+                    yield os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, "/")
+
+    def disk_stat(self, path):
+        """(mtime_ns, size) of path's file, None when there is no such file under root"""
+        full_path = safe_join(self.root, path)
+        if full_path is None or not os.path.isfile(full_path):
+            return None
+        st = os.stat(full_path)
+        return st.st_mtime_ns, st.st_size
+
+    def cached(self, path):
+        """The loaded asset when it is still current on disk, else None"""
+        asset = self.assets.get(path)
+        if asset is None or asset.stat != self.disk_stat(path):
+            return None
+        if any(self.hash_of(dep) != dep_hash for dep, dep_hash in asset.dependencies.items()):
+            return None                             # A page naming an asset that changed since
+        return asset
+
+    def hash_of(self, path):
+        asset = self.cached(path)
+        return asset.hash if asset is not None else None
+
+    def get(self, path):
+        """Current asset for path (loading it if needed); None when there is no such file"""
+        asset = self.cached(path)
+        if asset is not None:
+            return asset
+        stat = self.disk_stat(path)
+        if stat is None:
+            return None
+        with self.lock:
+            asset = self.load(path, stat)
+            self.assets[path] = asset
+            self.loads += 1
+        return asset
+
+    def load(self, path, stat):
+        full_path = safe_join(self.root, path)
+        with open(full_path, "rb") as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        dependencies = {}
+        if content_type == "text/html":
+            body = self.version_references(path, body, dependencies)
+        if content_type.startswith("text/") or content_type == "application/javascript":
+            content_type += "; charset=utf-8"
+        asset = Asset(path, stat, content_type, body, dependencies)
+        if COMPRESSIBLE.match(content_type) and not dependencies:
+            asset.variants = self.precompressed(full_path, stat) or {}
+        if COMPRESSIBLE.match(content_type):
+            for encoding in encodings():
+                if encoding not in asset.variants:
+                    data = compress(body, encoding)
+                    if len(data) < len(body):
+                        asset.variants[encoding] = data
+        return asset
+
+    def precompressed(self, full_path, stat):
+        """Variants `build` wrote next to the file, when newer than it"""
+        variants = {}
+        for encoding, suffix in PRECOMPRESSED.items():
+            try:
+                if encoding in encodings() and os.stat(full_path + suffix).st_mtime_ns >= stat[0]:
+                    with open(full_path + suffix, "rb") as f:
+                        variants[encoding] = f.read()
+            except OSError:
+                continue
+        return variants
+
+    def version_references(self, page, body, dependencies):
+        """Append ?v=<hash> to the page's references to files under root"""
+        base = os.path.dirname(page)
+
+        def versioned(match):
+            target = os.path.normpath(os.path.join(base, match.group(2))).replace(os.sep, "/")
+            if mimetypes.guess_type(target)[0] == "text/html":
+                return match.group(0)               # Links between pages stay unversioned
+            asset = self.get(target)
+            if asset is None:
+                return match.group(0)
+            dependencies[target] = asset.hash
+            return f'{match.group(1)}="{match.group(2)}?v={asset.hash}"'
+
+        return LOCAL_REFERENCE.sub(versioned, body.decode("utf-8")).encode("utf-8")
+
+    # ============ SERVING ============
+    def respond(self, path, method="GET", headers=None, version=None, load=True):
+        """
+        (status, headers, body) for a GET / HEAD of path ("" = index)
+        INPUT:
+          headers: request headers, looked up by lower-case name
+          version: the request's ?v= value
+          load: False returns None instead of reading a file that is not
+                (or no longer) in memory, for callers that load elsewhere
+        """
+        if method not in ("GET", "HEAD"):
+            return 405, [("Allow", "GET, HEAD"), ("Content-Type", "text/plain")], b"Method Not Allowed"
+        headers = headers or {}
+        path = path.lstrip("/") or self.index
+        asset = self.cached(path)
+        if asset is None:
+            if not load:
+                return None if self.disk_stat(path) is not None else not_found()
+            asset = self.get(path)
+            if asset is None:
+                return not_found()
+
+        common = [("Cache-Control", IMMUTABLE if version == asset.hash else REVALIDATE),
+                  ("Accept-Ranges", "bytes")]
+        if asset.variants:
+            common.append(("Vary", "Accept-Encoding"))
+        # Chosen before the 304 so it carries the ETag of the variant it revalidates
+        accepted = accepted_encodings(headers.get("accept-encoding"))
+        encoding = next((e for e in encodings() if e in accepted and e in asset.variants), None)
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and asset.matches(if_none_match):
+            return 304, common + [("ETag", asset.etag(encoding))], b""
+
+        span = None
+        if headers.get("range") and headers.get("if-range", asset.etag()) == asset.etag():
+            span = byte_range(headers["range"], len(asset.body))
+            if span is False:
+                return 416, common + [("Content-Range", f"bytes */{len(asset.body)}")], b""
+        if span is not None:
+            start, stop = span
+            body = asset.body[start:stop]
+            response = [("ETag", asset.etag()), ("Content-Range", f"bytes {start}-{stop - 1}/{len(asset.body)}")]
+            status = 206
+        else:
+            body = asset.variants[encoding] if encoding else asset.body
+            response = [("ETag", asset.etag(encoding))]
+            if encoding:
+                response.append(("Content-Encoding", encoding))
+            status = 200
+        response += [("Content-Type", asset.content_type), ("Content-Length", str(len(body)))]
+        return status, common + response, b"" if method == "HEAD" else body
+
+    def snapshot(self):
+        return {
+            "files": len(self.assets),
+            "bytes": sum(len(a.body) for a in self.assets.values()),
+            "compressed_bytes": {e: sum(len(a.variants.get(e, a.body)) for a in self.assets.values())
+                                 for e in encodings()},
+            "loads": self.loads,
+        }
+
+
+def not_found():
+    return 404, [("Content-Type", "text/plain")], b"Not Found"
+
+
+# ============ BUILD ============
+def build(root):
+    """Write .gz / .br next to every compressible file under root (HTML is versioned at load time instead)"""
+    assets = StaticAssets(root)
+    for path in assets.files():
+        full_path = os.path.join(assets.root, path)
+        content_type = mimetypes.guess_type(full_path)[0] or ""
+        if not COMPRESSIBLE.match(content_type) or content_type == "text/html":
+            continue
+        with open(full_path, "rb") as f:
+            body = f.read()
+        for encoding in encodings():
+            data = compress(body, encoding)
+            if len(data) < len(body):
+                with open(full_path + PRECOMPRESSED[encoding], "wb") as f:
+                    f.write(data)
+                print(f"{path}{PRECOMPRESSED[encoding]}: {len(body)} -> {len(data)} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="Precompress the files of a static directory")
+    build_parser.add_argument("root", nargs="?", default="frontend")
+    args = parser.parse_args()
+    build(args.root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+MODEL VARIANTS: Pick which exported model the server loads
+PURPOSE: model/build_variants.py writes fp32 / dynamic-int8 / static-int8
+         variants plus a report (model/variants/report.json) with each
+         variant's held-out accuracy. This module resolves a variant name to
+         a model file and refuses variants that lose too much accuracy, or
+         that were built from another model.onnx than the one on disk
+         (retrained since: the report records its source's fingerprint).
+"""
+
+import hashlib
+import json
+import os
+
+BASELINE_VARIANT = "fp32"
+REPORT_NAME = "report.json"
+
+
+class VariantRejected(RuntimeError):
+    """Raised when a variant is unknown or its accuracy drop is too large"""
+
+
+def model_fingerprint(model_path):
+    """sha256 of a model file and its external weight data (<model>.data), if any"""
+    digest = hashlib.sha256()
+    for path in (model_path, model_path + ".data"):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_report(variants_dir):
+    """Return the variants report dict, or None when no report was built"""
+    path = os.path.join(variants_dir, REPORT_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def resolve_variant(variant, default_model_path, variants_dir, max_accuracy_drop, prefer_ort=True):
+    """
+    Map a variant name to the file the InferenceSession should load
+    INPUT:
+      variant: "fp32" (default model.onnx) or a name from report.json
+      default_model_path: model/model.onnx, used for the fp32 baseline
+      variants_dir: directory holding report.json and the variant files
+      max_accuracy_drop: largest allowed (baseline - variant) accuracy, 0..1
+      prefer_ort: load the pre-optimized .ort file when one was saved
+    OUTPUT:
+      (model_path, info) where info is the report entry (or {} for fp32
+      without a current report)
+    """
+    report = load_report(variants_dir)
+    current = report is not None and report.get("source_sha256") == model_fingerprint(default_model_path)
+    if variant == BASELINE_VARIANT and not (current and variant in report["variants"]):
+        return default_model_path, {}
+    if report is None:
+        raise VariantRejected(
+            f"MODEL_VARIANT={variant!r} but {os.path.join(variants_dir, REPORT_NAME)} does not exist; "
+            "run model/build_variants.py first"
+        )
+    if not current:
+        raise VariantRejected(
+            f"MODEL_VARIANT={variant!r} was built from another model than {default_model_path} "
+            "(retrained since?); re-run model/build_variants.py"
+        )
+
+    info = report["variants"].get(variant)
+    if info is None:
+        raise VariantRejected(f"Unknown model variant {variant!r}, built: {sorted(report['variants'])}")
+
+    drop = info.get("accuracy_drop")
+    if drop is None:
+        raise VariantRejected(f"Variant {variant!r} has no recorded accuracy; rebuild it with held-out data")
+    if drop > max_accuracy_drop:
+        raise VariantRejected(
+            f"Variant {variant!r} loses {drop:.2%} accuracy (limit {max_accuracy_drop:.2%}); refusing to load it"
+        )
+
+    path = info["ort_path"] if prefer_ort and info.get("ort_path") else info["path"]
+    return os.path.join(variants_dir, path), info
@@ -0,0 +1,181 @@
+"""
+LANDMARK WIRE FORMATS: Decode landmark frames sent by clients
+PURPOSE: Replace ~20 KB of JSON text per frame with a packed binary vector
+FORMATS:
+  json  - {"vector": [1530 floats], "normalized": bool}  (original protocol)
+  f32   - raw little-endian float32 values (6120 bytes for 1530 values)
+  f16   - raw little-endian float16 values (3060 bytes)
+  i16q  - 4-byte little-endian float32 scale header, then int16 values;
+          value = q * scale  (4 + 3060 bytes)
+  sparse - 4-byte header (uint8 presence flags + 3 reserved bytes), then
+           float32 x,y,z values of the PRESENT blocks only, in block order:
+             bit 0: hand 1 (points 0-20)    63 values
+             bit 1: hand 2 (points 21-41)   63 values
+             bit 2: face   (points 42-509)  1404 values
+           Absent blocks are zero in the reconstructed (510, 3) frame, exactly
+           like the zero padding used by the dense formats
+  Dense formats carry either the full 1530 values or, for a landmark-subset
+  model, only the points the server announced in "landmark_layout".
+NEGOTIATION:
+  A client emits "wire_format" {"format": "f16", "normalized": false} once
+  after connecting. From then on its "landmark" events may carry the binary
+  payload as a Socket.IO binary attachment; dict payloads still take the JSON
+  path, so old and new clients can share one server during a roll-over.
+"""
+
+import numpy as np
+
+# ============ SUPPORTED FORMATS ============
+JSON_FORMAT = "json"
+BINARY_DTYPES = {
+    "f32": np.dtype("<f4"),
+    "f16": np.dtype("<f2"),
+    "i16q": np.dtype("<i2"),
+}
+SPARSE_FORMAT = "sparse"
+SUPPORTED_FORMATS = (JSON_FORMAT,) + tuple(BINARY_DTYPES) + (SPARSE_FORMAT,)
+I16Q_HEADER_BYTES = 4
+
+# Landmark blocks of the dense (510, 3) frame: (name, first point, end point)
+LANDMARK_BLOCKS = (
+    ("hand1", 0, 21),
+    ("hand2", 21, 42),
+    ("face", 42, 510),
+)
+NUM_POINTS = LANDMARK_BLOCKS[-1][2]
+SPARSE_HEADER_BYTES = 4
+
+
+# ============ PER-CONNECTION STATE ============
+class WireFormat:
+    """
+    Format negotiated by one connection (defaults to the JSON protocol)
+    Sparse connections own a preallocated (510, 3) frame that every payload
+    is reconstructed into, so decoding allocates nothing per frame
+    """
+
+    __slots__ = ("name", "normalized", "frame")
+
+    def __init__(self, name=JSON_FORMAT, normalized=False):
+        if name not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported wire format {name!r}, expected one of {SUPPORTED_FORMATS}")
+        self.name = name
+        self.normalized = bool(normalized)
+        self.frame = np.zeros((NUM_POINTS, 3), dtype=np.float32) if name == SPARSE_FORMAT else None
+
+
+# ============ DECODING ============
+def binary_values(payload, fmt):
+    """Number of values a dense binary payload holds, judged by its size (no validation)"""
+    dtype = BINARY_DTYPES.get(fmt)
+    if dtype is None:
+        return 0
+    header = I16Q_HEADER_BYTES if fmt == "i16q" else 0
+    return max(0, memoryview(payload).nbytes - header) // dtype.itemsize
+
+
+def decode_binary(payload, fmt, expected_dim):
+    """
+    Turn a binary landmark payload into a float32 vector
+    INPUT:
+      payload: bytes-like Socket.IO attachment
+      fmt: negotiated format name ("f32", "f16" or "i16q")
+      expected_dim: number of values the model expects (1530)
+    OUTPUT:
+      float32 array of shape (expected_dim,)
+      For f32 this is a zero-copy, READ-ONLY view over the payload buffer
+    """
+    dtype = BINARY_DTYPES.get(fmt)
+    if dtype is None:
+        raise ValueError(f"Binary payload received but negotiated format is {fmt!r}")
+
+    buf = memoryview(payload)
+    offset = 0
+    scale = None
+    if fmt == "i16q":
+        if buf.nbytes < I16Q_HEADER_BYTES:
+            raise ValueError("i16q payload is missing its scale header")
+        scale = np.frombuffer(buf, dtype="<f4", count=1)[0]
+        offset = I16Q_HEADER_BYTES
+
+    expected_bytes = offset + expected_dim * dtype.itemsize
+    if buf.nbytes != expected_bytes:
+        raise ValueError(
+            f"Invalid {fmt} payload: expected {expected_bytes} bytes, got {buf.nbytes}"
+        )
+
+    vec = np.frombuffer(buf, dtype=dtype, count=expected_dim, offset=offset)
+    if fmt == "f32":
+        return vec
+    if fmt == "f16":
+        return vec.astype(np.float32)
+    return vec.astype(np.float32) * np.float32(scale)
+
+
+def decode_sparse(payload, out):
+    """
+    Rebuild a dense landmark frame from a sparse payload
+    INPUT:
+      payload: bytes-like Socket.IO attachment (see "sparse" above)
+      out: preallocated float32 array of shape (510, 3), overwritten in place
+    OUTPUT:
+      out, with present blocks copied in and absent blocks zeroed
+    """
+    buf = memoryview(payload)
+    if buf.nbytes < SPARSE_HEADER_BYTES:
+        raise ValueError("sparse payload is missing its presence header")
+    flags = buf[0]
+
+    expected_bytes = SPARSE_HEADER_BYTES
+    for bit, (_, start, end) in enumerate(LANDMARK_BLOCKS):
+        if flags & (1 << bit):
+            expected_bytes += (end - start) * 3 * 4
+    if buf.nbytes != expected_bytes:
+        raise ValueError(
+            f"Invalid sparse payload: flags {flags:#05b} need {expected_bytes} bytes, got {buf.nbytes}"
+        )
+
+    offset = SPARSE_HEADER_BYTES
+    for bit, (_, start, end) in enumerate(LANDMARK_BLOCKS):
+        if flags & (1 << bit):
+            count = (end - start) * 3
+            out[start:end] = np.frombuffer(buf, dtype="<f4", count=count, offset=offset).reshape(-1, 3)
+            offset += count * 4
+        else:
+            out[start:end] = 0.0
+    return out
+
+
+# ============ ENCODING (clients, tests and benchmarks) ============
+def encode_binary(vec, fmt):
+    """Inverse of decode_binary: pack a float vector into a binary payload"""
+    arr = np.asarray(vec, dtype=np.float32).ravel()
+    if fmt == "i16q":
+        peak = float(np.max(np.abs(arr))) if arr.size else 0.0
+        scale = np.float32(peak / 32767.0 if peak > 0 else 1.0)
+        q = np.round(arr / scale).astype("<i2")
+        return np.asarray([scale], dtype="<f4").tobytes() + q.tobytes()
+    dtype = BINARY_DTYPES.get(fmt)
+    if dtype is None:
+        raise ValueError(f"Unsupported binary format {fmt!r}")
+    return arr.astype(dtype).tobytes()
+
+
+def encode_sparse(vec, present=None):
+    """
+    Inverse of decode_sparse
+    INPUT:
+      vec: dense 1530-value (or (510, 3)) landmark frame
+      present: optional iterable of block names to send; by default a block is
+               sent when any of its values is non-zero
+    """
+    pts = np.asarray(vec, dtype=np.float32).reshape(NUM_POINTS, 3)
+    flags = 0
+    parts = []
+    for bit, (name, start, end) in enumerate(LANDMARK_BLOCKS):
+        block = pts[start:end]
+        send = (name in present) if present is not None else bool(np.any(block))
+        if send:
+            flags |= 1 << bit
+            parts.append(block.astype("<f4").tobytes())
+    return bytes([flags, 0, 0, 0]) + b"".join(parts)
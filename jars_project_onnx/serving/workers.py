@@ -0,0 +1,413 @@
+"""
+MULTI-PROCESS INFERENCE WORKERS: ONNX scoring outside the Socket.IO process
+PURPOSE: Keep the front (Socket.IO) process doing I/O only. Frames go into
+         shared-memory ring buffers and a pool of worker processes, each with
+         its own InferenceSession and a pinned intra-op thread count, score them
+         and write probabilities back.
+LAYOUT (one SharedMemory block per worker, two single-producer rings):
+  header   int64[8]: req_head, req_tail, resp_head, resp_tail, heartbeat, ready
+  requests  ids int64[capacity] + rows float32[capacity, dim]        front -> worker
+  responses ids int64[capacity] + probs float32[capacity, classes]   worker -> front
+  Counters only grow; slot = counter % capacity. Each counter has exactly one
+  writer, and it is bumped only after its slot data is written.
+SIGNALLING: a pipe byte wakes the worker ("requests pending"), another wakes
+            the front ("responses ready"); nobody busy-polls.
+BACKPRESSURE: submit() picks the least loaded live worker and raises QueueFull
+              when every request ring is full.
+THREADS: submit() runs on the event loop and the collector / supervisor in
+         its own thread (a real one under server_asgi.py): a lock keeps a
+         restart from resetting a ring and its in-flight table mid-submit.
+HEALTH: dead workers, or workers whose heartbeat is stale, are killed and
+        respawned; their in-flight frames get an error instead of hanging.
+WORKER ENTRY POINT: python -m serving.workers ... (started by WorkerPool)
+"""
+
+import argparse
+import os
+import select
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from serving.batching import QueueFull
+from serving.registry import warm_up, warmup_batch_sizes
+from serving.session import create_session, softmax
+
+# The wake-up pipes are non-blocking and only carry signal bytes, so the
+# front process uses the real os.read/os.write even under eventlet (its green
+# versions wait for readiness first and would park the collector forever)
+if "eventlet" in sys.modules:
+    from eventlet.patcher import original as _original
+    _raw_os = _original("os")
+else:
+    _raw_os = os
+
+# ============ SHARED HEADER SLOTS ============
+REQ_HEAD, REQ_TAIL, RESP_HEAD, RESP_TAIL, HEARTBEAT, READY = range(6)
+HEADER_SLOTS = 8
+HEARTBEAT_INTERVAL = 1.0    # Worker refreshes its heartbeat at least this often
+
+
+# ============ SHARED-MEMORY RINGS ============
+class RingBlock:
+    """Numpy views over one worker's shared-memory block"""
+
+    def __init__(self, shm, capacity, dim, num_classes):
+        self.shm = shm
+        self.capacity = capacity
+        buf = shm.buf
+        offset = 0
+
+        def view(shape, dtype):
+            nonlocal offset
+            arr = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+            offset += arr.nbytes
+            return arr
+
+        self.header = view((HEADER_SLOTS,), np.int64)
+        self.req_ids = view((capacity,), np.int64)
+        self.req_rows = view((capacity, dim), np.float32)
+        self.resp_ids = view((capacity,), np.int64)
+        self.resp_probs = view((capacity, num_classes), np.float32)
+
+    @staticmethod
+    def nbytes(capacity, dim, num_classes):
+        return 8 * HEADER_SLOTS + capacity * (8 + 4 * dim) + capacity * (8 + 4 * num_classes)
+
+    def heartbeat(self):
+        """Worker heartbeat as CLOCK_MONOTONIC nanoseconds (shared across processes)"""
+        return int(self.header[HEARTBEAT])
+
+    def release(self):
+        # Drop numpy views first, otherwise SharedMemory.close() raises BufferError
+        self.header = self.req_ids = self.req_rows = self.resp_ids = self.resp_probs = None
+        self.shm.close()
+
+
+def _signal(fd):
+    """Write a wake-up byte; a full pipe already means 'wake up', so ignore it"""
+    try:
+        _raw_os.write(fd, b"\0")
+    except (BlockingIOError, BrokenPipeError, OSError):
+        pass
+
+
+def _drain(fd):
+    try:
+        while _raw_os.read(fd, 4096):
+            pass
+    except (BlockingIOError, OSError):
+        pass
+
+
+# ============ FRONT-PROCESS SIDE ============
+class _WorkerHandle:
+    """Front-process bookkeeping for one worker process"""
+
+    def __init__(self, index, ring):
+        self.index = index
+        self.ring = ring
+        self.proc = None
+        self.wake_w = None      # Front writes: requests pending
+        self.done_r = None      # Front reads: responses ready
+        self.in_flight = {}     # request id -> sid
+        self.restarts = 0
+        self.processed = 0
+
+    def load(self):
+        h = self.ring.header
+        return int(h[REQ_HEAD] - h[REQ_TAIL])
+
+
+class WorkerPool:
+    """
+    Drop-in replacement for MicroBatcher backed by worker processes
+    Same interface: start(), stop(), submit(sid, row), queue_depth(), snapshot()
+
+    INPUT:
+      model_path: model file each worker loads (.onnx or .ort)
+      dim, num_classes: row length in, probability vector length out
+      deliver: fn(sid, probs, error), called in the front process
+      workers: number of worker processes
+      intra_op_threads: ORT intra-op threads per worker (pinned, default 1)
+      capacity: request ring slots per worker (backpressure limit)
+      max_batch_size: most rows a worker scores in one session.run
+      pin_cpus: also pin worker i to CPU i (Linux only)
+      heartbeat_timeout: seconds without a heartbeat before a worker is restarted
+    """
+
+    def __init__(self, model_path, dim, num_classes, deliver, workers=2, intra_op_threads=1,
+                 capacity=256, max_batch_size=32, pin_cpus=False, heartbeat_timeout=10.0, cwd=None):
+        self.model_path = model_path
+        self.dim = int(dim)
+        self.num_classes = int(num_classes)
+        self.deliver = deliver
+        self.intra_op_threads = max(1, int(intra_op_threads))
+        self.capacity = int(capacity)
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.pin_cpus = pin_cpus
+        self.heartbeat_timeout = heartbeat_timeout
+        self.cwd = cwd or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.rejected = 0
+        self._next_id = 0
+        self._running = False
+        self._lock = threading.Lock()   # submit() vs a restart's ring reset
+        self._handles = []
+        for i in range(max(1, int(workers))):
+            size = RingBlock.nbytes(self.capacity, self.dim, self.num_classes)
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            self._handles.append(_WorkerHandle(i, RingBlock(shm, self.capacity, self.dim, self.num_classes)))
+
+    # ============ LIFECYCLE ============
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        for handle in self._handles:
+            self._spawn(handle)
+        self._thread = threading.Thread(target=self._collect_loop, name="worker-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        for handle in self._handles:
+            if handle.proc is not None and handle.proc.poll() is None:
+                handle.proc.terminate()
+                handle.proc.wait(timeout=5)
+            for fd in (handle.wake_w, handle.done_r):
+                if fd is not None:
+                    os.close(fd)
+            handle.wake_w = handle.done_r = None
+            shm = handle.ring.shm
+            handle.ring.release()
+            shm.unlink()
+
+    def wait_ready(self, timeout=30.0):
+        """Block until every worker has loaded its session (used by benchmarks)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if all(h.ring.header[READY] for h in self._handles):
+                return True
+            time.sleep(0.01)
+        return False
+
+    def _spawn(self, handle):
+        """(Re)start one worker process with fresh rings and pipes"""
+        handle.ring.header[:] = 0
+        wake_r, wake_w = os.pipe()
+        done_r, done_w = os.pipe()
+        os.set_blocking(wake_w, False)
+        os.set_blocking(done_r, False)
+        cmd = [
+            sys.executable, "-m", "serving.workers",
+            "--shm", handle.ring.shm.name,
+            "--wake-fd", str(wake_r),
+            "--done-fd", str(done_w),
+            "--model", self.model_path,
+            "--dim", str(self.dim),
+            "--classes", str(self.num_classes),
+            "--capacity", str(self.capacity),
+            "--max-batch", str(self.max_batch_size),
+            "--threads", str(self.intra_op_threads),
+        ]
+        if self.pin_cpus:
+            cmd += ["--cpu", str(handle.index % (os.cpu_count() or 1))]
+        handle.proc = subprocess.Popen(cmd, cwd=self.cwd, pass_fds=(wake_r, done_w))
+        os.close(wake_r)
+        os.close(done_w)
+        handle.wake_w, handle.done_r = wake_w, done_r
+        handle.ring.header[HEARTBEAT] = time.monotonic_ns()
+
+    # ============ PRODUCER SIDE ============
+    def submit(self, sid, row):
+        """Copy one row into the least loaded live worker's ring"""
+        with self._lock:
+            best = None
+            for handle in self._handles:
+                if handle.proc is None or handle.proc.poll() is not None:
+                    continue
+                load = handle.load()
+                if load < self.capacity and (best is None or load < best.load()):
+                    best = handle
+            if best is None:
+                self.rejected += 1
+                raise QueueFull("All inference worker queues are full")
+
+            ring = best.ring
+            head = int(ring.header[REQ_HEAD])
+            slot = head % self.capacity
+            req_id = self._next_id
+            self._next_id += 1
+            ring.req_rows[slot] = row
+            ring.req_ids[slot] = req_id
+            best.in_flight[req_id] = sid
+            ring.header[REQ_HEAD] = head + 1      # Publish only after the slot is written
+            _signal(best.wake_w)
+
+    def queue_depth(self):
+        return sum(h.load() for h in self._handles)
+
+    def queue_capacity(self):
+        return self.capacity * len(self._handles)
+
+    def snapshot(self):
+        return {
+            "mode": "workers",
+            "queue_depth": self.queue_depth(),
+            "rejected": self.rejected,
+            "workers": [
+                {
+                    "pid": h.proc.pid if h.proc else None,
+                    "alive": bool(h.proc and h.proc.poll() is None),
+                    "ready": bool(h.ring.header[READY]),
+                    "queue_depth": h.load(),
+                    "in_flight": len(h.in_flight),
+                    "processed": h.processed,
+                    "restarts": h.restarts,
+                }
+                for h in self._handles
+            ],
+        }
+
+    # ============ CONSUMER SIDE ============
+    def _collect_loop(self):
+        while self._running:
+            fds = {h.done_r: h for h in self._handles if h.done_r is not None}
+            try:
+                ready, _, _ = select.select(list(fds), [], [], HEARTBEAT_INTERVAL)
+            except (OSError, ValueError):
+                ready = []          # A pipe was swapped by a restart; rebuild the fd list
+            for fd in ready:
+                _drain(fd)
+            for handle in self._handles:
+                self._collect(handle)
+            self._supervise()
+
+    def _collect(self, handle):
+        ring = handle.ring
+        if ring.header is None:
+            return
+        tail = int(ring.header[RESP_TAIL])
+        head = int(ring.header[RESP_HEAD])
+        for counter in range(tail, head):
+            slot = counter % self.capacity
+            sid = handle.in_flight.pop(int(ring.resp_ids[slot]), None)
+            if sid is not None:
+                # Copy: the slot is reused as soon as RESP_TAIL moves on
+                self.deliver(sid, ring.resp_probs[slot].copy(), None)
+        if head != tail:
+            handle.processed += head - tail
+            ring.header[RESP_TAIL] = head
+
+    def _supervise(self):
+        now = time.monotonic_ns()
+        for handle in self._handles:
+            if not self._running or handle.proc is None:
+                continue
+            dead = handle.proc.poll() is not None
+            stale = (now - handle.ring.heartbeat()) / 1e9 > self.heartbeat_timeout
+            if not (dead or stale):
+                continue
+            reason = f"exited with code {handle.proc.returncode}" if dead else "stopped responding"
+            print(f"Inference worker {handle.index} (pid {handle.proc.pid}) {reason}; restarting")
+            if not dead:
+                handle.proc.kill()
+                handle.proc.wait()
+            # submit() skips the dead process from here on; one already past
+            # that check finishes before the ring and in-flight table reset.
+            # Fail everything the old process still owed an answer for
+            with self._lock:
+                lost, handle.in_flight = handle.in_flight, {}
+                handle.ring.header[:] = 0
+            for sid in lost.values():
+                self.deliver(sid, None, RuntimeError("Inference worker restarted, frame dropped"))
+            for fd in (handle.wake_w, handle.done_r):
+                os.close(fd)
+            handle.restarts += 1
+            self._spawn(handle)
+
+
+# ============ WORKER-PROCESS SIDE ============
+def worker_main(args):
+    """Score rows from the request ring until the front process goes away"""
+    if args.cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {args.cpu})
+
+    os.set_blocking(args.done_fd, False)
+    shm = shared_memory.SharedMemory(name=args.shm)
+    # The front process owns the block; stop this process's tracker from
+    # unlinking it when the worker exits (Python < 3.13 registers attachers)
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    ring = RingBlock(shm, args.capacity, args.dim, args.classes)
+    session = create_session(args.model, intra_op_threads=args.threads)
+    input_name = session.get_inputs()[0].name
+    # READY only after the first-run allocations are paid for
+    warm_up(session, warmup_batch_sizes(args.max_batch, session.get_inputs()[0].shape[0]))
+    batch = np.zeros((args.max_batch, args.dim), dtype=np.float32)
+    header = ring.header
+    header[HEARTBEAT] = time.monotonic_ns()
+    header[READY] = 1
+
+    while True:
+        readable, _, _ = select.select([args.wake_fd], [], [], HEARTBEAT_INTERVAL)
+        if readable:
+            try:
+                if not os.read(args.wake_fd, 4096):
+                    return          # Front process closed the pipe: shut down
+            except BlockingIOError:
+                pass
+        header[HEARTBEAT] = time.monotonic_ns()
+
+        while True:
+            tail = int(header[REQ_TAIL])
+            n = min(int(header[REQ_HEAD]) - tail, args.max_batch)
+            if n <= 0:
+                break
+            slots = (tail + np.arange(n)) % args.capacity
+            np.take(ring.req_rows, slots, axis=0, out=batch[:n])
+            ids = ring.req_ids[slots].copy()
+            header[REQ_TAIL] = tail + n       # Request slots are free again
+
+            logits = session.run(None, {input_name: batch[:n]})[0]
+            probs = softmax(np.asarray(logits, dtype=np.float32))
+
+            # Response ring has the same capacity and the front drains it, but
+            # never overwrite unread responses. Waiting on a slow front is not
+            # a hang: keep the heartbeat fresh so the supervisor does not
+            # restart a healthy worker under backpressure
+            while int(header[RESP_HEAD]) + n - int(header[RESP_TAIL]) > args.capacity:
+                header[HEARTBEAT] = time.monotonic_ns()
+                time.sleep(0.0005)
+            resp_head = int(header[RESP_HEAD])
+            out = (resp_head + np.arange(n)) % args.capacity
+            ring.resp_probs[out] = probs
+            ring.resp_ids[out] = ids
+            header[RESP_HEAD] = resp_head + n
+            header[HEARTBEAT] = time.monotonic_ns()
+            _signal(args.done_fd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference worker process (started by WorkerPool)")
+    parser.add_argument("--shm", required=True)
+    parser.add_argument("--wake-fd", type=int, required=True)
+    parser.add_argument("--done-fd", type=int, required=True)
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--dim", type=int, required=True)
+    parser.add_argument("--classes", type=int, required=True)
+    parser.add_argument("--capacity", type=int, required=True)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--cpu", type=int, default=None)
+    worker_main(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()